@@ -42,12 +42,17 @@ See function docstrings for additional details on arguments and return values.
                 * _run_command              : Run shell command locally or via SSH
                 * create_call_file          : Generate an Asterisk call file with given parameters
                 * execute_call_file         : Upload, set permissions, and trigger call file execution
-                * _get_recent_call_logs     : Fetch recent Asterisk log entries for a call
+                * _log_offset               : Full-log size checkpoint taken before spooling a call
+                * _get_recent_call_logs     : Fetch a call's Asterisk log (per-call index, or recent entries)
                 * simulate_did_call         : Simulate an incoming call to a DID (optionally force destination)
                 * test_extension_call       : Simulate a call to a specific extension
                 * test_voicemail_call       : Simulate a call directly to a voicemail box
                 * test_playback_application : Simulate a call that plays a sound file (Playback app)
                 * run_comprehensive_test_suite: Run a full suite of DID, extension, voicemail, playback, ring group, and queue tests
+                * run_load_test             : Originate N concurrent calls at a calls-per-second rate across DIDs;
+                                              report throughput, answer latency, failure codes, trunk saturation
+                * _load_ami_engine          : Load test over AMI (async Originate, one event stream for all calls)
+                * _load_callfile_engine     : Load test via batched .call files, CDRs via the CdrWatcher
                 * generate_test_summary     : Print and save a summary report of all test results
 
         main
@@ -65,6 +70,23 @@ from datetime import datetime, timedelta  # Date/time handling
 import json     # JSON encoding/decoding
 import socket   # Network interface and IP handling
 import re       # Regular expressions
+import threading  # Load test / CDR watcher state
+from concurrent.futures import Future  # CdrWatcher results
+
+# Sibling tools live in the same bin/ dir; the per-call log index is used
+# for local runs, with the tail/grep fallback kept for SSH targets.
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+try:
+    import freepbx_ami  # Load test: async Originate + one event stream for every call
+except ImportError:
+    freepbx_ami = None
+
+# AMI OriginateResponse Reason codes (AST_CONTROL_*) -> CDR-style disposition
+ORIGINATE_REASONS = {"0": "FAILED", "1": "HANGUP", "3": "NO ANSWER", "5": "BUSY", "8": "CONGESTION"}
 
 
 # Terminal color codes for pretty output
@@ -81,6 +103,151 @@ class Colors:
     RESET = '\033[0m'      # Reset
 
 
+class CdrWatcher:
+    """One shared CDR poll for every outstanding test call.
+
+    watch() registers a call (by origination channel prefix, linkedid,
+    uniqueid or account code) and returns a concurrent.futures.Future that
+    resolves to the call's CDR row as a dict — or to None once max_wait
+    seconds pass without one. A single daemon thread runs while calls are
+    outstanding and issues ONE query per poll_interval, whatever the number
+    of calls: rows newer than the mark, matched against every outstanding
+    call in calldate order, each row going to at most one call.
+
+    A row several calls could take goes to one matched by id (linkedid /
+    uniqueid / account) over one matched by channel prefix only, then to
+    the call with the LATEST `since` at or before its calldate: an older
+    call on the same channel can't have started after its own `since`, so
+    it must not take a newer call's row. Once a call has its row, its
+    linkedid is known and the call's other rows (the legs of a Local
+    channel) stay with it instead of resolving a later call; of the rows
+    one poll finds for a call, the ANSWERED one wins.
+
+    The mark is the start time of the oldest outstanding call, not the
+    newest calldate seen: CDR rows are written at hangup but stamped with
+    the call's start, so a long call can land after a newer short one.
+    Rows already handed out are skipped by (uniqueid, sequence).
+    """
+
+    COLUMNS = ["calldate", "src", "dst", "disposition", "duration", "billsec", "uniqueid", "linkedid",
+               "channel", "accountcode", "sequence"]
+
+    def __init__(self, query, poll_interval=3):
+        self.query = query                  # sql -> list of tab-split rows (FreePBXCallSimulator._query_cdr)
+        self.poll_interval = poll_interval
+        self.queries = 0                    # CDR queries issued (for --debug / tests)
+        self._calls = []                    # outstanding call records, in watch() order
+        self._seen = set()
+        self._claimed = set()               # linkedids of calls already resolved
+        self._has_sequence = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, channel=None, since=None, max_wait=20, linkedid=None, account=None, callback=None,
+              uniqueid=None):
+        """Future for the CDR row of the call that started at/after `since`
+        on `channel` (prefix, like channel LIKE 'X%'), or with `linkedid` /
+        `uniqueid` / `account`. `callback(row_or_None)` is also called when
+        it resolves."""
+        fut = Future()
+        if callback is not None:
+            fut.add_done_callback(lambda f: callback(f.result()))
+        call = {"channel": channel, "linkedid": linkedid, "uniqueid": uniqueid, "account": account,
+                "since": (since or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"),
+                "deadline": time.time() + max_wait, "future": fut}
+        with self._lock:
+            self._calls.append(call)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return fut
+
+    def outstanding(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _sql(self, floor):
+        if self._has_sequence is None:
+            rows = self.query("SHOW COLUMNS FROM cdr LIKE 'sequence';")
+            self._has_sequence = bool(rows)
+        cols = self.COLUMNS if self._has_sequence else self.COLUMNS[:-1] + ["0"]
+        return (f"SELECT {','.join(cols)} FROM cdr WHERE calldate >= '{floor}' "
+                f"ORDER BY calldate ASC{', sequence ASC' if self._has_sequence else ''};")
+
+    def _matches(self, call, row):
+        if row["calldate"] < call["since"]:
+            return False
+        if call["linkedid"] and row["linkedid"] != call["linkedid"]:
+            return False
+        if call["uniqueid"] and call["uniqueid"] not in (row["uniqueid"], row["linkedid"]):
+            return False
+        if call["account"] and row["accountcode"] != call["account"]:
+            return False
+        if call["channel"] and not row["channel"].startswith(call["channel"]):
+            return False
+        return True
+
+    @staticmethod
+    def _rank(call):
+        """Preference among calls matching one row: matched by id, then newest."""
+        by_id = bool(call["linkedid"] or call["uniqueid"] or call["account"])
+        return (by_id, call["since"])
+
+    def poll(self):
+        """Run one query and resolve every outstanding call it answers."""
+        with self._lock:
+            if not self._calls:
+                return
+            floor = min(c["since"] for c in self._calls)
+        rows = self.query(self._sql(floor))
+        self.queries += 1
+        resolved = {}    # linkedid (or uniqueid) -> (call, [rows])
+        with self._lock:
+            for raw in rows:
+                row = dict(zip(self.COLUMNS, raw + [""] * (len(self.COLUMNS) - len(raw))))
+                key = (row["uniqueid"], row["sequence"])
+                if key in self._seen:
+                    continue
+                link = row["linkedid"] or row["uniqueid"]
+                if link in self._claimed:
+                    # Another leg of a call that already has its row
+                    self._seen.add(key)
+                    if link in resolved:
+                        resolved[link][1].append(row)
+                    continue
+                matching = [c for c in self._calls if self._matches(c, row)]
+                if not matching:
+                    continue
+                call = max(matching, key=self._rank)
+                self._seen.add(key)
+                self._calls.remove(call)
+                if link:
+                    self._claimed.add(link)
+                resolved[link or key] = (call, [row])
+        for call, found in resolved.values():
+            call["future"].set_result(next((r for r in found if r["disposition"] == "ANSWERED"), found[0]))
+
+    def _run(self):
+        while True:
+            self.poll()
+            now = time.time()
+            with self._lock:
+                expired = [c for c in self._calls if c["deadline"] <= now]
+                for call in expired:
+                    self._calls.remove(call)
+                if not self._calls:
+                    self._thread = None
+                    self._seen.clear()
+                    self._claimed.clear()
+                wake = min([c["deadline"] for c in self._calls] + [now + self.poll_interval])
+                idle = not self._calls
+            for call in expired:
+                call["future"].set_result(None)
+            if idle:
+                return
+            time.sleep(max(0.05, min(self.poll_interval, wake - now)))
+
+
 # Main simulator class for generating and executing test calls
 class FreePBXCallSimulator:
     def __init__(self, server_ip=None, ssh_user="123net"):
@@ -101,6 +268,7 @@ class FreePBXCallSimulator:
         self.test_results = []                        # Store test results
         self.debug = False                            # Enable debug output when True
         self.is_local_execution = self._is_local_execution()  # Detect local/remote
+        self.cdr_watcher = CdrWatcher(self._query_cdr)  # One CDR poll for every outstanding call
 
     def _detect_local_ip(self):
         """Best-effort detection of this box's own primary IP, used as the
@@ -283,24 +451,14 @@ class FreePBXCallSimulator:
         row until the call hangs up, which for an unanswered ring group/
         queue/extension can be the full configured ring time away.
         Returns the matching row as a dict, or None if nothing showed up
-        within max_wait seconds."""
-        cols = ["calldate", "src", "dst", "disposition", "duration", "billsec", "uniqueid", "linkedid"]
-        since_str = since_dt.strftime("%Y-%m-%d %H:%M:%S")
-        sql = (f"SELECT {','.join(cols)} FROM cdr "
-               f"WHERE channel LIKE '{channel}%' AND calldate >= '{since_str}' "
-               f"ORDER BY calldate ASC LIMIT 1;")
-        deadline = time.time() + max_wait
-        while True:
-            rows = self._query_cdr(sql)
-            if rows:
-                return dict(zip(cols, rows[0]))
-            if time.time() >= deadline:
-                return None
-            time.sleep(poll_interval)
+        within max_wait seconds. The polling itself is shared: every call
+        waiting here is served by the same CdrWatcher query."""
+        self.cdr_watcher.poll_interval = poll_interval
+        return self.cdr_watcher.watch(channel=channel, since=since_dt, max_wait=max_wait).result()
 
     def create_call_file(self, channel, caller_id, destination, context="from-internal",
                         priority=1, wait_time=30, max_retries=2, application=None, 
-                        data=None, archive=False):
+                        data=None, archive=False, account=None):
         """
         Create an Asterisk call file with specified parameters.
         Args:
@@ -314,6 +472,7 @@ class FreePBXCallSimulator:
             application (str): Optional Asterisk application
             data (str): Data for application
             archive (bool): Whether to archive the call file
+            account (str): Optional account code (ends up in CDR accountcode)
         Returns:
             str: The call file content
         """
@@ -341,6 +500,8 @@ class FreePBXCallSimulator:
             call_file_content.append(f"Priority: {priority}")
         
         # Optional fields
+        if account:
+            call_file_content.append(f"Account: {account}")
         if archive:
             call_file_content.append("Archive: yes")
         else:
@@ -434,6 +595,7 @@ class FreePBXCallSimulator:
             # Using mv ensures file is moved (not copied) as required by Asterisk
             self.debug_print("Moving call file to spool directory (this triggers call)...", "INFO")
             call_started_at = datetime.now()
+            log_offset = self._log_offset()
             move_cmd = f"mv {temp_file} {target_file}"
             move_result = self._run_command(move_cmd, timeout=10)
             
@@ -496,7 +658,7 @@ class FreePBXCallSimulator:
             
             # Get call logs for this time period
             self.debug_print("Fetching recent call logs...", "INFO")
-            call_logs = self._get_recent_call_logs(call_id)
+            call_logs = self._get_recent_call_logs(call_id, channel=channel, since_offset=log_offset)
 
             if call_logs:
                 print(f"   {Colors.CYAN}📜 Retrieved {len(call_logs)} log entries{Colors.RESET}")
@@ -560,15 +722,39 @@ class FreePBXCallSimulator:
                 'call_id': call_id
             }
     
-    def _get_recent_call_logs(self, call_id, minutes=2):
+    def _log_offset(self):
+        """Current size of the local full log (the per-call index only
+        considers calls that start after it), or None when not local."""
+        if not self.is_local_execution or freepbx_log_index is None:
+            return None
+        try:
+            return os.path.getsize(freepbx_log_index.FULL_LOG)
+        except OSError:
+            return None
+
+    def _get_recent_call_logs(self, call_id, minutes=2, channel=None, since_offset=None):
         """
         Get recent Asterisk logs related to the call.
         Args:
             call_id (str): The call identifier.
             minutes (int): How far back to look in logs.
+            channel (str): Origination channel of the call file. On a local
+                run with a since_offset checkpoint, the calls Asterisk logged
+                on this channel are looked up in the per-call log index and
+                their complete logs returned (by call-id, via direct seeks).
+            since_offset (int): Full-log size taken just before spooling.
         Returns:
             list: Recent log lines.
         """
+        if channel and since_offset is not None:
+            try:
+                calls = freepbx_log_index.call_log(channel=channel, since=since_offset)
+            except OSError as e:
+                calls = []
+                self.debug_print(f"Call log index unavailable: {e}", "WARNING")
+            if calls:
+                self.debug_print(f"Asterisk call-id(s): {', '.join(cid for cid, _ in calls)}", "INFO")
+                return [l for _cid, lines in calls for l in lines]
         try:
             # Get logs from the last few minutes
             log_cmd = f"tail -100 /var/log/asterisk/full | grep -E '(NOTICE|WARNING|ERROR)' | tail -20"
@@ -1010,6 +1196,404 @@ class FreePBXCallSimulator:
         # Generate summary report
         self.generate_test_summary()
     
+    # ---------------------------
+    # Load test (concurrent calls)
+    # ---------------------------
+
+    def _query_dids(self):
+        """DIDs configured on the target PBX (inbound routes with a number)."""
+        try:
+            result = self._run_command(
+                'mysql -BN --user=root asterisk -e "SELECT extension FROM incoming WHERE extension <> \'\';" 2>/dev/null',
+                timeout=10
+            )
+        except Exception:
+            return []
+        if result.returncode != 0 or not result.stdout.strip():
+            return []
+        return [ln.strip() for ln in result.stdout.splitlines() if ln.strip() and ln.strip().isdigit()]
+
+    def _query_trunks(self):
+        """[{"name", "prefix", "maxchans"}] of the enabled trunks. `prefix` is
+        the channel-name prefix their calls use (None for DAHDI/custom)."""
+        try:
+            result = self._run_command(
+                'mysql -BN --user=root asterisk -e "SELECT tech, channelid, maxchans FROM trunks '
+                'WHERE disabled <> \'on\';" 2>/dev/null',
+                timeout=10
+            )
+        except Exception:
+            return []
+        if result.returncode != 0:
+            return []
+        techs = {"pjsip": "PJSIP", "sip": "SIP", "iax": "IAX2", "iax2": "IAX2"}
+        trunks = []
+        for ln in result.stdout.splitlines():
+            parts = ln.split('\t')
+            if len(parts) < 2 or not parts[1].strip():
+                continue
+            tech = techs.get(parts[0].strip().lower())
+            maxchans = parts[2].strip() if len(parts) > 2 else ""
+            trunks.append({
+                "name": parts[1].strip(),
+                "prefix": f"{tech}/{parts[1].strip()}-" if tech else None,
+                "maxchans": int(maxchans) if maxchans.isdigit() and int(maxchans) > 0 else None,
+            })
+        return trunks
+
+    def _load_channel(self, did):
+        """(channel, context, exten) a load-test call to `did` enters the
+        dialplan with — the same from-did-direct entry simulate_did_call uses."""
+        return f"Local/{did}@from-did-direct", "from-did-direct", did
+
+    def _load_ami_engine(self, plan, cps, wait_time, hold, max_concurrent, trunks, progress):
+        """Originate the plan's calls over AMI (async Originate) and follow
+        them all on one event stream. Returns the per-call records and the
+        channel peaks; raises AMIError if AMI can't be used."""
+        settings = freepbx_ami.connection_settings()
+        if settings is None:
+            raise freepbx_ami.AMIError("AMI not available")
+        client = freepbx_ami.AMIClient(events="call", **settings)
+        lock = threading.Lock()
+        responses = {}     # ActionID -> (time, OriginateResponse)
+        hangups = {}       # Uniqueid -> (time, cause)
+        live = {}          # Uniqueid -> trunk name (None: not a trunk channel)
+        peaks = {"channels": 0, "trunks": {}}
+
+        def on_event(e):
+            now = time.time()
+            name = e.get("Event")
+            with lock:
+                if name == "OriginateResponse":
+                    responses[e.get("ActionID", "")] = (now, e)
+                elif name == "Newchannel":
+                    chan = e.get("Channel", "")
+                    trunk = next((t["name"] for t in trunks if t["prefix"] and chan.startswith(t["prefix"])), None)
+                    live[e.get("Uniqueid", "")] = trunk
+                    peaks["channels"] = max(peaks["channels"], len(live))
+                    if trunk:
+                        up = sum(1 for t in live.values() if t == trunk)
+                        peaks["trunks"][trunk] = max(peaks["trunks"].get(trunk, 0), up)
+                elif name == "Hangup":
+                    live.pop(e.get("Uniqueid", ""), None)
+                    hangups[e.get("Uniqueid", "")] = (now, e.get("Cause", ""), e.get("Cause-txt", ""))
+
+        client.add_listener(on_event)
+        client.connect()
+
+        def finished(call):
+            resp = responses.get(call["action_id"])
+            if resp is None:
+                return call["error"] is not None
+            if resp[1].get("Response") != "Success":
+                return True
+            return resp[1].get("Uniqueid") in hangups
+
+        try:
+            start = time.time()
+            for call in plan:
+                target = start + call["n"] / cps
+                while True:
+                    with lock:
+                        in_flight = sum(1 for c in plan[:call["n"]] if not finished(c))
+                    now = time.time()
+                    if in_flight < max_concurrent and now >= target:
+                        break
+                    time.sleep(min(0.05, max(0.005, target - now)))
+                channel, context, exten = self._load_channel(call["did"])
+                call["sent"] = time.time()
+                try:
+                    resp = client.action("Originate", Channel=channel, Application="Wait", Data=str(hold),
+                                         CallerID=call["caller_id"], Timeout=str(wait_time * 1000),
+                                         Account=call["tag"], Async="true")
+                    call["action_id"] = resp.get("ActionID")
+                except freepbx_ami.AMIError as e:
+                    call["error"] = str(e)
+                progress(call)
+            deadline = time.time() + wait_time + hold + 30
+            while time.time() < deadline:
+                with lock:
+                    if all(finished(c) for c in plan):
+                        break
+                time.sleep(0.1)
+        finally:
+            client.close()
+
+        with lock:
+            for call in plan:
+                resp = responses.get(call["action_id"])
+                if call["error"] is not None:
+                    call["result"] = "ORIGINATE ERROR"
+                elif resp is None:
+                    call["result"] = "NO RESPONSE"
+                else:
+                    at, e = resp
+                    reason = e.get("Reason", "")
+                    if e.get("Response") == "Success":
+                        call["result"] = "ANSWERED"
+                        call["answer_s"] = at - call["sent"]
+                        end = hangups.get(e.get("Uniqueid"))
+                        if end:
+                            call["ended"] = end[0]
+                            call["cause"] = f"{end[1]} {end[2]}".strip()
+                    else:
+                        call["result"] = ORIGINATE_REASONS.get(reason, f"REASON {reason}")
+                    call["ended"] = call.get("ended") or at
+        return plan, peaks
+
+    def _load_callfile_engine(self, plan, cps, wait_time, hold, max_concurrent, trunks, progress, poll_interval=3):
+        """Spool the plan's calls as .call files (tagged with an account code)
+        and follow them all through the shared CdrWatcher (one CDR query per
+        poll, each call matched by its account code) plus one channel sample
+        per poll. Works locally and over SSH."""
+        peaks = {"channels": 0, "trunks": {}}
+        since = datetime.now()
+        state = {"polled": 0.0}
+        futures = []
+        self.cdr_watcher.poll_interval = poll_interval
+
+        def cdr_result(call, row):
+            if row is None or call.get("ended"):
+                return
+            call["result"] = row["disposition"]
+            call["ended"] = time.time()
+            if row["disposition"] == "ANSWERED" and row["duration"].isdigit() and row["billsec"].isdigit():
+                call["answer_s"] = float(int(row["duration"]) - int(row["billsec"]))
+
+        def poll():
+            if time.time() - state["polled"] < poll_interval:
+                return
+            state["polled"] = time.time()
+            try:
+                result = self._run_command('asterisk -rx "core show channels concise"', timeout=10)
+                names = [ln.split('!', 1)[0] for ln in result.stdout.splitlines() if '!' in ln]
+            except Exception:
+                names = []
+            peaks["channels"] = max(peaks["channels"], len(names))
+            for t in trunks:
+                if t["prefix"]:
+                    up = sum(1 for n in names if n.startswith(t["prefix"]))
+                    peaks["trunks"][t["name"]] = max(peaks["trunks"].get(t["name"], 0), up)
+
+        start = time.time()
+        batch = []
+
+        def spool(batch):
+            script = []
+            for call in batch:
+                channel, context, exten = self._load_channel(call["did"])
+                content = self.create_call_file(channel, call["caller_id"], exten, context=context,
+                                                wait_time=wait_time, max_retries=0, application="Wait",
+                                                data=str(hold), account=call["tag"])
+                tmp = f"{self.tmp_dir}/call_{call['tag']}"
+                script.append(f'cat > {tmp} << "EOF"\n{content}EOF\n'
+                              f"chown {self.asterisk_user}:{self.asterisk_user} {tmp} 2>/dev/null; "
+                              f"chmod 644 {tmp}; mv {tmp} {self.spool_dir}/call_{call['tag']}.call")
+            try:
+                result = self._run_command("\n".join(script), timeout=30)
+                error = None if result.returncode == 0 else (result.stderr.strip() or "spool failed")
+            except Exception as e:
+                error = str(e)
+            for call in batch:
+                call["sent"] = time.time()
+                call["error"] = error
+                if error is None:
+                    futures.append((call, self.cdr_watcher.watch(
+                        account=call["tag"], since=since, max_wait=wait_time + hold + 30,
+                        callback=lambda row, call=call: cdr_result(call, row))))
+                progress(call)
+
+        for call in plan:
+            target = start + call["n"] / cps
+            while True:
+                in_flight = sum(1 for c in plan[:call["n"]] if c["sent"] and c["error"] is None
+                                and c.get("result") is None) + len(batch)
+                now = time.time()
+                if now >= target and in_flight < max_concurrent:
+                    break
+                if batch:
+                    spool(batch)
+                    batch = []
+                poll()
+                time.sleep(min(0.25, max(0.01, target - now)))
+            batch.append(call)
+        if batch:
+            spool(batch)
+        deadline = time.time() + wait_time + hold + 30
+        while time.time() < deadline and any(c["error"] is None and c.get("result") is None for c in plan):
+            poll()
+            time.sleep(0.5)
+        for call, fut in futures:
+            # Each expires by its own deadline, no later than ours
+            cdr_result(call, fut.result())
+        for call in plan:
+            if call["error"] is not None:
+                call["result"] = "SPOOL ERROR"
+            elif call.get("result") is None:
+                call["result"] = "NO CDR"
+        return plan, peaks
+
+    def run_load_test(self, dids, calls=10, cps=1.0, max_concurrent=10, wait_time=30, hold=10,
+                      caller_id="8884400123", engine="auto"):
+        """
+        Originate `calls` calls across `dids` (round robin) at `cps` calls
+        per second with at most `max_concurrent` in flight, follow all of
+        them together and report throughput, answer latency, failure codes
+        and trunk saturation. Each answered call runs Wait(hold) and hangs up.
+        Args:
+            dids (list): DIDs to call (entered via from-did-direct).
+            calls (int): Total calls to place.
+            cps (float): Origination rate, calls per second.
+            max_concurrent (int): Cap on calls in flight at once.
+            wait_time (int): Ring timeout per call (seconds).
+            hold (int): Seconds an answered call stays up.
+            caller_id (str): Caller ID for the calls.
+            engine (str): "ami" (async Originate + events, local only),
+                "callfile" (spool + CDR polling, local or SSH) or "auto".
+        Returns:
+            dict: The load-test report (also saved as JSON).
+        """
+        if not dids:
+            print(f"{Colors.RED}❌ No DIDs to call{Colors.RESET}")
+            return None
+        run_tag = "lt" + format(int(time.time()), "x")[-7:]
+        plan = [{"n": n, "did": dids[n % len(dids)], "tag": f"{run_tag}-{n}", "caller_id": caller_id,
+                 "sent": None, "error": None, "action_id": None}
+                for n in range(calls)]
+        cps = max(0.01, float(cps))
+        trunks = self._query_trunks()
+        if engine == "ami" and freepbx_ami is None:
+            print(f"{Colors.YELLOW}⚠️  freepbx_ami.py not found — using call files{Colors.RESET}")
+            engine = "callfile"
+        if engine == "auto":
+            engine = "ami" if self.is_local_execution and freepbx_ami is not None else "callfile"
+
+        print(f"\n{Colors.YELLOW}╔{'═' * 78}╗{Colors.RESET}")
+        print(f"{Colors.YELLOW}║{Colors.BOLD}{Colors.WHITE} 📈 CALL LOAD TEST{' ' * 60}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
+        print(f"{Colors.YELLOW}╠{'═' * 78}╣{Colors.RESET}")
+        setup = f"{calls} calls @ {cps:g}/s, max {max_concurrent} in flight, hold {hold}s, {len(dids)} DID(s)"
+        print(f"{Colors.YELLOW}║{Colors.WHITE} {setup:<76}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
+        print(f"{Colors.YELLOW}║{Colors.WHITE} Engine: {Colors.CYAN}{engine:<68}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
+        print(f"{Colors.YELLOW}╚{'═' * 78}╝{Colors.RESET}")
+
+        def progress(call):
+            mark = f"{Colors.RED}✗{Colors.RESET}" if call["error"] else f"{Colors.GREEN}·{Colors.RESET}"
+            print(mark, end="\n" if (call["n"] + 1) % 60 == 0 else "", flush=True)
+
+        started = time.time()
+        try:
+            if engine == "ami":
+                try:
+                    plan, peaks = self._load_ami_engine(plan, cps, wait_time, hold, max_concurrent, trunks, progress)
+                except freepbx_ami.AMIError as e:
+                    print(f"\n{Colors.YELLOW}⚠️  AMI unavailable ({e}) — using call files{Colors.RESET}")
+                    engine = "callfile"
+            if engine == "callfile":
+                plan, peaks = self._load_callfile_engine(plan, cps, wait_time, hold, max_concurrent, trunks, progress)
+        except KeyboardInterrupt:
+            print(f"\n{Colors.YELLOW}⏹️  Load test interrupted — reporting what was placed{Colors.RESET}")
+            peaks = {"channels": 0, "trunks": {}}
+            for call in plan:
+                call.setdefault("result", None)
+                call["result"] = call["result"] or ("NOT PLACED" if call["sent"] is None else "INTERRUPTED")
+        print()
+        report = self._load_report(plan, peaks, trunks, time.time() - started, engine)
+        self._print_load_report(report)
+        return report
+
+    def _load_report(self, plan, peaks, trunks, elapsed, engine):
+        """Summarise the finished plan into the load-test report dict."""
+        sent = [c["sent"] for c in plan if c["sent"]]
+        answered = [c for c in plan if c.get("result") == "ANSWERED"]
+        latencies = sorted(c["answer_s"] for c in answered if c.get("answer_s") is not None)
+        ends = [c["ended"] for c in plan if c.get("ended")]
+        codes = {}
+        for c in plan:
+            if c.get("result") != "ANSWERED":
+                codes[c.get("result") or "UNKNOWN"] = codes.get(c.get("result") or "UNKNOWN", 0) + 1
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+        origin_span = (max(sent) - min(sent)) if len(sent) > 1 else 0.0
+        trunk_rows = []
+        congestion = sum(n for code, n in codes.items() if code in ("CONGESTION", "CHANUNAVAIL"))
+        for t in trunks:
+            peak = peaks["trunks"].get(t["name"], 0)
+            trunk_rows.append({
+                "trunk": t["name"], "maxchans": t["maxchans"], "peak": peak,
+                "saturated": bool(t["maxchans"] and peak >= t["maxchans"]),
+            })
+        return {
+            "engine": engine,
+            "calls": len(plan),
+            "placed": len(sent),
+            "answered": len(answered),
+            "failed": len(plan) - len(answered),
+            "failure_codes": codes,
+            "elapsed_s": round(elapsed, 2),
+            "originate_rate": round((len(sent) - 1) / origin_span, 2) if origin_span else None,
+            "throughput_cps": round(len(ends) / (max(ends) - min(sent)), 2) if ends and sent and max(ends) > min(sent) else None,
+            "answer_latency_s": {"avg": round(sum(latencies) / len(latencies), 3) if latencies else None,
+                                 "p50": pct(0.5), "p95": pct(0.95),
+                                 "max": round(latencies[-1], 3) if latencies else None},
+            "peak_channels": peaks["channels"],
+            "trunks": trunk_rows,
+            "congestion_failures": congestion,
+            "trunk_saturated": any(r["saturated"] for r in trunk_rows) or congestion > 0,
+            "call_results": [{k: c.get(k) for k in ("n", "did", "tag", "result", "answer_s", "cause", "error")}
+                             for c in plan],
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def _print_load_report(self, r):
+        """Print the load-test report and save it as JSON (like generate_test_summary)."""
+        lat = r["answer_latency_s"]
+
+        def fmt(v, unit="s"):
+            return f"{v:.3f}{unit}" if isinstance(v, float) else "n/a"
+
+        rows = [
+            ("Calls placed", f"{r['placed']}/{r['calls']}  (answered {r['answered']}, failed {r['failed']})"),
+            ("Originate rate", f"{r['originate_rate']} calls/s" if r["originate_rate"] else "n/a"),
+            ("Throughput", f"{r['throughput_cps']} completed calls/s" if r["throughput_cps"] else "n/a"),
+            ("Answer latency", f"avg {fmt(lat['avg'])}  p50 {fmt(lat['p50'])}  p95 {fmt(lat['p95'])}  max {fmt(lat['max'])}"),
+            ("Peak channels", str(r["peak_channels"])),
+            ("Elapsed", f"{r['elapsed_s']}s ({r['engine']})"),
+        ]
+        print(f"\n{Colors.GREEN}╔{'═' * 78}╗{Colors.RESET}")
+        print(f"{Colors.GREEN}║{Colors.BOLD}{Colors.WHITE} 📊 LOAD TEST RESULTS{' ' * 57}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+        print(f"{Colors.GREEN}╠{'═' * 78}╣{Colors.RESET}")
+        for label, value in rows:
+            print(f"{Colors.GREEN}║{Colors.WHITE}  {label + ':':<17}{Colors.CYAN}{value[:58]:<58}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+        if r["failure_codes"]:
+            print(f"{Colors.GREEN}╠{'═' * 78}╣{Colors.RESET}")
+            print(f"{Colors.GREEN}║{Colors.RED} ❌ Failure codes:{' ' * 60}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+            for code, n in sorted(r["failure_codes"].items(), key=lambda kv: -kv[1]):
+                print(f"{Colors.GREEN}║{Colors.YELLOW}    {code:<30}{Colors.WHITE}{n:<43}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+        if r["trunks"]:
+            print(f"{Colors.GREEN}╠{'═' * 78}╣{Colors.RESET}")
+            print(f"{Colors.GREEN}║{Colors.CYAN} 📡 Trunk saturation (peak concurrent / maxchans):{' ' * 27}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+            for t in r["trunks"]:
+                limit = t["maxchans"] if t["maxchans"] else "∞"
+                color = Colors.RED if t["saturated"] else Colors.WHITE
+                flag = "SATURATED" if t["saturated"] else ""
+                print(f"{Colors.GREEN}║{color}    {t['trunk'][:30]:<30} {t['peak']:>4} / {str(limit):<6} {flag:<28}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+        if r["congestion_failures"]:
+            msg = f"{r['congestion_failures']} call(s) failed with congestion — trunk/channel capacity reached"
+            print(f"{Colors.GREEN}║{Colors.RED}  ⚠️  {msg:<72}{Colors.RESET}{Colors.GREEN} ║{Colors.RESET}")
+        print(f"{Colors.GREEN}╚{'═' * 78}╝{Colors.RESET}")
+
+        results_file = f"call_load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        try:
+            with open(results_file, 'w') as f:
+                json.dump(r, f, indent=2)
+            print(f"\n{Colors.BLUE}💾 Results saved to: {Colors.BOLD}{results_file}{Colors.RESET}")
+        except Exception as e:
+            print(f"\n{Colors.YELLOW}⚠️  Could not save results: {str(e)}{Colors.RESET}")
+
     def generate_test_summary(self):
         """
         Generate a summary report of all test results.
@@ -1110,6 +1694,15 @@ def main():
     parser.add_argument("--playback", help="Test playback application with sound file")
     parser.add_argument("--caller-id", help="Override caller ID (defaults to DID for DID tests)")
     parser.add_argument("--comprehensive", action="store_true", help="Run comprehensive test suite")
+    parser.add_argument("--load", type=int, metavar="N", help="Load test: place N calls concurrently")
+    parser.add_argument("--dids", help="Load test: comma-separated DIDs (default: --did, else every DID on the PBX)")
+    parser.add_argument("--cps", type=float, default=1.0, help="Load test: calls per second (default: 1)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Load test: max calls in flight (default: 10)")
+    parser.add_argument("--hold", type=int, default=10, help="Load test: seconds each answered call stays up (default: 10)")
+    parser.add_argument("--ring-time", type=int, default=30, help="Load test: ring timeout per call (default: 30)")
+    parser.add_argument("--engine", choices=["auto", "ami", "callfile"], default="auto",
+                        help="Load test: AMI Originate (local) or .call files (default: auto)")
+    parser.add_argument("--yes", action="store_true", help="Load test: don't ask for confirmation")
     parser.add_argument("--debug", action="store_true", help="Enable detailed debug output")
     parser.add_argument("-v", "--verbose", action="store_true", help="Enable verbose output (same as --debug)")
     args = parser.parse_args()
@@ -1127,7 +1720,23 @@ def main():
         print(f"{Colors.CYAN}║{Colors.WHITE} Caller ID: {Colors.MAGENTA}{Colors.BOLD}{args.caller_id:<64}{Colors.RESET}{Colors.CYAN} ║{Colors.RESET}")
     print(f"{Colors.CYAN}╚{'═' * 78}╝{Colors.RESET}")
     # Execute based on arguments
-    if args.comprehensive:
+    if args.load:
+        dids = [d.strip() for d in (args.dids or args.did or "").split(",") if d.strip()]
+        dids = dids or simulator._query_dids()
+        if not dids:
+            print(f"{Colors.RED}❌ No DIDs given (--dids) and none found on the PBX{Colors.RESET}")
+            sys.exit(1)
+        if not args.yes:
+            print(f"\n{Colors.RED}{Colors.BOLD}⚠️  This places {args.load} REAL calls on {simulator.server_ip} "
+                  f"({args.cps:g}/s, up to {args.concurrency} at once).{Colors.RESET}")
+            if input(f"{Colors.YELLOW}Type 'yes' to continue: {Colors.RESET}").strip().lower() != "yes":
+                sys.exit(1)
+        caller = args.caller_id or "8884400123"
+        report = simulator.run_load_test(dids, calls=args.load, cps=args.cps, max_concurrent=args.concurrency,
+                                         wait_time=args.ring_time, hold=args.hold, caller_id=caller,
+                                         engine=args.engine)
+        sys.exit(0 if report and report["answered"] == report["calls"] else 1)
+    elif args.comprehensive:
         simulator.run_comprehensive_test_suite()
     elif args.did:
         result = simulator.simulate_did_call(args.did, destination=args.destination, caller_id=args.caller_id)
@@ -1171,6 +1780,9 @@ def main():
         print(f"{Colors.YELLOW}║{Colors.RESET}{' ' * 78}{Colors.YELLOW}║{Colors.RESET}")
         print(f"{Colors.YELLOW}║{Colors.CYAN} # Run comprehensive suite:{' ' * 52}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
         print(f"{Colors.YELLOW}║{Colors.WHITE}   python3 call_simulator.py --comprehensive{' ' * 33}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
+        print(f"{Colors.YELLOW}║{Colors.RESET}{' ' * 78}{Colors.YELLOW}║{Colors.RESET}")
+        print(f"{Colors.YELLOW}║{Colors.CYAN} # Load test (50 calls, 2/s, max 20 at once):{' ' * 32}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
+        print(f"{Colors.YELLOW}║{Colors.WHITE}   python3 call_simulator.py --load 50 --cps 2 --concurrency 20{' ' * 13}{Colors.RESET}{Colors.YELLOW} ║{Colors.RESET}")
         print(f"{Colors.YELLOW}╚{'═' * 78}╝{Colors.RESET}")
 
 # Standard Python entry point
@@ -26,6 +26,12 @@ See function docstrings for additional details on arguments and return values.
     FUNCTION MAP (Major Methods)
     ---------------------------
     setup_logging           : Configure and return logger instance
+    _call_log_lines         : A test call's own log lines via the per-call log index
+    predict_flow            : Predicted flow for a DID from the loaded routing config (no subprocess)
+    load_config             : Load the routing config once (snapshot / local DB / server's snapshot)
+    _simulate_ami_call      : AMI test call, its log lines picked out by its own channel
+    validate_dids           : Validate many DIDs concurrently (bounded worker count)
+    run_batch               : --dids / --all CLI path: progress, summary, one results file
     parse_args              : Parse command-line arguments
     load_test_cases         : Load call flow test cases from file or stdin
     run_all_tests           : Run all call flow validation tests
@@ -36,6 +42,7 @@ See function docstrings for additional details on arguments and return values.
     main                    : CLI entry point, parses arguments and runs tests
 """
 
+import os
 import sys
 import subprocess
 import time
@@ -44,8 +51,44 @@ import re
 import socket
 import argparse
 import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Sibling tools live in the same bin/ dir; the per-call log index is
+# optional (local runs only), with the tail/grep fallback kept.
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+try:
+    import freepbx_callflow_graph  # CallflowConfig: routing config in memory (DB pass or snapshot)
+except ImportError:
+    freepbx_callflow_graph = None
+try:
+    import freepbx_ami  # Test calls: async Originate, followed by Uniqueid on one event stream
+except ImportError:
+    freepbx_ami = None
+
+FULL_LOG = "/var/log/asterisk/full"
+SNAPSHOT_PATH = "/home/123net/callflows/freepbx_dump.json"   # freepbx_dump.py output (menu default)
+WORKERS = 4          # DIDs validated at once by validate_dids()
+SETTLE_TIME = 5      # Seconds a test call is followed before its log lines are read
+ORIGINATE_WAIT = 20  # Seconds to wait for an AMI OriginateResponse
+
+# Log heuristics, compiled once instead of per line
+_LOG_LEVEL_RE = re.compile(r'NOTICE|WARNING|ERROR|VERBOSE')
+_COMPONENT_RES = (
+    ('IVR', re.compile(r'(ivr|IVR)', re.IGNORECASE)),
+    ('TimeCondition', re.compile(r'(timecondition|time.*condition)', re.IGNORECASE)),
+    ('RingGroup', re.compile(r'(ringgroup|ring.*group)', re.IGNORECASE)),
+    ('Voicemail', re.compile(r'(voicemail|vm)', re.IGNORECASE)),
+)
+_EXT_RE = re.compile(r'(\d{4,5})')
+_LOG_ERROR_RE = re.compile(r'(ERROR|FAILED|BUSY|CONGESTION)', re.IGNORECASE)
+
 def get_all_local_ips():
     """Enumerate every IPv4 address configured on this host's network
     interfaces — not just the one hostname resolution or a single
@@ -76,6 +119,96 @@ def get_all_local_ips():
     return ips
 
 
+def predict_flow(cfg, did, max_depth=25):
+    """Predicted flow for `did`, walked straight from a loaded
+    freepbx_callflow_graph.CallflowConfig — the same dict
+    _parse_callflow_output() builds from the ASCII tool's text, without a
+    process per DID. Every branch is followed (both time-condition sides,
+    every IVR key), as the ASCII tool draws them. None if the DID has no
+    inbound route."""
+    route = cfg.incoming.get(did)
+    if route is None:
+        return None
+    label, dest = route
+    flow = {
+        'components': [],
+        'destinations': [],
+        'has_ivr': False,
+        'has_time_condition': False,
+        'has_ring_group': False,
+        'has_voicemail': False,
+        'extensions': [],
+        'label': label,
+        'source': 'config'
+    }
+
+    def component(name, flag):
+        flow[flag] = True
+        if name not in flow['components']:
+            flow['components'].append(name)
+
+    def extension(ext):
+        if ext and ext not in flow['extensions']:
+            flow['extensions'].append(ext)
+
+    seen = set()
+    stack = [(dest, 0)]
+    while stack:
+        dest, depth = stack.pop()
+        if not dest or dest in seen or depth > max_depth:
+            continue
+        seen.add(dest)
+        ctx, rest, _raw = freepbx_callflow_graph.parse_dest(dest)
+        arg = rest[0] if rest else ""
+        children = []
+
+        if ctx == "timeconditions":
+            component('TimeCondition', 'has_time_condition')
+            tc = cfg.timeconditions.get(arg)
+            if tc:
+                children = [tc[2], tc[3]]
+            flow['destinations'].append(f"Time Condition {arg}: {tc[0] if tc else '(not found)'}")
+        elif ctx.startswith("ivr-"):
+            component('IVR', 'has_ivr')
+            ivr_id = ctx.split("-")[1]
+            name, options = cfg.ivrs.get(ivr_id, (None, []))
+            children = [d for _sel, d in options]
+            flow['destinations'].append(f"IVR {ivr_id}: {name or '(not found)'}")
+        elif ctx.startswith("app-announcement-"):
+            ann_id = ctx.split("-")[-1]
+            desc, post = cfg.announcements.get(ann_id, ("", ""))
+            children = [post]
+            flow['destinations'].append(f"Announcement {ann_id}: {desc or '(no description)'}")
+        elif ctx == "ext-group":
+            component('RingGroup', 'has_ring_group')
+            rg = cfg.ringgroups.get(arg)
+            if rg:
+                for token in (rg[2] or "").split("-"):
+                    token = token.strip()
+                    if token and not token.endswith("#"):
+                        extension(token)
+                children = [rg[5]]
+            flow['destinations'].append(f"Ring Group {arg}: {rg[1] if rg else '(not found)'}")
+        elif ctx == "ext-queues":
+            name = cfg.queues.get(arg, ("",))[0]
+            flow['destinations'].append(f"Queue {arg}: {name or '[no name]'}")
+        elif ctx == "from-did-direct":
+            extension(arg)
+            flow['destinations'].append(f"Extension {arg}")
+        elif ctx == "ext-local" and re.match(r"vm[ubsi]\d+", arg):
+            component('Voicemail', 'has_voicemail')
+            extension(arg[3:])
+            flow['destinations'].append(f"Voicemail {arg[3:]}")
+        else:
+            flow['destinations'].append(dest)
+
+        # Reversed so branches come out in config order (it's a stack)
+        for child in reversed(children):
+            stack.append((child, depth + 1))
+
+    return flow
+
+
 class Colors:
     """ANSI color codes for terminal output"""
     CYAN = '\033[96m'
@@ -124,7 +257,7 @@ def setup_logging(debug=False):
 logger = None
 
 class CallFlowValidator:
-    def __init__(self, server_ip=None, ssh_user="123net", debug=False):
+    def __init__(self, server_ip=None, ssh_user="123net", debug=False, snapshot=None):
         # No server_ip given -> default to THIS box's own IP, not a
         # hardcoded lab server. A tool deployed to a given PBX must
         # validate that PBX by default.
@@ -132,6 +265,27 @@ class CallFlowValidator:
         self.ssh_user = ssh_user
         self.debug = debug
         self.callflow_tool = "/usr/local/123net/freepbx-tools/bin/freepbx_version_aware_ascii_callflow.py"
+        self.is_local = self.server_ip in get_all_local_ips()
+
+        # Routing config for in-process prediction: loaded once per run
+        # (load_config) and shared by every DID; None -> ASCII tool per DID
+        self.snapshot = snapshot
+        self._config = None
+        self._config_loaded = False
+        self._config_lock = threading.Lock()
+
+        # Test calls: AMI-originated calls run concurrently and are told
+        # apart by Uniqueid; the call-file path shares one log checkpoint,
+        # so those calls take turns.
+        self._serial_lock = threading.Lock()
+        self._ami = None                  # AMIClient, False once it failed
+        self._ami_lock = threading.Lock()
+        self._ami_cond = threading.Condition()
+        self._live = {}                   # Uniqueid -> channel name (live channels)
+        self._originated = {}             # ActionID -> OriginateResponse event
+        self._abandoned = set()           # ActionIDs we stopped waiting for
+        self._hungup = set()              # Uniqueids of our test calls that hung up
+        self._watching = set()            # Uniqueids of our test calls still up
         
         # Get logger
         global logger
@@ -157,10 +311,75 @@ class CallFlowValidator:
             except OSError:
                 return "127.0.0.1"
 
+    def load_config(self):
+        """The routing config every prediction is computed from, loaded once:
+        the --snapshot file if given, else one pass over the local DB, else
+        (remote target) the server's own freepbx_dump.py snapshot fetched
+        with a single SSH. None when none of those is available, and each
+        DID falls back to running the ASCII tool."""
+        with self._config_lock:
+            if self._config_loaded:
+                return self._config
+            self._config_loaded = True
+            if freepbx_callflow_graph is None:
+                self.logger.info("freepbx_callflow_graph not available - using the ASCII tool per DID")
+                return None
+            cfg = None
+            try:
+                if self.snapshot:
+                    cfg = freepbx_callflow_graph.CallflowConfig.from_snapshot(self.snapshot)
+                elif self.is_local:
+                    cfg = freepbx_callflow_graph.CallflowConfig.from_db()
+                else:
+                    path = self._fetch_remote_snapshot()
+                    if path:
+                        try:
+                            cfg = freepbx_callflow_graph.CallflowConfig.from_snapshot(path)
+                        finally:
+                            os.unlink(path)
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning(f"Could not load call-flow config: {e}")
+                cfg = None
+            if cfg is not None and not cfg.incoming:
+                self.logger.warning("Call-flow config has no inbound routes - using the ASCII tool per DID")
+                cfg = None
+            if cfg is not None:
+                self.logger.info(f"Call-flow config loaded: {len(cfg.incoming)} inbound route(s)")
+            self._config = cfg
+            return cfg
+
+    def _fetch_remote_snapshot(self):
+        """Copy the target's snapshot to a local temp file (path), or None."""
+        cmd = ["ssh", f"{self.ssh_user}@{self.server_ip}", f"cat {SNAPSHOT_PATH}"]
+        self.logger.debug(f"SSH command: {' '.join(cmd)}")
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            self.logger.debug(f"Snapshot fetch failed: {e}")
+            return None
+        if result.returncode != 0 or not result.stdout:
+            self.logger.debug(f"No snapshot on {self.server_ip}: {result.stderr.decode('utf-8', 'replace').strip()}")
+            return None
+        fd, path = tempfile.mkstemp(prefix="callflow_snapshot_", suffix=".json")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(result.stdout)
+        return path
+
     def get_predicted_flow(self, did):
-        """Get predicted call flow from our ASCII tool"""
+        """Get predicted call flow: in-process from the loaded config when
+        there is one, otherwise from our ASCII tool"""
         self.logger.info(f"Getting predicted call flow for DID: {did}")
-        
+
+        cfg = self.load_config()
+        if cfg is not None:
+            flow = predict_flow(cfg, did)
+            if flow is None:
+                error_msg = f"No inbound route found for DID: {did}"
+                self.logger.error(error_msg)
+                return {'error': error_msg}
+            self.logger.debug(f"Predicted from config: {flow['components']} / {flow['extensions']}")
+            return flow
+
         try:
             # Check if we're running on the same server - if so, run locally.
             # Checks every local IP (multi-homed boxes have more than one),
@@ -245,11 +464,27 @@ class CallFlowValidator:
         
         return flow_data
     
-    def simulate_call_and_monitor(self, did, caller_id="8884400123"):
-        """Simulate call and monitor actual Asterisk behavior"""
+    def simulate_call_and_monitor(self, did, caller_id="8884400123", verbose=True):
+        """Simulate call and monitor actual Asterisk behavior.
+
+        Locally, with AMI and the per-call log index, the call is
+        originated over AMI and its log lines are picked out by its own
+        channel, so any number of these can run at once. Otherwise the
+        call-file path below runs, one call at a time (it reads the log
+        from a shared checkpoint)."""
         self.logger.info(f"Starting call simulation for DID {did} with caller ID {caller_id}")
-        print(f"🚀 Simulating call to {did} and monitoring behavior...")
-        
+        if verbose:
+            print(f"🚀 Simulating call to {did} and monitoring behavior...")
+
+        client = self._ami_client() if (self.is_local and freepbx_log_index is not None) else None
+        if client is not None:
+            return self._simulate_ami_call(client, did, caller_id)
+
+        with self._serial_lock:
+            return self._simulate_callfile_call(did, caller_id)
+
+    def _simulate_callfile_call(self, did, caller_id):
+        """Call-file test call, correlated through the log checkpoint"""
         # Clear Asterisk logs before test
         self.logger.debug("Clearing Asterisk logs")
         self._clear_asterisk_logs()
@@ -271,7 +506,8 @@ class CallFlowValidator:
         
         # Analyze Asterisk logs
         self.logger.debug("Analyzing Asterisk logs")
-        log_analysis = self._analyze_asterisk_logs(call_result['call_id'])
+        log_analysis = self._analyze_asterisk_logs(call_result['call_id'],
+                                                   channel=f"local/{caller_id}@from-internal")
         
         result = {
             'call_successful': call_result['success'],
@@ -284,8 +520,123 @@ class CallFlowValidator:
         self.logger.info(f"Call simulation completed: {result['call_successful']}")
         return result
     
+    def _ami_client(self):
+        """Event-enabled AMI connection for test calls (opened once), or None"""
+        with self._ami_lock:
+            if self._ami is None:
+                self._ami = False
+                settings = freepbx_ami.connection_settings() if freepbx_ami is not None else None
+                if settings is not None:
+                    client = freepbx_ami.AMIClient(events="call", **settings)
+                    client.add_listener(self._on_ami_event)
+                    try:
+                        client.connect()
+                        self._ami = client
+                    except freepbx_ami.AMIError as e:
+                        self.logger.info(f"AMI unavailable, using call files: {e}")
+            return self._ami or None
+
+    def _on_ami_event(self, e):
+        """AMI reader thread: track channel names, originate results and hangups.
+
+        OriginateResponse goes to every event listener on the PBX; only the
+        ones for our own Originates (and not yet given up on) are kept."""
+        name = e.get("Event")
+        uid = e.get("Uniqueid", "")
+        with self._ami_cond:
+            if name == "Newchannel":
+                self._live[uid] = e.get("Channel", "")
+            elif name == "OriginateResponse":
+                action_id = e.get("ActionID", "")
+                client = self._ami
+                if not client or not client.owns(action_id):
+                    return
+                if action_id in self._abandoned:
+                    self._abandoned.discard(action_id)
+                    return
+                # Claimed here, in event order, so a Hangup right behind it isn't missed
+                channel = self._live.get(uid, "")
+                if channel:
+                    self._watching.add(uid)
+                self._originated[action_id] = (e, channel)
+            elif name == "Hangup":
+                self._live.pop(uid, None)
+                if uid in self._watching:
+                    self._watching.discard(uid)
+                    self._hungup.add(uid)
+            else:
+                return
+            self._ami_cond.notify_all()
+
+    def _simulate_ami_call(self, client, did, caller_id):
+        """Originate the test call over AMI and read back only its own log
+        lines: the OriginateResponse Uniqueid names the Local channel, and
+        the per-call log index maps that channel to its Asterisk call-ids."""
+        call_id = f"validation_{did}_{int(time.time())}"
+        try:
+            since = os.path.getsize(FULL_LOG)
+        except OSError:
+            since = 0
+        try:
+            response = client.action("Originate", Channel=f"Local/{caller_id}@from-internal",
+                                     Context="from-internal", Exten=did, Priority="1",
+                                     CallerID=caller_id, Timeout="15000", Async="true")
+        except freepbx_ami.AMIError as e:
+            error_msg = f"Call simulation failed: {e}"
+            self.logger.error(error_msg)
+            return {'error': error_msg}
+        action_id = response.get("ActionID", "")
+        self.logger.info(f"Test call originated over AMI: {call_id} (ActionID {action_id})")
+
+        deadline = time.time() + ORIGINATE_WAIT
+        with self._ami_cond:
+            while action_id not in self._originated and time.time() < deadline:
+                self._ami_cond.wait(max(0.0, deadline - time.time()))
+            event, channel = self._originated.pop(action_id, (None, ""))
+            uid = event.get("Uniqueid", "") if event is not None else ""
+            if event is None:
+                self._abandoned.add(action_id)  # drop the response if it still comes
+
+        if event is None:
+            error_msg = f"Call simulation failed: no OriginateResponse within {ORIGINATE_WAIT}s"
+            self.logger.error(error_msg)
+            return {'error': error_msg}
+        if event.get("Response") != "Success":
+            error_msg = f"Call simulation failed: Originate {event.get('Response')} (reason {event.get('Reason', '?')})"
+            self.logger.error(error_msg)
+            return {'error': error_msg}
+
+        # Follow the call until it hangs up, or SETTLE_TIME at most
+        deadline = time.time() + SETTLE_TIME
+        with self._ami_cond:
+            while uid not in self._hungup and time.time() < deadline:
+                self._ami_cond.wait(max(0.0, deadline - time.time()))
+            self._watching.discard(uid)
+            self._hungup.discard(uid)
+
+        # "Local/8884400123@from-internal-0000002b;1" -> both halves of this call
+        prefix = channel.rsplit(";", 1)[0] if channel else None
+        self.logger.debug(f"Test call {call_id}: Uniqueid {uid}, channel {channel or '?'}")
+        log_analysis = self._analyze_asterisk_logs(call_id, channel=prefix, since=since)
+
+        return {
+            'call_successful': True,
+            'call_processed': True,
+            'log_analysis': log_analysis,
+            'call_id': call_id,
+            'uniqueid': uid,
+            'channel': channel,
+            'timestamp': datetime.now().isoformat()
+        }
+
     def _clear_asterisk_logs(self):
         """Clear or mark current position in Asterisk logs"""
+        # Local runs also checkpoint the byte offset, so the per-call index
+        # only considers calls that start after this point.
+        try:
+            self.log_offset = os.path.getsize(FULL_LOG)
+        except OSError:
+            self.log_offset = 0
         try:
             # Get current log size for baseline
             cmd = ["ssh", f"{self.ssh_user}@{self.server_ip}", 
@@ -424,8 +775,31 @@ Archive: no
             self.logger.error(error_msg)
             return {'success': False, 'error': error_msg}
     
-    def _analyze_asterisk_logs(self, call_id):
-        """Analyze Asterisk logs for call behavior"""
+    def _call_log_lines(self, channel, since=None):
+        """(call_ids, lines) of the calls originated on `channel` since byte
+        offset `since` (default: the _clear_asterisk_logs() checkpoint), read
+        from the per-call log index by direct seeks — or None when the index
+        can't answer (no module, unreadable log, call not logged yet) and the
+        caller should fall back."""
+        if freepbx_log_index is None:
+            return None
+        if since is None:
+            since = getattr(self, 'log_offset', 0)
+        try:
+            calls = freepbx_log_index.call_log(channel=channel, since=since)
+        except OSError as e:
+            self.logger.debug(f"Call log index unavailable: {e}")
+            return None
+        if not calls:
+            return None
+        call_ids = [cid for cid, _lines in calls]
+        self.logger.debug(f"Call log index: {channel} -> {', '.join(call_ids)}")
+        return call_ids, [l for _cid, lines in calls for l in lines if _LOG_LEVEL_RE.search(l)]
+
+    def _analyze_asterisk_logs(self, call_id, channel=None, since=None):
+        """Analyze Asterisk logs for call behavior. With `since` (an AMI test
+        call) only that call's own lines count: no tail-of-log fallback,
+        which would pick up whatever other test calls were logging."""
         try:
             # Check if we should run locally (every local IP, not just one —
             # see get_all_local_ips()) — without it, this always SSHes to
@@ -434,57 +808,54 @@ Archive: no
             # isn't set up.
             is_local = self.server_ip in get_all_local_ips()
 
-            log_cmd = f"tail -n +{self.log_baseline + 1} /var/log/asterisk/full | grep -E '(NOTICE|WARNING|ERROR|VERBOSE)' | tail -50"
-            if is_local:
-                cmd = ["bash", "-c", log_cmd]
+            # Locally, pull exactly this call's lines (by Asterisk call-id)
+            # instead of whatever the last 50 lines of the log happen to be
+            found = self._call_log_lines(channel, since) if (is_local and channel) else None
+            if found is not None:
+                asterisk_call_ids, log_lines = found
+            elif since is not None:
+                asterisk_call_ids, log_lines = [], []
             else:
-                cmd = ["ssh", f"{self.ssh_user}@{self.server_ip}", log_cmd]
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=15)
+                asterisk_call_ids = []
+                log_cmd = f"tail -n +{self.log_baseline + 1} /var/log/asterisk/full | grep -E '(NOTICE|WARNING|ERROR|VERBOSE)' | tail -50"
+                if is_local:
+                    cmd = ["bash", "-c", log_cmd]
+                else:
+                    cmd = ["ssh", f"{self.ssh_user}@{self.server_ip}", log_cmd]
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=15)
 
-            if result.returncode != 0:
-                return {'error': 'Could not retrieve logs'}
-            
-            log_lines = result.stdout.strip().split('\n')
+                if result.returncode != 0:
+                    return {'error': 'Could not retrieve logs'}
+
+                log_lines = result.stdout.strip().split('\n')
             
             analysis = {
                 'components_hit': [],
                 'destinations_reached': [],
                 'errors': [],
-                'routing_path': []
+                'routing_path': [],
+                'asterisk_call_ids': asterisk_call_ids
             }
             
             for line in log_lines:
                 if not line.strip():
                     continue
-                    
-                # Detect IVR interaction
-                if re.search(r'(ivr|IVR)', line, re.IGNORECASE):
-                    analysis['components_hit'].append('IVR')
-                    analysis['routing_path'].append(f"IVR: {line.split()[-1] if line.split() else 'unknown'}")
-                
-                # Detect time condition evaluation
-                if re.search(r'(timecondition|time.*condition)', line, re.IGNORECASE):
-                    analysis['components_hit'].append('TimeCondition')
-                    analysis['routing_path'].append(f"TimeCondition: {line.split()[-1] if line.split() else 'unknown'}")
-                
-                # Detect ring group
-                if re.search(r'(ringgroup|ring.*group)', line, re.IGNORECASE):
-                    analysis['components_hit'].append('RingGroup')
-                    analysis['routing_path'].append(f"RingGroup: {line.split()[-1] if line.split() else 'unknown'}")
-                
-                # Detect voicemail
-                if re.search(r'(voicemail|vm)', line, re.IGNORECASE):
-                    analysis['components_hit'].append('Voicemail')
-                    analysis['routing_path'].append(f"Voicemail: {line.split()[-1] if line.split() else 'unknown'}")
+                words = line.split()
+
+                # Detect IVR / time condition / ring group / voicemail
+                for component, rx in _COMPONENT_RES:
+                    if rx.search(line):
+                        analysis['components_hit'].append(component)
+                        analysis['routing_path'].append(f"{component}: {words[-1] if words else 'unknown'}")
                 
                 # Detect extension calls
-                ext_match = re.search(r'(\d{4,5})', line)
+                ext_match = _EXT_RE.search(line)
                 if ext_match and 'DIAL' in line.upper():
                     analysis['destinations_reached'].append(f"Extension: {ext_match.group(1)}")
                     analysis['routing_path'].append(f"Extension: {ext_match.group(1)}")
                 
                 # Detect errors
-                if re.search(r'(ERROR|FAILED|BUSY|CONGESTION)', line, re.IGNORECASE):
+                if _LOG_ERROR_RE.search(line):
                     analysis['errors'].append(line.strip())
             
             # Remove duplicates with explicit string conversion
@@ -583,6 +954,71 @@ Archive: no
             'timestamp': datetime.now().isoformat()
         }
     
+    def validate_did(self, did, caller_id="8884400123"):
+        """validate_call_flow() without the step-by-step output: predict,
+        place the test call, compare. Same result dict."""
+        predicted = self.get_predicted_flow(did)
+        if 'error' in predicted:
+            return {'success': False, 'did': did, 'error': predicted['error']}
+        actual = self.simulate_call_and_monitor(did, caller_id, verbose=False)
+        if 'error' in actual:
+            return {'success': False, 'did': did, 'error': actual['error']}
+        return {
+            'success': True,
+            'did': did,
+            'predicted': predicted,
+            'actual': actual,
+            'validation': self._compare_flows(predicted, actual),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def validate_dids(self, dids, workers=WORKERS, progress=None):
+        """Validate many DIDs, up to `workers` at once.
+
+        The routing config is loaded once up front and every prediction is
+        computed from it in-process; test calls overlap when they go over
+        AMI (see simulate_call_and_monitor). `progress(done, total, result)`
+        is called as each DID finishes. Returns results in `dids` order."""
+        dids = list(dict.fromkeys(str(d) for d in dids))
+        self.load_config()
+        total = len(dids)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(self.validate_did, did): did for did in dids}
+            for fut in as_completed(futures):
+                did = futures[fut]
+                try:
+                    results[did] = fut.result()
+                except Exception as e:
+                    self.logger.error(f"Validation of {did} failed: {e}", exc_info=True)
+                    results[did] = {'success': False, 'did': did, 'error': str(e)}
+                if progress:
+                    progress(len(results), total, results[did])
+        return [results[did] for did in dids]
+
+    def print_batch_summary(self, results):
+        """One line per DID, then the totals"""
+        print(f"\n{Colors.CYAN}╔{'═' * 68}╗{Colors.RESET}")
+        print(f"{Colors.CYAN}║{Colors.YELLOW}{Colors.BOLD}{' 📋 VALIDATION SUMMARY'.ljust(67)}{Colors.RESET}{Colors.CYAN}║{Colors.RESET}")
+        print(f"{Colors.CYAN}╚{'═' * 68}╝{Colors.RESET}")
+        print(f"   {Colors.BOLD}{'DID':<16} {'Score':>7} {'Match':>6} {'Miss':>5}  Notes{Colors.RESET}")
+        scores = []
+        for r in results:
+            if not r['success']:
+                print(f"   {r['did']:<16} {Colors.RED}{'--':>7}{Colors.RESET} {'':>6} {'':>5}  {Colors.RED}{r['error'][:40]}{Colors.RESET}")
+                continue
+            v = r['validation']
+            scores.append(v['score'])
+            color = Colors.GREEN if v['score'] >= 80 else (Colors.YELLOW if v['score'] >= 60 else Colors.RED)
+            errors = r['actual'].get('log_analysis', {}).get('errors') or []
+            note = f"{len(errors)} log error(s)" if errors else ""
+            print(f"   {r['did']:<16} {color}{v['score']:>6.1f}%{Colors.RESET} {len(v['matches']):>6} "
+                  f"{len(v['mismatches']):>5}  {Colors.YELLOW}{note}{Colors.RESET}")
+        failed = len(results) - len(scores)
+        average = sum(scores) / len(scores) if scores else 0.0
+        print(f"\n   {Colors.BLUE}📊 {len(results)} DID(s): {Colors.GREEN}{len(scores)} validated{Colors.RESET}, "
+              f"{Colors.RED}{failed} failed{Colors.RESET}, average score {Colors.BOLD}{average:.1f}%{Colors.RESET}")
+
     def _compare_flows(self, predicted, actual):
         """Compare predicted vs actual call flows"""
         matches = []
@@ -652,13 +1088,78 @@ Archive: no
             'actual_extensions': [str(item) for item in actual_extensions]
         }
 
+def run_batch(validator, dids, validate_all, workers):
+    """--dids / --all: validate the DIDs concurrently, print the summary and
+    save every result to one JSON file. Returns the exit status.
+
+    --all leaves out routes a test call can't dial: the catch-all route
+    (empty DID) and pattern DIDs ("_X." style); they are listed as not
+    testable instead."""
+    untestable = []
+    if validate_all:
+        cfg = validator.load_config()
+        if cfg is None:
+            print("❌ --all needs the call-flow config (local DB, --snapshot, or the server's snapshot)")
+            return 1
+        dids = []
+        for did in sorted(cfg.incoming):
+            (dids if did and not did.startswith("_") else untestable).append(did)
+
+    print("🎯 FREEPBX CALL FLOW VALIDATOR")
+    print("=" * 40)
+    print(f"DIDs: {len(dids)}  Workers: {workers}")
+    print(f"Server: {validator.server_ip}")
+    if untestable:
+        names = ", ".join(did or "(any DID)" for did in untestable)
+        print(f"{Colors.YELLOW}⏭️  Not testable (catch-all / pattern routes): {names}{Colors.RESET}")
+
+    started = time.time()
+
+    def progress(done, total, result):
+        if result['success']:
+            status = f"{Colors.GREEN}✅ {result['validation']['score']:.1f}%{Colors.RESET}"
+        else:
+            status = f"{Colors.RED}❌ {result['error'][:50]}{Colors.RESET}"
+        print(f"   [{done:>{len(str(total))}}/{total}] {result['did']:<16} {status}")
+
+    try:
+        results = validator.validate_dids(dids, workers=workers, progress=progress)
+    except KeyboardInterrupt:
+        logger.info("Validation interrupted by user")
+        print("\n⚠️  Validation interrupted by user")
+        return 0
+
+    validator.print_batch_summary(results)
+    elapsed = time.time() - started
+    print(f"   ⏱️  {len(results)} DID(s) in {elapsed:.1f}s")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    results_file = f"validation_batch_{timestamp}.json"
+    with open(results_file, 'w') as f:
+        json.dump({'server': validator.server_ip, 'workers': workers, 'elapsed': round(elapsed, 1),
+                   'results': results, 'not_testable': untestable}, f, indent=2)
+    logger.info(f"Results saved to: {results_file}")
+    print(f"\n💾 Results saved to: {results_file}")
+    return 0 if all(r['success'] for r in results) else 1
+
 def main():
     parser = argparse.ArgumentParser(description='FreePBX Call Flow Validator')
-    parser.add_argument('did', help='DID number to validate')
+    parser.add_argument('did', nargs='?', help='DID number to validate')
+    parser.add_argument('--dids', default=None, help='Comma-separated DIDs to validate together')
+    parser.add_argument('--all', action='store_true', help='Validate every DID with an inbound route')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help=f'DIDs validated at once with --dids/--all (default: {WORKERS})')
+    parser.add_argument('--snapshot', default=None,
+                        help='Predict from a freepbx_dump.py JSON snapshot instead of the DB')
     parser.add_argument('--server', default=None, help="Server IP (default: this box's own IP)")
     parser.add_argument('--user', default='123net', help='SSH user (default: 123net)')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
 
+    dids = []
+    validate_all = False
+    workers = WORKERS
+    snapshot = None
+
     # Handle both new and old argument formats
     if len(sys.argv) >= 2 and not sys.argv[1].startswith('-') and '--' not in ' '.join(sys.argv):
         # Old format: script.py DID [server] [user] (no -- flags present)
@@ -670,15 +1171,24 @@ def main():
         # New format with argparse
         if len(sys.argv) < 2:
             print("Usage: python3 callflow_validator.py <DID> [--server IP] [--user USER] [--debug]")
+            print("       python3 callflow_validator.py --dids DID,DID,... | --all [--workers N] [--snapshot FILE]")
             print("Example: python3 callflow_validator.py 2485815200 --debug")
             sys.exit(1)
 
         args = parser.parse_args()
         did = args.did
+        dids = [d.strip() for d in (args.dids or "").split(",") if d.strip()]
+        if did and dids:
+            dids.insert(0, did)
+        validate_all = args.all
+        workers = args.workers
+        snapshot = args.snapshot
         server_ip = args.server
         ssh_user = args.user
         debug = args.debug
-    
+        if not (did or dids or validate_all):
+            parser.error("a DID, --dids or --all is required")
+
     # Initialize logging
     global logger
     logger = setup_logging(debug)
@@ -686,7 +1196,10 @@ def main():
     logger.info("Starting FreePBX Call Flow Validator")
     logger.info(f"Arguments: DID={did}, Server={server_ip}, User={ssh_user}, Debug={debug}")
     
-    validator = CallFlowValidator(server_ip, ssh_user, debug)
+    validator = CallFlowValidator(server_ip, ssh_user, debug, snapshot=snapshot)
+
+    if dids or validate_all:
+        sys.exit(run_batch(validator, dids, validate_all, workers))
 
     print("🎯 FREEPBX CALL FLOW VALIDATOR")
     print("=" * 40)
@@ -0,0 +1,1470 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+freepbx_ami.py
+--------------
+Shared Asterisk Manager Interface (AMI) client for the freepbx-tools
+collectors, with an `asterisk -rx` fallback and a local fake AMI server.
+✓ Python 3.6 compatible (stdlib only).
+
+The dashboard, TC status, phone and network tools used to fork
+`asterisk -rx "<command>"` for every question they asked — a process spawn,
+a console-socket connect and a full CLI round trip each time, several times
+per dashboard tick. This module keeps ONE authenticated TCP connection to
+the local AMI per process. Every action carries an ActionID; a reader
+thread routes each response and each list event (EndpointList,
+CoreShowChannel, DBGetResponse, ...) back to the caller that sent it, so the
+connection can be shared by the dashboard's collector threads. Unsolicited
+events go to registered listeners; LiveMonitor uses them (Newchannel, Hangup,
+ContactStatus, PeerStatus, Registry, QueueMemberStatus) to keep a LiveModel
+of the PBX current without polling.
+
+Credentials come from /etc/asterisk/manager.conf (the FreePBX-generated
+[admin] user, #include files followed) or FREEPBX_AMI_HOST / _PORT / _USER /
+_SECRET. When AMI can't be used (no readable credentials, manager disabled,
+connection refused, FREEPBX_AMI=0) cli() forks `asterisk -rx` exactly as
+before and the structured helpers raise AMIError so callers fall back to
+their CLI parsing. A failed connect is not retried for RETRY_AFTER seconds.
+
+FakeAMIServer speaks enough of the protocol (Login, Ping, Command in both
+the Asterisk 14+ "Output:" and the legacy "Follows" form, CoreShowChannels,
+PJSIPShowEndpoints, PJSIPShowContacts, PJSIPShowRegistrationsOutbound,
+SIPpeers, SIPshowregistry, QueueStatus, DBGet, DBGetTree, DBPut, DBDel,
+async Originate) and
+pushes events for start_call / hangup_call / set_contact / set_registration /
+set_queue_member, to test and benchmark the client without a PBX:
+    python3 freepbx_ami.py fake-server --port 15038
+    python3 freepbx_ami.py bench --fake --count 500
+
+VARIABLE MAP (Key Script Variables)
+-----------------------------------
+MANAGER_CONF    : Asterisk manager config (credentials, port, enabled)
+AMI_HOST        : Default AMI host (FREEPBX_AMI_HOST)
+AMI_PORT        : Default AMI port when manager.conf doesn't say (FREEPBX_AMI_PORT)
+ASTERISK_BIN    : Asterisk binary for the `asterisk -rx` fallback
+ENABLED         : False (FREEPBX_AMI=0) forces the CLI fallback everywhere
+TIMEOUT         : Default seconds to wait for a response / a whole event list
+RETRY_AFTER     : Seconds before a failed shared connect is tried again
+READ_ONLY_ACTIONS: Actions safe to resend when the connection drops before their response
+EVENT_MASK      : AMI event classes the live monitor subscribes to
+_SHARED         : The process-wide client (and the last failed-connect time)
+
+    FUNCTION MAP (Major Functions)
+    -----------------------------
+    read_manager_conf     : manager.conf -> {"enabled", "port", "bindaddr", "users"}
+    connection_settings   : Host / port / user / secret from env or manager.conf
+    AMIClient.action      : Send one action, return its response
+    AMIClient.list_action : Send a list action, return its events (until EventList: Complete)
+    AMIClient.command     : CLI command over AMI -> output text
+    get_client            : The shared, connected client (or None)
+    cli                   : (rc, out, err) of a CLI command: AMI, else `asterisk -rx`
+    pjsip_endpoints       : EndpointList events (PJSIPShowEndpoints)
+    sip_peers             : PeerEntry events (SIPpeers)
+    outbound_registrations: PJSIP outbound registrations, else the chan_sip registry
+    channels              : CoreShowChannel events
+    db_get / db_tree      : AstDB reads (DBGet / DBGetTree, "database show" fallback)
+    LiveModel             : Channels / contacts / trunks / queue members kept current from events
+    LiveMonitor           : LiveModel + its own event-enabled connection (reconnect + re-seed)
+    FakeAMIServer         : Local fake AMI for tests and benchmarks
+    main                  : CLI (command / action / fake-server / bench)
+"""
+
+import atexit
+import os
+import queue
+import re
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+
+class Colors:
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+    RED = '\033[91m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    CYAN = '\033[96m'
+    MAGENTA = '\033[95m'
+    WHITE = '\033[97m'
+    BLUE = '\033[94m'
+
+
+MANAGER_CONF = "/etc/asterisk/manager.conf"
+AMI_HOST = os.environ.get("FREEPBX_AMI_HOST", "127.0.0.1")
+AMI_PORT = 5038
+ASTERISK_BIN = "asterisk"
+ENABLED = os.environ.get("FREEPBX_AMI", "1") != "0"
+TIMEOUT = 5.0
+RETRY_AFTER = 30.0
+# Resent on a new connection if the old one died before answering. Anything
+# else (Originate, Redirect, Hangup, QueueAdd, DBPut, ...) may already have
+# run, so losing its response is an error rather than a second attempt.
+READ_ONLY_ACTIONS = frozenset((
+    "Ping", "CoreStatus", "CoreSettings", "CoreShowChannels", "Status", "Getvar",
+    "DBGet", "DBGetTree", "ListCommands", "ExtensionState", "ExtensionStateList",
+    "DeviceStateList", "PJSIPShowEndpoints", "PJSIPShowEndpoint", "PJSIPShowContacts",
+    "PJSIPShowRegistrationsOutbound", "SIPpeers", "SIPshowpeer", "SIPshowregistry",
+    "QueueStatus", "QueueSummary", "MailboxCount", "MailboxStatus",
+))
+_READ_ONLY_CLI_RE = re.compile(r"(?i)^\s*(?:\S+\s+){0,2}show\b|^\s*database\s+get\b")
+
+
+class AMIError(RuntimeError):
+    """An action failed, timed out, or AMI is not available."""
+
+
+class AMIConnectionError(AMIError):
+    """The connection could not be made or was lost."""
+
+
+# ---------------------------
+# Configuration
+# ---------------------------
+
+def read_manager_conf(path=MANAGER_CONF, _seen=None):
+    """manager.conf -> {"enabled": bool, "port": int|None, "bindaddr": str|None,
+    "users": [(name, secret)]} in file order; #include / #tryinclude followed.
+    Raises OSError if `path` itself can't be read."""
+    seen = _seen if _seen is not None else set()
+    out = {"enabled": None, "port": None, "bindaddr": None, "users": []}
+    seen.add(os.path.abspath(path))
+    section = None
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for raw in f:
+            line = raw.split(";", 1)[0].strip()
+            if not line:
+                continue
+            m = re.match(r'#(?:try)?include\s+"?([^"]+)"?', line)
+            if m:
+                inc = m.group(1).strip()
+                inc = inc if os.path.isabs(inc) else os.path.join(os.path.dirname(path), inc)
+                if os.path.abspath(inc) not in seen:
+                    try:
+                        sub = read_manager_conf(inc, seen)
+                    except OSError:
+                        continue
+                    for key in ("enabled", "port", "bindaddr"):
+                        if sub[key] is not None and out[key] is None:
+                            out[key] = sub[key]
+                    out["users"].extend(sub["users"])
+                continue
+            m = re.match(r"\[([^\]]+)\]", line)
+            if m:
+                section = m.group(1).strip()
+                continue
+            if "=" not in line:
+                continue
+            key, value = [part.strip() for part in line.split("=", 1)]
+            key = key.rstrip(">").strip().lower()
+            if section == "general":
+                if key == "enabled":
+                    out["enabled"] = value.lower() in ("yes", "true", "1", "on")
+                elif key == "port" and value.isdigit():
+                    out["port"] = int(value)
+                elif key == "bindaddr":
+                    out["bindaddr"] = value
+            elif section and key == "secret":
+                out["users"].append((section, value))
+    return out
+
+
+def connection_settings(conf_path=MANAGER_CONF):
+    """{"host", "port", "username", "secret"} for the local AMI, or None when
+    no credentials are available or manager.conf says AMI is disabled."""
+    env_user = os.environ.get("FREEPBX_AMI_USER")
+    env_secret = os.environ.get("FREEPBX_AMI_SECRET")
+    port = os.environ.get("FREEPBX_AMI_PORT")
+    if env_user and env_secret is not None:
+        return {"host": AMI_HOST, "port": int(port or AMI_PORT),
+                "username": env_user, "secret": env_secret}
+    try:
+        conf = read_manager_conf(conf_path)
+    except OSError:
+        return None
+    if conf["enabled"] is False or not conf["users"]:
+        return None
+    users = dict(conf["users"])
+    name = "admin" if "admin" in users else conf["users"][0][0]
+    return {"host": AMI_HOST, "port": int(port or conf["port"] or AMI_PORT),
+            "username": name, "secret": users[name]}
+
+
+# ---------------------------
+# Protocol
+# ---------------------------
+
+class AMIMessage(dict):
+    """One AMI packet. dict access gives the first value of a key; `pairs`
+    keeps every (key, value) in order (Output:, ChanVariable: ... repeat), and
+    `output` holds the body of a legacy "Response: Follows" command."""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.pairs = []
+        self.output = None
+
+    def add(self, key, value):
+        self.pairs.append((key, value))
+        if key not in self:
+            self[key] = value
+
+    def get_all(self, key):
+        return [v for k, v in self.pairs if k == key]
+
+    @property
+    def is_event(self):
+        return "Event" in self
+
+    @property
+    def complete(self):
+        return self.get("EventList", "").lower() == "complete"
+
+
+def _encode_action(name, action_id, fields):
+    lines = ["Action: %s" % name, "ActionID: %s" % action_id]
+    for key, value in fields.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            lines.append("%s: %s" % (key, item))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+
+def _read_message(rfile):
+    """Next AMIMessage from a binary file object, or None at EOF."""
+    msg = AMIMessage()
+    while True:
+        raw = rfile.readline()
+        if not raw:
+            return None
+        line = raw.decode("utf-8", "replace").rstrip("\r\n")
+        if not line:
+            if msg.pairs:
+                return msg
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue  # stray line outside any packet
+        msg.add(key.strip(), value.strip())
+        if key.strip() == "Response" and value.strip() == "Follows":
+            _read_follows(rfile, msg)
+            return msg
+
+
+def _read_follows(rfile, msg):
+    """Body of a pre-Asterisk-14 Command response, up to "--END COMMAND--"."""
+    body = []
+    header = True
+    while True:
+        raw = rfile.readline()
+        if not raw:
+            break
+        line = raw.decode("utf-8", "replace").rstrip("\r\n")
+        if header and re.match(r"(Privilege|ActionID): ", line):
+            key, _sep, value = line.partition(":")
+            msg.add(key, value.strip())
+            continue
+        header = False
+        if line.endswith("--END COMMAND--"):
+            tail = line[:-len("--END COMMAND--")]
+            if tail:
+                body.append(tail)
+            rfile.readline()  # the blank line closing the packet
+            break
+        body.append(line)
+    msg.output = "\n".join(body)
+
+
+# ---------------------------
+# Client
+# ---------------------------
+
+class AMIClient(object):
+    """One persistent, authenticated AMI connection shared between threads.
+
+    Actions are correlated by ActionID: a reader thread hands each response
+    and each event carrying that ActionID to the waiting caller, so several
+    threads can have actions in flight at once. Unsolicited events (only
+    sent when `events` is true or an event mask) go to add_listener()
+    callbacks. A lost connection is re-established once per action; after a
+    fork the child opens its own connection. Only an action that never went
+    out, or a read-only one (READ_ONLY_ACTIONS, list actions, "show" CLI
+    commands), is sent again on the new connection.
+
+    The connection is only usable once Login has succeeded: connect() holds
+    _connect_lock across the whole handshake, so other threads wait for it
+    instead of sending on a socket that isn't authenticated yet.
+    """
+
+    def __init__(self, host=AMI_HOST, port=AMI_PORT, username=None, secret=None,
+                 timeout=TIMEOUT, events=False):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.secret = secret
+        self.timeout = timeout
+        self.events = events
+        self.banner = None
+        self.listeners = []
+        self.actions = 0       # actions sent (for benchmarks / --debug)
+        self.connects = 0      # successful logins
+        self._sock = None
+        self._pid = None
+        self._reader = None
+        self._pending = {}     # ActionID -> Queue of AMIMessage (None = connection lost)
+        self._send_lock = threading.Lock()
+        self._route_lock = threading.Lock()
+        self._state_lock = threading.RLock()
+        self._connect_lock = threading.Lock()
+        self._authed = threading.Event()   # set once Login succeeded on _sock
+        self._seq = 0
+        self._prefix = "%d-%x" % (os.getpid(), id(self) & 0xffffff)
+
+    # -- connection ---------------------------------------------------------
+
+    @property
+    def connected(self):
+        """Logged in on a socket that belongs to this process."""
+        return self._open() and self._authed.is_set()
+
+    def _open(self):
+        return self._sock is not None and self._pid == os.getpid()
+
+    def connect(self):
+        """Open the socket, read the banner and log in. Raises AMIConnectionError / AMIError."""
+        with self._connect_lock:
+            if self.connected:
+                return self
+            self._login(self._open_socket())
+            self.connects += 1
+            return self
+
+    def _open_socket(self):
+        with self._state_lock:
+            self._drop()
+            try:
+                sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                rfile = sock.makefile("rb")
+                banner = rfile.readline()
+            except OSError as e:
+                raise AMIConnectionError("AMI connect to %s:%s failed: %s" % (self.host, self.port, e))
+            if not banner.startswith(b"Asterisk Call Manager"):
+                sock.close()
+                raise AMIConnectionError("%s:%s is not an AMI port" % (self.host, self.port))
+            sock.settimeout(None)  # the reader blocks; callers time out on their queues
+            self.banner = banner.decode("utf-8", "replace").strip()
+            self._sock, self._pid = sock, os.getpid()
+            self._reader = threading.Thread(target=self._read_loop, args=(sock, rfile), daemon=True)
+            self._reader.start()
+            return sock
+
+    def _login(self, sock):
+        events = self.events if isinstance(self.events, str) else ("on" if self.events else "off")
+        try:
+            self.action("Login", Username=self.username, Secret=self.secret, Events=events,
+                        _reconnect=False)
+        except AMIError:
+            self.close()
+            raise
+        with self._state_lock:
+            if self._sock is not sock:
+                raise AMIConnectionError("AMI connection lost during Login")
+            self._authed.set()
+
+    def _drop(self):
+        self._authed.clear()
+        sock, self._sock = self._sock, None
+        if sock is not None and self._pid == os.getpid():
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._pid = None
+
+    def close(self):
+        """Log off (best effort) and close the connection."""
+        if self._open():
+            try:
+                self._sock.sendall(_encode_action("Logoff", "%s-bye" % self._prefix, {}))
+            except OSError:
+                pass
+        with self._state_lock:
+            self._drop()
+
+    def owns(self, action_id):
+        """True if `action_id` was generated by this client (events such as
+        OriginateResponse carry the originator's ActionID to every listener)."""
+        return bool(action_id) and action_id.startswith(self._prefix + "-")
+
+    def add_listener(self, fn):
+        """Call fn(AMIMessage) for every unsolicited event (from the reader thread)."""
+        self.listeners.append(fn)
+
+    def _read_loop(self, sock, rfile):
+        try:
+            while True:
+                msg = _read_message(rfile)
+                if msg is None:
+                    break
+                with self._route_lock:
+                    q = self._pending.get(msg.get("ActionID"))
+                    if q is not None:
+                        q.put(msg)
+                if q is None and msg.is_event:
+                    for fn in list(self.listeners):
+                        try:
+                            fn(msg)
+                        except Exception:
+                            pass
+        except (OSError, ValueError):
+            pass
+        with self._state_lock:
+            if self._sock is sock:
+                self._drop()
+        for q in list(self._pending.values()):
+            q.put(None)
+
+    # -- actions ------------------------------------------------------------
+
+    def _dispatch_late(self, q):
+        """Hand events that raced in behind an action's response (an async
+        Originate's OriginateResponse, ...) to the listeners."""
+        while True:
+            try:
+                msg = q.get_nowait()
+            except queue.Empty:
+                return
+            if msg is not None and msg.is_event:
+                for fn in list(self.listeners):
+                    try:
+                        fn(msg)
+                    except Exception:
+                        pass
+
+    def _send(self, name, fields):
+        with self._state_lock:
+            self._seq += 1
+            action_id = "%s-%d" % (self._prefix, self._seq)
+        q = queue.Queue()
+        self._pending[action_id] = q
+        try:
+            with self._send_lock:
+                self._sock.sendall(_encode_action(name, action_id, fields))
+        except (OSError, AttributeError) as e:
+            self._pending.pop(action_id, None)
+            with self._state_lock:
+                self._drop()
+            raise AMIConnectionError("AMI send failed: %s" % e)
+        self.actions += 1
+        return action_id, q
+
+    def _wait(self, q, name, deadline):
+        try:
+            msg = q.get(timeout=max(0.0, deadline - time.time()))
+        except queue.Empty:
+            raise AMIError("AMI %s timed out" % name)
+        if msg is None:
+            raise AMIConnectionError("AMI connection lost during %s" % name)
+        return msg
+
+    def _resendable(self, name, fields, collect):
+        """May this action be sent again after its response was lost?"""
+        if collect or name in READ_ONLY_ACTIONS:
+            return True
+        return name == "Command" and bool(_READ_ONLY_CLI_RE.match(fields.get("Command") or ""))
+
+    def _exchange(self, name, fields, timeout, collect, reconnect):
+        for attempt in (0, 1):
+            if name == "Login":
+                if not self._open():
+                    raise AMIConnectionError("not connected")
+            elif not self.connected:
+                self.connect()
+            deadline = time.time() + (timeout or self.timeout)
+            try:
+                action_id, q = self._send(name, fields)
+            except AMIConnectionError:
+                if attempt or not reconnect:
+                    raise
+                continue
+            try:
+                response = self._wait(q, name, deadline)
+                events = []
+                if collect:
+                    if response.get("EventList", "").lower() == "start":
+                        while True:
+                            msg = self._wait(q, name, deadline)
+                            if msg.complete:
+                                break
+                            if msg.is_event:
+                                events.append(msg)
+                    elif response.get("Response") == "Success" and "follow" in response.get("Message", "").lower():
+                        events.append(self._wait(q, name, deadline))  # pre-EventList single result
+                return response, events
+            except AMIConnectionError:
+                # Sent, but the connection died before the answer: only go
+                # again if running the action twice can't hurt.
+                if attempt or not reconnect or not self._resendable(name, fields, collect):
+                    raise
+            finally:
+                with self._route_lock:
+                    self._pending.pop(action_id, None)
+                self._dispatch_late(q)
+
+    def action(self, name, timeout=None, _reconnect=True, **fields):
+        """Send one action and return its response. Raises AMIError on "Response: Error"."""
+        response, _events = self._exchange(name, fields, timeout, False, _reconnect)
+        if response.get("Response") == "Error":
+            raise AMIError("%s: %s" % (name, response.get("Message", "error")))
+        return response
+
+    def list_action(self, name, timeout=None, **fields):
+        """Send a list action and return its events (EventList start .. Complete).
+
+        An Error response whose message says nothing was found ("No endpoints
+        found", "No contacts found", ...) is an empty list; any other Error
+        raises AMIError.
+        """
+        response, events = self._exchange(name, fields, timeout, True, True)
+        if response.get("Response") == "Error":
+            message = response.get("Message", "error")
+            if re.search(r"\bno\b.*\bfound\b", message, re.IGNORECASE):
+                return []
+            raise AMIError("%s: %s" % (name, message))
+        return events
+
+    def command(self, command, timeout=None):
+        """Run a CLI command over AMI and return its output text (no trailing newline).
+
+        Raises AMIError if the command doesn't exist or fails.
+        """
+        ok, text = self.command_result(command, timeout)
+        if not ok:
+            raise AMIError("Command %r: %s" % (command, text.strip() or "failed"))
+        return text
+
+    def command_result(self, command, timeout=None):
+        """(success, output text) of a CLI command over AMI."""
+        response, _events = self._exchange("Command", {"Command": command}, timeout, False, True)
+        if response.output is not None:  # legacy "Response: Follows"
+            text = response.output
+        else:
+            text = "\n".join(response.get_all("Output"))
+        ok = response.get("Response") in ("Success", "Follows")
+        if not ok and not text:
+            text = response.get("Message", "")
+        return ok and "no such command" not in text[:80].lower(), text
+
+
+# ---------------------------
+# Shared client + CLI fallback
+# ---------------------------
+
+_SHARED = {"client": None, "failed": 0.0}
+_SHARED_LOCK = threading.Lock()
+
+
+def get_client():
+    """The process-wide connected AMIClient, or None when AMI can't be used
+    (then cli() forks `asterisk -rx`). A failed connect is remembered for
+    RETRY_AFTER seconds so a PBX without AMI doesn't pay for it every call."""
+    if not ENABLED:
+        return None
+    with _SHARED_LOCK:
+        client = _SHARED["client"]
+        if client is not None and client._pid in (None, os.getpid()):
+            return client
+        if time.time() - _SHARED["failed"] < RETRY_AFTER:
+            return None
+        settings = connection_settings()
+        if settings is None:
+            _SHARED["failed"] = time.time()
+            return None
+        client = AMIClient(**settings)
+        try:
+            client.connect()
+        except AMIError:
+            _SHARED["failed"] = time.time()
+            return None
+        _SHARED["client"] = client
+        return client
+
+
+def _shared_failed():
+    """Forget the shared client after a connection error (retry after RETRY_AFTER)."""
+    with _SHARED_LOCK:
+        client, _SHARED["client"] = _SHARED["client"], None
+        _SHARED["failed"] = time.time()
+    if client is not None:
+        client.close()
+
+
+def close_all():
+    with _SHARED_LOCK:
+        client, _SHARED["client"] = _SHARED["client"], None
+    if client is not None:
+        client.close()
+
+
+atexit.register(close_all)
+
+
+def _cli_fork(command, timeout):
+    try:
+        p = subprocess.run([ASTERISK_BIN, "-rx", command], stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout)
+        return p.returncode, (p.stdout or ""), (p.stderr or "")
+    except subprocess.TimeoutExpired:
+        return 1, "", "Timeout running asterisk -rx {!r}".format(command)
+    except OSError as e:
+        return 127, "", str(e)
+
+
+def cli(command, timeout=TIMEOUT):
+    """(rc, out, err) of an Asterisk CLI command, like `asterisk -rx`.
+
+    Runs over the shared AMI connection when possible (rc 0, or 1 for an
+    unknown / failed command); otherwise, or if AMI fails mid-way, forks
+    `asterisk -rx` as before.
+    """
+    client = get_client()
+    if client is not None:
+        try:
+            ok, text = client.command_result(command, timeout=timeout)
+            return (0 if ok else 1), (text + "\n" if text else ""), ""
+        except AMIConnectionError:
+            _shared_failed()
+        except AMIError:
+            pass
+    return _cli_fork(command, timeout)
+
+
+def _require_client():
+    client = get_client()
+    if client is None:
+        raise AMIError("AMI not available")
+    return client
+
+
+def _list(name, timeout=None, **fields):
+    try:
+        return [dict(e) for e in _require_client().list_action(name, timeout=timeout, **fields)]
+    except AMIConnectionError:
+        _shared_failed()
+        raise
+
+
+def pjsip_endpoints(timeout=None):
+    """EndpointList events (ObjectName, DeviceState, Contacts, ...) from PJSIPShowEndpoints."""
+    return _list("PJSIPShowEndpoints", timeout)
+
+
+def sip_peers(timeout=None):
+    """chan_sip PeerEntry events (ObjectName, IPaddress, Status, ...) from SIPpeers."""
+    return _list("SIPpeers", timeout)
+
+
+def outbound_registrations(timeout=None):
+    """[(name, registered)] of the PJSIP outbound registrations, or of the
+    chan_sip registry on a PBX without PJSIP."""
+    try:
+        events = _list("PJSIPShowRegistrationsOutbound", timeout)
+        return [(e.get("ObjectName", ""), e.get("Status", "") == "Registered")
+                for e in events if e.get("Event") == "OutboundRegistrationDetail"]
+    except AMIConnectionError:
+        raise
+    except AMIError:
+        events = _list("SIPshowregistry", timeout)
+        return [("%s@%s" % (e.get("Username", ""), e.get("Host", "")), e.get("State", "") == "Registered")
+                for e in events if e.get("Event") == "RegistryEntry"]
+
+
+def channels(timeout=None):
+    """CoreShowChannel events (Channel, Context, Exten, State, Duration, Linkedid, ...)."""
+    return _list("CoreShowChannels", timeout)
+
+
+def db_get(family, key, timeout=None):
+    """AstDB value of family/key, or None when the key doesn't exist."""
+    try:
+        events = _list("DBGet", timeout, Family=family, Key=key)
+    except AMIConnectionError:
+        raise
+    except AMIError as e:
+        if "not found" in str(e).lower():
+            return None
+        raise
+    for e in events:
+        if "Val" in e:
+            return e["Val"]
+    return None
+
+
+def db_tree(family, timeout=None):
+    """{"/family/key": value} of an AstDB family (DBGetTree, or "database show" over AMI)."""
+    try:
+        events = _list("DBGetTree", timeout, Family=family.strip("/"))
+        return dict(("/%s/%s" % (e.get("Family", family.strip("/")), e.get("Key", "")), e.get("Val", ""))
+                    for e in events if "Key" in e)
+    except AMIConnectionError:
+        raise
+    except AMIError:
+        pass  # Asterisk < 18.13 has no DBGetTree
+    text = _require_client().command("database show %s" % family, timeout=timeout)
+    out = {}
+    for line in text.splitlines():
+        m = re.match(r"\s*(/\S+)\s*:\s*(.*?)\s*$", line)
+        if m:
+            out[m.group(1)] = m.group(2)
+    return out
+
+
+# ---------------------------
+# Live model (event-driven)
+# ---------------------------
+
+EVENT_MASK = "call,system,agent"  # Newchannel/Hangup, ContactStatus/PeerStatus/Registry, QueueMember*
+QUEUE_STATUS = {"0": "unknown", "1": "available", "2": "in use", "3": "busy", "4": "invalid",
+                "5": "unavailable", "6": "ringing", "7": "ringing", "8": "on hold"}
+_UP_CONTACT = ("created", "reachable", "nonqualified", "updated", "unknown")
+_UP_PEER = ("registered", "reachable", "lagged")
+
+
+class LiveModel(object):
+    """Channels, endpoint contacts, trunk registrations and queue members,
+    seeded from list actions and then kept current from AMI events.
+
+    handle() applies one event and bumps `version` only when the model
+    actually changed (a Newstate to the same state, a duplicate Created
+    contact, an event of no interest: no bump), so a monitor can redraw
+    on change instead of on a timer: wait(version) blocks until then.
+
+    handle() runs on the AMI reader thread while a monitor renders on
+    another, so every read and write holds the model's lock, and a
+    renderer should draw from snapshot() rather than the live model.
+    Events that arrive during seed() are buffered and replayed onto the
+    seeded state, so none is lost to the swap.
+    """
+
+    def __init__(self):
+        self.channels = {}        # Uniqueid -> {"Channel", "Linkedid", "State", "CallerIDNum", "Exten"}
+        self.contacts = {}        # endpoint -> set(contact URI)
+        self.trunks = {}          # server URI / host -> [name, registered]
+        self.queue_members = {}   # (queue, interface) -> {"status", "paused"}
+        self.version = 0
+        self.events = 0           # events seen (for --debug / benchmarks)
+        self.seeded = 0.0
+        self._cond = threading.Condition()   # RLock: _changed() runs inside handle()
+        self._seeding = None      # events buffered while seed() runs, else None
+
+    # -- reads --------------------------------------------------------------
+
+    @property
+    def active_channels(self):
+        with self._cond:
+            return len(self.channels)
+
+    @property
+    def active_calls(self):
+        with self._cond:
+            return len(set(c["Linkedid"] for c in self.channels.values()))
+
+    def registered(self):
+        """Set of endpoints with at least one live contact."""
+        with self._cond:
+            return set(ep for ep, uris in self.contacts.items() if uris)
+
+    def trunk_status(self):
+        """(online, total) outbound registrations."""
+        with self._cond:
+            return sum(1 for _name, ok in self.trunks.values() if ok), len(self.trunks)
+
+    def queue_summary(self):
+        """{"available": n, "in use": n, "paused": n, ...} over all queue members."""
+        out = {}
+        with self._cond:
+            for member in self.queue_members.values():
+                key = "paused" if member["paused"] else member["status"]
+                out[key] = out.get(key, 0) + 1
+        return out
+
+    def snapshot(self):
+        """A detached copy of the model (same read API) for one render."""
+        copy = LiveModel()
+        with self._cond:
+            copy.channels = dict((k, dict(v)) for k, v in self.channels.items())
+            copy.contacts = dict((k, set(v)) for k, v in self.contacts.items())
+            copy.trunks = dict((k, list(v)) for k, v in self.trunks.items())
+            copy.queue_members = dict((k, dict(v)) for k, v in self.queue_members.items())
+            copy.version, copy.events, copy.seeded = self.version, self.events, self.seeded
+        return copy
+
+    def wait(self, version, timeout):
+        """Block until the model's version differs from `version` (or timeout); return it."""
+        with self._cond:
+            if self.version == version:
+                self._cond.wait(timeout)
+            return self.version
+
+    # -- writes -------------------------------------------------------------
+
+    def _changed(self):
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def seed(self, client):
+        """Replace the model with the PBX's current state (list actions on `client`)."""
+        with self._cond:
+            self._seeding = []
+        try:
+            state = self._collect(client)
+        except Exception:
+            with self._cond:
+                self._seeding = None
+            raise
+        with self._cond:
+            self.channels, self.contacts, self.trunks, self.queue_members = state
+            pending, self._seeding = self._seeding, None
+            for e in pending:
+                self._apply(e)
+            self.seeded = time.time()
+            self._changed()
+
+    def _collect(self, client):
+        """(channels, contacts, trunks, queue_members) from the list actions."""
+        channels, contacts, trunks, members = {}, {}, {}, {}
+        for e in _quiet(client, "CoreShowChannels"):
+            channels[e.get("Uniqueid", "")] = _channel(e)
+        endpoints = _quiet(client, "PJSIPShowEndpoints")
+        for e in endpoints:
+            uris = set()
+            for item in e.get("Contacts", "").split(","):
+                if item.strip():
+                    uris.add(item.strip().split("/", 1)[-1])
+            contacts[e.get("ObjectName", "")] = uris
+        if not endpoints:
+            for e in _quiet(client, "SIPpeers"):
+                ok = e.get("Status", "").split(" ")[0].lower() in ("ok", "unknown")
+                contacts[e.get("ObjectName", "")] = set(["sip"]) if ok else set()
+        regs = _quiet(client, "PJSIPShowRegistrationsOutbound")
+        for e in regs:
+            if e.get("Event") == "OutboundRegistrationDetail":
+                trunks[e.get("ServerUri", "")] = [e.get("ObjectName", ""), e.get("Status", "") == "Registered"]
+        if not regs:
+            for e in _quiet(client, "SIPshowregistry"):
+                trunks[e.get("Host", "")] = ["%s@%s" % (e.get("Username", ""), e.get("Host", "")),
+                                             e.get("State", "") == "Registered"]
+        for e in _quiet(client, "QueueStatus"):
+            if e.get("Event") == "QueueMember":
+                iface = e.get("StateInterface") or e.get("Location") or e.get("Name", "")
+                members[(e.get("Queue", ""), iface)] = _member(e)
+        return channels, contacts, trunks, members
+
+    def handle(self, e):
+        """Apply one AMI event; listener for AMIClient.add_listener()."""
+        with self._cond:
+            self.events += 1
+            if self._seeding is not None:
+                self._seeding.append(e)
+                return False
+            changed = self._apply(e)
+            if changed:
+                self._changed()
+            return changed
+
+    def _apply(self, e):
+        """Apply one event to the model (lock held); True if it changed."""
+        name = e.get("Event", "")
+        changed = False
+        if name == "Newchannel":
+            self.channels[e.get("Uniqueid", "")] = _channel(e)
+            changed = True
+        elif name == "Newstate":
+            chan = self.channels.get(e.get("Uniqueid", ""))
+            if chan is not None and chan["State"] != e.get("ChannelStateDesc", ""):
+                chan["State"] = e.get("ChannelStateDesc", "")
+                changed = True
+        elif name == "Hangup":
+            changed = self.channels.pop(e.get("Uniqueid", ""), None) is not None
+        elif name == "ContactStatus":
+            ep = e.get("EndpointName") or e.get("AOR", "")
+            uris = self.contacts.setdefault(ep, set())
+            before = len(uris)
+            if e.get("ContactStatus", "").lower() in _UP_CONTACT:
+                uris.add(e.get("URI", ""))
+            else:
+                uris.discard(e.get("URI", ""))
+            changed = len(uris) != before
+        elif name == "PeerStatus":
+            ep = e.get("Peer", "").split("/", 1)[-1]
+            up = e.get("PeerStatus", "").lower() in _UP_PEER
+            uris = self.contacts.setdefault(ep, set())
+            changed = bool(uris) != up
+            self.contacts[ep] = set(["sip"]) if up else set()
+        elif name == "Registry":
+            key = e.get("Domain", "")
+            ok = e.get("Status", "") == "Registered"
+            trunk = self.trunks.get(key)
+            if trunk is None:
+                self.trunks[key] = ["%s@%s" % (e.get("Username", ""), key), ok]
+                changed = True
+            elif trunk[1] != ok:
+                trunk[1] = ok
+                changed = True
+        elif name in ("QueueMemberStatus", "QueueMemberAdded", "QueueMemberPause", "QueueMemberPaused"):
+            key = (e.get("Queue", ""), e.get("StateInterface") or e.get("Interface") or e.get("MemberName", ""))
+            member = _member(e, self.queue_members.get(key))
+            changed = self.queue_members.get(key) != member
+            self.queue_members[key] = member
+        elif name == "QueueMemberRemoved":
+            key = (e.get("Queue", ""), e.get("StateInterface") or e.get("Interface") or e.get("MemberName", ""))
+            changed = self.queue_members.pop(key, None) is not None
+        return changed
+
+
+def _quiet(client, name):
+    """Events of a list action, or [] if the action fails (module not loaded, ...)."""
+    try:
+        return client.list_action(name)
+    except AMIConnectionError:
+        raise
+    except AMIError:
+        return []
+
+
+def _channel(e):
+    return {"Channel": e.get("Channel", ""), "Linkedid": e.get("Linkedid") or e.get("Uniqueid", ""),
+            "State": e.get("ChannelStateDesc", ""), "CallerIDNum": e.get("CallerIDNum", ""),
+            "Exten": e.get("Exten", "")}
+
+
+def _member(e, previous=None):
+    status = QUEUE_STATUS.get(e.get("Status", ""), previous["status"] if previous else "unknown")
+    paused = e.get("Paused", "1" if previous and previous["paused"] else "0") == "1"
+    return {"status": status, "paused": paused}
+
+
+class LiveMonitor(object):
+    """A LiveModel fed by its own event-enabled AMI connection.
+
+    The connection subscribes to EVENT_MASK only; actions of the shared
+    client stay event-free. ensure() (re)connects and re-seeds the model
+    after the connection drops, at most once per RECONNECT seconds.
+    """
+
+    RECONNECT = 5.0
+
+    def __init__(self, settings=None, client=None):
+        self.model = LiveModel()
+        if client is None:
+            settings = settings or connection_settings()
+            if settings is None:
+                raise AMIError("AMI not available")
+            client = AMIClient(events=EVENT_MASK, **settings)
+        self.client = client
+        self.client.add_listener(self.model.handle)
+        self._last_try = 0.0
+
+    def ensure(self):
+        """True when connected (reconnecting + re-seeding if needed)."""
+        if self.client.connected and self.model.seeded:
+            return True
+        if self._last_try and time.time() - self._last_try < self.RECONNECT:
+            return False
+        self._last_try = time.time()
+        try:
+            self.client.connect()
+            self.model.seed(self.client)
+            return True
+        except AMIError:
+            self.model.seeded = 0.0
+            self.client.close()
+            return False
+
+    def close(self):
+        self.client.close()
+
+
+# ---------------------------
+# Fake AMI server (tests / benchmarks)
+# ---------------------------
+
+class _FakeConn(object):
+    """A fake-server connection: serialised writes (responses + pushed events)."""
+
+    def __init__(self, wfile, lock):
+        self.wfile = wfile
+        self.lock = lock
+        self.mask = None
+
+    def write(self, data):
+        with self.lock:
+            self.wfile.write(data)
+
+
+class FakeAMIServer(object):
+    """A local AMI look-alike with synthetic PBX state.
+
+    `endpoints` PJSIP endpoints (100, 101, ...; every other one with a
+    contact), `calls` two-channel calls, two outbound registrations (one
+    Registered, one Rejected) and a small AstDB. `legacy_command` answers
+    Command with the pre-Asterisk-14 "Response: Follows" body; `latency` adds
+    a per-action delay in seconds. State is in plain attributes, so a test
+    can change it between actions.
+
+    Async Originate places a fake call: Local channels plus one `trunk`
+    channel per call (congestion, Reason 8, once `trunk_channels` are up),
+    an OriginateResponse after `answer_delay` seconds and Hangups when an
+    Application Wait's Data seconds are over. Extensions in `busy` answer
+    Reason 5, extensions starting with 0 Reason 0 (no such extension).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, username="admin", secret="fake",
+                 endpoints=20, calls=3, legacy_command=False, latency=0.0,
+                 trunk="trunk-a", trunk_channels=None, answer_delay=0.1, busy=()):
+        self.username = username
+        self.secret = secret
+        self.trunk = trunk
+        self.trunk_channels = trunk_channels
+        self.answer_delay = answer_delay
+        self.busy = set(busy)
+        self.legacy_command = legacy_command
+        self.latency = latency
+        self.endpoints = ["%d" % (100 + i) for i in range(endpoints)]
+        self.contacts = dict((ep, "sip:%s@192.0.2.%d:5060" % (ep, 10 + i))
+                             for i, ep in enumerate(self.endpoints) if i % 2 == 0)
+        self.channels = []
+        for i in range(calls):
+            a, b = self.endpoints[(2 * i) % len(self.endpoints)], self.endpoints[(2 * i + 1) % len(self.endpoints)]
+            linkedid = "1700000000.%d" % (2 * i)
+            self.channels.append({"Channel": "PJSIP/%s-%08x" % (a, 2 * i), "CallerIDNum": a, "Exten": b,
+                                  "Context": "from-internal", "ChannelStateDesc": "Up", "Duration": "00:01:%02d" % i,
+                                  "Linkedid": linkedid, "Uniqueid": linkedid})
+            self.channels.append({"Channel": "PJSIP/%s-%08x" % (b, 2 * i + 1), "CallerIDNum": b, "Exten": "",
+                                  "Context": "from-internal", "ChannelStateDesc": "Up", "Duration": "00:01:%02d" % i,
+                                  "Linkedid": linkedid, "Uniqueid": "1700000000.%d" % (2 * i + 1)})
+        self.registrations = [("trunk-a", "Registered"), ("trunk-b", "Rejected")]
+        self.astdb = {"/TC/1": "MATCHED", "/TC/2": "UNMATCHED", "/DND/100": "YES"}
+        self.queue_members = {("400", "PJSIP/100"): ("1", "0"), ("400", "PJSIP/101"): ("5", "0")}
+        self.actions = 0
+        self.emitted = 0
+        self._subs = []        # connections that asked for events
+        self._subs_lock = threading.Lock()
+        self._seq = 2 * calls
+        outer = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                outer._serve(self.rfile, self.wfile)
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        self._server = Server((host, port), Handler)
+        self.address = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        """Serve on a daemon thread; returns (host, port)."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def client(self, **kwargs):
+        """An AMIClient pointed at this server."""
+        return AMIClient(self.address[0], self.address[1], self.username, self.secret, **kwargs)
+
+    # -- events -------------------------------------------------------------
+
+    def emit(self, event, category, fields):
+        """Send an unsolicited event to every connection whose Events mask includes `category`."""
+        data = self._packet([("Event", event), ("Privilege", "%s,all" % category)] + list(fields))
+        with self._subs_lock:
+            subs = list(self._subs)
+        for conn in subs:
+            if conn.mask is None or category in conn.mask:
+                try:
+                    conn.write(data)
+                    self.emitted += 1
+                except OSError:
+                    pass
+
+    def start_call(self, a, b):
+        """Add a two-channel call from endpoint a to b (Newchannel events); returns its Linkedid."""
+        linkedid = None
+        for ep, exten in ((a, b), (b, "")):
+            uid = "%d.%d" % (int(time.time()), self._seq)
+            linkedid = linkedid or uid
+            chan = {"Channel": "PJSIP/%s-%08x" % (ep, self._seq), "CallerIDNum": ep, "Exten": exten,
+                    "Context": "from-internal", "ChannelStateDesc": "Ring", "Duration": "00:00:00",
+                    "Linkedid": linkedid, "Uniqueid": uid}
+            self._seq += 1
+            self.channels.append(chan)
+            self.emit("Newchannel", "call", sorted(chan.items()))
+        return linkedid
+
+    def hangup_call(self, linkedid):
+        """Remove every channel of a call (Hangup events)."""
+        for chan in [c for c in self.channels if c["Linkedid"] == linkedid]:
+            self.channels.remove(chan)
+            self.emit("Hangup", "call", [("Channel", chan["Channel"]), ("Uniqueid", chan["Uniqueid"]),
+                                         ("Linkedid", linkedid), ("Cause", "16"),
+                                         ("Cause-txt", "Normal Clearing")])
+
+    def set_contact(self, endpoint, reachable):
+        """Register (Created) or drop (Removed) an endpoint's contact (ContactStatus)."""
+        uri = self.contacts.get(endpoint) or "sip:%s@192.0.2.200:5060" % endpoint
+        if reachable:
+            self.contacts[endpoint] = uri
+        else:
+            self.contacts.pop(endpoint, None)
+        self.emit("ContactStatus", "system", [("URI", uri), ("ContactStatus", "Created" if reachable else "Removed"),
+                                              ("AOR", endpoint), ("EndpointName", endpoint)])
+
+    def set_registration(self, name, status):
+        """Change an outbound registration's status (Registry)."""
+        self.registrations = [(n, status if n == name else st) for n, st in self.registrations]
+        self.emit("Registry", "system", [("ChannelType", "PJSIP"), ("Username", "sip:%s@example.net" % name),
+                                         ("Domain", "sip:%s.example.net" % name), ("Status", status)])
+
+    def set_queue_member(self, queue_name, interface, status, paused="0"):
+        """Change a queue member's device status / pause (QueueMemberStatus)."""
+        self.queue_members[(queue_name, interface)] = (str(status), str(paused))
+        self.emit("QueueMemberStatus", "agent", [("Queue", queue_name), ("MemberName", interface),
+                                                 ("Interface", interface), ("StateInterface", interface),
+                                                 ("Status", str(status)), ("Paused", str(paused))])
+
+    def _act_originate(self, msg, aid):
+        threading.Thread(target=self._originate, args=(msg, aid), daemon=True).start()
+        return [self._packet([("Response", "Success")] + aid + [("Message", "Originate successfully queued")])]
+
+    def _originate(self, msg, aid):
+        dest = msg.get("Channel", "")
+        exten = dest.split("/", 1)[-1].split("@", 1)[0]
+        account = msg.get("Account", "")
+        with self._subs_lock:
+            trunk_up = sum(1 for c in self.channels if c["Channel"].startswith("PJSIP/%s-" % self.trunk))
+            seq, self._seq = self._seq, self._seq + 3
+        base = [("Channel", dest), ("Context", msg.get("Context", "")), ("Exten", msg.get("Exten", ""))] + aid
+        reason = None
+        if exten.startswith("0"):
+            reason = "0"
+        elif exten in self.busy:
+            reason = "5"
+        elif self.trunk_channels is not None and trunk_up >= self.trunk_channels:
+            reason = "8"
+        if reason is not None:
+            time.sleep(0.01)
+            self.emit("OriginateResponse", "call", [("Response", "Failure")] + base
+                      + [("Reason", reason), ("Uniqueid", "<null>")])
+            return
+        linkedid = "%d.%d" % (int(time.time()), seq)
+        chans = []
+        for i, name in enumerate(("%s-%08x;1" % (dest, seq), "%s-%08x;2" % (dest, seq),
+                                  "PJSIP/%s-%08x" % (self.trunk, seq + 2))):
+            chan = {"Channel": name, "CallerIDNum": exten, "Exten": exten, "Context": msg.get("Context", ""),
+                    "ChannelStateDesc": "Ring", "Duration": "00:00:00", "Linkedid": linkedid,
+                    "Uniqueid": "%d.%d" % (int(time.time()), seq + i)}
+            with self._subs_lock:
+                self.channels.append(chan)
+            chans.append(chan)
+            self.emit("Newchannel", "call", sorted(chan.items()) + [("AccountCode", account)])
+        time.sleep(self.answer_delay)
+        self.emit("OriginateResponse", "call", [("Response", "Success")] + base
+                  + [("Reason", "4"), ("Uniqueid", chans[0]["Uniqueid"])])
+        try:
+            hold = float(msg.get("Data") or 0) if msg.get("Application", "").lower() == "wait" else 0.0
+        except ValueError:
+            hold = 0.0
+        time.sleep(hold)
+        for chan in chans:
+            with self._subs_lock:
+                if chan in self.channels:
+                    self.channels.remove(chan)
+            self.emit("Hangup", "call", [("Channel", chan["Channel"]), ("Uniqueid", chan["Uniqueid"]),
+                                         ("Linkedid", linkedid), ("AccountCode", account), ("Cause", "16"),
+                                         ("Cause-txt", "Normal Clearing")])
+
+    # -- protocol -----------------------------------------------------------
+
+    @staticmethod
+    def _packet(fields):
+        return ("".join("%s: %s\r\n" % kv for kv in fields) + "\r\n").encode("utf-8")
+
+    def _serve(self, rfile, wfile):
+        lock = threading.Lock()
+        conn = _FakeConn(wfile, lock)
+        try:
+            self._serve_conn(rfile, conn)
+        finally:
+            with self._subs_lock:
+                if conn in self._subs:
+                    self._subs.remove(conn)
+
+    def _serve_conn(self, rfile, wfile):
+        wfile.write(b"Asterisk Call Manager/7.0.3\r\n")
+        authed = False
+        while True:
+            msg = _read_message(rfile)
+            if msg is None:
+                return
+            self.actions += 1
+            if self.latency:
+                time.sleep(self.latency)
+            name = msg.get("Action", "").lower()
+            aid = [("ActionID", msg["ActionID"])] if "ActionID" in msg else []
+            if name == "login":
+                authed = msg.get("Username") == self.username and msg.get("Secret") == self.secret
+                wfile.write(self._packet([("Response", "Success" if authed else "Error")] + aid
+                                         + [("Message", "Authentication accepted" if authed
+                                             else "Authentication failed")]))
+                if not authed:
+                    return
+                mask = msg.get("Events", "on").strip().lower()
+                if mask not in ("off", "no", "false", "0"):
+                    wfile.mask = None if mask in ("on", "yes", "true", "all", "1") else set(
+                        c.strip() for c in mask.split(","))
+                    with self._subs_lock:
+                        self._subs.append(wfile)
+                continue
+            if not authed:
+                wfile.write(self._packet([("Response", "Error")] + aid + [("Message", "Missing action in request")]))
+                continue
+            if name == "logoff":
+                wfile.write(self._packet([("Response", "Goodbye")] + aid + [("Message", "Thanks for all the fish.")]))
+                return
+            handler = getattr(self, "_act_" + name, None)
+            if handler is None:
+                wfile.write(self._packet([("Response", "Error")] + aid + [("Message", "Invalid/unknown command")]))
+            else:
+                wfile.write(b"".join(handler(msg, aid)))
+
+    def _list(self, aid, event, items, complete, message="Events will follow"):
+        out = [self._packet([("Response", "Success")] + aid + [("EventList", "start"), ("Message", message)])]
+        for item in items:
+            out.append(self._packet([("Event", event)] + aid + list(item)))
+        out.append(self._packet([("Event", complete)] + aid + [("EventList", "Complete"),
+                                                                ("ListItems", str(len(items)))]))
+        return out
+
+    def _act_ping(self, msg, aid):
+        return [self._packet([("Response", "Success")] + aid + [("Ping", "Pong"), ("Timestamp", "%.6f" % time.time())])]
+
+    def _act_coreshowchannels(self, msg, aid):
+        return self._list(aid, "CoreShowChannel", [sorted(c.items()) for c in self.channels],
+                          "CoreShowChannelsComplete")
+
+    def _act_pjsipshowendpoints(self, msg, aid):
+        items = []
+        for ep in self.endpoints:
+            contact = self.contacts.get(ep)
+            items.append([("ObjectType", "endpoint"), ("ObjectName", ep), ("Transport", "0.0.0.0-udp"),
+                          ("Aor", ep), ("Auths", ep),
+                          ("Contacts", "%s/%s," % (ep, contact) if contact else ""),
+                          ("DeviceState", "Not in use" if contact else "Unavailable"),
+                          ("ActiveChannels", "")])
+        return self._list(aid, "EndpointList", items, "EndpointListComplete")
+
+    def _act_pjsipshowcontacts(self, msg, aid):
+        if not self.contacts:
+            return [self._packet([("Response", "Error")] + aid + [("Message", "No Contacts found")])]
+        items = [[("ObjectType", "contact"), ("ObjectName", "%s;@x" % ep), ("Uri", uri), ("Status", "Reachable"),
+                  ("Endpoint", ep), ("Aor", ep)] for ep, uri in sorted(self.contacts.items())]
+        return self._list(aid, "ContactList", items, "ContactListComplete")
+
+    def _act_queuestatus(self, msg, aid):
+        items = [[("Queue", q), ("Name", iface), ("Location", iface), ("StateInterface", iface),
+                  ("Status", status), ("Paused", paused)]
+                 for (q, iface), (status, paused) in sorted(self.queue_members.items())]
+        return self._list(aid, "QueueMember", items, "QueueStatusComplete")
+
+    def _act_pjsipshowregistrationsoutbound(self, msg, aid):
+        items = [[("ObjectType", "registration"), ("ObjectName", name), ("ServerUri", "sip:%s.example.net" % name),
+                  ("ClientUri", "sip:%s@example.net" % name), ("Status", status)] for name, status in self.registrations]
+        return self._list(aid, "OutboundRegistrationDetail", items, "OutboundRegistrationDetailComplete")
+
+    def _act_sippeers(self, msg, aid):
+        return [self._packet([("Response", "Error")] + aid + [("Message", "Invalid/unknown command")])]
+
+    _act_sipshowregistry = _act_sippeers
+
+    def _act_dbget(self, msg, aid):
+        family, key = msg.get("Family", ""), msg.get("Key", "")
+        path = "/%s/%s" % (family, key)
+        if path not in self.astdb:
+            return [self._packet([("Response", "Error")] + aid + [("Message", "Database entry not found")])]
+        return self._list(aid, "DBGetResponse", [[("Family", family), ("Key", key), ("Val", self.astdb[path])]],
+                          "DBGetComplete", message="Result will follow")
+
+    def _act_dbgettree(self, msg, aid):
+        family = msg.get("Family", "").strip("/")
+        items = []
+        for path, val in sorted(self.astdb.items()):
+            if path.startswith("/%s/" % family):
+                fam, _sep, key = path[1:].rpartition("/")
+                items.append([("Family", fam), ("Key", key), ("Val", val)])
+        return self._list(aid, "DBGetTreeResponse", items, "DBGetTreeComplete", message="Result will follow")
+
+    def _act_dbput(self, msg, aid):
+        self.astdb["/%s/%s" % (msg.get("Family", ""), msg.get("Key", ""))] = msg.get("Val", "")
+        return [self._packet([("Response", "Success")] + aid + [("Message", "Updated database successfully")])]
+
+    def _act_dbdel(self, msg, aid):
+        found = self.astdb.pop("/%s/%s" % (msg.get("Family", ""), msg.get("Key", "")), None) is not None
+        return [self._packet([("Response", "Success" if found else "Error")] + aid
+                             + [("Message", "Key deleted successfully" if found else "Database entry not found")])]
+
+    def _cli_output(self, command):
+        """(ok, text) for the handful of CLI commands the tools ask for."""
+        cmd = " ".join(command.split()).lower()
+        calls = len(set(c["Linkedid"] for c in self.channels))
+        if cmd == "core show channels count":
+            return True, "%d active channels\n%d active calls\n%d calls processed" % (
+                len(self.channels), calls, 1000 + calls)
+        if cmd == "core show channels":
+            lines = ["Channel              Location             State   Application(Data)"]
+            lines += ["%-20s %-20s %-7s Dial" % (c["Channel"], "%s@%s" % (c["Exten"] or "s", c["Context"]),
+                                                  c["ChannelStateDesc"]) for c in self.channels]
+            return True, "\n".join(lines + ["%d active channels" % len(self.channels), "%d active calls" % calls])
+        if cmd == "core show version":
+            return True, "Asterisk 18.20.0 built by fake @ localhost on a x86_64 running Linux"
+        if cmd == "core show uptime":
+            return True, "System uptime: 1 hour, 2 minutes\nLast reload: 5 minutes"
+        if cmd == "pjsip show contacts":
+            lines = ["  Contact:  %s/%s  abcdef12 Avail  12.345" % (ep, uri) for ep, uri in sorted(self.contacts.items())]
+            return True, "\n".join(lines + ["", "Objects found: %d" % len(lines)])
+        if cmd == "pjsip show registrations":
+            lines = [" %s/sip:%s.example.net  %s" % (n, n, s) for n, s in self.registrations]
+            return True, "\n".join(lines + ["", "Objects found: %d" % len(lines)])
+        m = re.match(r"database show\s*(\S*)", " ".join(command.split()), re.IGNORECASE)
+        if m:
+            prefix = "/" + m.group(1).strip("/") if m.group(1) else ""
+            rows = ["%-40s: %s" % (p, v) for p, v in sorted(self.astdb.items()) if p.startswith(prefix)]
+            return True, "\n".join(rows + ["%d results found." % len(rows)])
+        return False, "No such command '%s' (type 'core show help %s' for other possible commands)" % (
+            command, command.split()[0] if command.split() else "")
+
+    def _act_command(self, msg, aid):
+        ok, text = self._cli_output(msg.get("Command", ""))
+        if self.legacy_command:
+            return [("Response: Follows\r\nPrivilege: Command\r\n%s%s\n--END COMMAND--\r\n\r\n" % (
+                "".join("ActionID: %s\r\n" % v for _k, v in aid), text)).encode("utf-8")]
+        fields = [("Response", "Success" if ok else "Error")] + aid + [("Message", "Command output follows")]
+        fields += [("Output", line) for line in text.split("\n")]
+        return [self._packet(fields)]
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def _bench(client, count, command):
+    t0 = time.time()
+    for _ in range(count):
+        client.command(command)
+    ami = time.time() - t0
+    print(f"{Colors.GREEN}AMI  : {count} x {command!r} in {ami:.3f}s "
+          f"({1000.0 * ami / count:.2f} ms each, {client.connects} connect(s)){Colors.RESET}")
+    t0 = time.time()
+    n = min(count, 50)
+    rc, _out, err = _cli_fork(command, TIMEOUT)
+    if rc == 127:
+        print(f"{Colors.YELLOW}CLI  : {ASTERISK_BIN} not found — nothing to compare against{Colors.RESET}")
+        return
+    for _ in range(n - 1):
+        _cli_fork(command, TIMEOUT)
+    cli_time = time.time() - t0
+    print(f"{Colors.CYAN}CLI  : {n} x asterisk -rx in {cli_time:.3f}s "
+          f"({1000.0 * cli_time / n:.2f} ms each){Colors.RESET}")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Asterisk Manager Interface client / fake server")
+    ap.add_argument("--host", default=None, help="AMI host (default: %s)" % AMI_HOST)
+    ap.add_argument("--port", type=int, default=None, help="AMI port (default: manager.conf, else %d)" % AMI_PORT)
+    ap.add_argument("--user", default=None, help="AMI user (default: manager.conf [admin])")
+    ap.add_argument("--secret", default=None, help="AMI secret (default: manager.conf)")
+    sub = ap.add_subparsers(dest="cmd")
+    sub.required = True
+    p = sub.add_parser("command", help="Run a CLI command over AMI")
+    p.add_argument("text", help='e.g. "core show channels count"')
+    p = sub.add_parser("action", help="Send an action; list actions print every event")
+    p.add_argument("name", help="e.g. PJSIPShowEndpoints, CoreShowChannels, DBGet")
+    p.add_argument("fields", nargs="*", help="Key=Value fields")
+    p.add_argument("--list", action="store_true", help="Collect the EventList events")
+    p = sub.add_parser("fake-server", help="Run a local fake AMI server")
+    p.add_argument("--endpoints", type=int, default=20)
+    p.add_argument("--calls", type=int, default=3)
+    p.add_argument("--legacy-command", action="store_true", help="Answer Command the pre-Asterisk-14 way")
+    p = sub.add_parser("bench", help="Time AMI Command round trips against asterisk -rx")
+    p.add_argument("--fake", action="store_true", help="Benchmark against an in-process fake server")
+    p.add_argument("--count", type=int, default=200)
+    p.add_argument("--command", default="core show channels count")
+    args = ap.parse_args()
+
+    if args.cmd == "fake-server":
+        server = FakeAMIServer(args.host or "127.0.0.1", args.port or 15038,
+                               args.user or "admin", args.secret or "fake",
+                               endpoints=args.endpoints, calls=args.calls,
+                               legacy_command=args.legacy_command)
+        host, port = server.start()
+        print(f"{Colors.GREEN}Fake AMI listening on {host}:{port} (user {server.username!r}, "
+              f"secret {server.secret!r}). Ctrl+C to stop.{Colors.RESET}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.stop()
+        return 0
+
+    server = None
+    if args.cmd == "bench" and args.fake:
+        server = FakeAMIServer()
+        server.start()
+        client = server.client()
+    else:
+        settings = connection_settings() or {"host": AMI_HOST, "port": AMI_PORT, "username": None, "secret": None}
+        for key, value in (("host", args.host), ("port", args.port), ("username", args.user), ("secret", args.secret)):
+            if value is not None:
+                settings[key] = value
+        if settings["username"] is None:
+            print(f"{Colors.RED}❌ No AMI credentials (manager.conf unreadable?) — pass --user/--secret{Colors.RESET}")
+            return 1
+        client = AMIClient(**settings)
+    try:
+        client.connect()
+        if args.cmd == "command":
+            print(client.command(args.text))
+        elif args.cmd == "action":
+            fields = dict(f.split("=", 1) for f in args.fields if "=" in f)
+            if args.list:
+                for event in client.list_action(args.name, **fields):
+                    print("\n".join("%s: %s" % kv for kv in event.pairs) + "\n")
+            else:
+                print("\n".join("%s: %s" % kv for kv in client.action(args.name, **fields).pairs))
+        elif args.cmd == "bench":
+            _bench(client, args.count, args.command)
+    except AMIError as e:
+        print(f"{Colors.RED}❌ {e}{Colors.RESET}")
+        return 1
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -8,7 +8,7 @@ one chronological, multi-leg trace — inbound route through transfers, ring
 groups, queues, and hangup — instead of the flat, single-row-at-a-time
 reporting the other CDR tools do. Answers "what actually happened to this
 call" and "who hung up" for ticket troubleshooting.
-✓ Python 3.6 compatible (uses mysql CLI via subprocess; no external modules).
+✓ Python 3.6 compatible (uses the mysql CLI via freepbx_db; no external modules).
 
 CEL (Channel Event Logging) may not be enabled on every customer's Asterisk.
 This tool self-detects CEL availability and gracefully degrades to CDR-only
@@ -22,6 +22,8 @@ ASTERISK_CDR_DB  : Primary database name for cdr/cel tables
 ASTERISK_FALLBACK_DB : Fallback database name on older/nonstandard installs
 DEFAULT_SOCK     : Default MySQL socket path
 CACHE_DIR        : Where per-call trace JSON results are cached (permanent)
+BATCH_CHUNK      : Linkedids per IN (...) query / worker job in batch mode
+DEFAULT_JOBS     : Worker threads (and mysql sessions) used by trace_batch
 CDR_COLUMNS      : Ordered column list used for the CDR leg query
 CAUSE_CODE_MAP   : Imported from freepbx_log_analyzer (SIP-code keyed)
 Q850_TO_INFO     : Reverse index of CAUSE_CODE_MAP keyed by Q.850 cause,
@@ -35,9 +37,13 @@ args             : Parsed command-line arguments
     detect_cdr_db               : Pick asteriskcdrdb vs asterisk fallback
     normalize_number / build_number_candidates : Phone number normalization
     find_linkedids_for_number  : Search CDR for candidate linkedids
+    find_linkedids_in_window   : Every linkedid in a window (optionally for one number)
     get_cdr_legs                : Fetch all CDR rows for one linkedid
     cel_available / get_cel_events : CEL detection + fetch
+    get_cdr_legs_batch / get_cel_events_batch : Same, for many linkedids via IN (...)
     build_call_tree             : Nest CEL events into CDR legs by time window
+    trace_call                  : CDR legs + CEL events -> (call_tree, hangup_info)
+    trace_batch                 : Trace many linkedids in parallel, filling the cache
     classify_leg_outcome        : Per-leg outcome (answered/no-answer/transfer/...)
     determine_hangup_initiator  : "Who hung up" heuristic
     render_tree / render_summary / render_verdict : Output formatting
@@ -49,8 +55,10 @@ import argparse
 import json
 import os
 import re
-import subprocess
 import sys
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 try:
@@ -63,6 +71,8 @@ except ImportError:
 # freepbx_callflow_menu.py already imports from freepbx_log_analyzer).
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+import freepbx_db
+
 try:
     from freepbx_log_analyzer import CAUSE_CODE_MAP, format_cause_code
 except ImportError:
@@ -137,6 +147,8 @@ ASTERISK_CDR_DB = "asteriskcdrdb"
 ASTERISK_FALLBACK_DB = "asterisk"
 DEFAULT_SOCK = "/var/lib/mysql/mysql.sock"
 CACHE_DIR = "/home/123net/callflows/call_leg_traces"
+BATCH_CHUNK = 200
+DEFAULT_JOBS = 4
 
 CDR_COLUMNS = [
     "calldate", "clid", "src", "dst", "dcontext", "channel", "dstchannel",
@@ -176,36 +188,19 @@ def lookup_hangup_cause(q850_code):
 # ---------------------------
 
 def run_mysql(sql, socket=None, user="root", password=None, db=ASTERISK_CDR_DB):
-    """Run a SQL statement via mysql CLI and return stdout as text."""
-    env = os.environ.copy()
-    if password:
-        env["MYSQL_PWD"] = password
-    cmd = ["mysql", "-BN"]
-    if user:
-        cmd += ["--user", str(user)]
-    if socket:
-        cmd += ["--socket", str(socket)]
-    if db:
-        cmd += [str(db)]
-    cmd += ["-e", sql]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                        universal_newlines=True, env=env)
-    if p.returncode != 0:
+    """Run a SQL statement on the shared mysql session and return stdout as text."""
+    try:
+        return freepbx_db.run_mysql(sql, socket=socket, user=user, password=password, db=db)
+    except freepbx_db.MySQLError:
         return ""
-    return p.stdout
 
 
 def rows_as_dicts(sql, cols, **kw):
     """Run a SELECT that returns exactly len(cols) columns -> list[dict]."""
-    out = run_mysql(sql, **kw).rstrip("\n")
-    if not out:
+    try:
+        return freepbx_db.rows_as_dicts(sql, cols, **kw)
+    except freepbx_db.MySQLError:
         return []
-    dicts = []
-    for line in out.split("\n"):
-        parts = line.split("\t")
-        parts = (parts + [""] * len(cols))[:len(cols)]
-        dicts.append(dict(zip(cols, parts)))
-    return dicts
 
 
 def get_tables(**kw):
@@ -274,19 +269,31 @@ def resolve_time_window(args):
 
 
 def find_linkedids_for_number(number, start, end, limit, **kw):
-    candidates = build_number_candidates(number)
-    if not candidates:
+    if not build_number_candidates(number):
         return []
-    clauses = " OR ".join("(src='%s' OR dst='%s')" % (c, c) for c in candidates)
+    return find_linkedids_in_window(start, end, number=number, limit=limit, **kw)
+
+
+def find_linkedids_in_window(start, end, number=None, limit=None, **kw):
+    """Candidate calls in [start, end], newest first; number=None means every call,
+    limit=None means no LIMIT (batch mode)."""
+    where = "calldate BETWEEN '%s' AND '%s'" % (start, end)
+    if number:
+        candidates = build_number_candidates(number)
+        if not candidates:
+            return []
+        clauses = " OR ".join("(src='%s' OR dst='%s')" % (c, c) for c in candidates)
+        where += " AND (%s)" % clauses
     sql = (
         "SELECT linkedid, MIN(calldate) AS first_seen, MIN(src) AS src, MIN(dst) AS dst, "
         "MIN(disposition) AS disposition, SUM(duration) AS duration "
-        "FROM cdr WHERE calldate BETWEEN '%s' AND '%s' AND (%s) "
-        "GROUP BY linkedid ORDER BY first_seen DESC LIMIT %d;"
-        % (start, end, clauses, int(limit))
+        "FROM cdr WHERE %s "
+        "GROUP BY linkedid ORDER BY first_seen DESC" % where
     )
+    if limit is not None:
+        sql += " LIMIT %d" % int(limit)
     cols = ["linkedid", "first_seen", "src", "dst", "disposition", "duration"]
-    return rows_as_dicts(sql, cols, **kw)
+    return rows_as_dicts(sql + ";", cols, **kw)
 
 
 def get_cdr_legs(linkedid, **kw):
@@ -313,6 +320,37 @@ def get_cel_events(linkedid, **kw):
     return rows_as_dicts(sql, cols, **kw)
 
 
+def _in_list(linkedids):
+    return ", ".join("'%s'" % sanitize_linkedid(lid) for lid in linkedids)
+
+
+def get_cdr_legs_batch(linkedids, **kw):
+    """{linkedid: [cdr leg, ...]} for many calls in one query; each call's legs keep
+    get_cdr_legs()'s order. Linkedids with no rows are absent from the result."""
+    if not linkedids:
+        return {}
+    sql = (
+        "SELECT " + ", ".join(CDR_COLUMNS) + " FROM cdr WHERE linkedid IN (" + _in_list(linkedids) + ") "
+        "ORDER BY linkedid, calldate ASC, sequence ASC, uniqueid ASC;"
+    )
+    by_call = {}
+    for row in rows_as_dicts(sql, CDR_COLUMNS, **kw):
+        by_call.setdefault(row['linkedid'], []).append(row)
+    return by_call
+
+
+def get_cel_events_batch(linkedids, cols, **kw):
+    """{linkedid: [cel event, ...]} in id order, for many calls in one query.
+    `cols` is get_columns_ordered('cel'), looked up once by the caller."""
+    if not linkedids or not cols:
+        return {}
+    sql = "SELECT * FROM cel WHERE linkedid IN (" + _in_list(linkedids) + ") ORDER BY id ASC;"
+    by_call = {}
+    for row in rows_as_dicts(sql, cols, **kw):
+        by_call.setdefault(row.get('linkedid'), []).append(row)
+    return by_call
+
+
 def parse_cel_extra(row):
     """Best-effort parse of a CEL row's JSON extra-data blob, wherever it lives —
     CEL's JSON column name/shape varies across Asterisk versions/backends, so
@@ -368,6 +406,10 @@ def classify_leg_outcome(cdr, leg_cel_events):
 
 
 def build_call_tree(cdr_legs, cel_events, cel_status):
+    # Parse every CEL timestamp once and sort them (ties keep id order), so each
+    # leg's window is two bisects instead of a re-parse of every event per leg.
+    timed = sorted((parse_dt(e.get('eventtime', '')), pos) for pos, e in enumerate(cel_events))
+    times = [t for t, _pos in timed]
     legs = []
     n = len(cdr_legs)
     for i, cdr in enumerate(cdr_legs):
@@ -387,12 +429,9 @@ def build_call_tree(cdr_legs, cel_events, cel_status):
             # leg's HANGUP event lands exactly ON leg_end — an exclusive upper bound
             # would silently drop it from the displayed evidence. Only intermediate
             # legs use an exclusive bound (next leg's start belongs to that leg, not this one).
-            if is_last:
-                leg_cel = [e for e in cel_events
-                           if leg_start <= parse_dt(e.get('eventtime', '')) <= leg_end]
-            else:
-                leg_cel = [e for e in cel_events
-                           if leg_start <= parse_dt(e.get('eventtime', '')) < leg_end]
+            lo = bisect_left(times, leg_start)
+            hi = (bisect_right if is_last else bisect_left)(times, leg_end)
+            leg_cel = [cel_events[pos] for pos in sorted(pos for _t, pos in timed[lo:hi])]
         outcome = classify_leg_outcome(cdr, leg_cel)
         legs.append({
             'leg_index': i + 1,
@@ -407,6 +446,13 @@ def build_call_tree(cdr_legs, cel_events, cel_status):
     }
 
 
+def trace_call(cdr_legs, cel_events, cel_status):
+    """One call's fetched rows -> (call_tree, hangup_info), as cached on disk."""
+    call_tree = build_call_tree(cdr_legs, cel_events, cel_status)
+    hangup_info = determine_hangup_initiator(cdr_legs, cel_events, cel_status)
+    return call_tree, hangup_info
+
+
 def determine_hangup_initiator(cdr_legs, cel_events, cel_status):
     if cel_status != 'ok':
         final_disp = (cdr_legs[-1].get('disposition') or '').upper() if cdr_legs else ''
@@ -616,6 +662,154 @@ def save_cached_trace(linkedid, data):
         pass
 
 
+# ---------------------------
+# Batch tracing
+# ---------------------------
+
+def trace_batch(linkedids, jobs=DEFAULT_JOBS, use_cache=True, progress=None, **kw):
+    """Trace many calls -> {linkedid: {'call_tree', 'hangup_info'}}.
+
+    Cached traces are loaded as-is. The rest are fetched BATCH_CHUNK at a time
+    (one CDR and one CEL IN (...) query per chunk, with the CEL schema looked up
+    once), and the chunks run concurrently on a freepbx_db SessionPool. Each new
+    trace is saved to the permanent cache. Linkedids with no CDR rows are absent
+    from the result. progress(done, total) is called as each call is finished.
+    """
+    ids = []
+    seen = set()
+    for raw in linkedids:
+        lid = sanitize_linkedid(raw)
+        if lid and lid not in seen:
+            seen.add(lid)
+            ids.append(lid)
+
+    results = {}
+    todo = []
+    for lid in ids:
+        cached = load_cached_trace(lid) if use_cache else None
+        if cached is not None:
+            results[lid] = cached
+        else:
+            todo.append(lid)
+    total = len(ids)
+    if progress:
+        progress(len(results), total)
+    if not todo:
+        return results
+
+    cel_cols = get_columns_ordered('cel', **kw) if cel_available(**kw) else []
+    chunks = [todo[i:i + BATCH_CHUNK] for i in range(0, len(todo), BATCH_CHUNK)]
+
+    def run_chunk(chunk):
+        legs_by_call = get_cdr_legs_batch(chunk, **kw)
+        events_by_call = get_cel_events_batch(chunk, cel_cols, **kw)
+        traced = {}
+        for lid in chunk:
+            cdr_legs = legs_by_call.get(lid)
+            if not cdr_legs:
+                continue
+            cel_events = events_by_call.get(lid, [])
+            if not cel_cols:
+                cel_status = 'missing'
+            else:
+                cel_status = 'ok' if cel_events else 'present_no_data'
+            call_tree, hangup_info = trace_call(cdr_legs, cel_events, cel_status)
+            traced[lid] = {'call_tree': call_tree, 'hangup_info': hangup_info}
+            save_cached_trace(lid, traced[lid])
+        return chunk, traced
+
+    done = [len(results)]
+
+    def finish(chunk, traced):
+        results.update(traced)
+        done[0] += len(chunk)
+        if progress:
+            progress(done[0], total)
+
+    jobs = max(1, min(jobs, len(chunks)))
+    if jobs == 1:
+        for chunk in chunks:
+            finish(*run_chunk(chunk))
+        return results
+
+    pool = freepbx_db.SessionPool(jobs, **kw)
+
+    def run(chunk):
+        with pool.bound():
+            return run_chunk(chunk)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as ex:
+            for chunk, traced in ex.map(run, chunks):
+                finish(chunk, traced)
+    finally:
+        pool.close()
+    return results
+
+
+def read_linkedids(spec):
+    """--linkedids value: comma/space separated ids, or '-' for one per line on stdin."""
+    text = sys.stdin.read() if spec == '-' else spec
+    return [tok for tok in re.split(r'[\s,]+', text) if tok]
+
+
+def render_batch(results, order, fmt):
+    if fmt == 'json':
+        print(json.dumps([dict(results[lid], linkedid=lid) for lid in order if lid in results],
+                         indent=2, sort_keys=True))
+        return
+    for lid in order:
+        trace = results.get(lid)
+        if trace is None:
+            print(f"\n{Colors.RED}No CDR rows found for linkedid {lid}{Colors.RESET}")
+            continue
+        call_tree, hangup_info = trace['call_tree'], trace['hangup_info']
+        if fmt == 'tree':
+            render_tree(call_tree)
+            render_verdict(call_tree, hangup_info)
+        else:
+            render_summary(call_tree, hangup_info)
+
+
+def run_batch(args, kw):
+    if args.linkedids:
+        order = [sanitize_linkedid(lid) for lid in read_linkedids(args.linkedids)]
+    else:
+        start, end = resolve_time_window(args)
+        rows = find_linkedids_in_window(start, end, number=args.number, limit=args.batch_limit, **kw)
+        order = [r['linkedid'] for r in rows]
+    order = [lid for lid in order if lid]
+    if not order:
+        print(f"{Colors.YELLOW}No calls to trace.{Colors.RESET}")
+        sys.exit(0)
+
+    print(f"{Colors.CYAN}Tracing {len(order)} call(s) with {args.jobs} worker(s)...{Colors.RESET}")
+    t0 = time.time()
+
+    def progress(done, total):
+        sys.stderr.write(f"\r  {done}/{total} traced")
+        sys.stderr.flush()
+
+    results = trace_batch(order, jobs=args.jobs, use_cache=not args.no_cache,
+                          progress=progress if sys.stderr.isatty() else None, **kw)
+    if sys.stderr.isatty():
+        sys.stderr.write("\n")
+
+    if args.out:
+        try:
+            with open(args.out, 'w') as f:
+                json.dump([dict(results[lid], linkedid=lid) for lid in order if lid in results],
+                          f, indent=2, sort_keys=True)
+            print(f"{Colors.GREEN}✅ Wrote {args.out}{Colors.RESET}")
+        except OSError as e:
+            print(f"{Colors.RED}Failed to write {args.out}: {e}{Colors.RESET}")
+
+    render_batch(results, order, args.format)
+    missing = len(set(order) - set(results))
+    print(f"\n{Colors.GREEN}✅ Traced {len(results)} call(s) in {time.time() - t0:.1f}s"
+          f"{f' ({missing} not found)' if missing else ''}{Colors.RESET}\n")
+
+
 # ---------------------------
 # CLI
 # ---------------------------
@@ -634,6 +828,15 @@ def main():
                          help="Output format (default: tree)")
     parser.add_argument("--no-cache", action="store_true", help="Force re-query even if a cached trace exists")
     parser.add_argument("--out", help="Also write the JSON result to this file")
+    parser.add_argument("--linkedids", metavar="LIST",
+                        help="Batch: trace these linkedids (comma/space separated, or '-' to read stdin)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Batch: trace every call in the window (matching --number, if given) "
+                             "instead of picking one")
+    parser.add_argument("--batch-limit", type=int, default=None,
+                        help="Batch: cap the number of calls traced from the window (default: all)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help="Batch: parallel workers / mysql sessions (default: %d)" % DEFAULT_JOBS)
     parser.add_argument("--db-user", default="root", help="MySQL username")
     parser.add_argument("--socket", default=DEFAULT_SOCK, help="MySQL socket path")
     args = parser.parse_args()
@@ -645,8 +848,9 @@ def main():
     except AttributeError:
         pass  # Windows doesn't have geteuid
 
-    if not args.linkedid and not args.number:
-        parser.error("either --linkedid or --number is required")
+    batch = bool(args.linkedids or args.batch)
+    if not batch and not args.linkedid and not args.number:
+        parser.error("either --linkedid or --number is required (or --batch / --linkedids)")
 
     print(f"{Colors.CYAN}{Colors.BOLD}{'=' * 78}")
     print(f"  \U0001F4DE FREEPBX CALL-LEG ANALYZER")
@@ -655,6 +859,10 @@ def main():
     kw = {"socket": args.socket, "user": args.db_user}
     kw["db"] = detect_cdr_db(**kw)
 
+    if batch:
+        run_batch(args, kw)
+        return
+
     linkedid = args.linkedid
     if not linkedid:
         start, end = resolve_time_window(args)
@@ -695,8 +903,7 @@ def main():
         if cel_available(**kw):
             cel_events = get_cel_events(linkedid, **kw)
             cel_status = 'ok' if cel_events else 'present_no_data'
-        call_tree = build_call_tree(cdr_legs, cel_events, cel_status)
-        hangup_info = determine_hangup_initiator(cdr_legs, cel_events, cel_status)
+        call_tree, hangup_info = trace_call(cdr_legs, cel_events, cel_status)
         save_cached_trace(linkedid, {'call_tree': call_tree, 'hangup_info': hangup_info})
 
     if args.out:
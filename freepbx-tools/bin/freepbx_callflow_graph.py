@@ -5,7 +5,8 @@
 freepbx_callflow_graphV3.py
 ---------------------------
 Build a call-flow SVG for a DID, expanding Time Conditions, IVRs, Ring Groups, Queues, etc.
-No Python DB drivers needed: we shell out to the mysql CLI.
+No Python DB drivers needed: queries go through the shared mysql CLI session
+in freepbx_db.py.
 
 VARIABLE MAP (Key Script Variables)
 -----------------------------------
@@ -40,14 +41,23 @@ See function docstrings for additional details on arguments and return values.
     expand_queue            : Expand queue branches in call flow
     build_graphviz_dot      : Build Graphviz dot file from call flow data
     render_svg              : Render SVG from dot file using Graphviz
+    CallflowConfig          : All routing config in memory (one DB pass or a snapshot)
+    build_did_graph         : Resolve one DID into a Graph
+    render_batch            : Resolve many DIDs in-process, render SVGs in parallel
     main                    : CLI entry point, parses args and runs diagram generation
 """
 
 import argparse
+import json
 import subprocess
 import sys
 import re
 import os
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
 
 # ANSI Color codes for professional output in the terminal.
 # These are purely for CLI aesthetics and don't affect the SVG.
@@ -85,6 +95,14 @@ DB = "asterisk"
 
 DEBUG_MODE = False  # global flag toggled by --debug
 
+# When set (batch mode), the fetch_* helpers answer from this in-memory
+# CallflowConfig instead of issuing one query per lookup.
+CONFIG = None
+
+# Per-run memo for the DB-backed fetch_* helpers: (function, args) -> result.
+# A CLI run is one process, so the memo never outlives the DB state it saw.
+_FETCH_CACHE = {}
+
 
 def dbg(msg: str) -> None:
     """Safe debug print that only outputs when --debug is passed."""
@@ -96,7 +114,7 @@ def dbg(msg: str) -> None:
 
 def q(sql, socket=None, user="root", password=None):
     """
-    Execute a SQL query using the mysql CLI and return results as a list of tuples.
+    Execute a SQL query on the shared mysql session and return results as a list of tuples.
 
     Parameters:
         sql (str)       : The SQL query to run.
@@ -110,43 +128,43 @@ def q(sql, socket=None, user="root", password=None):
     """
     dbg(f"DB QUERY: {sql}")
 
-    # Base mysql command with DB and user
-    cmd = ["mysql", "-NBe", sql, DB, "-u", user]
-
-    # Add password if provided
-    if password:
-        cmd += ["-p" + password]
-
-    # Add socket if provided
-    if socket:
-        cmd += ["--socket", socket]
-
-    # Execute the command; capture stdout and stderr
-    p = subprocess.run(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True  # Python 3.6 compatible 'text' mode
-    )
-
-    # If mysql returned a non-zero exit code, treat it as an error
-    if p.returncode != 0:
-        sys.stderr.write(p.stderr)
+    try:
+        rows = freepbx_db.query(sql, socket=socket, user=user, password=password, db=DB)
+    except freepbx_db.MySQLError as e:
+        # Treat a failed query like an empty result, but leave the reason visible
+        sys.stderr.write(str(e) + "\n")
         dbg("DB QUERY FAILED")
         return []
 
-    out = p.stdout.strip()
-    if not out:
+    if not rows:
         dbg("DB QUERY returned no rows")
         return []
 
-    rows = [tuple(line.split("\t")) for line in out.splitlines()]
     dbg(f"DB QUERY returned {len(rows)} row(s)")
     return rows
 
 
 # ---------- Friendly labels / lookups ----------------------------------------
 
+def cached_fetch(fn):
+    """
+    Memoize a fetch_* helper for the current run, so an IVR, time condition
+    or ring group reached from several branches is only queried once.
+    Bypassed while CONFIG is set (those lookups are already in memory).
+    """
+    @functools.wraps(fn)
+    def wrapper(*args):
+        if CONFIG is not None:
+            return fn(*args)
+        key = (fn.__name__,) + args
+        if key not in _FETCH_CACHE:
+            _FETCH_CACHE[key] = fn(*args)
+        else:
+            dbg(f"Cache hit: {fn.__name__}{args[:1]}")
+        return _FETCH_CACHE[key]
+    return wrapper
+
+
 def human_time_rules(rows):
     """
     Convert FreePBX timegroup rules to a readable multiline string.
@@ -186,6 +204,8 @@ def fetch_users_map(socket, user, password):
 
     This is used to turn numeric extensions into "101 — Alice Smith" in labels.
     """
+    if CONFIG is not None:
+        return CONFIG.users
     dbg("Fetching users map")
     rows = q("SELECT extension,name FROM users;", socket, user, password)
     m = {ext: name for (ext, name) in rows}
@@ -193,6 +213,7 @@ def fetch_users_map(socket, user, password):
     return m
 
 
+@cached_fetch
 def fetch_ringgroup(grpnum, socket, user, password):
     """
     Fetch a ring group definition from 'ringgroups' by its grpnum.
@@ -201,6 +222,8 @@ def fetch_ringgroup(grpnum, socket, user, password):
         tuple (grpnum, description, grplist, strategy, grptime, postdest)
         or None if not found.
     """
+    if CONFIG is not None:
+        return CONFIG.ringgroups.get(grpnum)
     dbg(f"DB: fetch_ringgroup({grpnum})")
     sql = ("SELECT grpnum,description,grplist,strategy,grptime,COALESCE(postdest,'') "
            "FROM ringgroups WHERE grpnum='{g}'").format(g=grpnum)
@@ -210,6 +233,7 @@ def fetch_ringgroup(grpnum, socket, user, password):
     return rg[0] if rg else None
 
 
+@cached_fetch
 def fetch_queue_details(queue_id, socket, user, password):
     """
     Return details about a queue:
@@ -225,6 +249,8 @@ def fetch_queue_details(queue_id, socket, user, password):
         timeout      : Max wait/timeout in seconds
         members_csv  : A comma-separated list of member endpoints (extensions or external numbers)
     """
+    if CONFIG is not None:
+        return CONFIG.queues.get(queue_id, ("", "", "", ""))
     dbg(f"DB: fetch_queue_details({queue_id})")
 
     # Get strategy and timeout
@@ -251,6 +277,7 @@ def fetch_queue_details(queue_id, socket, user, password):
     return name, strategy, timeout, members
 
 
+@cached_fetch
 def fetch_ivr(ivr_id, socket, user, password):
     """
     Fetch IVR header and entries for a given IVR id.
@@ -261,6 +288,8 @@ def fetch_ivr(ivr_id, socket, user, password):
         name    : IVR name (string)
         options : list of (selection, dest) pairs.
     """
+    if CONFIG is not None:
+        return CONFIG.ivrs.get(ivr_id, (None, []))
     dbg(f"DB: fetch_ivr({ivr_id})")
 
     # IVR basic info: id, name, announcement
@@ -282,10 +311,13 @@ def fetch_ivr(ivr_id, socket, user, password):
     return name, [(sel, dest) for (_ivr, sel, dest) in entries]
 
 
+@cached_fetch
 def fetch_timecondition(tc_id, socket, user, password):
     """
     Fetch a Time Condition configuration and its associated Time Group rules.
     """
+    if CONFIG is not None:
+        return CONFIG.timecondition(tc_id)
     dbg(f"DB: fetch_timecondition({tc_id})")
 
     rows = q(
@@ -317,6 +349,7 @@ def fetch_timecondition(tc_id, socket, user, password):
     }
 
 
+@cached_fetch
 def fetch_announcement(ann_id, socket, user, password):
     """
     Fetch an announcement by id.
@@ -324,6 +357,8 @@ def fetch_announcement(ann_id, socket, user, password):
     Returns:
         (description, post_dest) or (None, None) if not found.
     """
+    if CONFIG is not None:
+        return CONFIG.announcements.get(ann_id, (None, None))
     dbg(f"DB: fetch_announcement({ann_id})")
 
     rows = q(
@@ -339,10 +374,13 @@ def fetch_announcement(ann_id, socket, user, password):
     return desc, post
 
 
+@cached_fetch
 def fetch_system_recording(rec_id, socket, user, password):
     """
     Return display name of a system recording id, or None.
     """
+    if CONFIG is not None:
+        return CONFIG.recordings.get(rec_id)
     dbg(f"DB: fetch_system_recording({rec_id})")
 
     # Try modern table first
@@ -363,6 +401,162 @@ def fetch_system_recording(rec_id, socket, user, password):
     return None
 
 
+# ---------- Batch config ------------------------------------------------------
+
+class CallflowConfig:
+    """
+    Every table the resolver reads, loaded once and indexed by id.
+
+    Values have the same shapes the fetch_* helpers return, so
+    resolve_recursive behaves identically whether it is answered by the DB
+    or by this cache (see the CONFIG global).
+    """
+
+    def __init__(self):
+        self.users = {}           # extension -> name
+        self.incoming = {}        # did -> (description, destination)
+        self.ringgroups = {}      # grpnum -> fetch_ringgroup() row
+        self.queues = {}          # queue id -> (name, strategy, timeout, members_csv)
+        self.ivrs = {}            # ivr id -> (name, [(selection, dest), ...])
+        self.timeconditions = {}  # tc id -> (display, tg_id, truegoto, falsegoto)
+        self.timegroups = {}      # tg id -> [(timegroupid, time), ...]
+        self.announcements = {}   # announcement id -> (description, post_dest)
+        self.recordings = {}      # recording id -> displayname
+
+    def timecondition(self, tc_id):
+        """Same dict fetch_timecondition() builds, or None if not found."""
+        row = self.timeconditions.get(tc_id)
+        if row is None:
+            return None
+        display, tg_id, truegoto, falsegoto = row
+        return {
+            "display": display,
+            "tg_id": tg_id,
+            "rules": human_time_rules(self.timegroups.get(tg_id, [])),
+            "true": truegoto,
+            "false": falsegoto
+        }
+
+    @classmethod
+    def from_db(cls, socket=None, user="root", password=None):
+        """
+        Load the config with one query per table on the shared mysql session,
+        skipping tables this install doesn't have.
+        """
+        dbg("Loading call-flow config from DB")
+        tables = {r[0] for r in q("SHOW TABLES;", socket, user, password)}
+
+        def rows(table, sql):
+            return q(sql, socket, user, password) if table in tables else []
+
+        cfg = cls()
+        cfg.users = {ext: name for (ext, name) in
+                     rows("users", "SELECT extension,name FROM users;")}
+        for did, desc, dest in rows(
+                "incoming",
+                "SELECT extension, COALESCE(description,''), destination FROM incoming;"):
+            cfg.incoming.setdefault(did, (desc, dest))
+        for row in rows(
+                "ringgroups",
+                "SELECT grpnum,description,grplist,strategy,grptime,COALESCE(postdest,'') "
+                "FROM ringgroups;"):
+            cfg.ringgroups[row[0]] = row
+
+        strat = {r[0]: (r[1], r[2]) for r in rows("queues_details", """
+            SELECT id,
+                   MAX(CASE WHEN keyword='strategy' THEN data END),
+                   MAX(CASE WHEN keyword='timeout'  THEN data END)
+            FROM queues_details GROUP BY id;""")}
+        members = {r[0]: r[1] for r in rows("queues_details", """
+            SELECT id,
+                   GROUP_CONCAT(
+                     TRIM(BOTH ',' FROM SUBSTRING_INDEX(SUBSTRING_INDEX(data,'@',1),'/',-1))
+                     ORDER BY data SEPARATOR ',')
+            FROM queues_details WHERE keyword='member' GROUP BY id;""")}
+        names = {r[0]: r[1] for r in
+                 rows("queues_config", "SELECT extension,descr FROM queues_config;")}
+        for qid in set(strat) | set(members) | set(names):
+            strategy, timeout = strat.get(qid, ("", ""))
+            cfg.queues[qid] = (names.get(qid, ""), strategy, timeout, members.get(qid) or "")
+
+        for ivr_id, name, _ann in rows("ivr_details",
+                                       "SELECT id,name,announcement FROM ivr_details;"):
+            cfg.ivrs[ivr_id] = (name, [])
+        for ivr_id, sel, dest in rows(
+                "ivr_entries",
+                "SELECT ivr_id, selection, dest FROM ivr_entries ORDER BY ivr_id, selection;"):
+            if ivr_id in cfg.ivrs:
+                cfg.ivrs[ivr_id][1].append((sel, dest))
+
+        for tc_id, display, tg_id, truegoto, falsegoto in rows(
+                "timeconditions",
+                "SELECT timeconditions_id,displayname,`time`,"
+                "COALESCE(truegoto,''),COALESCE(falsegoto,'') FROM timeconditions;"):
+            cfg.timeconditions[tc_id] = (display, tg_id, truegoto, falsegoto)
+        for tg_id, rule in rows(
+                "timegroups_details",
+                "SELECT timegroupid, `time` FROM timegroups_details ORDER BY id;"):
+            cfg.timegroups.setdefault(tg_id, []).append((tg_id, rule))
+
+        for ann_id, desc, post in rows(
+                "announcement",
+                "SELECT announcement_id, description, COALESCE(post_dest,'') FROM announcement;"):
+            cfg.announcements[ann_id] = (desc, post)
+
+        # Legacy table first so the modern one wins, as in fetch_system_recording()
+        for table in ("systemrecordings", "recordings"):
+            for rec_id, name in rows(table, f"SELECT id, displayname FROM {table};"):
+                cfg.recordings[rec_id] = name
+
+        dbg(f"Config loaded: {len(cfg.incoming)} DID(s), {len(cfg.ivrs)} IVR(s), "
+            f"{len(cfg.ringgroups)} ring group(s), {len(cfg.timeconditions)} time condition(s)")
+        return cfg
+
+    @classmethod
+    def from_snapshot(cls, path):
+        """Load the config from a freepbx_dump.py JSON snapshot (no DB access)."""
+        dbg(f"Loading call-flow config from snapshot {path}")
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        def s(v):
+            # The dump keeps the mysql CLI's literal "NULL" for un-COALESCEd columns
+            return "" if v is None or v == "NULL" else str(v)
+
+        cfg = cls()
+        cfg.users = {s(u["extension"]): s(u.get("name")) for u in data.get("extensions", [])}
+        for r in data.get("inbound", []):
+            cfg.incoming.setdefault(s(r.get("did")), (s(r.get("label")), s(r.get("destination"))))
+        for r in data.get("ringgroups", []):
+            cfg.ringgroups[s(r["grpnum"])] = (
+                s(r["grpnum"]), s(r.get("description")), s(r.get("grplist")),
+                s(r.get("strategy")), s(r.get("ringtime")), s(r.get("postdest")))
+        for r in data.get("queues", []):
+            if "queue" not in r:    # the trailing {"_dynamic_members": [...]} entry
+                continue
+            cfg.queues[s(r["queue"])] = (s(r.get("queue_name")), s(r.get("strategy")),
+                                         s(r.get("timeout")), s(r.get("members")))
+        ivrs = data.get("ivrs") or {}
+        for m in ivrs.get("menus", []):
+            cfg.ivrs[s(m["ivr_id"])] = (s(m.get("name")), [])
+        for o in ivrs.get("options", []):
+            if s(o["ivr_id"]) in cfg.ivrs:
+                cfg.ivrs[s(o["ivr_id"])][1].append((s(o.get("selection")), s(o.get("dest"))))
+        for r in data.get("timeconditions", []):
+            cfg.timeconditions[s(r["timeconditions_id"])] = (
+                s(r.get("displayname")), s(r.get("timegroupid")),
+                s(r.get("true_dest")), s(r.get("false_dest")))
+        for r in data.get("timegroups", []):
+            tg_id = s(r.get("timegroupid"))
+            cfg.timegroups.setdefault(tg_id, []).append((tg_id, s(r.get("time"))))
+        for r in data.get("announcements", []):
+            cfg.announcements[s(r["announcement_id"])] = (s(r.get("description")),
+                                                           s(r.get("post_dest")))
+        for r in data.get("recordings", []):
+            cfg.recordings[s(r["id"])] = s(r.get("displayname"))
+        return cfg
+
+
 # ---------- Graph helper ------------------------------------------------------
 
 class Graph:
@@ -380,6 +574,8 @@ class Graph:
         ]
         self.ids = 0              # Counter used to generate unique node IDs
         self.node_ids = {}        # Maps logical 'key' -> 'n<number>'
+        self.shared = {}          # Maps an expanded dest string -> its node ID
+        self.cuts = []            # Loop targets / None (max depth) where expansion stopped
 
     def new_id(self):
         """
@@ -451,29 +647,69 @@ def resolve_recursive(graph,
     """
     Core engine: recursively "expand" a FreePBX destination into graph nodes.
 
-    `path` is a list of dest strings seen so far on the current call path.
-    It is used for loop detection (IVR <-> IVR, IVR <-> TC, etc.).
+    `path` is the set of dest strings on the current call path (pushed on
+    the way down, popped on the way back up). It is used for loop detection
+    (IVR <-> IVR, IVR <-> TC, etc.).
+
+    Each destination is expanded once per graph: a sub-flow reached again
+    from another branch (a shared sub-menu, the same ring group behind
+    several IVR keys) gets an edge to the node already built for it
+    instead of a second copy of the whole subtree. Only subtrees that came
+    out the same wherever they are reached are shared: one cut short by the
+    depth brake, or with a loop back to a destination above it, depends on
+    the path it was reached by and is built again next time.
     """
 
     # Initialize path for the first call
     if path is None:
-        path = []
+        path = set()
 
-    # Loop detection: if this destination already exists in the current path,
+    # Loop detection: if this destination is already on the current path,
     # we have a cycle in the dialplan (e.g., IVR -> TC -> IVR).
     if dest in path:
-        dbg(f"Loop detected at dest='{dest}' (already in path: {path})")
+        dbg(f"Loop detected at dest='{dest}' (already in path: {sorted(path)})")
+        graph.cuts.append(dest)
         loop_label = f"Loop detected\n{dest}"
         return graph.add_node(key, loop_label)
 
+    # Already expanded elsewhere in this graph: share that sub-flow
+    nid = graph.shared.get(dest)
+    if nid is not None:
+        dbg(f"Sharing node {nid} for dest='{dest}'")
+        return nid
+
     # Hard safety brake in case something goes insane
     if depth > max_depth:
         dbg(f"Max depth exceeded at dest='{dest}'")
+        graph.cuts.append(None)
         return graph.add_node(key, f"Max depth reached at {dest}")
 
-    # Build new path including this dest for child calls
-    new_path = path + [dest]
-
+    cuts_before = len(graph.cuts)
+    path.add(dest)
+    try:
+        nid = _expand_dest(graph, key, dest, users_map, socket, user, password,
+                           depth, max_depth, path)
+    finally:
+        path.discard(dest)
+
+    # `path` is back to the ancestors here: a loop to one of them, or a depth
+    # cut, means this subtree is specific to how we got here.
+    # Loops back to this dest or below it are settled; keep the rest for
+    # the callers, whose subtrees contain this one.
+    pending = [cut for cut in graph.cuts[cuts_before:] if cut is None or cut in path]
+    del graph.cuts[cuts_before:]
+    graph.cuts.extend(pending)
+    if nid is not None and not pending:
+        graph.shared[dest] = nid
+    return nid
+
+
+def _expand_dest(graph, key, dest, users_map, socket, user, password,
+                 depth, max_depth, path):
+    """
+    Build the node for one destination and recurse into its branches.
+    Only called by resolve_recursive(), which owns loop detection and sharing.
+    """
     ctx, rest, raw = parse_dest(dest)
     dbg(f"Resolving dest='{dest}' depth={depth} ctx='{ctx}' rest={rest}")
 
@@ -507,7 +743,7 @@ def resolve_recursive(graph,
             password,
             depth + 1,
             max_depth,
-            new_path
+            path
         )
 
         fchild = resolve_recursive(
@@ -520,7 +756,7 @@ def resolve_recursive(graph,
             password,
             depth + 1,
             max_depth,
-            new_path
+            path
         )
 
         graph.add_edge(nid, tchild, "TRUE")
@@ -550,7 +786,7 @@ def resolve_recursive(graph,
                 password,
                 depth + 1,
                 max_depth,
-                new_path
+                path
             )
             graph.add_edge(nid, child, sel)
         return nid
@@ -576,7 +812,7 @@ def resolve_recursive(graph,
                 password,
                 depth + 1,
                 max_depth,
-                new_path
+                path
             )
             graph.add_edge(nid, child, "after")
         else:
@@ -653,7 +889,7 @@ def resolve_recursive(graph,
                 password,
                 depth + 1,
                 max_depth,
-                new_path
+                path
             )
             graph.add_edge(nid, child, "post")
         else:
@@ -705,6 +941,119 @@ def resolve_recursive(graph,
         return add_terminal(raw)
 
 
+# ---------- Rendering ---------------------------------------------------------
+
+def build_did_graph(did, label, dest, users_map, socket=None, user="root", password=None):
+    """
+    Build the full graph for one inbound route: the DID root node plus its
+    recursively expanded destination.
+    """
+    g = Graph()
+    root_key = ("root", did)
+    root_label = f"DID: {did}\n{label or '(no label)'}"
+    dbg(f"Creating root node for DID={did}")
+    root = g.add_node(root_key, root_label)
+
+    # Resolve first hop with an empty path for loop detection
+    dbg(f"Starting recursive resolution from dest='{dest}'")
+    child = resolve_recursive(
+        g,
+        ("dest", dest),
+        dest,
+        users_map,
+        socket,
+        user,
+        password,
+        depth=0,
+        max_depth=25
+    )
+    g.add_edge(root, child)
+    return g
+
+
+def render_svg(dot, out_path, timeout=120):
+    """
+    Pipe DOT text through Graphviz into an SVG file.
+
+    Returns:
+        (ok, error_text)
+    """
+    dbg(f"Invoking 'dot' to render SVG: {out_path}")
+    try:
+        p = subprocess.run(["dot", "-Tsvg", "-o", out_path], input=dot.encode("utf-8"),
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    except FileNotFoundError:
+        return False, "Graphviz 'dot' not found (install the graphviz package)"
+    except subprocess.TimeoutExpired:
+        return False, f"Graphviz timed out after {timeout}s"
+    if p.returncode != 0:
+        err = p.stderr.decode("utf-8", "replace").strip()
+        return False, err or f"dot exited with status {p.returncode}"
+    return True, ""
+
+
+def render_batch(dids, out_dir, socket=None, user="root", password=None,
+                 snapshot=None, jobs=None, progress=None):
+    """
+    Render call-flow SVGs for many DIDs from a single process.
+
+    The routing config is loaded once (from `snapshot` if given, otherwise
+    one pass over the DB) and every DID is resolved in memory. Only the
+    Graphviz step fans out: up to `jobs` (default: CPU count) `dot`
+    processes run at once. Each worker thread just waits on its own `dot`
+    child, so this gets one render per core without re-importing this
+    module in a process pool.
+
+    Parameters:
+        dids     : DIDs to render; None renders every inbound route.
+        progress : optional callback(done, total, did), called as each DID finishes.
+
+    Returns:
+        list of (did, out_path, ok, error_text), in the order of `dids`.
+    """
+    global CONFIG
+    if snapshot:
+        cfg = CallflowConfig.from_snapshot(snapshot)
+    else:
+        cfg = CallflowConfig.from_db(socket, user, password)
+    dids = sorted(cfg.incoming) if dids is None else [str(d) for d in dids]
+    total = len(dids)
+    done = 0
+    results = {}
+    work = []
+
+    previous, CONFIG = CONFIG, cfg
+    try:
+        for did in dids:
+            out_path = os.path.join(out_dir, f"callflow_{did}.svg")
+            route = cfg.incoming.get(did)
+            if route is None:
+                results[did] = (did, out_path, False, f"No inbound route found for DID: {did}")
+                done += 1
+                if progress:
+                    progress(done, total, did)
+                continue
+            label, dest = route
+            g = build_did_graph(did, label, dest, cfg.users, socket, user, password)
+            work.append((did, out_path, g.render()))
+    finally:
+        CONFIG = previous
+
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(render_svg, dot, out_path): (did, out_path)
+                   for did, out_path, dot in work}
+        for fut in as_completed(futures):
+            did, out_path = futures[fut]
+            ok, err = fut.result()
+            results[did] = (did, out_path, ok, err)
+            done += 1
+            if progress:
+                progress(done, total, did)
+
+    return [results[did] for did in dids]
+
+
 # ---------- CLI ---------------------------------------------------------------
 
 def main():
@@ -718,8 +1067,17 @@ def main():
         description="Render FreePBX callflow for a DID to SVG "
                     "(expands Time Conditions, IVR, Queues, Ring Groups, Announcements)"
     )
-    ap.add_argument("--did", required=True, help="DID to render (incoming.extension)")
-    ap.add_argument("--out", required=True, help="Output SVG path")
+    ap.add_argument("--did", help="DID to render (incoming.extension)")
+    ap.add_argument("--out", help="Output SVG path")
+    ap.add_argument("--dids",
+                    help="Batch mode: comma-separated DIDs, or 'all' for every inbound route")
+    ap.add_argument("--out-dir", default=".",
+                    help="Batch mode: directory for callflow_<DID>.svg files")
+    ap.add_argument("--snapshot",
+                    help="Batch mode: read config from a freepbx_dump.py JSON snapshot "
+                         "instead of the DB")
+    ap.add_argument("--jobs", type=int, default=None,
+                    help="Batch mode: parallel Graphviz renders (default: CPU count)")
     ap.add_argument("--db-user", default="root")
     ap.add_argument("--db-pass", default=None)
     ap.add_argument("--socket", default=None, help="MySQL socket path (e.g., /var/lib/mysql/mysql.sock)")
@@ -735,6 +1093,25 @@ def main():
     if DEBUG_MODE:
         print(Colors.YELLOW + "🔧 Debug mode enabled" + Colors.ENDC)
 
+    if args.dids:
+        dids = None if args.dids.strip().lower() == "all" else \
+            [d.strip() for d in args.dids.split(",") if d.strip()]
+        os.makedirs(args.out_dir, exist_ok=True)
+        results = render_batch(dids, args.out_dir, args.socket, args.db_user, args.db_pass,
+                               snapshot=args.snapshot, jobs=args.jobs)
+        failed = 0
+        for did, out_path, ok, err in results:
+            if ok:
+                print(Colors.GREEN + "✓ " + Colors.ENDC + f"DID {did} -> {out_path}")
+            else:
+                failed += 1
+                print(Colors.RED + "✖ " + Colors.ENDC + f"DID {did} FAILED: {err}")
+        print(Colors.BOLD + f"\nDone. Success: {len(results) - failed}, Failed: {failed}" + Colors.ENDC)
+        sys.exit(3 if failed else 0)
+
+    if not args.did or not args.out:
+        ap.error("--did and --out are required (or use --dids for batch mode)")
+
     print(Colors.CYAN + "📞 Analyzing DID: " + Colors.BOLD + args.did + Colors.ENDC)
 
     # Find inbound route for this DID
@@ -763,28 +1140,8 @@ def main():
     # Build extension -> name mapping for prettier labels
     users_map = fetch_users_map(args.socket, args.db_user, args.db_pass)
 
-    # Create graph and root node
-    g = Graph()
-    root_key = ("root", did)
-    root_label = f"DID: {did}\n{label or '(no label)'}"
-    dbg(f"Creating root node for DID={did}")
-    root = g.add_node(root_key, root_label)
-
-    # Resolve first hop with an empty path for loop detection
-    dbg(f"Starting recursive resolution from dest='{dest}'")
-    child = resolve_recursive(
-        g,
-        ("dest", dest),
-        dest,
-        users_map,
-        args.socket,
-        args.db_user,
-        args.db_pass,
-        depth=0,
-        max_depth=25,
-        path=[]
-    )
-    g.add_edge(root, child)
+    g = build_did_graph(did, label, dest, users_map,
+                        args.socket, args.db_user, args.db_pass)
 
     print(Colors.CYAN + "🎨 Generating SVG diagram..." + Colors.ENDC)
 
@@ -802,10 +1159,9 @@ def main():
         print(Colors.GREEN + f"\nDOT saved to {dot_file}" + Colors.ENDC)
 
     # Call Graphviz
-    dbg(f"Invoking 'dot' to render SVG: {args.out}")
-    p = subprocess.run(["dot", "-Tsvg", "-o", args.out], input=dot.encode("utf-8"))
-    if p.returncode != 0:
-        print(Colors.RED + "❌ Graphviz dot command failed" + Colors.ENDC, file=sys.stderr)
+    ok, err = render_svg(dot, args.out)
+    if not ok:
+        print(Colors.RED + "❌ Graphviz dot command failed: " + err + Colors.ENDC, file=sys.stderr)
         sys.exit(3)
 
     # Summary
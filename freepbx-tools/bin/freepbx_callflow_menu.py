@@ -43,6 +43,8 @@ See function docstrings for additional details on arguments and return values.
 """
 
 import json, os, sys, subprocess, time, shutil, re, threading, smtplib, zipfile, socket
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
@@ -54,6 +56,26 @@ try:
 except ImportError:
     _HAS_TERMIOS = False  # e.g. Windows — fall back to plain prompt()
 
+# Sibling tools live in the same bin/ dir; the call-flow renderer is used
+# in-process for batch runs, with a per-DID subprocess fallback.
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_callflow_graph as callflow_graph
+except ImportError:
+    callflow_graph = None
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+try:
+    import freepbx_security_stats
+except ImportError:
+    freepbx_security_stats = None
+try:
+    import freepbx_ami
+except ImportError:
+    freepbx_ami = None
+
 # ANSI Color codes
 class Colors:
     RESET = '\033[0m'
@@ -349,7 +371,7 @@ def get_freepbx_version_live():
 
 def get_asterisk_version_live():
     """Best-effort Asterisk version from CLI."""
-    rc, out, _ = run(["asterisk", "-rx", "core show version"], timeout=2)
+    rc, out, _ = asterisk_rx("core show version", timeout=2)
     if rc != 0:
         return None
     line = (out.strip().splitlines() or [""])[0].strip()
@@ -670,7 +692,7 @@ def run_tc_control(sock):
             run(["mysql", "--user", DB_USER, "--socket", sock, "-NBe", f"UPDATE timeconditions SET inuse_state={action} WHERE timeconditions_id={tc_id_int}", "asterisk"])
             print(f"{Colors.GREEN}✓ TC {tc_id_int} forced {state_label}.{Colors.RESET}")
 
-        _DASH_CACHE["ts"] = 0.0  # invalidate dashboard cache after TC change
+        invalidate_dashboard()  # TC state changed: re-collect on the next render
 
 
 def run_module_analyzer(sock):
@@ -1731,6 +1753,14 @@ def run(cmd, env=None, timeout=None):
         return 1, "", "Timeout running {}".format(e.cmd)
 
 
+def asterisk_rx(command, timeout=5):
+    """(rc, out, err) of an Asterisk CLI command — over the shared AMI
+    connection when available, else a forked `asterisk -rx` as before."""
+    if freepbx_ami is not None:
+        return freepbx_ami.cli(command, timeout=timeout)
+    return run(["asterisk", "-rx", command], timeout=timeout)
+
+
 def run_interactive(cmd, env=None):
     """Run command with output streaming directly to terminal. Returns the
     exit code (existing callers that ignore the return value are unaffected)."""
@@ -1814,9 +1844,14 @@ def load_dump():
     with open(DUMP_PATH, "r") as f:
         return json.load(f)
 
-def refresh_dump(sock):
+def refresh_dump(sock, incremental=False):
+    """Re-snapshot FreePBX config. incremental=True passes --refresh, so the
+    dump only re-reads sections whose tables changed (CHECKSUM TABLE) and is
+    close to free when nothing did — that's what the live monitor uses."""
     ensure_outdir()
     cmd = ["python3", DUMP_SCRIPT, "--socket", sock, "--db-user", DB_USER, "--out", DUMP_PATH]
+    if incremental:
+        cmd.append("--refresh")
     rc, out, err = run_with_spinner(cmd, "Refreshing FreePBX data cache (reads MySQL)")
     if rc == 0:
         print("    ✓ Snapshot written to", DUMP_PATH)
@@ -1824,6 +1859,14 @@ def refresh_dump(sock):
     print("    ✖ Snapshot failed:\n" + (err or out))
     return False
 
+def _snapshot_age_text(meta):
+    """'<generated_at_utc>', plus when --refresh last found it still current."""
+    generated = meta.get("generated_at_utc", "")
+    verified = meta.get("verified_at_utc", "")
+    if verified and verified != generated:
+        return f"{generated} (verified {verified})"
+    return generated
+
 def summarize(data):
     def count(key, sub=None):
         if key not in data: return 0
@@ -1838,7 +1881,7 @@ def summarize(data):
     print(Colors.CYAN + "║ " + Colors.BOLD + Colors.WHITE + "Host:            " + Colors.RESET + Colors.GREEN + Colors.BOLD + data.get("meta", {}).get("hostname", "").ljust(58) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
     print(Colors.CYAN + "║ " + Colors.BOLD + Colors.WHITE + "freePBX version: " + Colors.RESET + Colors.YELLOW + Colors.BOLD + data.get("meta", {}).get("freepbx_version", "").ljust(58) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
     print(Colors.CYAN + "║ " + Colors.BOLD + Colors.WHITE + "MySQL version:   " + Colors.RESET + Colors.YELLOW + Colors.BOLD + data.get("meta", {}).get("mysql_version", "").ljust(58) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
-    print(Colors.CYAN + "║ " + Colors.BOLD + Colors.WHITE + "Generated:       " + Colors.RESET + Colors.MAGENTA + data.get("meta", {}).get("generated_at_utc", "").ljust(58) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
+    print(Colors.CYAN + "║ " + Colors.BOLD + Colors.WHITE + "Generated:       " + Colors.RESET + Colors.MAGENTA + _snapshot_age_text(data.get("meta", {})).ljust(58) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
     print(Colors.CYAN + Colors.BOLD + "╠" + "═" * 78 + "╣" + Colors.RESET)
     print(Colors.CYAN + "║ " + Colors.WHITE + "Inbound routes (DIDs):     " + Colors.RESET + Colors.CYAN + Colors.BOLD + str(count("inbound")).rjust(48) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
     print(Colors.CYAN + "║ " + Colors.WHITE + "IVRs (menus):              " + Colors.RESET + Colors.CYAN + Colors.BOLD + str(count("ivrs", "menus")).rjust(48) + Colors.RESET + Colors.CYAN + " ║" + Colors.RESET)
@@ -1860,9 +1903,117 @@ _SORT_CYCLE = ['index', 'did', 'label', 'dest']
 # Session state — persists across menu visits within one run
 _SESSION = {"last_filter": "", "last_sort": "index", "last_did": ""}
 
-# Dashboard live-data cache — avoid re-querying Asterisk on every menu render
-_DASH_CACHE: dict = {"ts": 0.0}
-_DASH_CACHE_TTL = 30  # seconds
+# Dashboard collectors: how long each one's result stays fresh (seconds).
+# 0 = re-collect every refresh tick (the render still uses the last value).
+_DASH_TTLS = {
+    "active_calls": 0,
+    "trunks": 10,
+    "endpoints": 15,
+    "recent_errors": 15,
+    "time_conditions": 30,
+    "services": 30,
+    "versions": 600,
+    "packages": 3600,
+}
+_DASH_FIRST_WAIT = 8.0  # first render: seconds to wait for collectors that have no value yet
+
+
+class CollectorScheduler(object):
+    """Run dashboard collectors concurrently, each on its own TTL.
+
+    get() never blocks: it returns the last collected value (or the
+    collector's default) and starts a background refresh when the value is
+    older than the collector's TTL. At most one refresh per collector runs at
+    a time, each on a daemon thread, so a slow `systemctl` or a hung
+    `asterisk -rx` delays only its own tile and never the render — and never
+    holds up exit. A collector that raises keeps its previous value.
+    """
+
+    def __init__(self):
+        self.collectors = {}   # name -> (fn, ttl, default)
+        self.values = {}
+        self.stamps = {}       # name -> time.time() of the last finished run
+        self.running = {}      # name -> Thread
+        self.lock = threading.Lock()
+
+    def register(self, name, fn, ttl, default=None):
+        self.collectors[name] = (fn, ttl, default)
+
+    def invalidate(self, *names):
+        """Mark collectors (all when none given) stale for the next get()."""
+        with self.lock:
+            for name in names or list(self.stamps):
+                self.stamps[name] = 0.0
+
+    def _run(self, name, fn):
+        try:
+            value = fn()
+            with self.lock:
+                self.values[name] = value
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.stamps[name] = time.time()
+                self.running.pop(name, None)
+
+    def refresh(self, names=None):
+        """Start a background run of every stale, not-already-running collector."""
+        now = time.time()
+        with self.lock:
+            for name in names or list(self.collectors):
+                fn, ttl, _default = self.collectors[name]
+                if name in self.running or now - self.stamps.get(name, 0.0) < max(ttl, 0.001):
+                    continue
+                t = threading.Thread(target=self._run, args=(name, fn), daemon=True)
+                self.running[name] = t
+                t.start()
+
+    def wait_first(self, names, timeout):
+        """Block up to `timeout` seconds for collectors that have never produced a value."""
+        deadline = time.time() + timeout
+        for name in names:
+            with self.lock:
+                t = self.running.get(name) if name not in self.values else None
+            if t is not None:
+                t.join(max(0.0, deadline - time.time()))
+
+    def get(self, name):
+        with self.lock:
+            if name in self.values:
+                return self.values[name]
+        return self.collectors[name][2]
+
+
+# One scheduler per MySQL socket (the DB-backed collectors are bound to it)
+_DASH_COLLECTORS: dict = {}
+
+
+def dashboard_collectors(sock):
+    """The CollectorScheduler for `sock`, with every dashboard collector registered."""
+    sched = _DASH_COLLECTORS.get(sock)
+    if sched is None:
+        sched = _DASH_COLLECTORS[sock] = CollectorScheduler()
+        services = ["asterisk", "httpd", "mariadb", "fail2ban", "php-fpm", "crond"]
+        sched.register("active_calls", lambda: get_active_calls(sock), _DASH_TTLS["active_calls"])
+        sched.register("time_conditions", lambda: get_time_conditions_status(sock),
+                       _DASH_TTLS["time_conditions"], (0, 0, ["Loading..."]))
+        sched.register("endpoints", lambda: get_endpoint_status(sock), _DASH_TTLS["endpoints"],
+                       {"registered": 0, "unregistered": 0, "total": 0, "details": []})
+        sched.register("services", lambda: get_service_status(services), _DASH_TTLS["services"],
+                       [(svc, "unknown", Colors.YELLOW) for svc in services])
+        sched.register("trunks", lambda: get_trunk_status(sock), _DASH_TTLS["trunks"], (None, None))
+        sched.register("recent_errors", get_recent_error_count, _DASH_TTLS["recent_errors"])
+        sched.register("versions", lambda: (get_freepbx_version_live(), get_asterisk_version_live()),
+                       _DASH_TTLS["versions"], (None, None))
+        sched.register("packages", get_recent_package_updates, _DASH_TTLS["packages"], [])
+    return sched
+
+
+def invalidate_dashboard():
+    """Make every dashboard collector re-run on the next render (after a change)."""
+    for sched in _DASH_COLLECTORS.values():
+        sched.invalidate()
 
 
 def get_did_rows(data):
@@ -2143,40 +2294,51 @@ def parse_selection(sel, did_rows):
     return sorted(chosen)
 
 def render_dids(did_rows, indexes, sock, skip_labels=None):
+    """Render call-flow SVGs for the selected DIDs. Uses the in-process
+    batch renderer (config loaded once, Graphviz fanned out across cores);
+    falls back to one freepbx_callflow_graph.py subprocess per DID."""
     ensure_outdir()
-    ok = 0
-    bad = 0
-    ok_files = []
-    total = len(indexes)
-    for i, idx in enumerate(indexes, 1):
+    dids = []
+    for idx in indexes:
         _, did, label, _, _ = did_rows[idx-1]
-
         if skip_labels and label and label.strip().lower() in skip_labels:
             print(f"• Skipping DID {did} (label='{label}')")
             continue
+        dids.append(str(did))
 
-        out_file = os.path.join(OUT_DIR, f"callflow_{did}.svg")
-
-        print_progress_bar(i, total, f"Rendering DID {did}")
-
-        cmd = [
-            "python3",
-            GRAPH_SCRIPT,
-            "--socket", sock,
-            "--db-user", DB_USER,
-            "--did", str(did),
-            "--out", out_file,
-        ]
-
-        # Put a per-DID timeout on the graph generator
-        rc, out, err = run(cmd, timeout=120)
+    if callflow_graph is not None:
+        results = callflow_graph.render_batch(
+            dids, OUT_DIR, socket=sock, user=DB_USER,
+            progress=lambda done, total, did: print_progress_bar(done, total, f"Rendered DID {did}"))
+        print()
+    else:
+        results = []
+        for i, did in enumerate(dids, 1):
+            out_file = os.path.join(OUT_DIR, f"callflow_{did}.svg")
+            print_progress_bar(i, len(dids), f"Rendering DID {did}")
+            cmd = [
+                "python3",
+                GRAPH_SCRIPT,
+                "--socket", sock,
+                "--db-user", DB_USER,
+                "--did", did,
+                "--out", out_file,
+            ]
+            # Put a per-DID timeout on the graph generator
+            rc, out, err = run(cmd, timeout=120)
+            results.append((did, out_file, rc == 0, (err or out).strip()))
+        print()
 
-        if rc == 0 and os.path.isfile(out_file):
-            print(f"\n✓ DID {did} -> {out_file}")
+    ok = 0
+    bad = 0
+    ok_files = []
+    for did, out_file, success, err in results:
+        if success and os.path.isfile(out_file):
+            print(f"✓ DID {did} -> {out_file}")
             ok += 1
             ok_files.append(out_file)
         else:
-            print(f"\n✖ DID {did} FAILED: {(err or out).strip()}")
+            print(f"✖ DID {did} FAILED: {err}")
             bad += 1
 
     print(f"\nDone. Success: {ok}, Failed: {bad}")
@@ -2190,69 +2352,78 @@ def render_dids(did_rows, indexes, sock, skip_labels=None):
         maybe_email_file(zip_path, default_subject="freepbx-tools: call-flow diagrams")
 
 
-def get_service_status(services):
-    """Get status of system services"""
-    status_list = []
-    for service in services:
-        variations = [service]
-        if service == "asterisk":
-            variations = ["asterisk", "asterisk16", "asterisk18", "asterisk20"]
-        elif service == "php-fpm":
-            variations = ["php-fpm", "php73-php-fpm", "php74-php-fpm", "php80-php-fpm", "rh-php73-php-fpm"]
-
-        found = False
-        for variant in variations:
-            try:
-                cmd = ["systemctl", "is-active", variant]
-                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                      universal_newlines=True, timeout=2)
-                if result.returncode == 0 and result.stdout.strip() == "active":
-                    status_list.append((service, "running", Colors.GREEN))
-                    found = True
-                    break
-            except Exception:
-                pass
+def _service_variants(service):
+    """Unit names a service may be installed under."""
+    if service == "asterisk":
+        return ["asterisk", "asterisk16", "asterisk18", "asterisk20"]
+    if service == "php-fpm":
+        return ["php-fpm", "php73-php-fpm", "php74-php-fpm", "php80-php-fpm", "rh-php73-php-fpm"]
+    return [service]
 
-        if not found:
-            try:
-                for variant in variations:
-                    cmd = ["service", variant, "status"]
-                    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                          universal_newlines=True, timeout=2)
-                    if result.returncode == 0:
-                        status_list.append((service, "running", Colors.GREEN))
-                        found = True
-                        break
-            except Exception:
-                pass
 
-        # Asterisk-specific fallback: CLI ping proves it's running even if systemd
-        # unit name doesn't match any variant (e.g. custom build or init.d start)
-        if not found and service == "asterisk":
-            try:
-                r = subprocess.run(["asterisk", "-rx", "core show uptime"],
-                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                   universal_newlines=True, timeout=3)
-                if r.returncode == 0 and r.stdout.strip():
-                    status_list.append((service, "running", Colors.GREEN))
-                    found = True
-            except Exception:
-                pass
+def _service_fallback_running(service, variants):
+    """`service <name> status` for each variant; for Asterisk, finally a CLI ping."""
+    try:
+        for variant in variants:
+            cmd = ["service", variant, "status"]
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                  universal_newlines=True, timeout=2)
+            if result.returncode == 0:
+                return True
+    except Exception:
+        pass
 
-        if not found:
-            status_list.append((service, "stopped", Colors.RED))
+    # Asterisk-specific fallback: CLI ping proves it's running even if systemd
+    # unit name doesn't match any variant (e.g. custom build or init.d start)
+    if service == "asterisk":
+        try:
+            r = subprocess.run(["asterisk", "-rx", "core show uptime"],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True, timeout=3)
+            if r.returncode == 0 and r.stdout.strip():
+                return True
+        except Exception:
+            pass
+    return False
 
-    return status_list
+
+def get_service_status(services):
+    """Get status of system services.
+
+    One `systemctl is-active` call checks every unit-name variant of every
+    service at once (it prints one state per unit, in order); only services
+    it can't confirm fall back to `service ... status`, checked concurrently.
+    """
+    variants = dict((service, _service_variants(service)) for service in services)
+    units = [unit for service in services for unit in variants[service]]
+    active = set()
+    try:
+        result = subprocess.run(["systemctl", "is-active"] + units,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, timeout=3)
+        for unit, state in zip(units, result.stdout.split("\n")):
+            if state.strip() == "active":
+                active.add(unit)
+    except Exception:
+        pass
+
+    running = dict((service, any(unit in active for unit in variants[service])) for service in services)
+    unresolved = [service for service in services if not running[service]]
+    if unresolved:
+        with ThreadPoolExecutor(max_workers=len(unresolved)) as ex:
+            for service, ok in zip(unresolved, ex.map(
+                    lambda svc: _service_fallback_running(svc, variants[svc]), unresolved)):
+                running[service] = ok
+
+    return [(service, "running", Colors.GREEN) if running[service] else (service, "stopped", Colors.RED)
+            for service in services]
 
 def get_active_calls(sock):
     """Get count of active calls from Asterisk"""
     try:
-        cmd = ["asterisk", "-rx", "core show channels count"]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                              universal_newlines=True, timeout=5)
-        if result.returncode != 0:
+        rc, output, _ = asterisk_rx("core show channels count", timeout=5)
+        if rc != 0:
             return None
-        output = result.stdout or ""
         # Parse output like "2 active channels" or "0 active calls"
         for line in output.split('\n'):
             if 'active call' in line.lower() or 'active channel' in line.lower():
@@ -2398,7 +2569,22 @@ def get_endpoint_status(sock):
         # PJSIP: try contacts first; "No such command" in output means chan_sip system
         contact_endpoints = set()
         pjsip_active = False
-        rc, out, _ = run(["asterisk", "-rx", "pjsip show contacts"], timeout=5)
+        sip_ok = set()
+        ami_done = False
+        if freepbx_ami is not None:
+            # Structured over AMI: an endpoint with any contact is registered
+            try:
+                contact_endpoints = set(e.get("ObjectName", "") for e in freepbx_ami.pjsip_endpoints()
+                                        if e.get("Contacts", "").strip(","))
+                pjsip_active = ami_done = True
+            except freepbx_ami.AMIError:
+                try:
+                    sip_ok = set(e.get("ObjectName", "") for e in freepbx_ami.sip_peers()
+                                 if re.match(r"(ok|unknown)", e.get("Status", ""), re.IGNORECASE))
+                    ami_done = True
+                except freepbx_ami.AMIError:
+                    pass
+        rc, out = (1, "") if ami_done else asterisk_rx("pjsip show contacts", timeout=5)[:2]
         if rc == 0 and out and "no such command" not in out.lower():
             pjsip_active = True
             for line in out.split('\n'):
@@ -2412,9 +2598,8 @@ def get_endpoint_status(sock):
                     contact_endpoints.add(endpoint)
 
         # chan_sip fallback — only on systems that don't have PJSIP at all
-        sip_ok = set()
-        if not pjsip_active:
-            rc2, out2, _ = run(["asterisk", "-rx", "sip show peers"], timeout=5)
+        if not pjsip_active and not ami_done:
+            rc2, out2, _ = asterisk_rx("sip show peers", timeout=5)
             if rc2 == 0 and out2 and "no such command" not in out2.lower():
                 for line in out2.split('\n'):
                     if not line.strip() or line.lower().startswith("name/"):
@@ -2456,7 +2641,14 @@ def get_endpoint_status(sock):
 def get_trunk_status(sock):
     """Return (online, total) trunk registration counts."""
     try:
-        rc, out, _ = run(["asterisk", "-rx", "pjsip show registrations"], timeout=5)
+        if freepbx_ami is not None:
+            try:
+                regs = freepbx_ami.outbound_registrations()
+                online = sum(1 for _name, ok in regs if ok)
+                return online, len(regs)
+            except freepbx_ami.AMIError:
+                pass
+        rc, out, _ = asterisk_rx("pjsip show registrations", timeout=5)
         if rc == 0 and out:
             online = sum(1 for l in out.split('\n') if 'Registered' in l)
             total = sum(1 for l in out.split('\n') if re.search(r'^\s*\S+.*sip', l, re.IGNORECASE))
@@ -2464,7 +2656,7 @@ def get_trunk_status(sock):
                 total = out.lower().count('sip')
             return online, max(online, total)
         # fallback: chan_sip
-        rc2, out2, _ = run(["asterisk", "-rx", "sip show registry"], timeout=5)
+        rc2, out2, _ = asterisk_rx("sip show registry", timeout=5)
         if rc2 == 0 and out2:
             online = sum(1 for l in out2.split('\n') if 'Registered' in l)
             total = sum(1 for l in out2.split('\n')
@@ -2492,7 +2684,129 @@ def get_recent_error_count():
     return None
 
 
-def display_system_dashboard(sock, data):
+# Live log follow state for the dashboard — see get_live_log_counters()
+_LIVE_LOG: dict = {}
+_LIVE_SEED_BYTES = 1 << 20  # queue_log / no-index fallback: how far back the first read starts
+_LIVE_ERR_RE = re.compile(rb'ERROR|CRITICAL')
+_LIVE_REG_RE = re.compile(rb'(?i)failed.*register|registration.*failed|401.*REGISTER|403.*REGISTER')
+_LIVE_SEC_RE = re.compile(rb'(?i)failed.*auth|SECURITY|auth.*failed|SecurityEvent')
+_LIVE_SIP_RE = re.compile(rb'SIP/2\.0 ([456]\d\d)')
+_LIVE_ANY_RE = re.compile(rb'ERROR|CRITICAL|SIP/2\.0 [456]|(?i:regist|auth|SECURITY)')
+_LIVE_QUEUE_EVENTS = {b"ABANDON": "queue_abandon", b"EXITWITHTIMEOUT": "queue_timeout"}
+
+
+def _live_seed_offset(path, horizon):
+    """Byte offset to start following `path` from so the first read covers ~horizon seconds."""
+    if freepbx_log_index is not None and path == freepbx_log_index.FULL_LOG:
+        try:
+            idx = freepbx_log_index.LogIndex(path)
+            idx.update()
+            return idx.byte_range(datetime.now() - timedelta(seconds=horizon))[0]
+        except OSError:
+            pass
+    try:
+        return max(0, os.path.getsize(path) - _LIVE_SEED_BYTES)
+    except OSError:
+        return 0
+
+
+def _live_auth_ip(line):
+    """Offending address of a failed-auth line (bytes), or None.
+
+    Uses the security stats parser, which reads RemoteAddress / "failed for"
+    rather than the first dotted quad (on a SecurityEvent that is the PBX's
+    own LocalAddress).
+    """
+    if freepbx_security_stats is None:
+        return None
+    parsed = freepbx_security_stats.parse_security_line(line)
+    return parsed[1] if parsed else None
+
+
+def get_live_log_counters():
+    """Rolling 1/5/15-minute counts from the full log and queue_log, or None.
+
+    The first call seeds the last 15 minutes and starts following both logs
+    by file offset; every later call (each --watch tick) only reads the
+    bytes appended since the previous one. Rotation and truncation are
+    handled by the follower. Returns {window_seconds: {key: count}}.
+    """
+    if freepbx_log_index is None:
+        return None
+    full_log = freepbx_log_index.FULL_LOG
+    if not os.path.isfile(full_log):
+        return None
+    if not _LIVE_LOG:
+        counters = freepbx_log_index.RollingCounters()
+        _LIVE_LOG.update({
+            "counters": counters,
+            "full": freepbx_log_index.LogFollower(
+                full_log, start=_live_seed_offset(full_log, counters.horizon)),
+            "queue": freepbx_log_index.LogFollower(
+                freepbx_log_index.QUEUE_LOG,
+                start=_live_seed_offset(freepbx_log_index.QUEUE_LOG, counters.horizon)),
+        })
+    counters = _LIVE_LOG["counters"]
+    add = counters.add
+    year = freepbx_log_index.file_year(time.time())  # a Dec 31 line read after midnight stays in last year
+    last_stamp, when = None, None
+    try:
+        for line in _LIVE_LOG["full"].poll():
+            if not _LIVE_ANY_RE.search(line):
+                continue
+            stamp = freepbx_log_index.line_timestamp(line, year)
+            if stamp != last_stamp:
+                last_stamp = stamp
+                when = freepbx_log_index.stamp_epoch(stamp) if stamp else None
+            if _LIVE_ERR_RE.search(line):
+                add("errors", when)
+            m = _LIVE_SIP_RE.search(line)
+            if m:
+                add("sip_fail", when)
+                add(("sip", m.group(1).decode()), when)
+            if _LIVE_REG_RE.search(line):
+                add("reg_fail", when)
+            if _LIVE_SEC_RE.search(line):
+                add("auth_fail", when)
+                ip = _live_auth_ip(line)
+                if ip:
+                    add(("auth_ip", ip), when)
+        for line in _LIVE_LOG["queue"].poll():
+            # epoch|callid|queue|agent|EVENT|data...
+            parts = line.split(b"|", 5)
+            if len(parts) >= 5 and parts[4] in _LIVE_QUEUE_EVENTS:
+                try:
+                    add(_LIVE_QUEUE_EVENTS[parts[4]], int(parts[0]))
+                except ValueError:
+                    pass
+    except (OSError, ValueError):
+        return None
+    return counters.totals()
+
+
+def _live_triplet(totals, key):
+    """'1m/5m/15m' counts of one key, e.g. '0/3/12'."""
+    return "/".join(str(totals[w].get(key, 0)) for w in sorted(totals))
+
+
+def _live_top(counts, kind):
+    """(name, count) of the most frequent ("sip", code) / ("auth_ip", ip) key, or None."""
+    items = [(k[1], n) for k, n in counts.items() if isinstance(k, tuple) and k[0] == kind]
+    return max(items, key=lambda x: x[1]) if items else None
+
+
+def _live_endpoint_status(base, registered):
+    """The endpoints tile with registration state taken from the AMI live model."""
+    details = [(ext, name, "Registered" if ext in registered else "Unregistered")
+               for ext, name, _status in base["details"]]
+    if not details:
+        return base
+    reg = [d for d in details if d[2] == "Registered"]
+    unreg = [d for d in details if d[2] != "Registered"]
+    return {"registered": len(reg), "unregistered": len(unreg), "total": len(details), "details": reg + unreg}
+
+
+def display_system_dashboard(sock, data, ami_live=None):
     """Display key system information in a professional tile-based dashboard layout"""
     import os
     import shutil
@@ -2518,11 +2832,26 @@ def display_system_dashboard(sock, data):
     print("/_/   /_/   \\___/\\____/_____/_____/ /_/   /    /_/  \\____/\\____/_/____/  ")
     print(Colors.RESET)
     
+    # Log counters follow the logs by offset, so they are cheap to refresh every tick
+    live = get_live_log_counters()
+
+    # Everything else comes from collectors running in the background on their
+    # own TTLs: this render uses whatever each one last returned, and only the
+    # very first render waits (briefly) for values it has never had.
+    collectors = dashboard_collectors(sock)
+    names = [n for n in collectors.collectors if n != "recent_errors" or live is None]
+    if ami_live is not None:
+        # Calls and trunks come from the event-fed model (endpoints still need the DB list)
+        names = [n for n in names if n not in ("active_calls", "trunks")]
+    collectors.refresh(names)
+    collectors.wait_first([n for n in names if n != "packages"], _DASH_FIRST_WAIT)
+
     # Get meta info (prefer live versions; fall back to snapshot meta)
     meta = data.get("meta", {}) if data else {}
     hostname = meta.get("hostname", "Unknown")
-    freepbx_ver = get_freepbx_version_live() or meta.get("freepbx_version", "N/A")
-    asterisk_ver = get_asterisk_version_live() or meta.get("asterisk_version", "N/A")
+    live_freepbx, live_asterisk = collectors.get("versions")
+    freepbx_ver = live_freepbx or meta.get("freepbx_version", "N/A")
+    asterisk_ver = live_asterisk or meta.get("asterisk_version", "N/A")
     tool_ver = get_tool_version()
 
     # Dashboard Header with system info - full width, properly aligned
@@ -2535,33 +2864,18 @@ def display_system_dashboard(sock, data):
     print("\n" + header_line)
     print(Colors.CYAN + "─" * BOX_TOTAL + Colors.RESET)
     
-    # Get all data — use cache if fresh, otherwise re-query
-    _now = time.time()
-    if _now - _DASH_CACHE.get("ts", 0) < _DASH_CACHE_TTL:
-        active_calls   = _DASH_CACHE["active_calls"]
-        tc_total       = _DASH_CACHE["tc_total"]
-        forced_count   = _DASH_CACHE["forced_count"]
-        tc_status_list = _DASH_CACHE["tc_status_list"]
-        endpoint_status = _DASH_CACHE["endpoint_status"]
-        service_status  = _DASH_CACHE["service_status"]
-        trunk_online    = _DASH_CACHE["trunk_online"]
-        trunk_total     = _DASH_CACHE["trunk_total"]
-        recent_errors   = _DASH_CACHE["recent_errors"]
-    else:
-        active_calls = get_active_calls(sock)
-        tc_total, forced_count, tc_status_list = get_time_conditions_status(sock)
-        endpoint_status = get_endpoint_status(sock)
-        services = ["asterisk", "httpd", "mariadb", "fail2ban", "php-fpm", "crond"]
-        service_status = get_service_status(services)
-        trunk_online, trunk_total = get_trunk_status(sock)
-        recent_errors = get_recent_error_count()
-        _DASH_CACHE.update({
-            "ts": _now, "active_calls": active_calls,
-            "tc_total": tc_total, "forced_count": forced_count, "tc_status_list": tc_status_list,
-            "endpoint_status": endpoint_status, "service_status": service_status,
-            "trunk_online": trunk_online, "trunk_total": trunk_total, "recent_errors": recent_errors,
-        })
-    
+    active_calls = collectors.get("active_calls")
+    tc_total, forced_count, tc_status_list = collectors.get("time_conditions")
+    endpoint_status = collectors.get("endpoints")
+    service_status = collectors.get("services")
+    trunk_online, trunk_total = collectors.get("trunks")
+    recent_errors = collectors.get("recent_errors") if live is None else None
+    packages = collectors.get("packages")
+    if ami_live is not None:
+        active_calls = ami_live.active_channels
+        endpoint_status = _live_endpoint_status(endpoint_status, ami_live.registered())
+        trunk_online, trunk_total = ami_live.trunk_status()
+
     # Calculate metrics
     ep_total = endpoint_status["total"]
     ep_registered = endpoint_status["registered"]
@@ -2774,7 +3088,11 @@ def display_system_dashboard(sock, data):
         status_parts.append("📡 Trunks: " + trunk_display)
 
     # Recent errors badge
-    if recent_errors is not None:
+    if live is not None:
+        errs_5m = live[300].get("errors", 0)
+        err_color = Colors.GREEN if errs_5m == 0 else Colors.YELLOW if errs_5m < 10 else Colors.RED + Colors.BOLD
+        status_parts.append("⚠ Errors 1/5/15m: " + err_color + _live_triplet(live, "errors") + Colors.RESET)
+    elif recent_errors is not None:
         if recent_errors == 0:
             err_display = Colors.GREEN + "0" + Colors.RESET
         elif recent_errors < 10:
@@ -2783,7 +3101,37 @@ def display_system_dashboard(sock, data):
             err_display = Colors.RED + Colors.BOLD + str(recent_errors) + Colors.RESET
         status_parts.append("⚠ Errors(200L): " + err_display)
 
+    # Queue members (event-driven monitor only)
+    if ami_live is not None and ami_live.queue_members:
+        qs = ami_live.queue_summary()
+        avail = qs.get("available", 0)
+        q_color = Colors.GREEN if avail else Colors.RED
+        status_parts.append(f"👥 Agents: {q_color}{avail} avail{Colors.RESET} / "
+                            f"{qs.get('in use', 0) + qs.get('busy', 0) + qs.get('ringing', 0)} busy / "
+                            f"{qs.get('paused', 0)} paused / {qs.get('unavailable', 0)} unavail")
+
+    # Latest Asterisk package change (collected hourly)
+    if packages and packages[0] != "No package history found":
+        status_parts.append("📦 " + Colors.CYAN + packages[0][:40] + Colors.RESET)
+
     print("\n  " + "  │  ".join(status_parts))
+
+    # Rolling log counters (1/5/15 minutes)
+    if live is not None:
+        last15 = live[900]
+        log_parts = []
+        for label, key in (("SIP 4xx-6xx", "sip_fail"), ("Reg fail", "reg_fail"),
+                           ("Auth fail", "auth_fail"), ("Queue abandon", "queue_abandon"),
+                           ("Queue timeout", "queue_timeout")):
+            color = Colors.YELLOW if last15.get(key) else Colors.GREEN
+            log_parts.append(f"{label}: {color}{_live_triplet(live, key)}{Colors.RESET}")
+        top_sip = _live_top(last15, "sip")
+        if top_sip:
+            log_parts.append(f"Top SIP: {Colors.YELLOW}{top_sip[0]} x{top_sip[1]}{Colors.RESET}")
+        top_ip = _live_top(last15, "auth_ip")
+        if top_ip:
+            log_parts.append(f"Top auth IP: {Colors.RED}{top_ip[0]} x{top_ip[1]}{Colors.RESET}")
+        print("  📜 Log 1/5/15m  │  " + "  │  ".join(log_parts))
     print("")
 
 
@@ -2791,7 +3139,7 @@ def run_stuck_channels_inline():
     """Show channels that have been up longer than STUCK_MINUTES."""
     STUCK_MINUTES = 30
     print(f"\n{Colors.CYAN}Querying active channels...{Colors.RESET}")
-    rc, out, _ = run(["asterisk", "-rx", "core show channels verbose"], timeout=8)
+    rc, out, _ = asterisk_rx("core show channels verbose", timeout=8)
     if rc != 0 or not out:
         print(f"{Colors.YELLOW}Could not query Asterisk channels.{Colors.RESET}")
         return
@@ -2894,18 +3242,39 @@ def run_inline_log_analysis_timed(hours=1):
         print(f"{Colors.RED}Log not found: {full_log}{Colors.RESET}")
         return
 
-    tail_lines = min(max(hours * 5000, 1000), 50000)
+    err_re = r'ERROR|CRITICAL'
+    reg_re = r'failed.*register|registration.*failed|401.*REGISTER|403.*REGISTER'
+    sec_re = r'failed.*auth|SECURITY|auth.*failed|SecurityEvent'
 
-    print(f"\n{Colors.CYAN}📊 Inline log analysis — last ~{hours}h (~{tail_lines} lines){Colors.RESET}\n")
-
-    def _grep(pattern, lines=None):
-        n = lines or tail_lines
-        cmd = f"tail -{n} {full_log} | grep -iE '{pattern}'"
-        r = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=15)
-        return r.stdout.strip().split('\n') if r.stdout.strip() else []
+    # Read the window once: exactly the last N hours from the log's byte-offset
+    # index, or the old tail-N guess as the fallback. Every line goes through one
+    # combined prefilter and is then dispatched to the scans it matches.
+    lines = None
+    if freepbx_log_index is not None:
+        try:
+            lines = freepbx_log_index.window_lines(full_log, hours=hours)
+            print(f"\n{Colors.CYAN}📊 Inline log analysis — last {hours}h{Colors.RESET}\n")
+        except OSError:
+            lines = None
+    if lines is None:
+        tail_lines = min(max(hours * 5000, 1000), 50000)
+        print(f"\n{Colors.CYAN}📊 Inline log analysis — last ~{hours}h (~{tail_lines} lines){Colors.RESET}\n")
+        r = subprocess.run(["tail", "-n", str(tail_lines), full_log],
+                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=15)
+        lines = r.stdout.decode("utf-8", "replace").splitlines()
+
+    scans = (err_re, reg_re, sec_re)
+    any_rx = re.compile("|".join("(?:%s)" % p for p in scans), re.IGNORECASE)
+    rxs = [re.compile(p, re.IGNORECASE) for p in scans]
+    found = dict((p, []) for p in scans)
+    for line in lines:
+        if any_rx.search(line):
+            for p, rx in zip(scans, rxs):
+                if rx.search(line):
+                    found[p].append(line)
 
     # Errors
-    errors = _grep(r'ERROR|CRITICAL')
+    errors = found[err_re]
     if errors:
         etype = defaultdict(int)
         for e in errors:
@@ -2919,7 +3288,7 @@ def run_inline_log_analysis_timed(hours=1):
         print(f"{Colors.GREEN}✅ No errors{Colors.RESET}")
 
     # Registration failures
-    reg_fails = _grep(r'failed.*register|registration.*failed|401.*REGISTER|403.*REGISTER', lines=tail_lines)
+    reg_fails = found[reg_re]
     if reg_fails:
         print(f"\n{Colors.YELLOW}⚠  {len(reg_fails)} registration failure(s) — last 3:{Colors.RESET}")
         for l in reg_fails[-3:]:
@@ -2927,18 +3296,28 @@ def run_inline_log_analysis_timed(hours=1):
     else:
         print(f"\n{Colors.GREEN}✅ No registration failures{Colors.RESET}")
 
-    # Auth/security events
-    sec = _grep(r'failed.*auth|SECURITY|auth.*failed|SecurityEvent')
-    ips = defaultdict(int)
-    for l in sec:
-        m = re.search(r'\b(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\b', l)
-        if m:
-            ips[m.group(1)] += 1
-    if ips:
-        top = sorted(ips.items(), key=lambda x: x[1], reverse=True)[:5]
+    # Auth/security events: from the persisted aggregator when available (it
+    # keeps per-IP first/last seen across runs and rotations), else this window
+    top = None
+    if freepbx_security_stats is not None:
+        try:
+            rep = freepbx_security_stats.top_offenders(hours, 5, full_log)
+            top = [(ip, f"{info['count']} attempts, last "
+                        f"{datetime.fromtimestamp(info['last']).strftime('%m-%d %H:%M')}")
+                   for ip, info in rep["ip"]]
+        except OSError:
+            top = None
+    if top is None:
+        ips = defaultdict(int)
+        for l in found[sec_re]:
+            m = re.search(r'\b(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\b', l)
+            if m:
+                ips[m.group(1)] += 1
+        top = [(ip, f"{cnt} attempts") for ip, cnt in sorted(ips.items(), key=lambda x: x[1], reverse=True)[:5]]
+    if top:
         print(f"\n{Colors.RED}🔒 Auth failures by IP:{Colors.RESET}")
-        for ip, cnt in top:
-            print(f"   {ip:<20} {cnt} attempts")
+        for ip, what in top:
+            print(f"   {ip:<20} {what}")
     else:
         print(f"\n{Colors.GREEN}✅ No auth failures{Colors.RESET}")
 
@@ -2946,6 +3325,47 @@ def run_inline_log_analysis_timed(hours=1):
     print(f"{Colors.GREEN}✅ Inline analysis complete{Colors.RESET}")
 
 
+def search_log_paged(log_file, pattern, page=20):
+    """Regex-search a log a page at a time, in-process.
+
+    Each page is one freepbx_log_index.search_log() call that resumes from the
+    previous page's cursor, so paging never re-scans what was already shown
+    and only one page of hits is held in memory.
+    """
+    if not os.path.isfile(log_file):
+        print(f"{Colors.RED}Log not found: {log_file}{Colors.RESET}")
+        return
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        print(f"{Colors.RED}Bad regex: {e}{Colors.RESET}")
+        return
+    cursor = None
+    shown = 0
+    while True:
+        try:
+            hits, cursor = freepbx_log_index.search_log(log_file, pattern, cursor=cursor, limit=page)
+        except (OSError, ValueError) as e:
+            print(f"{Colors.RED}Search failed: {e}{Colors.RESET}")
+            return
+        if not hits and not shown:
+            print(f"{Colors.YELLOW}No matches found{Colors.RESET}")
+            return
+        for hit in hits:
+            a, b = hit["span"]
+            line = hit["line"]
+            print(f"{Colors.CYAN}{hit['offset']:>12}{Colors.RESET}  {sanitize_for_terminal(line[:a])}"
+                  f"{Colors.YELLOW}{sanitize_for_terminal(line[a:b])}{Colors.RESET}"
+                  f"{sanitize_for_terminal(line[b:])}")
+        shown += len(hits)
+        if cursor is None:
+            print(f"\n{Colors.GREEN}✅ {shown} matching line(s), end of log{Colors.RESET}")
+            return
+        more = prompt(f"\n{Colors.YELLOW}{shown} shown — ENTER for the next {page}, q to stop: {Colors.RESET}")
+        if more.strip().lower().startswith("q"):
+            return
+
+
 def run_log_analysis():
     """Run automated log analysis to detect issues"""
     analyzer_script = "/usr/local/123net/freepbx-tools/bin/freepbx_log_analyzer.py"
@@ -3117,14 +3537,16 @@ def run_log_analysis_menu():
                 hours = prompt(f"{Colors.YELLOW}Analyze last N hours (default: 1): {Colors.RESET}").strip() or "1"
                 run_interactive(["python3", LOG_ANALYZER_SCRIPT, "--journal", "--hours", hours])
         elif choice == "8":
-            if not has_script:
-                print(f"{Colors.RED}Script not available.{Colors.RESET}")
-            else:
-                print_tip("Standard Python regex, matched against each log line, e.g. ERROR|WARNING.")
-                pattern = prompt(f"{Colors.YELLOW}Enter regex pattern to search: {Colors.RESET}").strip()
-                if pattern:
-                    log_file = prompt(f"{Colors.YELLOW}Log file (default: /var/log/asterisk/full): {Colors.RESET}").strip()
-                    log_file = log_file or "/var/log/asterisk/full"
+            print_tip("Standard Python regex, matched against each log line, e.g. ERROR|WARNING.")
+            pattern = prompt(f"{Colors.YELLOW}Enter regex pattern to search: {Colors.RESET}").strip()
+            if pattern:
+                log_file = prompt(f"{Colors.YELLOW}Log file (default: /var/log/asterisk/full): {Colors.RESET}").strip()
+                log_file = log_file or "/var/log/asterisk/full"
+                if freepbx_log_index is not None and not log_file.endswith(".gz"):
+                    search_log_paged(log_file, pattern)
+                elif not has_script:
+                    print(f"{Colors.RED}Script not available.{Colors.RESET}")
+                else:
                     run_interactive(["python3", LOG_ANALYZER_SCRIPT, "--grep", pattern, "--log-file", log_file])
         elif choice == "9":
             if not has_script:
@@ -4026,10 +4448,15 @@ def main():
     parser = argparse.ArgumentParser(description="freePBX call-flow menu + dashboard")
     parser.add_argument("--watch", action="store_true", help="Run live dashboard monitor (auto-refresh).")
     parser.add_argument("--interval", default="2", help="Refresh interval seconds for --watch (default: 2).")
+    parser.add_argument("--max-fps", default="4",
+                        help="--watch with AMI events: redraw at most this many times a second (default: 4).")
+    parser.add_argument("--poll", action="store_true",
+                        help="--watch: poll every --interval instead of following AMI events.")
     parser.add_argument(
         "--watch-refresh-snapshot",
         action="store_true",
-        help="When using --watch, refresh the data cache every cycle (can be heavy).",
+        help="When using --watch, refresh the data cache every cycle (incremental: "
+             "only tables that changed are re-read).",
     )
     args = parser.parse_args()
 
@@ -4058,14 +4485,66 @@ def main():
             sys.exit(1)
         data = load_dump()
 
+    def run_event_monitor(initial_data):
+        """Redraw when the AMI event model changes (at most --max-fps per second).
+        Returns (ran, data); ran is False when AMI events aren't available."""
+        if freepbx_ami is None or args.poll:
+            return False, initial_data
+        try:
+            monitor = freepbx_ami.LiveMonitor()
+        except freepbx_ami.AMIError:
+            return False, initial_data
+        if not monitor.ensure():
+            return False, initial_data
+        min_gap = 1.0 / max(0.1, _safe_float(args.max_fps, 4.0))
+        # Log counters, services etc. are not event-driven; refresh them at least this often
+        heartbeat = max(10.0, _safe_float(args.interval, 2.0))
+        # --watch-refresh-snapshot: at most once per --interval, not once per redraw
+        refresh_every = max(0.5, _safe_float(args.interval, 2.0))
+        data_local = initial_data
+        model = monitor.model
+        drawn_version, drawn_at = None, 0.0
+        last_refresh = time.time()
+        print(Colors.YELLOW + "\nLive dashboard monitor (AMI events) running. Press Ctrl+C to return." + Colors.RESET)
+        try:
+            while True:
+                if not monitor.ensure():
+                    print(Colors.YELLOW + "AMI connection lost — falling back to polling." + Colors.RESET)
+                    return True, run_poll_monitor(data_local)
+                now = time.time()
+                if model.version != drawn_version or now - drawn_at >= heartbeat:
+                    if now - drawn_at < min_gap:
+                        # Rate limit: let further changes pile up, then draw them all at once
+                        time.sleep(min_gap - (now - drawn_at))
+                        continue
+                    if args.watch_refresh_snapshot and now - last_refresh >= refresh_every:
+                        last_refresh = now
+                        if refresh_dump(sock, incremental=True):
+                            data_local = load_dump() or data_local
+                    # Draw from a copy: the AMI reader thread keeps updating the model
+                    live = model.snapshot()
+                    drawn_version = live.version
+                    display_system_dashboard(sock, data_local, ami_live=live)
+                    print(f"  {Colors.CYAN}⚡ AMI events: {live.events}  │  max {1.0 / min_gap:g} fps{Colors.RESET}")
+                    drawn_at = time.time()
+                model.wait(drawn_version, max(0.05, heartbeat - (time.time() - drawn_at)))
+        except KeyboardInterrupt:
+            return True, data_local
+        finally:
+            monitor.close()
+
     def run_live_monitor(initial_data):
+        ran, data_local = run_event_monitor(initial_data)
+        return data_local if ran else run_poll_monitor(initial_data)
+
+    def run_poll_monitor(initial_data):
         interval = max(0.5, _safe_float(args.interval, 2.0))
         data_local = initial_data
         print(Colors.YELLOW + "\nLive dashboard monitor running. Press Ctrl+C to return." + Colors.RESET)
         try:
             while True:
                 if args.watch_refresh_snapshot:
-                    if refresh_dump(sock):
+                    if refresh_dump(sock, incremental=True):
                         data_local = load_dump() or data_local
                 display_system_dashboard(sock, data_local)
                 time.sleep(interval)
@@ -4165,7 +4644,7 @@ def main():
             if choice == "1":
                 if refresh_dump(sock):
                     data = load_dump()
-                _DASH_CACHE["ts"] = 0.0  # invalidate dashboard cache after refresh
+                invalidate_dashboard()  # re-collect live tiles after a refresh
                 print("\n" + Colors.YELLOW + "Press ENTER to continue..." + Colors.RESET)
                 prompt()
 
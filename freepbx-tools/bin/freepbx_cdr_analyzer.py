@@ -37,7 +37,11 @@ See function docstrings for additional details on arguments and return values.
     FUNCTION MAP (Major Functions)
     -----------------------------
     parse_args                : Parse command-line arguments
+    window_bounds              : Resolve --hours / --start / --end to (start, end, description)
     resolve_window             : Build the calldate WHERE-clause fragment for a query
+    aggregate                  : CDRAggregate for a window (all report sections)
+    export_stream              : Stream a cdr/cel window to NDJSON or CSV (optionally gzip)
+    CDRRollup                  : Local SQLite store of finalized hourly aggregates
     print_summary             : Print summary statistics to terminal
     write_report               : Write analysis report to file
     main                      : CLI entry point, parses args and runs analysis
@@ -45,12 +49,24 @@ See function docstrings for additional details on arguments and return values.
 
 import os
 import sys
-import subprocess
 import re
+import csv
+import gzip
+import heapq
+import time
+from bisect import bisect_right
 from datetime import datetime, timedelta
 from collections import defaultdict
 import json
 
+try:
+    import sqlite3
+except ImportError:  # some minimal Python builds ship without _sqlite3
+    sqlite3 = None
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
+
 class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
@@ -90,44 +106,296 @@ CALL_LEG_ANALYZER_PATH = os.path.join(
 )
 
 
+# get_call_duration_distribution buckets, in display order. A call lands in
+# bucket bisect_right(DURATION_BOUNDS, billsec): 0s, <30s, <60s, ... 30+ min.
+DURATION_BUCKETS = ['0s (Unanswered)', '1-30s', '31-60s', '1-3 min',
+                    '3-5 min', '5-10 min', '10-30 min', '30+ min']
+DURATION_BOUNDS = [1, 30, 60, 180, 300, 600, 1800]
+
+# The aggregate scan streams every row in the window, so it gets a much
+# longer deadline than the 30s used for the small per-report queries.
+SCAN_TIMEOUT = 600
+
+# Local rollup cache: finalized hourly aggregates, so repeated or long
+# windows only read the hours they haven't seen yet from asteriskcdrdb.
+ROLLUP_PATH = "/home/123net/callflows/cdr_rollup.sqlite"
+ROLLUP_VERSION = 1
+# calldate is the call's *start*, and the row is written at hangup, so an
+# hour keeps growing for as long as its longest call. Hours younger than
+# this are treated as open and always re-read from MySQL.
+ROLLUP_GRACE = timedelta(hours=2)
+
+_TS_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Streaming export: formats, and which time column bounds the window per table
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_TIME_COLUMN = {"cdr": "calldate", "cel": "eventtime"}
+
+
+def _int(value):
+    """mysql -B column -> int (NULL/empty -> 0)."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+class CDRAggregate:
+    """Counters for every report section over one calldate window.
+
+    Filled row by row from a single streamed scan of cdr (see
+    CDRAnalyzer.aggregate); the get_* report methods only render from it.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.total_duration = 0
+        self.total_billsec = 0
+        self.dispositions = {}   # disposition -> [calls, sum duration, sum billsec]
+        self.callers = {}        # src -> [calls, sum duration, answered]
+        self.destinations = {}   # dst -> [calls, sum duration, answered]
+        self.hours = {}          # hour of day -> [calls, answered]
+        self.trunks = {}         # channel up to the first '-' -> [calls, answered, sum duration]
+        self.durations = [0] * len(DURATION_BUCKETS)
+
+    def add(self, hour_key, src, dst, disposition, duration, billsec, trunk):
+        """Fold one cdr row (as selected by CDRAnalyzer._stream) into the counters.
+        hour_key is the calldate truncated to 'YYYY-MM-DD HH'."""
+        hour = _int(hour_key[11:13])
+        duration = _int(duration)
+        billsec = _int(billsec)
+        answered = 1 if disposition == 'ANSWERED' else 0
+
+        self.total += 1
+        self.total_duration += duration
+        self.total_billsec += billsec
+
+        d = self.dispositions.get(disposition)
+        if d is None:
+            d = self.dispositions[disposition] = [0, 0, 0]
+        d[0] += 1
+        d[1] += duration
+        d[2] += billsec
+
+        for table, key in ((self.callers, src), (self.destinations, dst)):
+            if key and key != 'NULL':
+                c = table.get(key)
+                if c is None:
+                    c = table[key] = [0, 0, 0]
+                c[0] += 1
+                c[1] += duration
+                c[2] += answered
+
+        h = self.hours.get(hour)
+        if h is None:
+            h = self.hours[hour] = [0, 0]
+        h[0] += 1
+        h[1] += answered
+
+        if trunk:
+            t = self.trunks.get(trunk)
+            if t is None:
+                t = self.trunks[trunk] = [0, 0, 0]
+            t[0] += 1
+            t[1] += answered
+            t[2] += duration
+
+        self.durations[bisect_right(DURATION_BOUNDS, billsec)] += 1
+
+    def absorb(self, other):
+        """Add another aggregate's counters into this one."""
+        self.total += other.total
+        self.total_duration += other.total_duration
+        self.total_billsec += other.total_billsec
+        for mine, theirs in ((self.dispositions, other.dispositions),
+                             (self.callers, other.callers),
+                             (self.destinations, other.destinations),
+                             (self.hours, other.hours),
+                             (self.trunks, other.trunks)):
+            for key, counters in theirs.items():
+                c = mine.get(key)
+                if c is None:
+                    mine[key] = list(counters)
+                else:
+                    for i, v in enumerate(counters):
+                        c[i] += v
+        self.durations = [a + b for a, b in zip(self.durations, other.durations)]
+
+    def count(self, disposition):
+        d = self.dispositions.get(disposition)
+        return d[0] if d else 0
+
+    @staticmethod
+    def top(table, limit):
+        """Largest entries by call count (the first counter), as (key, counters)."""
+        return heapq.nlargest(limit, table.items(), key=lambda kv: kv[1][0])
+
+
+class CDRRollup:
+    """Finalized hourly CDR aggregates in a local SQLite file.
+
+    One row set per closed hour ('YYYY-MM-DD HH'): totals, and per
+    disposition / src / dst / trunk / duration-bucket counters. A row in
+    hour_totals marks the hour as finalized (even with zero calls), so it is
+    never read from MySQL again.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS hour_totals (hour TEXT PRIMARY KEY, calls INTEGER, answered INTEGER);
+    CREATE TABLE IF NOT EXISTS by_disposition (hour TEXT, disposition TEXT, calls INTEGER,
+        duration INTEGER, billsec INTEGER, PRIMARY KEY (hour, disposition));
+    CREATE TABLE IF NOT EXISTS by_src (hour TEXT, src TEXT, calls INTEGER, duration INTEGER,
+        answered INTEGER, PRIMARY KEY (hour, src));
+    CREATE TABLE IF NOT EXISTS by_dst (hour TEXT, dst TEXT, calls INTEGER, duration INTEGER,
+        answered INTEGER, PRIMARY KEY (hour, dst));
+    CREATE TABLE IF NOT EXISTS by_trunk (hour TEXT, trunk TEXT, calls INTEGER, answered INTEGER,
+        duration INTEGER, PRIMARY KEY (hour, trunk));
+    CREATE TABLE IF NOT EXISTS by_duration (hour TEXT, bucket INTEGER, calls INTEGER,
+        PRIMARY KEY (hour, bucket));
+    """
+    TABLES = ["hour_totals", "by_disposition", "by_src", "by_dst", "by_trunk", "by_duration"]
+
+    def __init__(self, path):
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.con = sqlite3.connect(path, timeout=30)
+        version = self.con.execute("PRAGMA user_version").fetchone()[0]
+        if version != ROLLUP_VERSION:
+            for table in self.TABLES:
+                self.con.execute(f"DROP TABLE IF EXISTS {table}")
+            self.con.execute(f"PRAGMA user_version = {ROLLUP_VERSION}")
+        self.con.executescript(self.SCHEMA)
+
+    def close(self):
+        self.con.close()
+
+    def finalized(self, first, last):
+        """Hour keys in [first, last] that are already stored."""
+        rows = self.con.execute("SELECT hour FROM hour_totals WHERE hour BETWEEN ? AND ?",
+                                (first, last))
+        return set(r[0] for r in rows)
+
+    def save(self, per_hour):
+        """Store {hour_key: CDRAggregate} as finalized hours, in one transaction."""
+        with self.con:
+            for hour, agg in per_hour.items():
+                self.con.execute("INSERT OR REPLACE INTO hour_totals VALUES (?,?,?)",
+                                 (hour, agg.total, agg.count('ANSWERED')))
+                self.con.executemany("INSERT OR REPLACE INTO by_disposition VALUES (?,?,?,?,?)",
+                                     [(hour, k,) + tuple(v) for k, v in agg.dispositions.items()])
+                self.con.executemany("INSERT OR REPLACE INTO by_src VALUES (?,?,?,?,?)",
+                                     [(hour, k,) + tuple(v) for k, v in agg.callers.items()])
+                self.con.executemany("INSERT OR REPLACE INTO by_dst VALUES (?,?,?,?,?)",
+                                     [(hour, k,) + tuple(v) for k, v in agg.destinations.items()])
+                self.con.executemany("INSERT OR REPLACE INTO by_trunk VALUES (?,?,?,?,?)",
+                                     [(hour, k,) + tuple(v) for k, v in agg.trunks.items()])
+                self.con.executemany("INSERT OR REPLACE INTO by_duration VALUES (?,?,?)",
+                                     [(hour, i, n) for i, n in enumerate(agg.durations) if n])
+
+    def load(self, first, last):
+        """Sum the stored hours in [first, last] into one CDRAggregate."""
+        agg = CDRAggregate()
+        span = (first, last)
+
+        def grouped(table, key, cols):
+            return self.con.execute(
+                f"SELECT {key}, {', '.join('SUM(%s)' % c for c in cols)} FROM {table} "
+                f"WHERE hour BETWEEN ? AND ? GROUP BY {key}", span)
+
+        for disposition, calls, duration, billsec in grouped(
+                "by_disposition", "disposition", ["calls", "duration", "billsec"]):
+            agg.dispositions[disposition] = [calls, duration, billsec]
+            agg.total += calls
+            agg.total_duration += duration
+            agg.total_billsec += billsec
+        for table, key, target in (("by_src", "src", agg.callers),
+                                   ("by_dst", "dst", agg.destinations)):
+            for k, calls, duration, answered in grouped(table, key, ["calls", "duration", "answered"]):
+                target[k] = [calls, duration, answered]
+        for trunk, calls, answered, duration in grouped(
+                "by_trunk", "trunk", ["calls", "answered", "duration"]):
+            agg.trunks[trunk] = [calls, answered, duration]
+        for hour, calls, answered in grouped(
+                "hour_totals", "CAST(substr(hour, 12, 2) AS INTEGER)", ["calls", "answered"]):
+            if calls:
+                agg.hours[hour] = [calls, answered]
+        for bucket, calls in grouped("by_duration", "bucket", ["calls"]):
+            agg.durations[bucket] = calls
+        return agg
+
+
+def _hour_key(dt):
+    return dt.strftime("%Y-%m-%d %H")
+
+
+class ExportProgress:
+    """In-place row counter and throughput line for long exports."""
+
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.started = time.time()
+        self._shown = 0.0
+
+    def tick(self):
+        self.rows += 1
+        if self.rows % 1000 == 0:
+            now = time.time()
+            if now - self._shown >= 0.5:
+                self._shown = now
+                self._print(now)
+
+    def _print(self, now, end=""):
+        elapsed = max(now - self.started, 1e-6)
+        sys.stdout.write(f"\r{Colors.CYAN}   ⏳ {self.label}: {self.rows:,} rows "
+                         f"({self.rows / elapsed:,.0f} rows/s, {elapsed:.1f}s){Colors.RESET}   " + end)
+        sys.stdout.flush()
+
+    def finish(self):
+        self._print(time.time(), end="\n")
+
+
 class CDRAnalyzer:
-    def __init__(self, db_user="root", db_socket="/var/lib/mysql/mysql.sock"):
+    def __init__(self, db_user="root", db_socket="/var/lib/mysql/mysql.sock",
+                 rollup_path=ROLLUP_PATH):
         self.db_user = db_user
         self.db_socket = db_socket
         self.db_name = "asteriskcdrdb"
+        self.rollup_path = rollup_path if sqlite3 is not None else None
         self._columns_cache = {}
+        self._aggregates = {}
 
     def query_db(self, sql):
         """Execute SQL query against CDR database"""
         try:
-            cmd = [
-                "mysql",
-                "-u", self.db_user,
-                "-S", self.db_socket,
-                "-NBe", sql,
-                self.db_name
-            ]
-
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                universal_newlines=True,
-                timeout=30
-            )
-
-            if result.returncode != 0:
-                print(f"{Colors.RED}❌ Database query failed: {result.stderr}{Colors.RESET}")
-                return []
-
-            if not result.stdout.strip():
-                return []
-
-            return result.stdout.strip().split('\n')
-
+            out = freepbx_db.run_mysql(sql, socket=self.db_socket, user=self.db_user,
+                                       db=self.db_name, timeout=30)
+        except freepbx_db.MySQLError as e:
+            print(f"{Colors.RED}❌ Database query failed: {e}{Colors.RESET}")
+            return []
         except Exception as e:
             print(f"{Colors.RED}❌ Query error: {str(e)}{Colors.RESET}")
             return []
 
+        if not out.strip():
+            return []
+
+        return out.strip().split('\n')
+
+    def describe(self, table):
+        """DESCRIBE table -> [(column, type)] in table order."""
+        lines = self.query_db(f"DESCRIBE `{table}`;")
+        out = []
+        for ln in lines:
+            parts = ln.split('\t')
+            if len(parts) >= 2:
+                out.append((parts[0], parts[1].lower()))
+        return out
+
     def get_columns(self, table):
         """DESCRIBE table -> set of column names, cached per table for this run."""
         if table not in self._columns_cache:
@@ -135,8 +403,8 @@ class CDRAnalyzer:
             self._columns_cache[table] = set(ln.split('\t')[0] for ln in lines if ln.strip())
         return self._columns_cache[table]
 
-    def resolve_window(self, hours, date_start=None, date_end=None):
-        """Build a calldate WHERE-clause fragment for a query.
+    def window_bounds(self, hours, date_start=None, date_end=None):
+        """Resolve the report window to (start, end, human_description).
 
         date_start/date_end (either one, or both) take precedence over hours
         when given — tickets usually reference a specific past date, not
@@ -145,7 +413,8 @@ class CDRAnalyzer:
         number instead of just naming the date. A bare date (no time)
         is treated as that whole day: 00:00:00 for start, 23:59:59 for end.
 
-        Returns (where_fragment, human_description) — the description is
+        start/end are 'YYYY-MM-DD HH:MM:SS'; end is None for an --hours
+        window (open-ended: "from the cutoff until now"). The description is
         used in place of "(Last N hours)" in each report's header.
         """
         def _validate(raw, label, end_of_day):
@@ -161,45 +430,149 @@ class CDRAnalyzer:
         if date_start or date_end:
             start = _validate(date_start, "start", end_of_day=False) if date_start else "1970-01-01 00:00:00"
             end = _validate(date_end, "end", end_of_day=True) if date_end else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            return f"calldate >= '{start}' AND calldate <= '{end}'", f"{start} to {end}"
+            return start, end, f"{start} to {end}"
 
         cutoff = (datetime.now() - timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M:%S")
-        return f"calldate >= '{cutoff}'", f"last {hours} hours"
+        return cutoff, None, f"last {hours} hours"
 
-    def get_call_statistics(self, hours=24, date_start=None, date_end=None):
-        """Get comprehensive call statistics"""
-        where_clause, window_desc = self.resolve_window(hours, date_start, date_end)
-        print(f"\n{Colors.CYAN}{Colors.BOLD}{'='*78}")
-        print(f"  📊 CALL STATISTICS ({window_desc})")
-        print(f"{'='*78}{Colors.RESET}\n")
+    def resolve_window(self, hours, date_start=None, date_end=None, column="calldate"):
+        """Build a calldate (or `column`) WHERE-clause fragment for a query.
+
+        Returns (where_fragment, human_description); see window_bounds().
+        """
+        start, end, window_desc = self.window_bounds(hours, date_start, date_end)
+        if end is None:
+            return f"{column} >= '{start}'", window_desc
+        return f"{column} >= '{start}' AND {column} <= '{end}'", window_desc
 
+
+    def _stream(self, where_clause):
+        """Yield the few cdr columns the reports need, one row at a time:
+        (hour_key, src, dst, disposition, duration, billsec, trunk)."""
         sql = f"""
         SELECT
-            COUNT(*) as total_calls,
-            SUM(CASE WHEN disposition = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
-            SUM(CASE WHEN disposition = 'NO ANSWER' THEN 1 ELSE 0 END) as no_answer,
-            SUM(CASE WHEN disposition = 'BUSY' THEN 1 ELSE 0 END) as busy,
-            SUM(CASE WHEN disposition = 'FAILED' THEN 1 ELSE 0 END) as failed,
-            SUM(duration) as total_duration,
-            SUM(billsec) as total_billsec,
-            AVG(duration) as avg_duration,
-            AVG(billsec) as avg_billsec
+            DATE_FORMAT(calldate, '%Y-%m-%d %H'),
+            src,
+            dst,
+            disposition,
+            duration,
+            billsec,
+            CASE WHEN channel LIKE '%SIP/%' THEN SUBSTRING_INDEX(channel, '-', 1) ELSE '' END
         FROM cdr
         WHERE {where_clause}
         """
+        for row in freepbx_db.iter_rows(sql, socket=self.db_socket, user=self.db_user,
+                                        db=self.db_name, timeout=SCAN_TIMEOUT):
+            if len(row) == 7:
+                yield row
+
+    def _scan(self, where_clause):
+        """One streamed pass over cdr -> CDRAggregate."""
+        agg = CDRAggregate()
+        for row in self._stream(where_clause):
+            agg.add(*row)
+        return agg
+
+    def aggregate(self, hours=24, date_start=None, date_end=None):
+        """Counters for every report section over the window.
+
+        Closed hours come from the local rollup (CDRRollup), computing and
+        storing any it doesn't have yet; the partial first hour and the
+        still-open recent hours are streamed from MySQL. Without a usable
+        rollup the whole window is one streamed scan. The result is cached
+        per window, so --comprehensive or any mix of report flags costs one
+        pass. Returns None if the query failed.
+        """
+        key = (hours, date_start, date_end)
+        if key in self._aggregates:
+            return self._aggregates[key]
 
-        result = self.query_db(sql)
-        if result:
-            data = result[0].split('\t')
-            total = int(data[0]) if data[0] and data[0] != 'NULL' else 0
-            answered = int(data[1]) if data[1] and data[1] != 'NULL' else 0
-            no_answer = int(data[2]) if data[2] and data[2] != 'NULL' else 0
-            busy = int(data[3]) if data[3] and data[3] != 'NULL' else 0
-            failed = int(data[4]) if data[4] and data[4] != 'NULL' else 0
-            total_duration = int(float(data[5])) if data[5] and data[5] != 'NULL' else 0
-            total_billsec = int(float(data[6])) if data[6] and data[6] != 'NULL' else 0
-            avg_duration = float(data[7]) if data[7] and data[7] != 'NULL' else 0
-            avg_billsec = float(data[8]) if data[8] and data[8] != 'NULL' else 0
+        start, end, _window_desc = self.window_bounds(hours, date_start, date_end)
+        agg = None
+        try:
+            if self.rollup_path:
+                try:
+                    agg = self._aggregate_with_rollup(start, end)
+                except (sqlite3.Error, OSError) as e:
+                    print(f"{Colors.YELLOW}⚠️  CDR rollup cache unavailable ({e}); "
+                          f"scanning MySQL directly{Colors.RESET}")
+            if agg is None:
+                where_clause, _window_desc = self.resolve_window(hours, date_start, date_end)
+                agg = self._scan(where_clause)
+        except freepbx_db.MySQLError as e:
+            print(f"{Colors.RED}❌ Database query failed: {e}{Colors.RESET}")
+            agg = None
+        self._aggregates[key] = agg
+        return agg
+
+    def _aggregate_with_rollup(self, start, end):
+        """Window aggregate using the rollup for closed whole hours.
+        Returns None when the window holds no closed whole hour."""
+        one_hour = timedelta(hours=1)
+        t0 = datetime.strptime(start, _TS_FMT)
+        t1 = datetime.strptime(end, _TS_FMT) if end else datetime.now()
+
+        first = t0.replace(minute=0, second=0, microsecond=0)
+        if first < t0:
+            first += one_hour
+        # End (exclusive) of the last hour that is both inside the window
+        # (calldate <= end is inclusive to the second) and past the grace period
+        limit = min(t1 + timedelta(seconds=1), datetime.now() - ROLLUP_GRACE)
+        closed = []
+        h = first
+        while h + one_hour <= limit:
+            closed.append(h)
+            h += one_hour
+        if not closed:
+            return None
+
+        store = CDRRollup(self.rollup_path)
+        try:
+            have = store.finalized(_hour_key(closed[0]), _hour_key(closed[-1]))
+            run = []
+            for hour in closed + [None]:
+                if hour is not None and _hour_key(hour) not in have:
+                    run.append(hour)
+                    continue
+                if run:
+                    # One query per contiguous stretch of hours not yet rolled up
+                    per_hour = dict((_hour_key(x), CDRAggregate()) for x in run)
+                    where = (f"calldate >= '{run[0].strftime(_TS_FMT)}' "
+                             f"AND calldate < '{(run[-1] + one_hour).strftime(_TS_FMT)}'")
+                    for row in self._stream(where):
+                        per_hour.setdefault(row[0], CDRAggregate()).add(*row)
+                    store.save(per_hour)
+                    run = []
+            agg = store.load(_hour_key(closed[0]), _hour_key(closed[-1]))
+        finally:
+            store.close()
+
+        if t0 < first:
+            agg.absorb(self._scan(f"calldate >= '{start}' AND calldate < '{first.strftime(_TS_FMT)}'"))
+        if end is None or h <= t1:
+            tail = f"calldate >= '{h.strftime(_TS_FMT)}'"
+            if end:
+                tail += f" AND calldate <= '{end}'"
+            agg.absorb(self._scan(tail))
+        return agg
+
+    def get_call_statistics(self, hours=24, date_start=None, date_end=None):
+        """Get comprehensive call statistics"""
+        where_clause, window_desc = self.resolve_window(hours, date_start, date_end)
+        print(f"\n{Colors.CYAN}{Colors.BOLD}{'='*78}")
+        print(f"  📊 CALL STATISTICS ({window_desc})")
+        print(f"{'='*78}{Colors.RESET}\n")
+
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg is not None:
+            total = agg.total
+            answered = agg.count('ANSWERED')
+            no_answer = agg.count('NO ANSWER')
+            busy = agg.count('BUSY')
+            failed = agg.count('FAILED')
+            total_duration = agg.total_duration
+            total_billsec = agg.total_billsec
+            avg_billsec = (total_billsec / total) if total else 0
 
             answer_rate = (answered / total * 100) if total > 0 else 0
 
@@ -233,30 +606,12 @@ class CDRAnalyzer:
         print(f"  📞 TOP {limit} CALLERS ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            src,
-            COUNT(*) as call_count,
-            SUM(duration) as total_duration,
-            SUM(CASE WHEN disposition = 'ANSWERED' THEN 1 ELSE 0 END) as answered
-        FROM cdr
-        WHERE {where_clause} AND src != ''
-        GROUP BY src
-        ORDER BY call_count DESC
-        LIMIT {limit}
-        """
-
-        results = self.query_db(sql)
-        if results:
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.callers:
             print(f"{Colors.WHITE}{'Caller':<15} {'Calls':<8} {'Answered':<10} {'Duration':<12}{Colors.RESET}")
             print(f"{Colors.CYAN}{'─'*50}{Colors.RESET}")
 
-            for row in results:
-                data = row.split('\t')
-                caller = data[0]
-                calls = int(data[1])
-                duration = int(float(data[2]))
-                answered = int(data[3])
+            for caller, (calls, duration, answered) in agg.top(agg.callers, limit):
                 answer_rate = (answered / calls * 100) if calls > 0 else 0
 
                 print(f"{Colors.GREEN}{caller:<15}{Colors.RESET} {calls:<8} {answered:<4} ({answer_rate:>4.0f}%)  {self.format_duration(duration)}")
@@ -268,30 +623,12 @@ class CDRAnalyzer:
         print(f"  🎯 TOP {limit} DESTINATIONS ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            dst,
-            COUNT(*) as call_count,
-            SUM(duration) as total_duration,
-            SUM(CASE WHEN disposition = 'ANSWERED' THEN 1 ELSE 0 END) as answered
-        FROM cdr
-        WHERE {where_clause} AND dst != ''
-        GROUP BY dst
-        ORDER BY call_count DESC
-        LIMIT {limit}
-        """
-
-        results = self.query_db(sql)
-        if results:
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.destinations:
             print(f"{Colors.WHITE}{'Destination':<15} {'Calls':<8} {'Answered':<10} {'Duration':<12}{Colors.RESET}")
             print(f"{Colors.CYAN}{'─'*50}{Colors.RESET}")
 
-            for row in results:
-                data = row.split('\t')
-                dst = data[0]
-                calls = int(data[1])
-                duration = int(float(data[2]))
-                answered = int(data[3])
+            for dst, (calls, duration, answered) in agg.top(agg.destinations, limit):
                 answer_rate = (answered / calls * 100) if calls > 0 else 0
 
                 print(f"{Colors.MAGENTA}{dst:<15}{Colors.RESET} {calls:<8} {answered:<4} ({answer_rate:>4.0f}%)  {self.format_duration(duration)}")
@@ -303,30 +640,10 @@ class CDRAnalyzer:
         print(f"  ⏰ CALL DISTRIBUTION BY HOUR ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            HOUR(calldate) as hour,
-            COUNT(*) as call_count,
-            SUM(CASE WHEN disposition = 'ANSWERED' THEN 1 ELSE 0 END) as answered
-        FROM cdr
-        WHERE {where_clause}
-        GROUP BY hour
-        ORDER BY hour
-        """
-
-        results = self.query_db(sql)
-        if results:
-            max_calls = 0
-            hour_data = {}
-
-            for row in results:
-                data = row.split('\t')
-                hour = int(data[0])
-                calls = int(data[1])
-                answered = int(data[2])
-                hour_data[hour] = (calls, answered)
-                if calls > max_calls:
-                    max_calls = calls
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.hours:
+            hour_data = agg.hours
+            max_calls = max(calls for calls, _answered in hour_data.values())
 
             # Create bar chart
             for hour in sorted(hour_data.keys()):
@@ -344,31 +661,15 @@ class CDRAnalyzer:
         print(f"  📋 CALL DISPOSITION BREAKDOWN ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            disposition,
-            COUNT(*) as count,
-            AVG(duration) as avg_duration,
-            AVG(billsec) as avg_billsec
-        FROM cdr
-        WHERE {where_clause}
-        GROUP BY disposition
-        ORDER BY count DESC
-        """
-
-        results = self.query_db(sql)
-        if results:
-            total = sum(int(row.split('\t')[1]) for row in results)
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.dispositions:
+            total = agg.total
 
             print(f"{Colors.WHITE}{'Disposition':<20} {'Count':<10} {'%':<8} {'Avg Duration':<15}{Colors.RESET}")
             print(f"{Colors.CYAN}{'─'*60}{Colors.RESET}")
 
-            for row in results:
-                data = row.split('\t')
-                disposition = data[0]
-                count = int(data[1])
-                avg_dur = int(float(data[2])) if data[2] and data[2] != 'NULL' else 0
-                avg_bill = int(float(data[3])) if data[3] and data[3] != 'NULL' else 0
+            for disposition, (count, _sum_dur, sum_bill) in agg.top(agg.dispositions, len(agg.dispositions)):
+                avg_bill = int(sum_bill / count) if count else 0
                 percentage = (count / total * 100) if total > 0 else 0
 
                 color = Colors.GREEN if disposition == 'ANSWERED' else Colors.YELLOW if disposition == 'NO ANSWER' else Colors.RED
@@ -491,35 +792,16 @@ class CDRAnalyzer:
         print(f"  📡 TRUNK USAGE ANALYSIS ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            channel,
-            COUNT(*) as call_count,
-            SUM(CASE WHEN disposition = 'ANSWERED' THEN 1 ELSE 0 END) as answered,
-            SUM(duration) as total_duration
-        FROM cdr
-        WHERE {where_clause}
-        AND channel LIKE '%SIP/%'
-        GROUP BY SUBSTRING_INDEX(channel, '-', 1)
-        ORDER BY call_count DESC
-        LIMIT 15
-        """
-
-        results = self.query_db(sql)
-        if results:
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.trunks:
             print(f"{Colors.WHITE}{'Trunk/Channel':<30} {'Calls':<8} {'Success Rate':<15} {'Duration':<12}{Colors.RESET}")
             print(f"{Colors.CYAN}{'─'*70}{Colors.RESET}")
 
-            for row in results:
-                data = row.split('\t')
-                channel = data[0]
+            for channel, (calls, answered, duration) in agg.top(agg.trunks, 15):
                 # Extract trunk name from channel
                 trunk_match = re.search(r'SIP/([^-]+)', channel)
                 trunk = trunk_match.group(1) if trunk_match else channel
 
-                calls = int(data[1])
-                answered = int(data[2])
-                duration = int(float(data[3]))
                 success_rate = (answered / calls * 100) if calls > 0 else 0
 
                 color = Colors.GREEN if success_rate > 90 else Colors.YELLOW if success_rate > 70 else Colors.RED
@@ -533,47 +815,17 @@ class CDRAnalyzer:
         print(f"  ⏱️  CALL DURATION DISTRIBUTION ({window_desc})")
         print(f"{'='*78}{Colors.RESET}\n")
 
-        sql = f"""
-        SELECT
-            CASE
-                WHEN billsec = 0 THEN '0s (Unanswered)'
-                WHEN billsec < 30 THEN '1-30s'
-                WHEN billsec < 60 THEN '31-60s'
-                WHEN billsec < 180 THEN '1-3 min'
-                WHEN billsec < 300 THEN '3-5 min'
-                WHEN billsec < 600 THEN '5-10 min'
-                WHEN billsec < 1800 THEN '10-30 min'
-                ELSE '30+ min'
-            END as duration_range,
-            COUNT(*) as count
-        FROM cdr
-        WHERE {where_clause}
-        GROUP BY duration_range
-        ORDER BY
-            CASE duration_range
-                WHEN '0s (Unanswered)' THEN 0
-                WHEN '1-30s' THEN 1
-                WHEN '31-60s' THEN 2
-                WHEN '1-3 min' THEN 3
-                WHEN '3-5 min' THEN 4
-                WHEN '5-10 min' THEN 5
-                WHEN '10-30 min' THEN 6
-                ELSE 7
-            END
-        """
-
-        results = self.query_db(sql)
-        if results:
-            total = sum(int(row.split('\t')[1]) for row in results)
-            max_count = max(int(row.split('\t')[1]) for row in results)
+        agg = self.aggregate(hours, date_start, date_end)
+        if agg and agg.total:
+            total = agg.total
+            max_count = max(agg.durations)
 
             print(f"{Colors.WHITE}{'Duration Range':<20} {'Count':<10} {'%':<8} {'Graph':<30}{Colors.RESET}")
             print(f"{Colors.CYAN}{'─'*70}{Colors.RESET}")
 
-            for row in results:
-                data = row.split('\t')
-                duration_range = data[0]
-                count = int(data[1])
+            for duration_range, count in zip(DURATION_BUCKETS, agg.durations):
+                if not count:
+                    continue
                 percentage = (count / total * 100) if total > 0 else 0
                 bar_width = int((count / max_count) * 20) if max_count > 0 else 0
                 bar = '█' * bar_width
@@ -613,50 +865,128 @@ class CDRAnalyzer:
         ORDER BY calldate DESC
         """
 
-        results = self.query_db(sql)
-
-        calls = []
-        for row in results:
-            data = row.split('\t')
-            call = {
-                'calldate': data[0] if len(data) > 0 else '',
-                'clid': data[1] if len(data) > 1 else '',
-                'src': data[2] if len(data) > 2 else '',
-                'dst': data[3] if len(data) > 3 else '',
-                'dcontext': data[4] if len(data) > 4 else '',
-                'channel': data[5] if len(data) > 5 else '',
-                'dstchannel': data[6] if len(data) > 6 else '',
-                'lastapp': data[7] if len(data) > 7 else '',
-                'lastdata': data[8] if len(data) > 8 else '',
-                'duration': int(data[9]) if len(data) > 9 and data[9] else 0,
-                'billsec': int(data[10]) if len(data) > 10 and data[10] else 0,
-                'disposition': data[11] if len(data) > 11 else '',
-                'amaflags': data[12] if len(data) > 12 else '',
-                'accountcode': data[13] if len(data) > 13 else '',
-                'uniqueid': data[14] if len(data) > 14 else '',
-                'userfield': data[15] if len(data) > 15 else '',
-            }
-            calls.append(call)
-
-        export_data = {
-            'export_date': datetime.now().isoformat(),
-            'window': window_desc,
-            'total_calls': len(calls),
-            'calls': calls
-        }
-
+        # Rows are written as they arrive (the document is assembled by hand so
+        # only one call is ever held in memory); total_calls therefore goes
+        # after the calls array.
+        tmp_file = output_file + ".part"
+        progress = ExportProgress("cdr")
         try:
-            with open(output_file, 'w') as f:
-                json.dump(export_data, f, indent=2)
-
-            print(f"{Colors.GREEN}✅ Exported {len(calls)} calls to: {output_file}{Colors.RESET}")
+            with open(tmp_file, 'w') as f:
+                f.write('{\n  "export_date": %s,\n  "window": %s,\n  "calls": ['
+                        % (json.dumps(datetime.now().isoformat()), json.dumps(window_desc)))
+                for data in freepbx_db.iter_rows(sql, socket=self.db_socket, user=self.db_user,
+                                                 db=self.db_name):
+                    call = {
+                        'calldate': data[0] if len(data) > 0 else '',
+                        'clid': data[1] if len(data) > 1 else '',
+                        'src': data[2] if len(data) > 2 else '',
+                        'dst': data[3] if len(data) > 3 else '',
+                        'dcontext': data[4] if len(data) > 4 else '',
+                        'channel': data[5] if len(data) > 5 else '',
+                        'dstchannel': data[6] if len(data) > 6 else '',
+                        'lastapp': data[7] if len(data) > 7 else '',
+                        'lastdata': data[8] if len(data) > 8 else '',
+                        'duration': int(data[9]) if len(data) > 9 and data[9] else 0,
+                        'billsec': int(data[10]) if len(data) > 10 and data[10] else 0,
+                        'disposition': data[11] if len(data) > 11 else '',
+                        'amaflags': data[12] if len(data) > 12 else '',
+                        'accountcode': data[13] if len(data) > 13 else '',
+                        'uniqueid': data[14] if len(data) > 14 else '',
+                        'userfield': data[15] if len(data) > 15 else '',
+                    }
+                    f.write(("\n    " if progress.rows == 0 else ",\n    ")
+                            + json.dumps(call, indent=2).replace("\n", "\n    "))
+                    progress.tick()
+                f.write("\n  ]" if progress.rows else "]")
+                f.write(',\n  "total_calls": %d\n}' % progress.rows)
+            os.replace(tmp_file, output_file)
+            progress.finish()
+
+            print(f"{Colors.GREEN}✅ Exported {progress.rows} calls to: {output_file}{Colors.RESET}")
 
             # Show file size
             size = os.path.getsize(output_file)
             print(f"{Colors.CYAN}   File size: {size:,} bytes{Colors.RESET}")
 
         except Exception as e:
-            print(f"{Colors.RED}❌ Export failed: {str(e)}{Colors.RESET}")
+            print(f"\n{Colors.RED}❌ Export failed: {str(e)}{Colors.RESET}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def export_stream(self, output_file, fmt=None, table="cdr", compress=None,
+                      hours=24, date_start=None, date_end=None):
+        """Stream every column of a cdr/cel window to NDJSON or CSV.
+
+        Rows go from the mysql client (--quick, so the server hands them over
+        one at a time) straight to the file, so memory stays flat however
+        large the window is. fmt defaults from the file name (.csv -> CSV,
+        anything else NDJSON); a .gz name or compress=True gzips the output.
+        Integer columns are written as numbers, SQL NULL as null / empty.
+        Returns True on success.
+        """
+        if compress is None:
+            compress = output_file.endswith(".gz")
+        elif compress and not output_file.endswith(".gz"):
+            output_file += ".gz"
+        base = output_file[:-3] if output_file.endswith(".gz") else output_file
+        fmt = fmt or ("csv" if base.lower().endswith(".csv") else "ndjson")
+
+        time_col = EXPORT_TIME_COLUMN[table]
+        columns = self.describe(table)
+        if not any(name == time_col for name, _type in columns):
+            print(f"{Colors.RED}❌ Table '{table}' not found (or has no {time_col} column) "
+                  f"in {self.db_name}{Colors.RESET}")
+            return False
+        names = [name for name, _type in columns]
+        kinds = [int if re.match(r'(tiny|small|medium|big)?int', col_type) else None
+                 for _name, col_type in columns]
+
+        where_clause, window_desc = self.resolve_window(hours, date_start, date_end, column=time_col)
+        sql = (f"SELECT {', '.join('`%s`' % n for n in names)} FROM `{table}` "
+               f"WHERE {where_clause} ORDER BY `{time_col}`")
+
+        print(f"\n{Colors.CYAN}📤 Streaming {table} export ({window_desc}) → {output_file} "
+              f"[{fmt}{', gzip' if compress else ''}]{Colors.RESET}")
+
+        tmp_file = output_file + ".part"
+        progress = ExportProgress(table)
+        opener = gzip.open if compress else open
+        try:
+            with opener(tmp_file, "wt", encoding="utf-8", newline="") as f:
+                if fmt == "csv":
+                    writer = csv.writer(f)
+                    writer.writerow(names)
+                for parts in freepbx_db.iter_rows(sql, socket=self.db_socket, user=self.db_user,
+                                                  db=self.db_name):
+                    values = []
+                    for raw, kind in zip(parts, kinds):
+                        if raw == "NULL":
+                            values.append(None)
+                        elif kind is not None:
+                            values.append(freepbx_db.convert(raw, kind))
+                        else:
+                            values.append(freepbx_db.unescape(raw))
+                    if fmt == "csv":
+                        writer.writerow(["" if v is None else v for v in values])
+                    else:
+                        f.write(json.dumps(dict(zip(names, values)), ensure_ascii=False) + "\n")
+                    progress.tick()
+            os.replace(tmp_file, output_file)
+        except (freepbx_db.MySQLError, OSError) as e:
+            print(f"\n{Colors.RED}❌ Export failed: {e}{Colors.RESET}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            return False
+        except KeyboardInterrupt:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        progress.finish()
+
+        size = os.path.getsize(output_file)
+        print(f"{Colors.GREEN}✅ Exported {progress.rows:,} {table} rows to: {output_file}{Colors.RESET}")
+        print(f"{Colors.CYAN}   File size: {size:,} bytes{Colors.RESET}")
+        return True
 
 
 def main():
@@ -677,10 +1007,22 @@ def main():
     parser.add_argument("--trunk-usage", action="store_true", help="Show trunk usage")
     parser.add_argument("--duration-dist", action="store_true", help="Show duration distribution")
     parser.add_argument("--export-json", type=str, metavar="FILE", help="Export to JSON file")
+    parser.add_argument("--export", type=str, metavar="FILE",
+                        help="Stream the window to FILE as NDJSON or CSV (by extension; "
+                             "a .gz suffix gzips it) with flat memory use")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="--export format (default: from FILE's extension, else ndjson)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the --export output")
+    parser.add_argument("--table", choices=sorted(EXPORT_TIME_COLUMN), default="cdr",
+                        help="Table for --export (default: cdr)")
     parser.add_argument("--find-number", type=str, metavar="NUMBER", help="Find calls matching a phone number (partial ok)")
     parser.add_argument("--comprehensive", action="store_true", help="Run all analyses")
     parser.add_argument("--db-user", default="root", help="MySQL username")
     parser.add_argument("--socket", default="/var/lib/mysql/mysql.sock", help="MySQL socket path")
+    parser.add_argument("--rollup-db", default=ROLLUP_PATH, metavar="PATH",
+                        help=f"Local hourly CDR rollup cache (default: {ROLLUP_PATH})")
+    parser.add_argument("--no-rollup", action="store_true",
+                        help="Ignore the rollup cache and scan asteriskcdrdb for the whole window")
 
     args = parser.parse_args()
 
@@ -692,13 +1034,20 @@ def main():
     except AttributeError:
         pass  # Windows doesn't have geteuid
 
-    analyzer = CDRAnalyzer(db_user=args.db_user, db_socket=args.socket)
+    analyzer = CDRAnalyzer(db_user=args.db_user, db_socket=args.socket,
+                           rollup_path=None if args.no_rollup else args.rollup_db)
     window_kw = {"date_start": args.start, "date_end": args.end}
 
     print(f"{Colors.CYAN}{Colors.BOLD}{'='*78}")
     print(f"  📞 FREEPBX CDR/CEL CALL LOG ANALYZER")
     print(f"{'='*78}{Colors.RESET}")
 
+    # Streaming export mode
+    if args.export:
+        ok = analyzer.export_stream(args.export, fmt=args.format, table=args.table,
+                                    compress=args.gzip or None, hours=args.hours, **window_kw)
+        sys.exit(0 if ok else 1)
+
     # Export mode
     if args.export_json:
         analyzer.export_to_json(hours=args.hours, output_file=args.export_json, **window_kw)
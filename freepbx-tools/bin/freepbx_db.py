@@ -0,0 +1,582 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+freepbx_db.py
+-------------
+Shared MySQL access layer for the freepbx-tools collectors.
+✓ Python 3.6 compatible (drives the mysql CLI; no external modules).
+
+Every tool in bin/ used to fork `mysql -BNe "<sql>"` once per statement, which
+on a full dump or analyzer run means hundreds of process spawns, socket
+connects and auth handshakes. Zone A hosts can't take a Python DB driver (see
+CODING_RULES.md), so instead this module keeps ONE long-lived `mysql --batch`
+client per (database, socket, user) and feeds it statements over stdin. Each
+statement is followed by a `SELECT '<marker>'` so we know exactly where its
+output ends. The per-statement fork is kept as the fallback for hosts where the
+persistent session can't be used (non-POSIX dev boxes, or
+FREEPBX_DB_PERSISTENT=0 for troubleshooting).
+
+Output is byte-for-byte what `mysql -BN` printed before (tab-separated,
+batch-escaped, NULL as the literal "NULL"), so the existing `run_mysql` /
+`rows_as_dicts` / tuple-returning helpers in each tool keep their contracts.
+
+Tools import it as a sibling module: put the script's real directory on
+sys.path (tools are usually invoked through /usr/local/bin symlinks), then
+`import freepbx_db`.
+
+VARIABLE MAP (Key Script Variables)
+-----------------------------------
+ASTERISK_DB      : FreePBX configuration database name
+ASTERISK_CDR_DB  : CDR/CEL database name
+DEFAULT_SOCK     : Default MariaDB/MySQL unix socket path
+MYSQL_BIN        : mysql client binary
+PERSISTENT       : False forces the one-fork-per-statement fallback
+STMT_CACHE_SIZE  : Max server-side prepared statements kept per session
+_SESSIONS        : Registry of open MySQLSession objects keyed by connection
+
+    FUNCTION MAP (Major Functions)
+    -----------------------------
+    MySQLSession.execute : Run SQL on the persistent client, return stdout text
+    MySQLSession.iter_lines : Stream a statement's output line by line
+    get_session          : Shared session for a connection key (one per DB)
+    SessionPool          : Small set of sessions for concurrent collectors
+    run_mysql            : Drop-in for the per-tool run_mysql helpers
+    query                : SELECT -> list of tuples
+    rows_as_dicts        : SELECT -> list of dicts (fixed column list)
+    fetch                : SELECT -> list of typed namedtuple rows
+    unescape             : Undo mysql --batch escaping in a column value
+    close_all            : Close every open session (registered atexit)
+"""
+
+import atexit
+import collections
+import contextlib
+import os
+import queue
+import re
+import select
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+ASTERISK_DB = "asterisk"
+ASTERISK_CDR_DB = "asteriskcdrdb"
+DEFAULT_SOCK = "/var/lib/mysql/mysql.sock"
+MYSQL_BIN = "mysql"
+
+PERSISTENT = (os.name == "posix"
+              and os.environ.get("FREEPBX_DB_PERSISTENT", "1") != "0")
+STMT_CACHE_SIZE = 64
+
+
+class MySQLError(RuntimeError):
+    """A statement failed (or the client died). Subclasses RuntimeError so
+    callers that already catch RuntimeError from their old run_mysql keep
+    working unchanged."""
+
+
+# ---------------------------
+# SQL literal helpers
+# ---------------------------
+
+_ESCAPES = {
+    "\\": "\\\\", "'": "\\'", "\0": "\\0",
+    "\n": "\\n", "\r": "\\r", "\x1a": "\\Z",
+}
+
+
+def sql_literal(value):
+    """Render a Python value as a MySQL literal for SET @var = ... ."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    text = value if isinstance(value, str) else str(value)
+    return "'" + "".join(_ESCAPES.get(ch, ch) for ch in text) + "'"
+
+
+def _normalize(sql):
+    """Strip whitespace/trailing semicolons so we control statement terminators."""
+    return sql.strip().rstrip(";").rstrip()
+
+
+# ---------------------------
+# Persistent client session
+# ---------------------------
+
+class MySQLSession(object):
+    """One long-lived `mysql --batch` client bound to a single database.
+
+    Statements are serialized with a lock, so a session can be shared between
+    threads; tools that want real concurrency open several sessions. The
+    session restarts itself transparently after an error, a timeout, or a
+    fork (a child never reuses its parent's pipes).
+
+    While iter_lines() is streaming, the client's pipe belongs to that
+    result: a second statement from the same thread raises MySQLError
+    instead of interleaving with (or deadlocking on) the open stream.
+    """
+
+    def __init__(self, db=ASTERISK_DB, socket=None, user="root", password=None):
+        self.db = db
+        self.socket = socket
+        self.user = user
+        self.password = password
+        self.key = _key(db, socket, user, password)
+        self._lock = threading.Lock()
+        self._streaming = None   # thread ident of an open iter_lines() stream
+        self._proc = None
+        self._pid = None
+        self._stderr = None
+        self._buf = b""
+        self._token = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._stmts = collections.OrderedDict()  # sql text -> prepared stmt name
+        self._stmt_seq = 0
+        self.statements = 0   # executed statements (for --debug / timings)
+        self.spawns = 0       # client processes started
+
+    # -- process management ------------------------------------------------
+
+    def _base_cmd(self):
+        cmd = [MYSQL_BIN, "--batch", "--skip-column-names"]
+        if self.user:
+            cmd += ["--user", str(self.user)]
+        if self.socket:
+            cmd += ["--socket", str(self.socket)]
+        return cmd
+
+    def _env(self):
+        env = os.environ.copy()
+        if self.password:
+            env["MYSQL_PWD"] = self.password
+        return env
+
+    def _alive(self):
+        return (self._proc is not None and self._pid == os.getpid()
+                and self._proc.poll() is None)
+
+    def _start(self):
+        if self._proc is not None and self._pid != os.getpid():
+            # Inherited across fork(): the pipes belong to the parent.
+            self._proc = None
+        self._stop()
+        # --quick: rows are fetched from the server one at a time
+        # (mysql_use_result) instead of the whole result being buffered in the
+        # client first, so iter_lines() really streams large SELECTs.
+        cmd = self._base_cmd() + ["--unbuffered", "--quick"]
+        if self.db:
+            cmd += [str(self.db)]
+        self._stderr = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                      stdout=subprocess.PIPE,
+                                      stderr=self._stderr, env=self._env(),
+                                      bufsize=0, close_fds=True)
+        self._pid = os.getpid()
+        self._buf = b""
+        self._stmts.clear()
+        self.spawns += 1
+
+    def _stop(self, kill=False):
+        proc, self._proc = self._proc, None
+        if proc is not None and self._pid == os.getpid():
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+            if kill:
+                proc.kill()
+            try:
+                proc.wait(timeout=2)
+            except Exception:
+                proc.kill()
+                proc.wait()
+        if self._stderr is not None:
+            self._stderr.close()
+            self._stderr = None
+        self._buf = b""
+        self._stmts.clear()
+
+    def close(self):
+        self._check_stream("close")
+        with self._lock:
+            self._stop()
+
+    def _check_stream(self, what="a statement"):
+        """Refuse to re-enter the session from inside one of its own streams."""
+        if self._streaming == threading.get_ident():
+            raise MySQLError(
+                "mysql error ({}): {} started while an iter_lines() result is "
+                "still streaming on this session; finish or close the first "
+                "iterator, or use another session".format(self.db, what))
+
+    def _failure(self, reason):
+        """Collect the client's stderr, tear the process down, build the error."""
+        detail = ""
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+        if proc is not None:
+            proc.wait()
+        if self._stderr is not None:
+            self._stderr.seek(0)
+            detail = self._stderr.read().decode("utf-8", "replace").strip()
+        self._stop()
+        return MySQLError("mysql error ({}): {}\n{}".format(self.db, reason, detail).strip())
+
+    # -- statement plumbing ------------------------------------------------
+
+    def _prepared_script(self, sql, params):
+        """PREPARE once per session, then SET + EXECUTE on every call."""
+        name = self._stmts.get(sql)
+        script = []
+        if name is None:
+            self._stmt_seq += 1
+            name = "fpdb_stmt_{}".format(self._stmt_seq)
+            script.append("PREPARE {} FROM {};".format(name, sql_literal(sql)))
+            self._stmts[sql] = name
+            while len(self._stmts) > STMT_CACHE_SIZE:
+                _old_sql, old = self._stmts.popitem(last=False)
+                script.append("DEALLOCATE PREPARE {};".format(old))
+        else:
+            self._stmts.move_to_end(sql)
+        if params:
+            names = ["@fpdb_p{}".format(i) for i in range(len(params))]
+            script.append("SET " + ", ".join(
+                "{} = {}".format(n, sql_literal(v)) for n, v in zip(names, params)) + ";")
+            script.append("EXECUTE {} USING {};".format(name, ", ".join(names)))
+        else:
+            script.append("EXECUTE {};".format(name))
+        return "\n".join(script)
+
+    def _submit(self, sql, params, marker):
+        """Write one statement plus its end marker to the client's stdin."""
+        for attempt in (0, 1):
+            if not self._alive():
+                self._start()
+            # Built after _start() so a restart never reuses stale stmt names.
+            body = (self._prepared_script(_normalize(sql), params)
+                    if params is not None else _normalize(sql) + "\n;")
+            try:
+                self._proc.stdin.write(
+                    (body + "\nSELECT '{}';\n".format(marker)).encode("utf-8"))
+                return
+            except (BrokenPipeError, OSError):
+                # Client went away between statements (server restart, idle
+                # timeout): nothing was executed, so retry once on a new one.
+                if attempt:
+                    raise self._failure("client unavailable")
+                self._stop(kill=True)
+
+    def iter_lines(self, sql, params=None, timeout=None):
+        """Stream the output of one statement as decoded lines.
+
+        Holds the session lock until the generator is exhausted or closed. A
+        consumer that stops early leaves unread output in the pipe, so the
+        client is restarted rather than resynchronized. Other threads wait for
+        the stream to finish; the streaming thread itself gets a MySQLError.
+        """
+        self._check_stream()
+        with self._lock:
+            self._streaming = threading.get_ident()
+            self._seq += 1
+            marker = "__fpdb_{}_{}__".format(self._token, self._seq)
+            self._submit(sql, params, marker)
+            self.statements += 1
+            deadline = (time.time() + timeout) if timeout else None
+            done = False
+            try:
+                for line in self._read_until(marker.encode("ascii"), deadline):
+                    yield line.decode("utf-8", "replace")
+                done = True
+            finally:
+                self._streaming = None
+                if not done and self._alive():
+                    self._stop(kill=True)
+
+    def _read_until(self, marker, deadline):
+        fd = self._proc.stdout.fileno()
+        while True:
+            if b"\n" in self._buf:
+                lines = self._buf.split(b"\n")
+                self._buf = lines.pop()
+                for i, line in enumerate(lines):
+                    if line == marker:
+                        # Anything after the marker belongs to nobody; the
+                        # client only writes when we ask, so this is empty.
+                        self._buf = b"\n".join(lines[i + 1:] + [self._buf])
+                        return
+                    yield line
+                continue
+            wait = None
+            if deadline is not None:
+                wait = deadline - time.time()
+                if wait <= 0:
+                    raise self._failure("timed out")
+            ready, _, _ = select.select([fd], [], [], wait)
+            if not ready:
+                raise self._failure("timed out")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise self._failure("client exited")
+            self._buf += chunk
+
+    def execute(self, sql, params=None, timeout=None):
+        """Run SQL and return its stdout exactly as `mysql -BN -e` would."""
+        lines = list(self.iter_lines(sql, params=params, timeout=timeout))
+        return "".join(line + "\n" for line in lines)
+
+    # -- one-shot fallback -------------------------------------------------
+
+    def _oneshot_body(self, sql, params):
+        """Script for a forked client; shares the statement cache, so locked."""
+        self._check_stream()
+        with self._lock:
+            self._stmts.clear()  # a fresh process never has prepared statements
+            self.statements += 1
+            self.spawns += 1
+            return (self._prepared_script(_normalize(sql), params)
+                    if params is not None else sql)
+
+    def execute_oneshot(self, sql, params=None, timeout=None):
+        """Fork a dedicated mysql process for this statement (legacy path)."""
+        body = self._oneshot_body(sql, params)
+        cmd = self._base_cmd()
+        if self.db:
+            cmd += [str(self.db)]
+        cmd += ["-e", body]
+        try:
+            p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               env=self._env(), timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise MySQLError("mysql error ({}): timed out".format(self.db))
+        if p.returncode != 0:
+            raise MySQLError("mysql error ({}):\n{}".format(
+                self.db, p.stderr.decode("utf-8", "replace").strip()))
+        return p.stdout.decode("utf-8", "replace")
+
+    def iter_oneshot(self, sql, params=None, timeout=None):
+        """execute_oneshot(), but yield lines as the forked client prints
+        them. The deadline is checked between lines."""
+        body = self._oneshot_body(sql, params)
+        cmd = self._base_cmd() + ["--quick"]
+        if self.db:
+            cmd += [str(self.db)]
+        cmd += ["-e", body]
+        deadline = (time.time() + timeout) if timeout else None
+        err = tempfile.TemporaryFile()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err,
+                                env=self._env(), close_fds=True)
+        try:
+            for raw in proc.stdout:
+                if deadline is not None and time.time() > deadline:
+                    raise MySQLError("mysql error ({}): timed out".format(self.db))
+                yield raw.rstrip(b"\n").decode("utf-8", "replace")
+            if proc.wait() != 0:
+                err.seek(0)
+                raise MySQLError("mysql error ({}):\n{}".format(
+                    self.db, err.read().decode("utf-8", "replace").strip()))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            err.close()
+
+
+# ---------------------------
+# Session registry
+# ---------------------------
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+_LOCAL = threading.local()   # .session: pool session bound to this thread
+
+
+def _key(db, socket, user, password):
+    return (db or "", socket or "", user or "", password or "")
+
+
+def get_session(db=ASTERISK_DB, socket=None, user="root", password=None):
+    """Return the session for this connection: the pool session bound to the
+    calling thread if there is one, otherwise the shared one per database."""
+    key = _key(db, socket, user, password)
+    bound = getattr(_LOCAL, "session", None)
+    if bound is not None and bound.key == key:
+        return bound
+    with _SESSIONS_LOCK:
+        sess = _SESSIONS.get(key)
+        if sess is None:
+            sess = MySQLSession(db=db, socket=socket, user=user, password=password)
+            _SESSIONS[key] = sess
+        return sess
+
+
+class SessionPool(object):
+    """A fixed number of sessions for one connection, lent out to threads.
+
+    Inside `with pool.bound():` every freepbx_db call made by that thread for
+    the same connection runs on the borrowed session, so existing collectors
+    (which only pass socket/user/password/db through **kw) run concurrently
+    without any signature changes.
+    """
+
+    def __init__(self, size, db=ASTERISK_DB, socket=None, user="root", password=None):
+        self.size = max(1, int(size))
+        self.sessions = [MySQLSession(db=db, socket=socket, user=user, password=password)
+                         for _ in range(self.size)]
+        self._free = queue.Queue()
+        for sess in self.sessions:
+            self._free.put(sess)
+
+    @contextlib.contextmanager
+    def bound(self):
+        sess = self._free.get()
+        prev = getattr(_LOCAL, "session", None)
+        _LOCAL.session = sess
+        try:
+            yield sess
+        finally:
+            _LOCAL.session = prev
+            self._free.put(sess)
+
+    def close(self):
+        for sess in self.sessions:
+            sess.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def close_all():
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+    for sess in sessions:
+        sess.close()
+
+
+atexit.register(close_all)
+
+
+def stats():
+    """(statements, spawns) across all sessions — handy for --debug output."""
+    with _SESSIONS_LOCK:
+        sessions = list(_SESSIONS.values())
+    return (sum(s.statements for s in sessions), sum(s.spawns for s in sessions))
+
+
+# ---------------------------
+# Public helpers (mirror the per-tool signatures)
+# ---------------------------
+
+def run_mysql(sql, socket=None, user="root", password=None, db=ASTERISK_DB,
+              params=None, timeout=None):
+    """Run a SQL statement and return stdout as text. Raises MySQLError.
+
+    `params` binds `?` placeholders through a server-side prepared statement
+    that stays cached on the session, so repeated lookups skip re-parsing and
+    values never get interpolated into the SQL text.
+    """
+    sess = get_session(db=db, socket=socket, user=user, password=password)
+    if PERSISTENT:
+        return sess.execute(sql, params=params, timeout=timeout)
+    return sess.execute_oneshot(sql, params=params, timeout=timeout)
+
+
+def iter_rows(sql, socket=None, user="root", password=None, db=ASTERISK_DB,
+              params=None, timeout=None):
+    """Yield tab-split rows as they arrive instead of buffering the result."""
+    sess = get_session(db=db, socket=socket, user=user, password=password)
+    if PERSISTENT:
+        lines = sess.iter_lines(sql, params=params, timeout=timeout)
+    else:
+        lines = sess.iter_oneshot(sql, params=params, timeout=timeout)
+    for line in lines:
+        yield tuple(line.split("\t"))
+
+
+def query(sql, **kw):
+    """SELECT -> list of tuples of column strings ([] when no rows)."""
+    out = run_mysql(sql, **kw).rstrip("\n")
+    if not out:
+        return []
+    return [tuple(line.split("\t")) for line in out.split("\n")]
+
+
+def rows_as_dicts(sql, cols, **kw):
+    """Run a SELECT that returns exactly len(cols) columns -> list[dict]."""
+    out = run_mysql(sql, **kw).rstrip("\n")
+    if not out:
+        return []
+    n = len(cols)
+    dicts = []
+    for line in out.split("\n"):
+        parts = line.split("\t")
+        parts = (parts + [""] * n)[:n]
+        dicts.append(dict(zip(cols, parts)))
+    return dicts
+
+
+_ROW_TYPES = {}
+
+
+def _row_type(cols):
+    cols = tuple(cols)
+    rt = _ROW_TYPES.get(cols)
+    if rt is None:
+        rt = collections.namedtuple("Row", cols, rename=True)
+        _ROW_TYPES[cols] = rt
+    return rt
+
+
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r", "0": "\0"}
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def unescape(value):
+    """Undo mysql --batch escaping (\\t, \\n, \\\\, \\0) in one column value."""
+    if "\\" not in value:
+        return value
+    return _ESCAPE_RE.sub(lambda m: _UNESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def convert(value, kind):
+    """Coerce one batch-mode column string; NULL/empty/garbage -> None."""
+    if value == "NULL":
+        return None
+    if kind is None or kind is str:
+        return value
+    if value == "":
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch(sql, cols, types=None, **kw):
+    """SELECT -> list of namedtuple rows, with optional per-column converters.
+
+    types: {column: int|float|str|callable}; columns not listed stay strings.
+    SQL NULL comes back as None in every column.
+    """
+    rt = _row_type(cols)
+    kinds = [(types or {}).get(c) for c in cols]
+    n = len(cols)
+    rows = []
+    for parts in iter_rows(sql, **kw):
+        if len(parts) != n:
+            parts = (parts + ("",) * n)[:n]
+        rows.append(rt(*[convert(v, k) for v, k in zip(parts, kinds)]))
+    return rows
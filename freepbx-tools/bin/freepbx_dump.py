@@ -4,7 +4,7 @@
 freepbx_dump.py
 ---------------
 Normalize FreePBX call-flow data across schema differences and dump to JSON.
-✓ Python 3.6 compatible (uses mysql CLI via subprocess; no external modules).
+✓ Python 3.6 compatible (uses the mysql CLI via freepbx_db; no external modules).
 
 VARIABLE MAP (Key Script Variables)
 -----------------------------------
@@ -31,16 +31,24 @@ See function docstrings for additional details on arguments and return values.
     FUNCTION MAP (Major Functions)
     -----------------------------
     print_header              : Print professional header banner
-    run_mysql_query           : Run a MySQL query using the CLI
+    run_mysql_query           : Run a MySQL query on the shared freepbx_db session
     get_tables                : Get list of tables in the database
     has_table                 : Check if a table exists
     extract_table_data        : Extract data from a table
     normalize_schema          : Normalize data across schema versions
-    dump_to_json              : Write normalized data to JSON file
+    discover_schema           : Load all table/column names in one query
+    table_checksums           : CHECKSUM TABLE fingerprints stored in meta
+    unchanged_sections        : Sections reusable by an incremental --refresh
+    iter_sections             : Run collectors (concurrently) in snapshot order
+    SnapshotWriter            : Stream sections to JSON file, atomic rename
     main                      : CLI entry point, parses args and runs extraction
 """
 
-import argparse, json, os, socket as pysocket, subprocess, sys, time
+import argparse, json, os, socket as pysocket, sys, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
 
 # ANSI Color codes for professional output
 class Colors:
@@ -73,40 +81,40 @@ ASTERISK_DB = "asterisk"
 # ---------------------------
 
 def run_mysql(sql, socket=None, user="root", password=None, db=ASTERISK_DB):
-    """Run a SQL statement via mysql CLI and return stdout as text."""
-    env = os.environ.copy()
-    if password:
-        env["MYSQL_PWD"] = password
-    cmd = ["mysql", "-BN"]
-    if user:
-        cmd += ["--user", str(user)]
-    if socket:
-        cmd += ["--socket", str(socket)]
-    if db:
-        cmd += [str(db)]
-    cmd += ["-e", sql]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       universal_newlines=True, env=env)
-    if p.returncode != 0:
-        raise RuntimeError("mysql error:\n" + (p.stderr or "").strip())
-    return p.stdout
+    """Run a SQL statement on the shared mysql session and return stdout as text."""
+    return freepbx_db.run_mysql(sql, socket=socket, user=user, password=password, db=db)
 
 def rows_as_dicts(sql, cols, **kw):
     """Run a SELECT that returns exactly len(cols) columns -> list[dict]."""
-    out = run_mysql(sql, **kw).rstrip("\n")
-    if not out:
-        return []
-    dicts = []
-    for line in out.split("\n"):
-        parts = line.split("\t")
-        parts = (parts + [""] * len(cols))[:len(cols)]
-        dicts.append(dict(zip(cols, parts)))
-    return dicts
+    return freepbx_db.rows_as_dicts(sql, cols, **kw)
+
+# Filled once per run by discover_schema(): {table: set(columns)}. While set,
+# get_tables()/get_columns() answer from it instead of another SHOW/DESCRIBE.
+_SCHEMA = None
+
+def discover_schema(**kw):
+    """Load every table's column names in a single information_schema query."""
+    global _SCHEMA
+    try:
+        rows = rows_as_dicts(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE();", ["table", "column"], **kw)
+    except freepbx_db.MySQLError:
+        rows = []  # no information_schema access: fall back to SHOW/DESCRIBE
+    schema = {}
+    for r in rows:
+        schema.setdefault(r["table"], set()).add(r["column"])
+    _SCHEMA = schema or None
+    return _SCHEMA
 
 def get_tables(**kw):
+    if _SCHEMA is not None:
+        return set(_SCHEMA)
     return set(run_mysql("SHOW TABLES;", **kw).split())
 
 def get_columns(table, **kw):
+    if _SCHEMA is not None and table in _SCHEMA:
+        return set(_SCHEMA[table])
     # DESCRIBE returns Field\tType\tNull\tKey\tDefault\tExtra
     lines = run_mysql(f"DESCRIBE `{table}`;", **kw).splitlines()
     return set([ln.split("\t",1)[0] for ln in lines if ln.strip()])
@@ -365,6 +373,156 @@ def outbound_routes(**kw):
 
     return {"routes": routes, "patterns": pats, "route_trunks": rts}
 
+# ---------------------------
+# collection engine
+# ---------------------------
+
+# Snapshot section -> collector. Order only matters for the sequential path;
+# sections are always written in sorted-key order (matching sort_keys=True).
+COLLECTORS = [
+    ("meta",           meta),
+    ("inbound",        inbound),              # DIDs / Inbound Routes
+    ("ringgroups",     ringgroups),
+    ("queues",         queues),
+    ("ivrs",           ivrs),
+    ("timeconditions", timeconditions),
+    ("timegroups",     timegroups),
+    ("announcements",  announcements),
+    ("extensions",     extensions),
+    ("recordings",     recordings),
+    ("trunks",         trunks),               # trunks + trunk_dialpatterns
+    ("outbound",       outbound_routes),      # routes + patterns + route→trunks
+]
+
+# Source tables behind each section (meta is always rebuilt). An incremental
+# refresh re-runs a collector only when CHECKSUM TABLE says one of these moved.
+SECTION_TABLES = {
+    "inbound":        ["incoming"],
+    "ringgroups":     ["ringgroups"],
+    "queues":         ["queues_config", "queues_details", "queue_members"],
+    "ivrs":           ["ivr_details", "ivr_entries"],
+    "timeconditions": ["timeconditions"],
+    "timegroups":     ["timegroups_details"],
+    "announcements":  ["announcement", "announcements"],
+    "extensions":     ["users"],
+    "recordings":     ["recordings"],
+    "trunks":         ["trunks", "trunk_dialpatterns"],
+    "outbound":       ["outbound_routes", "outbound_route_patterns",
+                       "outbound_route_trunks", "trunks"],
+}
+
+# Bump when a collector's output shape changes so --refresh never splices
+# sections written by an older freepbx_dump.py into a newer snapshot.
+SNAPSHOT_FORMAT = 1
+
+DEFAULT_JOBS = 4
+
+def table_checksums(tables, **kw):
+    """CHECKSUM TABLE every listed table that exists, in one statement."""
+    present = sorted(set(tables) & get_tables(**kw))
+    if not present:
+        return {}
+    out = run_mysql("CHECKSUM TABLE " + ", ".join("`%s`" % t for t in present) + ";", **kw)
+    sums = {}
+    for line in out.splitlines():
+        parts = line.split("\t")
+        if len(parts) >= 2:
+            sums[parts[0].rsplit(".", 1)[-1]] = parts[1]   # "asterisk.users"
+    return sums
+
+def load_previous(path):
+    """Previous snapshot if --refresh can build on it, else None."""
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    meta_prev = data.get("meta") or {}
+    if meta_prev.get("snapshot_format") != SNAPSHOT_FORMAT or "table_checksums" not in meta_prev:
+        return None
+    return data
+
+def unchanged_sections(previous, sums):
+    """Sections of `previous` whose source tables all have the same checksum."""
+    if not previous:
+        return {}
+    old = previous["meta"]["table_checksums"]
+    keep = {}
+    for name, tables in SECTION_TABLES.items():
+        if name in previous and all(old.get(t) == sums.get(t) for t in tables):
+            keep[name] = previous[name]
+    return keep
+
+def iter_sections(jobs=DEFAULT_JOBS, reuse=None, **kw):
+    """Yield (section, data) in sorted order as soon as each one is ready.
+
+    With jobs > 1 the collectors run concurrently on a small freepbx_db
+    SessionPool (one mysql client per worker); jobs=1 runs them one after
+    another on the shared session. Sections present in `reuse` are passed
+    through from the previous snapshot without touching the database.
+    """
+    reuse = reuse or {}
+    names = sorted(name for name, _fn in COLLECTORS)
+    todo = [(name, fn) for name, fn in COLLECTORS if name not in reuse]
+    if jobs <= 1 or len(todo) <= 1:
+        fns = dict(todo)
+        for name in names:
+            yield name, (reuse[name] if name in reuse else fns[name](**kw))
+        return
+
+    jobs = min(jobs, len(todo))
+    pool = freepbx_db.SessionPool(jobs, **kw)
+
+    def run(fn):
+        with pool.bound():
+            return fn(**kw)
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as ex:
+            futures = dict((name, ex.submit(run, fn)) for name, fn in todo)
+            for name in names:
+                yield name, (reuse[name] if name in reuse else futures[name].result())
+    finally:
+        pool.close()
+
+class SnapshotWriter(object):
+    """Write the snapshot one section at a time to <out>.tmp, then rename.
+
+    Produces exactly what json.dump(payload, indent=2, sort_keys=True) did, but
+    each section is encoded and flushed as it arrives instead of holding the
+    whole payload, and readers never see a half-written freepbx_dump.json.
+    Sections must be written in sorted key order.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self._enc = json.JSONEncoder(indent=2, sort_keys=True)
+        self._count = 0
+        self._f = open(self.tmp, "w")
+        self._f.write("{")
+
+    def write_section(self, key, value):
+        self._f.write(",\n  " if self._count else "\n  ")
+        self._f.write(json.dumps(key) + ": ")
+        # ensure_ascii keeps every newline structural, so re-indenting is safe
+        for chunk in self._enc.iterencode(value):
+            self._f.write(chunk.replace("\n", "\n  "))
+        self._f.flush()
+        self._count += 1
+
+    def commit(self):
+        self._f.write("\n}" if self._count else "}")
+        self._f.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        self._f.close()
+        try:
+            os.remove(self.tmp)
+        except OSError:
+            pass
+
 # ---------------------------
 # main
 # ---------------------------
@@ -377,55 +535,81 @@ def main():
     ap.add_argument("--db-user", default="root")
     ap.add_argument("--db-pass", default=None)
     ap.add_argument("--out", default="/home/123net/callflows/freepbx_dump.json")
+    ap.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                    help="Collectors to run concurrently, one mysql session each "
+                         "(default: %(default)s; 1 = one at a time)")
+    ap.add_argument("--refresh", action="store_true",
+                    help="Incremental: re-read only sections whose tables changed "
+                         "since the snapshot already at --out")
     args = ap.parse_args()
 
     kw = dict(socket=args.socket, user=args.db_user, password=args.db_pass, db=ASTERISK_DB)
 
     print(Colors.YELLOW + "📡 Connecting to MySQL database..." + Colors.ENDC)
-    
+
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    writer = None
+    counts = {}
+    started = time.time()
     try:
-        print(Colors.CYAN + "⚙️  Extracting configuration data..." + Colors.ENDC)
-        payload = {
-            "meta":            meta(**kw),
-            "inbound":         inbound(**kw),              # DIDs / Inbound Routes
-            "ringgroups":      ringgroups(**kw),
-            "queues":          queues(**kw),
-            "ivrs":            ivrs(**kw),
-            "timeconditions":  timeconditions(**kw),
-            "timegroups":      timegroups(**kw),
-            "announcements":   announcements(**kw),
-            "extensions":      extensions(**kw),
-            "recordings":      recordings(**kw),
-            "trunks":          trunks(**kw),               # trunks + trunk_dialpatterns
-            "outbound":        outbound_routes(**kw),      # routes + patterns + route→trunks
-        }
-        
+        discover_schema(**kw)
+        sums = table_checksums(set(t for ts in SECTION_TABLES.values() for t in ts), **kw)
+        previous = load_previous(args.out) if args.refresh else None
+        reuse = unchanged_sections(previous, sums)
+        if reuse and len(reuse) == len(SECTION_TABLES):
+            # Nothing to re-read, but record the check: readers show
+            # verified_at_utc as the time the data was known to be current.
+            verified_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            previous["meta"]["verified_at_utc"] = verified_at
+            writer = SnapshotWriter(args.out)
+            for name in sorted(previous):
+                writer.write_section(name, previous[name])
+            writer.commit()
+            print(Colors.GREEN + "✓ Snapshot already current — no source tables changed "
+                  "(verified " + verified_at + ")." + Colors.ENDC)
+            return
+        if reuse:
+            changed = sorted(set(SECTION_TABLES) - set(reuse))
+            print(Colors.CYAN + "↻ Incremental refresh: re-reading " + ", ".join(changed) +
+                  " ({} sections unchanged)".format(len(reuse)) + Colors.ENDC)
+        else:
+            print(Colors.CYAN + "⚙️  Extracting configuration data..." + Colors.ENDC)
+        writer = SnapshotWriter(args.out)
+        for name, data in iter_sections(jobs=args.jobs, reuse=reuse, **kw):
+            if name == "meta":
+                data["snapshot_format"] = SNAPSHOT_FORMAT
+                data["table_checksums"] = sums
+                generated_at = data["generated_at_utc"]
+                data["verified_at_utc"] = generated_at
+            writer.write_section(name, data)
+            counts[name] = len(data)
+        writer.commit()
+
         # Display collection summary
         print(Colors.GREEN + "\n✓ Data Collection Summary:" + Colors.ENDC)
-        print(Colors.BOLD + "  • DIDs/Inbound Routes:  " + Colors.ENDC + str(len(payload["inbound"])))
-        print(Colors.BOLD + "  • Ring Groups:          " + Colors.ENDC + str(len(payload["ringgroups"])))
-        print(Colors.BOLD + "  • Queues:               " + Colors.ENDC + str(len(payload["queues"])))
-        print(Colors.BOLD + "  • IVRs:                 " + Colors.ENDC + str(len(payload["ivrs"])))
-        print(Colors.BOLD + "  • Time Conditions:      " + Colors.ENDC + str(len(payload["timeconditions"])))
-        print(Colors.BOLD + "  • Time Groups:          " + Colors.ENDC + str(len(payload["timegroups"])))
-        print(Colors.BOLD + "  • Extensions:           " + Colors.ENDC + str(len(payload["extensions"])))
-        print(Colors.BOLD + "  • Trunks:               " + Colors.ENDC + str(len(payload["trunks"])))
-        
+        print(Colors.BOLD + "  • DIDs/Inbound Routes:  " + Colors.ENDC + str(counts["inbound"]))
+        print(Colors.BOLD + "  • Ring Groups:          " + Colors.ENDC + str(counts["ringgroups"]))
+        print(Colors.BOLD + "  • Queues:               " + Colors.ENDC + str(counts["queues"]))
+        print(Colors.BOLD + "  • IVRs:                 " + Colors.ENDC + str(counts["ivrs"]))
+        print(Colors.BOLD + "  • Time Conditions:      " + Colors.ENDC + str(counts["timeconditions"]))
+        print(Colors.BOLD + "  • Time Groups:          " + Colors.ENDC + str(counts["timegroups"]))
+        print(Colors.BOLD + "  • Extensions:           " + Colors.ENDC + str(counts["extensions"]))
+        print(Colors.BOLD + "  • Trunks:               " + Colors.ENDC + str(counts["trunks"]))
+
     except Exception as e:
+        if writer is not None:
+            writer.abort()
         print(Colors.RED + "❌ ERROR: " + str(e) + Colors.ENDC, file=sys.stderr)
         sys.exit(1)
 
-    print(Colors.YELLOW + "\n💾 Writing snapshot to disk..." + Colors.ENDC)
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, "w") as f:
-        json.dump(payload, f, indent=2, sort_keys=True)
-    
     # Get file size
     size_mb = os.path.getsize(args.out) / (1024 * 1024)
-    print(Colors.GREEN + Colors.BOLD + "\n✓ Success! " + Colors.ENDC + 
+    print(Colors.GREEN + Colors.BOLD + "\n✓ Success! " + Colors.ENDC +
           "Snapshot saved to: " + Colors.CYAN + args.out + Colors.ENDC)
     print(Colors.BOLD + "  File size: " + Colors.ENDC + "{:.2f} MB".format(size_mb))
-    print(Colors.BOLD + "  Timestamp: " + Colors.ENDC + payload["meta"]["generated_at_utc"])
+    print(Colors.BOLD + "  Timestamp: " + Colors.ENDC + generated_at)
+    print(Colors.BOLD + "  Collected in: " + Colors.ENDC + "{:.2f}s (jobs={})".format(
+        time.time() - started, max(1, args.jobs)))
     print("")
 
 if __name__ == "__main__":
@@ -17,6 +17,9 @@ error_events   : List of detected error events
 trunk_issues   : List of detected trunk issues
 queue_stats    : Dictionary of queue performance metrics
 security_events: List of detected security events
+SCAN_CHECKS    : Full-log checks fed by LogScan (pattern, flags, fallback tail)
+SCAN_SAMPLES   : Most recent matching lines LogScan keeps per check
+SEARCH_PAGE    : Hits shown per --grep page (continue with --cursor)
 
 Key Function Arguments:
 -----------------------
@@ -31,10 +34,20 @@ See function docstrings for additional details on arguments and return values.
     -----------------------------
     parse_args                : Parse command-line arguments
     read_log_file             : Read and parse log file
+    LogScan                   : One-pass accumulator behind the full-log checks
+    LogAnalyzer.scan_full_log : Read the window once and feed every check
+    LogAnalyzer.scan_range    : Same over a date range of rotated/.gz logs, in parallel
+    LogAnalyzer.analyze_range : Full analysis for a date range (--start/--end)
     detect_errors             : Detect error events in logs
     detect_trunk_issues       : Detect trunk issues in logs
     analyze_queues            : Analyze queue performance from logs
+    LogAnalyzer.check_queue_performance : Per-queue metrics from the freepbx_queue_stats
+                                rollup (tail-500 fallback)
+    LogAnalyzer.check_security_events : Top failed-auth IPs / endpoints from the persisted
+                                freepbx_security_stats aggregator (log scan fallback)
     detect_security_events    : Detect security events in logs
+    LogAnalyzer.grep_logs_with_regex : Paged mmap regex search with byte offsets
+                                (--limit / --cursor; grep / rotation scan fallback)
     print_summary             : Print summary statistics to terminal
     write_report              : Write analysis report to file
     main                      : CLI entry point, parses args and runs analysis
@@ -44,8 +57,25 @@ import os
 import sys
 import subprocess
 import re
+import heapq
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from collections import defaultdict
+from collections import defaultdict, deque
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+try:
+    import freepbx_queue_stats
+except ImportError:
+    freepbx_queue_stats = None
+try:
+    import freepbx_security_stats
+except ImportError:
+    freepbx_security_stats = None
 
 class Colors:
     RESET = '\033[0m'
@@ -113,12 +143,251 @@ def format_cause_code(code_info):
     return (f"SIP {code_info['sip']} / Q.850 {code_info['q850']} "
             f"({code_info['description']}) → {code_info['meaning']}")
 
+# Full-log checks, all fed from ONE read of the window by LogScan:
+#   (name, pattern, re flags, fallback tail — the check's old `tail -N | grep`)
+SCAN_CHECKS = (
+    ('errors', r'ERROR|CRITICAL|hangupcause', 0, 1000),
+    ('codes', r'SIP/2\.0|hangupcause|Cause:|Response:', 0, 2000),
+    ('trunk', r'trunk.*Unreachable|Registration.*failed', 0, 500),
+    ('security', r'failed.*auth|SECURITY', re.IGNORECASE, 500),
+    ('database', r'database.*fail|mysql.*error|mysql.*gone away', re.IGNORECASE, 500),
+)
+
+SCAN_SAMPLES = 50   # lines kept per check; the counts cover every match
+
+_SCAN_RES = [(name, re.compile(pat, flags)) for name, pat, flags, _tail in SCAN_CHECKS]
+# Any-check prefilter: most lines match nothing, so they cost one search
+_SCAN_ANY_RE = re.compile('|'.join(('(?i:%s)' if flags else '(?:%s)') % pat
+                                   for _name, pat, flags, _tail in SCAN_CHECKS))
+_SIP_RESPONSE_RE = re.compile(r'SIP/2\.0\s+(\d{3})\s+(.+?)(?:\r|\n|$)')
+_SIP_CODE_RE = re.compile(r'SIP/2\.0\s+(\d{3})')
+_CAUSE_RE = re.compile(r'(?:hangupcause[=:]\s*(\d+)|Cause:\s*(\d+))', re.IGNORECASE)
+_ERROR_MSG_RE = re.compile(r'(ERROR|CRITICAL).*?:\s*(.+?)$')
+_IP_RE = re.compile(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b')
+SEARCH_PAGE = 50
+
+
+class LogScan:
+    """Everything the full-log checks need, accumulated in a single pass.
+
+    feed() each line once; a line is tested against the combined prefilter
+    and then dispatched to every check whose own pattern it matches. The
+    check_* methods only render from these accumulators: per check, a match
+    count plus the last SCAN_SAMPLES lines, so memory stays flat however
+    large the window is.
+    """
+
+    def __init__(self, span):
+        self.span = span                               # "last 1h" / "last 2000 lines"
+        self.counts = dict((name, 0) for name, _rx in _SCAN_RES)
+        self.lines = dict((name, deque(maxlen=SCAN_SAMPLES)) for name, _rx in _SCAN_RES)
+        self.error_count = 0
+        self.error_types = defaultdict(int)            # message -> count
+        self.error_sip_codes = defaultdict(int)        # SIP code seen on an error line
+        self.sip_codes = {}                            # code -> {'count', 'samples'}
+        self.hangup_causes = {}                        # Q.850 cause -> {'count', 'samples'}
+        self.auth_ips = defaultdict(int)
+        self.read_errors = []                          # "file: error" for unreadable rotations
+
+    def feed(self, line, skip=()):
+        """Account one line; checks named in `skip` ignore it (tail fallback)."""
+        if not _SCAN_ANY_RE.search(line):
+            return
+        for name, rx in _SCAN_RES:
+            if name not in skip and rx.search(line):
+                self.counts[name] += 1
+                self.lines[name].append(line)
+                add = getattr(self, '_add_' + name, None)
+                if add is not None:
+                    add(line)
+
+    def merge(self, other):
+        """Fold in the scan of a LATER stretch of log (rotations merge oldest first),
+        giving the same result as one scan over both."""
+        for name, found in other.lines.items():
+            self.counts[name] += other.counts[name]
+            self.lines[name].extend(found)   # maxlen keeps the latest samples
+        self.error_count += other.error_count
+        for mine, theirs in ((self.error_types, other.error_types),
+                             (self.error_sip_codes, other.error_sip_codes),
+                             (self.auth_ips, other.auth_ips)):
+            for key, count in theirs.items():
+                mine[key] += count
+        for mine, theirs, keep in ((self.sip_codes, other.sip_codes, 3),
+                                   (self.hangup_causes, other.hangup_causes, 2)):
+            for key, entry in theirs.items():
+                acc = mine.setdefault(key, {'count': 0, 'samples': []})
+                acc['count'] += entry['count']
+                acc['samples'].extend(entry['samples'][:max(0, keep - len(acc['samples']))])
+        self.read_errors.extend(other.read_errors)
+
+    def _add_errors(self, line):
+        is_error = 'ERROR' in line or 'CRITICAL' in line
+        if is_error:
+            self.error_count += 1
+            match = _ERROR_MSG_RE.search(line)
+            if match:
+                self.error_types[match.group(2)[:80]] += 1
+        sip_match = _SIP_CODE_RE.search(line)
+        if sip_match:
+            self.error_sip_codes[sip_match.group(1)] += 1
+
+    def _add_codes(self, line):
+        sip_match = _SIP_RESPONSE_RE.search(line)
+        if sip_match:
+            entry = self.sip_codes.setdefault(sip_match.group(1), {'count': 0, 'samples': []})
+            entry['count'] += 1
+            if len(entry['samples']) < 3:
+                entry['samples'].append(line[:100])
+        cause_match = _CAUSE_RE.search(line)
+        if cause_match:
+            cause = cause_match.group(1) or cause_match.group(2)
+            entry = self.hangup_causes.setdefault(cause, {'count': 0, 'samples': []})
+            entry['count'] += 1
+            if len(entry['samples']) < 2:
+                entry['samples'].append(line[:80])
+
+    def _add_security(self, line):
+        ip_match = _IP_RE.search(line)
+        if ip_match:
+            self.auth_ips[ip_match.group(0)] += 1
+
+def _scan_log_file(path, start, end, live):
+    """Process-pool worker: LogScan of one (possibly rotated / gzipped) log file."""
+    scan = LogScan(os.path.basename(path))
+    try:
+        for _stamp, line in freepbx_log_index.iter_file_lines(path, start, end, live=live):
+            scan.feed(line)
+    except (OSError, EOFError, zlib.error) as e:
+        scan.read_errors.append(f"{path}: {e}")
+    return scan
+
+
+def _grep_log_file(path, pattern, start, end, live, context):
+    """Process-pool worker: [(stamp, 'file:line' / 'file-context')] for one log file."""
+    rx = re.compile(pattern, re.IGNORECASE)
+    name = os.path.basename(path)
+    out = []
+    before = deque(maxlen=context) if context else None
+    after = 0
+    try:
+        for stamp, line in freepbx_log_index.iter_file_lines(path, start, end, live=live):
+            if rx.search(line):
+                if before:
+                    out.extend((s, f"{name}-{l}") for s, l in before)
+                    before.clear()
+                out.append((stamp, f"{name}:{line}"))
+                after = context
+            elif after > 0:
+                out.append((stamp, f"{name}-{line}"))
+                after -= 1
+            elif before is not None:
+                before.append((stamp, line))
+    except (OSError, EOFError, zlib.error) as e:
+        out.append(("", f"{name}: read error: {e}"))
+    return out
+
+
 class LogAnalyzer:
     def __init__(self):
         self.full_log = "/var/log/asterisk/full"
         self.queue_log = "/var/log/asterisk/queue_log"
         self.cdr_log = "/var/log/asterisk/cdr-csv/Master.csv"
         self.issues = []
+        self.hours = None
+        self.range = None      # (start, end) datetimes for --start/--end analysis
+        self.jobs = None       # process-pool size for range scans (None = CPU count)
+        self.range_files = []
+        self.search_cursor = None  # where the last paged --grep search stopped
+        self._scans = {}
+
+    def scan_full_log(self, hours=None):
+        """Read the full log once and return the LogScan every check renders from.
+
+        With `hours`, the exact last-N-hours window comes from the
+        freepbx_log_index byte-offset index. Without it (or if the index can't
+        be used) the last max(tail) lines are read once and each check only
+        counts its own old `tail -N`. Cached per window.
+        """
+        if hours is None and self.range is not None:
+            return self.scan_range(*self.range)
+        key = hours
+        cached = self._scans.get(key)
+        if cached is not None:
+            return cached
+        scan = None
+        if hours is not None and freepbx_log_index is not None:
+            try:
+                scan = LogScan(f"last {hours}h")
+                for line in freepbx_log_index.window_lines(self.full_log, hours=hours):
+                    scan.feed(line)
+            except OSError:
+                scan = None
+        if scan is None:
+            longest = max(tail for _name, _pat, _flags, tail in SCAN_CHECKS)
+            result = subprocess.run(["tail", "-n", str(longest), self.full_log],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10)
+            lines = result.stdout.decode("utf-8", "replace").splitlines()
+            n = len(lines)
+            scan = LogScan("last 1000 lines")
+            for i, line in enumerate(lines):
+                scan.feed(line, skip=[name for name, _pat, _flags, tail in SCAN_CHECKS
+                                      if i < n - tail])
+        self._scans[key] = scan
+        return scan
+
+    def scan_range(self, start, end=None):
+        """LogScan over [start, end] across the live log and its rotations.
+
+        The files whose first/last timestamps overlap the range (found by
+        freepbx_log_index.logs_for_range) are scanned in parallel on a process
+        pool — gzipped rotations are decompressed as they stream — and the
+        per-file scans are merged oldest first, i.e. in time order.
+        """
+        key = ('range', start, end)
+        cached = self._scans.get(key)
+        if cached is not None:
+            return cached
+        span = f"{start:%Y-%m-%d %H:%M:%S} → {end:%Y-%m-%d %H:%M:%S}" if end else f"since {start:%Y-%m-%d %H:%M:%S}"
+        scan = LogScan(span)
+        files = freepbx_log_index.logs_for_range(start, end, path=self.full_log)
+        self.range_files = files
+        jobs = max(1, min(self.jobs or os.cpu_count() or 1, len(files)))
+        work = [(path, start, end, path == self.full_log) for path, _first, _last in files]
+        if jobs == 1:
+            parts = [_scan_log_file(*args) for args in work]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as ex:
+                parts = list(ex.map(_scan_log_file, *zip(*work)))
+        for part in parts:
+            scan.merge(part)
+        self._scans[key] = scan
+        return scan
+
+    def analyze_range(self, start, end=None):
+        """Analyze a date range, including rotated and gzipped logs"""
+        if freepbx_log_index is None:
+            print(f"{Colors.RED}❌ Date-range analysis needs freepbx_log_index.py next to this script{Colors.RESET}")
+            return self.issues
+        self.range = (start, end)
+        scan = self.scan_range(start, end)
+        
+        print(f"{Colors.CYAN}🔍 Analyzing logs {scan.span}{Colors.RESET}")
+        print("=" * 70)
+        if not self.range_files:
+            print(f"{Colors.YELLOW}⚠️  No log files cover that range{Colors.RESET}")
+        for path, first, last in self.range_files:
+            print(f"  📄 {os.path.basename(path):<24} {first} → {last}")
+        for err in scan.read_errors:
+            print(f"  {Colors.RED}❌ {err}{Colors.RESET}")
+        
+        self.check_errors(None)
+        self.evaluate_error_codes()
+        self.check_trunk_status()
+        self.check_security_events()
+        self.check_database_issues()
+        
+        return self.issues
         
     def analyze_last_n_hours(self, hours=1):
         """Analyze logs from last N hours"""
@@ -128,6 +397,7 @@ class LogAnalyzer:
         print(f"{Colors.CYAN}🔍 Analyzing logs since {cutoff_str}{Colors.RESET}")
         print("=" * 70)
         
+        self.hours = hours
         self.check_errors(hours)
         self.evaluate_error_codes()  # NEW: Actively map error codes
         self.check_trunk_status()
@@ -137,48 +407,22 @@ class LogAnalyzer:
         
         return self.issues
     
-    def evaluate_error_codes(self):
+    def evaluate_error_codes(self, hours=None):
         """Evaluate logs and apply SIP/Q.850 error code mapping"""
         if not os.path.exists(self.full_log):
             return
         
         print(f"\n{Colors.CYAN}{Colors.BOLD}📋 Error Code Evaluation (with mapping):{Colors.RESET}")
         
-        # Search for SIP response codes and hangup causes
-        cmd = f"tail -2000 {self.full_log} | grep -E 'SIP/2\\.0|hangupcause|Cause:|Response:'"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
-                              universal_newlines=True, timeout=10)
+        # SIP response codes and hangup causes, from the shared single pass
+        scan = self.scan_full_log(hours if hours is not None else self.hours)
         
-        if not result.stdout.strip():
+        if not scan.counts['codes']:
             print(f"  {Colors.GREEN}No error codes found in recent logs{Colors.RESET}")
             return
         
-        lines = result.stdout.strip().split('\n')
-        
-        # Extract and count SIP codes
-        sip_codes = {}  # type: dict[str, dict]
-        hangup_causes = {}  # type: dict[str, dict]
-        
-        for line in lines:
-            # Look for SIP response codes
-            sip_match = re.search(r'SIP/2\.0\s+(\d{3})\s+(.+?)(?:\r|\n|$)', line)
-            if sip_match:
-                code = sip_match.group(1)
-                if code not in sip_codes:
-                    sip_codes[code] = {'count': 0, 'samples': []}
-                sip_codes[code]['count'] += 1
-                if len(sip_codes[code]['samples']) < 3:
-                    sip_codes[code]['samples'].append(line[:100])
-            
-            # Look for hangup causes
-            cause_match = re.search(r'(?:hangupcause[=:]\s*(\d+)|Cause:\s*(\d+))', line, re.IGNORECASE)
-            if cause_match:
-                cause = cause_match.group(1) or cause_match.group(2)
-                if cause not in hangup_causes:
-                    hangup_causes[cause] = {'count': 0, 'samples': []}
-                hangup_causes[cause]['count'] += 1
-                if len(hangup_causes[cause]['samples']) < 2:
-                    hangup_causes[cause]['samples'].append(line[:80])
+        sip_codes = scan.sip_codes
+        hangup_causes = scan.hangup_causes
         
         # Display SIP codes with mapping
         if sip_codes:
@@ -253,46 +497,21 @@ class LogAnalyzer:
             print(f"{Colors.YELLOW}⚠️  Log file not found: {self.full_log}{Colors.RESET}")
             return
         
-        cmd = f"tail -1000 {self.full_log} | grep -E 'ERROR|CRITICAL|hangupcause'"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10)
-        
-        errors = result.stdout.strip().split('\n') if result.stdout.strip() else []
-        error_count = len([e for e in errors if 'ERROR' in e or 'CRITICAL' in e])
-        
-        # Extract hangup causes and SIP codes
-        hangup_causes = defaultdict(int)
-        sip_codes = defaultdict(int)
-        
-        for line in errors:
-            # Look for SIP response codes
-            sip_match = re.search(r'SIP/2\.0\s+(\d{3})', line)
-            if sip_match:
-                sip_codes[sip_match.group(1)] += 1
-            
-            # Look for hangup causes
-            cause_match = re.search(r'hangupcause[=:]\s*(\d+)', line, re.IGNORECASE)
-            if cause_match:
-                hangup_causes[cause_match.group(1)] += 1
+        scan = self.scan_full_log(hours)
+        errors = list(scan.lines['errors'])
+        error_count = scan.error_count
+        sip_codes = scan.error_sip_codes
         
         if error_count > 0:
             self.issues.append({
                 "severity": "HIGH",
                 "category": "Errors",
-                "message": f"Found {error_count} errors in last 1000 lines",
+                "message": f"Found {error_count} errors in {scan.span}",
                 "details": errors[-10:],
                 "playbook": "📖 See: Database Connectivity / Codec Negotiation sections"
             })
             
-            # Count by type
-            error_types = defaultdict(int)
-            for line in errors:
-                if 'ERROR' in line or 'CRITICAL' in line:
-                    # Extract error message (simplified)
-                    match = re.search(r'(ERROR|CRITICAL).*?:\s*(.+?)$', line)
-                    if match:
-                        error_msg = match.group(2)[:80]  # First 80 chars
-                        error_types[error_msg] += 1
-            
+            error_types = scan.error_types
             if error_types:
                 print(f"\n{Colors.RED}📊 Error Summary:{Colors.RESET}")
                 for msg, count in sorted(error_types.items(), key=lambda x: x[1], reverse=True)[:5]:
@@ -312,16 +531,14 @@ class LogAnalyzer:
         if not error_count and not sip_codes:
             print(f"\n{Colors.GREEN}✅ No errors found in recent logs{Colors.RESET}")
     
-    def check_trunk_status(self):
+    def check_trunk_status(self, hours=None):
         """Check trunk registration and failures with playbook reference"""
         if not os.path.exists(self.full_log):
             return
         
-        cmd = f"tail -500 {self.full_log} | grep -E 'trunk.*Unreachable|Registration.*failed'"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10)
+        trunk_issues = list(self.scan_full_log(hours if hours is not None else self.hours).lines['trunk'])
         
-        if result.stdout.strip():
-            trunk_issues = result.stdout.strip().split('\n')
+        if trunk_issues:
             self.issues.append({
                 "severity": "CRITICAL",
                 "category": "Trunk",
@@ -339,11 +556,70 @@ class LogAnalyzer:
         else:
             print(f"\n{Colors.GREEN}✅ No trunk issues detected{Colors.RESET}")
     
-    def check_queue_performance(self):
+    def _queue_rollup_report(self, hours):
+        """Queue metrics for the last `hours` from the freepbx_queue_stats
+        rollup (only events appended since its last run are parsed), or None
+        when it can't be used and the tail fallback should run. The first run
+        parses all history, so it says so and shows progress."""
+        if freepbx_queue_stats is None or freepbx_queue_stats.sqlite3 is None:
+            return None
+        sqlite_error = freepbx_queue_stats.sqlite3.Error
+        try:
+            rollup = freepbx_queue_stats.QueueRollup()
+        except (OSError, sqlite_error):
+            return None
+        try:
+            if rollup.is_empty():
+                print(f"{Colors.CYAN}⏳ Building the queue rollup from all queue_log history "
+                      f"(first run only){Colors.RESET}")
+
+            def progress(log, pos):
+                sys.stdout.write(f"\r{Colors.CYAN}   ⏳ {os.path.basename(log)}: "
+                                 f"{pos / 1048576.0:,.1f} MB{Colors.RESET}   ")
+                sys.stdout.flush()
+
+            files, events, _nbytes = rollup.update(self.queue_log, progress=progress)
+            if events >= freepbx_queue_stats.FLUSH_EVENTS:
+                print(f"\r{Colors.CYAN}📥 Parsed {events:,} queue event(s) from {files} file(s)"
+                      f"{Colors.RESET}   ")
+            start = datetime.now() - timedelta(hours=hours)
+            return rollup.report(start.strftime("%Y-%m-%d %H"), datetime.now().strftime("%Y-%m-%d %H"))
+        except (OSError, sqlite_error):
+            return None
+        finally:
+            rollup.close()
+
+    def check_queue_performance(self, hours=None):
         """Analyze queue metrics"""
         if not os.path.exists(self.queue_log):
             return
-        
+
+        hours = hours or self.hours or 24
+        rep = self._queue_rollup_report(hours)
+        if rep is not None:
+            fmt = lambda v, suffix="": "—" if v is None else f"{v}{suffix}"
+            if rep["queues"]:
+                print(f"\n{Colors.CYAN}📞 Queue Performance (last {hours}h, SL = answered ≤ {rep['sl_threshold']}s):{Colors.RESET}")
+                print(f"  {'Queue':<14}{'Entered':>8}{'Answered':>9}{'Abandon%':>9}{'SL%':>7}{'AvgWait':>9}{'p90':>6}")
+            for queue, m in rep["queues"].items():
+                print(f"  {queue[:13]:<14}{m['offered']:>8}{m['answered']:>9}{fmt(m['abandon_rate']):>9}"
+                      f"{fmt(m['service_level']):>7}{fmt(m['avg_wait'], 's'):>9}{fmt(m['wait_p90']):>6}")
+                if m["offered"] and (m["abandon_rate"] or 0) > 20:
+                    self.issues.append({
+                        "severity": "HIGH",
+                        "category": "Queue",
+                        "message": f"High abandon rate in queue {queue}: {m['abandon_rate']:.1f}%",
+                        "details": [f"Abandons: {m['abandoned']}/{m['offered']}"]
+                    })
+                if (m["avg_wait"] or 0) > 60:
+                    self.issues.append({
+                        "severity": "MEDIUM",
+                        "category": "Queue",
+                        "message": f"Long average wait time in queue {queue}: {m['avg_wait']:.1f}s",
+                        "details": [f"Average: {m['avg_wait']:.1f}s, p95: {fmt(m['wait_p95'], 's')}"]
+                    })
+            return
+
         cmd = f"tail -500 {self.queue_log}"
         result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10)
         
@@ -398,29 +674,35 @@ class LogAnalyzer:
                     "details": [f"Average: {avg_wait:.1f}s, Max: {max(wait_times) if wait_times else 0}s"]
                 })
     
-    def check_security_events(self):
+    def check_security_events(self, hours=None):
         """Check for authentication failures and attacks with playbook"""
         if not os.path.exists(self.full_log):
             return
         
-        cmd = f"tail -500 {self.full_log} | grep -i 'failed.*auth\\|SECURITY'"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10)
+        # The persisted aggregator remembers every failed auth across runs and
+        # rotations; a --start/--end range (possibly older than its retention)
+        # still scans the log itself.
+        if freepbx_security_stats is not None and self.range is None:
+            window = hours or self.hours or 24
+            try:
+                rep = freepbx_security_stats.top_offenders(window, 10, self.full_log)
+            except OSError:
+                rep = None
+            if rep is not None:
+                self._report_security(rep)
+                return
+
+        scan = self.scan_full_log(hours if hours is not None else self.hours)
+        security_count = scan.counts['security']
         
-        if result.stdout.strip():
-            security_events = result.stdout.strip().split('\n')
-            
-            # Extract IPs
-            ips = defaultdict(int)
-            for line in security_events:
-                ip_match = re.search(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b', line)
-                if ip_match:
-                    ips[ip_match.group(0)] += 1
+        if security_count:
+            ips = scan.auth_ips
             
-            if len(security_events) > 20:
+            if security_count > 20:
                 self.issues.append({
                     "severity": "HIGH",
                     "category": "Security",
-                    "message": f"Multiple authentication failures: {len(security_events)}",
+                    "message": f"Multiple authentication failures: {security_count}",
                     "details": [f"{ip}: {count} attempts" for ip, count in sorted(ips.items(), key=lambda x: x[1], reverse=True)[:10]],
                     "playbook": "📖 Playbook: Authentication Storm / SIP Attack"
                 })
@@ -437,16 +719,48 @@ class LogAnalyzer:
         else:
             print(f"\n{Colors.GREEN}✅ No security issues detected{Colors.RESET}")
     
-    def check_database_issues(self):
+    def _report_security(self, rep):
+        """Render check_security_events from a freepbx_security_stats report."""
+        total = rep["total"]
+        if not total:
+            print(f"\n{Colors.GREEN}✅ No security issues detected (last {rep['hours']}h){Colors.RESET}")
+            return
+        ips = rep["ip"]
+        if total <= 20:
+            print(f"\n{Colors.GREEN}✅ No significant security issues ({total} failed auth(s), last {rep['hours']}h){Colors.RESET}")
+            return
+        stamp = lambda epoch: datetime.fromtimestamp(epoch).strftime("%m-%d %H:%M")
+        self.issues.append({
+            "severity": "HIGH",
+            "category": "Security",
+            "message": f"Multiple authentication failures: {total} in the last {rep['hours']}h",
+            "details": [f"{ip}: {info['count']} attempts (first {stamp(info['first'])}, last {stamp(info['last'])})"
+                        for ip, info in ips]
+                       + [f"endpoint {ep}: {info['count']} attempts" for ep, info in rep["endpoint"][:5]],
+            "playbook": "📖 Playbook: Authentication Storm / SIP Attack"
+        })
+        print(f"\n{Colors.YELLOW}🔒 Security Events (last {rep['hours']}h, {total} failed auth):{Colors.RESET}")
+        for ip, info in ips[:5]:
+            tried = ", ".join(p for p, _n in info["peers"][:3])
+            print(f"  {ip}: {info['count']} failed attempts, last {stamp(info['last'])}"
+                  + (f" (tried {tried})" if tried else ""))
+        if rep["endpoint"]:
+            print("  Most targeted endpoints: " + ", ".join(
+                f"{ep} ({info['count']})" for ep, info in rep["endpoint"][:5]))
+
+        print(f"\n{Colors.MAGENTA}📖 Response Playbook:{Colors.RESET}")
+        print(f"  1. Validate volume: python3 freepbx_security_stats.py --hours {rep['hours']}")
+        print(f"  2. Block abusive IPs: {', '.join(ip for ip, _info in ips[:3])}")
+        print(f"  3. Check fail2ban status and coordinate with security operations")
+
+    def check_database_issues(self, hours=None):
         """Check for database connection problems with playbook"""
         if not os.path.exists(self.full_log):
             return
         
-        cmd = f"tail -500 {self.full_log} | grep -i 'database.*fail\\|mysql.*error\\|mysql.*gone away'"
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=10)
+        db_issues = list(self.scan_full_log(hours if hours is not None else self.hours).lines['database'])
         
-        if result.stdout.strip():
-            db_issues = result.stdout.strip().split('\n')
+        if db_issues:
             self.issues.append({
                 "severity": "CRITICAL",
                 "category": "Database",
@@ -646,57 +960,135 @@ class LogAnalyzer:
         except Exception as e:
             print(f"{Colors.RED}❌ Error analyzing journal: {str(e)}{Colors.RESET}")
     
-    def grep_logs_with_regex(self, log_file, pattern, context_lines=2):
-        """Search log files with regex patterns and show context"""
+    def grep_range(self, log_file, pattern, start=None, end=None, context_lines=2):
+        """Regex search over [start, end] in log_file and its rotated / .gz copies.
+
+        Files are picked by their timestamp span, searched in parallel on a
+        process pool, and the hits merged in time order. Lines come back as
+        'file:line' (match) or 'file-line' (context), like grep with several files.
+        """
+        re.compile(pattern)  # fail fast on a bad pattern, before forking workers
+        files = freepbx_log_index.logs_for_range(start, end, path=log_file)
+        work = [(path, pattern, start, end, path == log_file, context_lines)
+                for path, _first, _last in files]
+        jobs = max(1, min(self.jobs or os.cpu_count() or 1, len(work)))
+        if jobs == 1:
+            parts = [_grep_log_file(*args) for args in work]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as ex:
+                parts = list(ex.map(_grep_log_file, *zip(*work)))
+        return [text for _stamp, text in heapq.merge(*parts, key=lambda hit: hit[0])]
+
+    def _paged_search(self, log_file, start, end):
+        """True when a search can run as a paged mmap search_log(): a plain
+        file, and for a date range only when the live log alone covers it."""
+        if freepbx_log_index is None or log_file.endswith(".gz"):
+            return False
+        if start is None and end is None:
+            return True
+        files = [path for path, _first, _last in freepbx_log_index.logs_for_range(start, end, path=log_file)]
+        return files in ([], [log_file])
+
+    def _print_hit(self, hit):
+        a, b = hit["span"]
+        line = hit["line"]
+        for text in hit["before"]:
+            print(f"  {'':>12}  {Colors.WHITE}{sanitize_for_terminal(text)}{Colors.RESET}")
+        print(f"  {Colors.CYAN}{hit['offset']:>12}{Colors.RESET}  {Colors.WHITE}{sanitize_for_terminal(line[:a])}"
+              f"{Colors.YELLOW}{sanitize_for_terminal(line[a:b])}{Colors.WHITE}"
+              f"{sanitize_for_terminal(line[b:])}{Colors.RESET}")
+        for text in hit["after"]:
+            print(f"  {'':>12}  {Colors.WHITE}{sanitize_for_terminal(text)}{Colors.RESET}")
+        if hit["before"] or hit["after"]:
+            print(f"  {'':>12}  {Colors.CYAN}--{Colors.RESET}")
+
+    def grep_logs_with_regex(self, log_file, pattern, context_lines=2, start=None, end=None,
+                             limit=SEARCH_PAGE, cursor=None):
+        """Search log files with regex patterns and show context.
+
+        A plain log is searched a page at a time on a memory map
+        (freepbx_log_index.search_log): at most `limit` hits, each shown with
+        its byte offset, and a cursor to continue from when there are more
+        (self.search_cursor, also printed as a --cursor hint). With start/end
+        (datetimes) the search covers that date range — through the log's
+        index when the live log covers it, else across its rotations (full.1,
+        full-YYYYMMDD, .gz) via grep_range(). Returns the matching lines shown.
+        """
+        ranged = start is not None or end is not None
+        self.search_cursor = None
         print(f"\n{Colors.CYAN}{Colors.BOLD}{'='*70}")
-        print(f"  🔎 REGEX SEARCH: {log_file}")
+        print(f"  🔎 REGEX SEARCH: {log_file}{' (+ rotations)' if ranged else ''}")
         print(f"  Pattern: {pattern}")
+        if ranged:
+            print(f"  Range:   {start or '…'} → {end or 'now'}")
         print(f"{'='*70}{Colors.RESET}\n")
         
-        if not os.path.exists(log_file):
+        if not ranged and not os.path.exists(log_file):
             print(f"{Colors.RED}❌ Log file not found: {log_file}{Colors.RESET}")
             return []
+        if ranged and freepbx_log_index is None:
+            print(f"{Colors.RED}❌ Date-range search needs freepbx_log_index.py next to this script{Colors.RESET}")
+            return []
         
         try:
-            # Use grep with context for better performance on large files
-            cmd = ["grep", "-E", "-n", "-i"]
-            if context_lines > 0:
-                cmd.extend(["-A", str(context_lines), "-B", str(context_lines)])
-            cmd.extend([pattern, log_file])
-            
-            result = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                universal_newlines=True,
-                timeout=30
-            )
+            if self._paged_search(log_file, start, end):
+                hits, self.search_cursor = freepbx_log_index.search_log(
+                    log_file, pattern, start=start, end=end, cursor=cursor, limit=limit,
+                    context=context_lines)
+                if not hits:
+                    print(f"{Colors.YELLOW}No {'more ' if cursor else ''}matches found{Colors.RESET}")
+                    return []
+                more = "+" if self.search_cursor else ""
+                print(f"{Colors.GREEN}✅ {len(hits)}{more} matching line(s){' from ' + cursor if cursor else ''}"
+                      f"{Colors.RESET}  {Colors.CYAN}(byte offset, line){Colors.RESET}\n")
+                for hit in hits:
+                    self._print_hit(hit)
+                if self.search_cursor:
+                    print(f"\n  {Colors.CYAN}... more matches: rerun with --cursor {self.search_cursor}{Colors.RESET}")
+                return [hit["line"] for hit in hits]
+
+            if ranged:
+                lines = self.grep_range(log_file, pattern, start, end, context_lines)
+            else:
+                # Use grep with context for better performance on large files
+                cmd = ["grep", "-E", "-n", "-i"]
+                if context_lines > 0:
+                    cmd.extend(["-A", str(context_lines), "-B", str(context_lines)])
+                cmd.extend([pattern, log_file])
+                
+                result = subprocess.run(
+                    cmd,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                    universal_newlines=True,
+                    timeout=30
+                )
+                lines = result.stdout.strip().split('\n') if result.returncode == 0 and result.stdout.strip() else []
             
             matches = []
-            if result.returncode == 0 and result.stdout.strip():
-                lines = result.stdout.strip().split('\n')
+            if lines:
                 matches = lines
                 
                 print(f"{Colors.GREEN}✅ Found {len(lines)} matching lines{Colors.RESET}\n")
                 
-                # Show first 20 matches
-                for line in lines[:20]:
+                # Show the first page of matches
+                rx = re.compile(pattern, re.IGNORECASE)
+                for line in lines[:limit]:
                     clean_line = sanitize_for_terminal(line)
                     # Color the matching part
-                    colored_line = re.sub(
-                        f'({pattern})',
-                        f'{Colors.YELLOW}\\1{Colors.RESET}',
-                        clean_line,
-                        flags=re.IGNORECASE
-                    )
+                    colored_line = rx.sub(lambda m: f'{Colors.YELLOW}{m.group(0)}{Colors.RESET}{Colors.WHITE}',
+                                          clean_line)
                     print(f"  {Colors.WHITE}{colored_line}{Colors.RESET}")
                 
-                if len(lines) > 20:
-                    print(f"\n  {Colors.CYAN}... and {len(lines)-20} more matches{Colors.RESET}")
+                if len(lines) > limit:
+                    print(f"\n  {Colors.CYAN}... and {len(lines)-limit} more matches{Colors.RESET}")
             else:
                 print(f"{Colors.YELLOW}No matches found{Colors.RESET}")
             
             return matches
-            
+        
+        except ValueError as e:
+            print(f"{Colors.RED}❌ {e}{Colors.RESET}")
+            return []
         except Exception as e:
             print(f"{Colors.RED}❌ Error searching logs: {str(e)}{Colors.RESET}")
             return []
@@ -728,10 +1120,11 @@ class LogAnalyzer:
             
             for name, pattern in patterns.items():
                 print(f"{Colors.CYAN}Checking: {name.replace('_', ' ').title()}{Colors.RESET}")
-                matches = self.grep_logs_with_regex(self.full_log, pattern, context_lines=0)
+                matches = self.grep_logs_with_regex(self.full_log, pattern, context_lines=0, limit=20)
                 
                 if matches:
-                    print(f"  {Colors.RED}⚠️  Found {len(matches)} occurrences{Colors.RESET}")
+                    more = "+" if self.search_cursor else ""
+                    print(f"  {Colors.RED}⚠️  Found {len(matches)}{more} occurrences{Colors.RESET}")
                     self.issues.append({
                         'type': name,
                         'severity': 'high' if any(x in name for x in ['segfault', 'deadlock', 'database']) else 'medium',
@@ -762,8 +1155,14 @@ if __name__ == "__main__":
     parser.add_argument("--journal", action="store_true", help="Analyze systemd journal")
     parser.add_argument("--grep", type=str, metavar="PATTERN", help="Search logs with regex pattern")
     parser.add_argument("--log-file", type=str, default="/var/log/asterisk/full", help="Log file to search (with --grep)")
+    parser.add_argument("--limit", type=int, default=SEARCH_PAGE, help=f"Matches per --grep page (default: {SEARCH_PAGE})")
+    parser.add_argument("--cursor", type=str, help="Continue a --grep search where the previous page stopped")
     parser.add_argument("--search-patterns", action="store_true", help="Search for common Asterisk issues")
     parser.add_argument("--comprehensive", action="store_true", help="Run all analyses (full + dmesg + journal + patterns)")
+    parser.add_argument("--start", type=str, help="Analyze/search from this time 'YYYY-MM-DD[ HH:MM[:SS]]', "
+                                                  "including rotated and .gz logs")
+    parser.add_argument("--end", type=str, help="End of the --start range (default: now)")
+    parser.add_argument("--jobs", type=int, help="Parallel processes for --start/--end scans (default: CPU count)")
     
     args = parser.parse_args()
     
@@ -782,13 +1181,28 @@ if __name__ == "__main__":
         sys.exit(0)
     
     analyzer = LogAnalyzer()
+    analyzer.jobs = args.jobs
+    range_start = range_end = None
+    if args.start or args.end:
+        if freepbx_log_index is None:
+            print(f"{Colors.RED}❌ --start/--end need freepbx_log_index.py next to this script{Colors.RESET}")
+            sys.exit(1)
+        try:
+            range_start = freepbx_log_index.parse_when(args.start) if args.start else datetime.now() - timedelta(hours=args.hours)
+            range_end = freepbx_log_index.parse_when(args.end) if args.end else None
+        except ValueError as e:
+            print(f"{Colors.RED}❌ {e}{Colors.RESET}")
+            sys.exit(1)
+        if range_end is not None and args.end and len(args.end.strip()) == 10:
+            range_end += timedelta(days=1, seconds=-1)  # a bare date means the whole day
+        analyzer.range = (range_start, range_end)
     
     # Handle codes-only mode
     if args.codes_only:
         print(f"{Colors.CYAN}{Colors.BOLD}{'='*70}")
         print(f"  📋 Error Code Evaluation Only")
         print(f"{'='*70}{Colors.RESET}\n")
-        analyzer.evaluate_error_codes()
+        analyzer.evaluate_error_codes(hours=None if analyzer.range else args.hours)
         sys.exit(0)
     
     # Handle dmesg mode
@@ -805,7 +1219,9 @@ if __name__ == "__main__":
     
     # Handle grep mode
     if args.grep:
-        analyzer.grep_logs_with_regex(args.log_file, args.grep, context_lines=2)
+        analyzer.grep_logs_with_regex(args.log_file, args.grep, context_lines=2,
+                                      start=range_start, end=range_end,
+                                      limit=args.limit, cursor=args.cursor)
         sys.exit(0)
     
     # Handle pattern search mode
@@ -820,7 +1236,10 @@ if __name__ == "__main__":
         print(f"  🔬 COMPREHENSIVE SYSTEM ANALYSIS")
         print(f"{'='*70}{Colors.RESET}\n")
         
-        analyzer.analyze_last_n_hours(hours=args.hours)
+        if analyzer.range:
+            analyzer.analyze_range(range_start, range_end)
+        else:
+            analyzer.analyze_last_n_hours(hours=args.hours)
         analyzer.analyze_dmesg()
         analyzer.analyze_journalctl(hours=args.hours)
         analyzer.search_asterisk_logs()
@@ -828,5 +1247,8 @@ if __name__ == "__main__":
         sys.exit(0)
     
     # Full analysis (default)
-    analyzer.analyze_last_n_hours(hours=args.hours)
+    if analyzer.range:
+        analyzer.analyze_range(range_start, range_end)
+    else:
+        analyzer.analyze_last_n_hours(hours=args.hours)
     analyzer.print_summary()
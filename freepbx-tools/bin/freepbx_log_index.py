@@ -0,0 +1,952 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+freepbx_log_index.py
+--------------------
+Timestamp -> byte-offset index for /var/log/asterisk/full (or any log whose
+lines start with an Asterisk "[timestamp]").
+✓ Python 3.6 compatible (stdlib only).
+
+The analyzers used to answer "last N hours" with a guessed `tail -N` — too
+little on a busy PBX, far too much on a quiet one. This module records the
+byte offset of the first line of every minute, so a time window resolves to
+an exact byte range with two binary searches. The index is persisted next to
+the other 123net caches together with an inode / size / head-bytes
+checkpoint: a later run only indexes what was appended since, and a rotated
+or truncated log is detected and re-indexed from scratch.
+
+VARIABLE MAP (Key Script Variables)
+-----------------------------------
+FULL_LOG         : Default Asterisk full log path
+LOG_INDEX_DIR    : Where per-log index files are persisted
+INDEX_VERSION    : Bumped when the on-disk index layout changes
+HEAD_BYTES       : Leading bytes fingerprinted to detect copytruncate rotation
+_MONTHS          : Month-name -> number for syslog-style "[Mon dd HH:MM:SS]" stamps
+_ROTATED_RE      : File-name shapes logrotate gives the full log (.N, -YYYYMMDD, .gz)
+SPAN_CACHE       : File name (in LOG_INDEX_DIR) of the rotated-file span cache
+QUEUE_LOG        : Default Asterisk queue_log path (followed by the live dashboard)
+FOLLOW_CHUNK     : Read size used by LogFollower when catching up
+FOLLOW_HEAD      : Leading bytes LogFollower re-checks each poll (copytruncate)
+ROLLING_WINDOWS  : Default RollingCounters windows in seconds (1, 5, 15 minutes)
+CALL_GAP         : CallIndex merges a call's byte runs closer than this
+SEARCH_LIMIT     : Default hits per search_log() page
+_CALLID_RE       : The "[C-xxxxxxxx]" call-id tag Asterisk puts on a call's lines
+_CHANNEL_RE      : Channel names (PJSIP/100-0000001a, Local/100@ctx-00000002;1, ...)
+_LINKEDID_RE     : "linkedid=1699999999.123" style tokens
+
+    FUNCTION MAP (Major Functions)
+    -----------------------------
+    line_timestamp        : "YYYY-MM-DD HH:MM:SS" of a log line (bytes), or None
+    LogIndex.update       : Bring the index up to date with the file (incremental)
+    LogIndex.byte_range   : (start, end) datetimes -> (lo, hi) byte offsets
+    LogIndex.iter_window  : Yield the decoded lines inside a time window
+    window_lines          : One-call helper: lines from the last N hours / a range
+    CallIndex.find        : Call-ids seen on a channel (prefix) / linkedid since an offset
+    CallIndex.call_lines  : One call's complete log, read by seeking to its byte runs
+    call_log              : One-call helper: [(call-id, lines)] for a call / channel / linkedid
+    search_log            : One page of regex hits (mmap, byte offsets, resume cursor)
+    rotated_logs          : The live log plus its full.N / full-YYYYMMDD[.gz] rotations
+    log_span              : (first, last) timestamp of one (possibly gzipped) log file
+    logs_for_range        : Rotations overlapping a date range, oldest first
+    iter_file_lines       : Lines of one log file inside [start, end] (gz-aware)
+    parse_when            : 'YYYY-MM-DD[ HH:MM[:SS]]' -> datetime
+    stamp_epoch           : 'YYYY-MM-DD HH:MM:SS' (local time) -> epoch seconds
+    LogFollower.poll      : Yield complete lines appended since the last poll (tail -F)
+    RollingCounters       : Per-second buckets summed over 1/5/15-minute windows
+    main                  : CLI (print a window or a call's log, or index stats)
+"""
+
+import glob
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from zlib import error as zlib_error
+
+FULL_LOG = "/var/log/asterisk/full"
+LOG_INDEX_DIR = "/home/123net/callflows/log_index"
+INDEX_VERSION = 1
+HEAD_BYTES = 4096
+SPAN_CACHE = "spans.json"
+_ROTATED_RE = re.compile(r"^(?:\.\d+|-\d{8})?(?:\.gz)?$")
+QUEUE_LOG = "/var/log/asterisk/queue_log"
+FOLLOW_CHUNK = 1 << 20
+FOLLOW_HEAD = 256
+ROLLING_WINDOWS = (60, 300, 900)
+CALL_GAP = 4096
+SEARCH_LIMIT = 200
+_CALLID_RE = re.compile(rb"\]\[(C-[0-9a-fA-F]{8})\]")
+_CHANNEL_RE = re.compile(rb"\b((?:PJSIP|SIP|IAX2|DAHDI|Local|Message|Surrogate)/"
+                         rb"[^\s,\"'()\[\]]+-[0-9a-fA-F]+(?:;[12])?)(?![^\s,\"'()\[\]])")
+_LINKEDID_RE = re.compile(rb"(?i)linkedid\W{1,3}(\d+\.\d+)")
+
+_MONTHS = dict((m.encode(), i) for i, m in enumerate(
+    ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1))
+
+
+# ---------------------------
+# Timestamp parsing
+# ---------------------------
+
+def file_year(mtime):
+    """`year` argument of line_timestamp() for a file last written at `mtime` (epoch)."""
+    ref = datetime.fromtimestamp(mtime)
+    return ref.year, ref.strftime("%m-%d %H:%M:%S")
+
+
+def line_timestamp(line, year=None):
+    """Return a line's leading "[...]" stamp as 'YYYY-MM-DD HH:MM:SS', or None.
+
+    Handles the default ISO dateformat ("[2025-11-06 14:23:45]" or with
+    ".mmm") and the syslog-style one ("[Nov  6 14:23:45]", which has no
+    year). For those `year` is either a plain year or file_year() of the
+    file's mtime: no line is newer than the file, so a stamp later in the
+    year than the mtime belongs to the year before (a log spanning Dec ->
+    Jan). Lines without a stamp (multi-line continuations) return None.
+    Works on bytes, so it can run on every line without decoding it first.
+    """
+    if line[:1] != b"[":
+        return None
+    if line[5:6] == b"-" and line[11:12] == b" " and line[14:15] == b":":
+        stamp = line[1:20]
+        if len(stamp) == 19 and stamp[:4].isdigit():
+            return stamp.decode("ascii", "replace")
+        return None
+    month = _MONTHS.get(line[1:4])
+    if month is None or line[7:8] != b" ":
+        return None
+    day = line[5:7].strip()
+    clock = line[8:16]
+    if not day.isdigit() or clock[2:3] != b":" or clock[5:6] != b":":
+        return None
+    rest = "%02d-%02d %s" % (month, int(day), clock.decode("ascii", "replace"))
+    if isinstance(year, tuple):
+        year, last = year
+        if rest > last:
+            year -= 1
+    return "%04d-%s" % (year or datetime.now().year, rest)
+
+
+def _fmt(dt):
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------------------------
+# Index
+# ---------------------------
+
+class LogIndex(object):
+    """Minute-granularity byte-offset index for one log file.
+
+    minutes[i] is a 'YYYY-MM-DD HH:MM' key and offsets[i] the byte offset of
+    the first line stamped in that minute. Keys are kept strictly increasing
+    (a line whose minute is not newer than the last key — out-of-order
+    threads, clock steps — just stays inside the current entry), so both
+    lists can be bisected.
+
+    Subclasses index something else per line by overriding _index_line()
+    and the _clear / _payload / _restore persistence hooks; the checkpoint
+    and rebuild logic in update() is shared.
+    """
+
+    KIND = "idx"
+
+    def __init__(self, path=FULL_LOG, index_dir=LOG_INDEX_DIR):
+        self.path = path
+        self.index_dir = index_dir
+        self.index_path = os.path.join(
+            index_dir, os.path.basename(path) + "." +
+            hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8] + "." + self.KIND + ".json")
+        self.inode = None
+        self.size = 0          # indexed up to here (always a line boundary)
+        self.head = ""
+        self.file_size = 0
+        self.year = None
+        self._clear()
+
+    def _clear(self):
+        self.minutes = []
+        self.offsets = []
+
+    def _payload(self):
+        return {"minutes": self.minutes, "offsets": self.offsets}
+
+    def _restore(self, data):
+        self.minutes = list(data.get("minutes") or [])
+        self.offsets = list(data.get("offsets") or [])
+        return len(self.minutes) == len(self.offsets)
+
+    # -- persistence --------------------------------------------------------
+
+    def load(self):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_VERSION or data.get("path") != os.path.abspath(self.path):
+            return False
+        self.inode = data.get("inode")
+        self.size = int(data.get("size") or 0)
+        self.head = data.get("head") or ""
+        return self._restore(data)
+
+    def save(self):
+        """Persist atomically; an unwritable index dir only costs the next run a rebuild."""
+        data = {
+            "version": INDEX_VERSION, "path": os.path.abspath(self.path),
+            "inode": self.inode, "size": self.size, "head": self.head,
+        }
+        data.update(self._payload())
+        tmp = "%s.%d.tmp" % (self.index_path, os.getpid())
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.index_path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def _reset(self, inode):
+        self.inode = inode
+        self.size = 0
+        self.head = ""
+        self._clear()
+
+    # -- building -----------------------------------------------------------
+
+    def update(self):
+        """Index whatever was appended since the last run; returns bytes scanned.
+
+        A different inode (logrotate moved the file), a file shorter than the
+        checkpoint, or different leading bytes (copytruncate, then regrowth)
+        all mean the old index no longer describes this file, so it is rebuilt.
+        Raises OSError if the log itself can't be read.
+        """
+        if self.inode is None:
+            self.load()
+        st = os.stat(self.path)
+        self.file_size = st.st_size
+        self.year = file_year(st.st_mtime)
+        with open(self.path, "rb") as f:
+            # head fingerprints the first min(size, HEAD_BYTES) indexed bytes
+            head = hashlib.sha1(f.read(min(self.size, HEAD_BYTES))).hexdigest()
+            if st.st_ino != self.inode or st.st_size < self.size or head != self.head:
+                self._reset(st.st_ino)
+            if self.size == st.st_size:
+                return 0
+            start = self.size
+            f.seek(start)
+            pos = start
+            index_line = self._index_line
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial last line: leave it for the next run
+                index_line(line, pos)
+                pos += len(line)
+            self.size = pos
+            f.seek(0)
+            self.head = hashlib.sha1(f.read(min(self.size, HEAD_BYTES))).hexdigest()
+        self.save()
+        return self.size - start
+
+    def _index_line(self, line, pos):
+        stamp = line_timestamp(line, self.year)
+        if stamp is not None:
+            minute = stamp[:16]
+            if not self.minutes or minute > self.minutes[-1]:
+                self.minutes.append(minute)
+                self.offsets.append(pos)
+
+    # -- querying -----------------------------------------------------------
+
+    def byte_range(self, start=None, end=None):
+        """(start, end) datetimes (either may be None) -> (lo, hi) byte offsets.
+
+        The range is minute-aligned: it may begin up to a minute before
+        `start` and end up to a minute after `end`; iter_window() trims those.
+        """
+        lo, hi = 0, self.file_size
+        if start is not None:
+            i = bisect_left(self.minutes, _fmt(start)[:16])
+            lo = self.offsets[i] if i < len(self.offsets) else self.size
+        if end is not None:
+            j = bisect_right(self.minutes, _fmt(end)[:16])
+            hi = self.offsets[j] if j < len(self.offsets) else self.file_size
+        return lo, max(lo, hi)
+
+    def iter_window(self, start=None, end=None):
+        """Yield the log's lines (str, newline stripped) stamped in [start, end].
+
+        Continuation lines inherit the stamp of the line above them. The
+        unindexed tail (a partial line still being written) is included.
+        """
+        self.update()
+        lo, hi = self.byte_range(start, end)
+        start_s = _fmt(start) if start is not None else None
+        end_s = _fmt(end) if end is not None else None
+        keep = True
+        with open(self.path, "rb") as f:
+            f.seek(lo)
+            pos = lo
+            for line in f:
+                if pos >= hi:
+                    break
+                pos += len(line)
+                stamp = line_timestamp(line, self.year)
+                if stamp is not None:
+                    keep = ((start_s is None or stamp >= start_s)
+                            and (end_s is None or stamp <= end_s))
+                if keep:
+                    yield line.rstrip(b"\r\n").decode("utf-8", "replace")
+
+    def stats(self):
+        return {
+            "path": self.path, "index": self.index_path, "inode": self.inode,
+            "indexed_bytes": self.size, "file_size": self.file_size,
+            "minutes": len(self.minutes),
+            "first": self.minutes[0] if self.minutes else None,
+            "last": self.minutes[-1] if self.minutes else None,
+        }
+
+
+def window_lines(path=FULL_LOG, hours=None, start=None, end=None, index_dir=LOG_INDEX_DIR):
+    """Lines from the last `hours` hours, or from [start, end] (datetimes).
+
+    Raises OSError when the log can't be read, so callers can fall back.
+    """
+    if hours is not None and start is None:
+        start = datetime.now() - timedelta(hours=hours)
+    idx = LogIndex(path, index_dir=index_dir)
+    idx.update()
+    return idx.iter_window(start, end)
+
+
+# ---------------------------
+# Per-call correlation
+# ---------------------------
+
+class CallIndex(LogIndex):
+    """Call-id -> byte ranges index for the full log.
+
+    Asterisk tags every line a call's threads write with its call-id
+    ("VERBOSE[12345][C-0000001a] ..."). calls[cid] is a flat
+    [start, end, start, end, ...] list of the byte runs holding that call's
+    lines (runs closer than CALL_GAP are merged; reads filter by the tag, so
+    the gap only costs a few extra bytes read). channels / linkedids map
+    every channel name and linkedid seen on a tagged line to its call-ids,
+    so a test call can be found from the channel it was originated on.
+    """
+
+    KIND = "calls"
+
+    def _clear(self):
+        self.calls = {}
+        self.channels = {}
+        self.linkedids = {}
+        self._prev = None
+
+    def _payload(self):
+        return {"calls": self.calls, "channels": self.channels, "linkedids": self.linkedids}
+
+    def _restore(self, data):
+        self.calls = dict(data.get("calls") or {})
+        self.channels = dict(data.get("channels") or {})
+        self.linkedids = dict(data.get("linkedids") or {})
+        return True
+
+    def _extend(self, cid, pos, end):
+        runs = self.calls.get(cid)
+        if runs is None:
+            self.calls[cid] = [pos, end]
+        elif pos - runs[-1] <= CALL_GAP:
+            runs[-1] = end
+        else:
+            runs.extend((pos, end))
+
+    def _index_line(self, line, pos):
+        m = _CALLID_RE.search(line, 0, 96)
+        if m is None:
+            # an unstamped continuation line belongs to the call above it
+            if self._prev is not None and line[:1] != b"[":
+                self._extend(self._prev, pos, pos + len(line))
+            else:
+                self._prev = None
+            return
+        cid = m.group(1).decode()
+        self._extend(cid, pos, pos + len(line))
+        self._prev = cid
+        for key, rx in ((self.channels, _CHANNEL_RE), (self.linkedids, _LINKEDID_RE)):
+            for name in rx.findall(line):
+                cids = key.setdefault(name.decode("utf-8", "replace"), [])
+                if cid not in cids:
+                    cids.append(cid)
+
+    def find(self, channel=None, linkedid=None, since=0):
+        """Call-ids seen on `channel` (case-insensitive name prefix, e.g.
+        "Local/100@from-internal") and/or `linkedid`, oldest first.
+
+        Only calls whose first line is at or after byte offset `since` count
+        (a checkpoint taken before originating a test call); a `since` past
+        the end of the file means the log rotated since, so it is ignored.
+        """
+        if since > self.size:
+            since = 0
+        found = set()
+        if channel:
+            prefix = channel.lower()
+            for name, cids in self.channels.items():
+                if name.lower().startswith(prefix):
+                    found.update(cids)
+        if linkedid:
+            found.update(self.linkedids.get(linkedid, ()))
+        return sorted((c for c in found if self.calls[c][0] >= since),
+                      key=lambda c: self.calls[c][0])
+
+    def call_lines(self, cid):
+        """All of one call's lines (str, newline stripped), read by seeking to its runs."""
+        runs = self.calls.get(cid) or []
+        tag = ("][%s]" % cid).encode()
+        out = []
+        with open(self.path, "rb") as f:
+            for i in range(0, len(runs), 2):
+                f.seek(runs[i])
+                keep = False
+                for line in f.read(runs[i + 1] - runs[i]).split(b"\n"):
+                    if line[:1] == b"[":
+                        keep = tag in line
+                    if keep and line:
+                        out.append(line.rstrip(b"\r").decode("utf-8", "replace"))
+        return out
+
+    def call_lines_many(self, cids, jobs=4):
+        """{cid: lines} for many calls; each read is a handful of seeks, run on `jobs` threads."""
+        from concurrent.futures import ThreadPoolExecutor
+        cids = list(cids)
+        if jobs <= 1 or len(cids) <= 1:
+            return dict((c, self.call_lines(c)) for c in cids)
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            return dict(zip(cids, pool.map(self.call_lines, cids)))
+
+    def stats(self):
+        return {
+            "path": self.path, "index": self.index_path, "inode": self.inode,
+            "indexed_bytes": self.size, "file_size": self.file_size,
+            "calls": len(self.calls), "channels": len(self.channels),
+            "linkedids": len(self.linkedids),
+        }
+
+
+def call_log(channel=None, linkedid=None, callid=None, since=0, path=FULL_LOG,
+             index_dir=LOG_INDEX_DIR, jobs=4):
+    """One-call helper: [(call-id, lines)] for a call-id, or for every call seen
+    on a channel / linkedid since byte offset `since`, oldest call first.
+
+    Raises OSError when the log can't be read, so callers can fall back.
+    """
+    idx = CallIndex(path, index_dir=index_dir)
+    idx.update()
+    cids = [callid] if callid else idx.find(channel=channel, linkedid=linkedid, since=since)
+    lines = idx.call_lines_many(cids, jobs=jobs)
+    return [(c, lines[c]) for c in cids]
+
+
+# ---------------------------
+# Paged regex search (mmap)
+# ---------------------------
+
+def _context_lines(mm, line_start, line_end, count, size):
+    """(before, after): up to `count` whole lines around [line_start, line_end)."""
+    before, after = [], []
+    pos = line_start
+    while len(before) < count and pos > 0:
+        prev = mm.rfind(b"\n", 0, pos - 1) + 1
+        before.insert(0, mm[prev:pos - 1])
+        pos = prev
+    pos = line_end + 1
+    while len(after) < count and pos < size:
+        nxt = mm.find(b"\n", pos)
+        nxt = size if nxt < 0 else nxt
+        after.append(mm[pos:nxt])
+        pos = nxt + 1
+    return before, after
+
+
+def search_log(path, pattern, start=None, end=None, cursor=None, limit=SEARCH_LIMIT,
+               context=0, max_bytes=None, ignore_case=True, index_dir=LOG_INDEX_DIR):
+    """One page of regex hits in a plain (uncompressed) log file.
+
+    The file is memory-mapped and the compiled pattern runs over the map
+    itself, so no line is copied or decoded unless it matches. start / end
+    (datetimes) narrow the scan to the LogIndex byte range of that window.
+    At most `limit` hits are returned, and at most `max_bytes` are scanned
+    per page; the search then stops at a line boundary and returns a cursor
+    ("inode:offset") that continues exactly there. `^` / `$` match per line.
+
+    Returns (hits, cursor); cursor is None once the range is exhausted. Each
+    hit is {"offset", "stamp", "line", "span", "before", "after"}, where span
+    is the (start, end) of the match within the decoded line. Raises OSError
+    when the log can't be read, re.error for a bad pattern, and ValueError for
+    a cursor that belongs to another (e.g. since rotated) file.
+    """
+    flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+    rx = re.compile(pattern.encode("utf-8") if isinstance(pattern, str) else pattern, flags)
+    start_s = _fmt(start) if start is not None else None
+    end_s = _fmt(end) if end is not None else None
+    hits = []
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        size = st.st_size
+        lo, hi = 0, size
+        if start is not None or end is not None:
+            idx = LogIndex(path, index_dir=index_dir)
+            idx.update()
+            lo, hi = idx.byte_range(start, end)
+        if cursor:
+            try:
+                inode, offset = (int(x) for x in cursor.split(":"))
+            except ValueError:
+                raise ValueError("Bad search cursor %r" % cursor)
+            if inode != st.st_ino or offset > size:
+                raise ValueError("%s was rotated or truncated since this cursor" % path)
+            lo = max(lo, offset)
+        if lo >= hi:
+            return hits, None
+        year = file_year(st.st_mtime)
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            stop = hi
+            if max_bytes is not None and lo + max_bytes < hi:
+                cut = mm.find(b"\n", lo + max_bytes)
+                stop = hi if cut < 0 else min(hi, cut + 1)
+            pos = lo
+            while pos < stop and len(hits) < limit:
+                m = rx.search(mm, pos, stop)
+                # A pattern that can match empty (".*", "ERROR|") also matches
+                # zero-width at `stop` itself: that is the next page's line (or
+                # EOF), not a hit here, and would otherwise repeat forever.
+                if m is None or m.start() >= stop:
+                    pos = stop
+                    break
+                line_start = mm.rfind(b"\n", 0, m.start()) + 1
+                line_end = mm.find(b"\n", m.start())
+                if line_end < 0:
+                    line_end = size
+                pos = min(line_end + 1, stop)
+                raw = mm[line_start:line_end]
+                stamp = line_timestamp(raw, year)
+                if stamp is not None and ((start_s is not None and stamp < start_s)
+                                          or (end_s is not None and stamp > end_s)):
+                    continue  # the index range is minute-aligned; trim its edges
+                before, after = _context_lines(mm, line_start, line_end, context, size) if context else ([], [])
+                a = len(raw[:m.start() - line_start].decode("utf-8", "replace"))
+                b = a + len(mm[m.start():min(m.end(), line_end)].decode("utf-8", "replace"))
+                hits.append({
+                    "offset": line_start, "stamp": stamp,
+                    "line": raw.rstrip(b"\r").decode("utf-8", "replace"), "span": (a, b),
+                    "before": [l.rstrip(b"\r").decode("utf-8", "replace") for l in before],
+                    "after": [l.rstrip(b"\r").decode("utf-8", "replace") for l in after],
+                })
+        finally:
+            mm.close()
+    return hits, (None if pos >= hi else "%d:%d" % (st.st_ino, pos))
+
+
+# ---------------------------
+# Rotated / compressed logs
+# ---------------------------
+
+def open_log(path):
+    """Binary line iterator source; .gz files are decompressed as they stream."""
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def rotated_logs(path=FULL_LOG):
+    """The live log and every rotation of it that exists (full.1, full.2.gz,
+    full-20251106, full-20251106.gz, ...), unordered."""
+    base = os.path.basename(path)
+    out = []
+    for cand in glob.glob(glob.escape(path) + "*"):
+        if _ROTATED_RE.match(os.path.basename(cand)[len(base):]) and os.path.isfile(cand):
+            out.append(cand)
+    return out
+
+
+def _first_stamp(f, year):
+    for line in f:
+        stamp = line_timestamp(line, year)
+        if stamp is not None:
+            return stamp
+    return None
+
+
+def _last_stamp_plain(path, year):
+    """Read backwards in growing chunks until a stamped line turns up."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        chunk = 65536
+        while True:
+            start = max(0, size - chunk)
+            f.seek(start)
+            lines = f.read(size - start).split(b"\n")
+            if start > 0:
+                lines = lines[1:]  # first piece may be a partial line
+            for line in reversed(lines):
+                stamp = line_timestamp(line, year)
+                if stamp is not None:
+                    return stamp
+            if start == 0:
+                return None
+            chunk *= 4
+
+
+def log_span(path, cache=None):
+    """(first, last) 'YYYY-MM-DD HH:MM:SS' stamps of a log file, or (None, None).
+
+    A gzipped rotation has to be streamed end to end to find its last stamp,
+    so spans are remembered in `cache` (a dict keyed by path, checked against
+    size and mtime) — rotated files never change once written.
+    """
+    st = os.stat(path)
+    key = os.path.abspath(path)
+    if cache is not None:
+        hit = cache.get(key)
+        if hit and hit.get("size") == st.st_size and hit.get("mtime") == int(st.st_mtime):
+            return hit.get("first"), hit.get("last")
+    year = file_year(st.st_mtime)
+    with open_log(path) as f:
+        first = _first_stamp(f, year)
+        last = None
+        if path.endswith(".gz"):
+            for line in f:
+                stamp = line_timestamp(line, year)
+                if stamp is not None:
+                    last = stamp
+            last = last or first
+    if not path.endswith(".gz"):
+        last = _last_stamp_plain(path, year)
+    if cache is not None:
+        cache[key] = {"size": st.st_size, "mtime": int(st.st_mtime), "first": first, "last": last}
+    return first, last
+
+
+def _load_span_cache(index_dir):
+    try:
+        with open(os.path.join(index_dir, SPAN_CACHE)) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_span_cache(index_dir, cache):
+    path = os.path.join(index_dir, SPAN_CACHE)
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+        # drop entries for rotations that have since been deleted
+        live = dict((k, v) for k, v in cache.items() if os.path.exists(k))
+        with open(tmp, "w") as f:
+            json.dump(live, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def logs_for_range(start=None, end=None, path=FULL_LOG, index_dir=LOG_INDEX_DIR):
+    """[(path, first, last)] for the live log and rotations whose timestamp span
+    overlaps [start, end] (datetimes, either may be None), oldest first."""
+    start_s = _fmt(start) if start is not None else None
+    end_s = _fmt(end) if end is not None else None
+    cache = _load_span_cache(index_dir)
+    picked = []
+    for cand in rotated_logs(path):
+        try:
+            first, last = log_span(cand, cache)
+        except (OSError, EOFError, zlib_error):
+            continue
+        if first is None:
+            continue
+        if (end_s is None or first <= end_s) and (start_s is None or last >= start_s):
+            picked.append((cand, first, last))
+    _save_span_cache(index_dir, cache)
+    picked.sort(key=lambda item: (item[1], item[2]))
+    return picked
+
+
+def iter_file_lines(path, start=None, end=None, live=None, index_dir=LOG_INDEX_DIR):
+    """Yield (stamp, line) for one log file's lines inside [start, end].
+
+    The live log goes through its LogIndex (exact byte range); rotations are
+    streamed start to finish (gzip decompressed on the fly). Continuation lines
+    carry the stamp of the line above them.
+    """
+    if live is None:
+        live = os.path.abspath(path) == os.path.abspath(FULL_LOG)
+    start_s = _fmt(start) if start is not None else None
+    end_s = _fmt(end) if end is not None else None
+    year = file_year(os.stat(path).st_mtime)
+    if live:
+        stamp = start_s or ""
+        for line in LogIndex(path, index_dir=index_dir).iter_window(start, end):
+            got = line_timestamp(line[:32].encode("utf-8", "replace"), year)
+            stamp = got or stamp
+            yield stamp, line
+        return
+    stamp = ""
+    keep = start_s is None
+    with open_log(path) as f:
+        for line in f:
+            got = line_timestamp(line, year)
+            if got is not None:
+                stamp = got
+                if end_s is not None and stamp > end_s:
+                    break
+                keep = start_s is None or stamp >= start_s
+            if keep:
+                yield stamp, line.rstrip(b"\r\n").decode("utf-8", "replace")
+
+
+def parse_when(value):
+    """'YYYY-MM-DD', 'YYYY-MM-DD HH:MM' or 'YYYY-MM-DD HH:MM:SS' -> datetime (ValueError if none)."""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+    raise ValueError("Bad time %r (use 'YYYY-MM-DD HH:MM:SS')" % value)
+
+
+def stamp_epoch(stamp):
+    """'YYYY-MM-DD HH:MM:SS' (local time, as line_timestamp returns) -> epoch seconds."""
+    return time.mktime(time.strptime(stamp, "%Y-%m-%d %H:%M:%S"))
+
+
+# ---------------------------
+# Live follow (tail -F by offset)
+# ---------------------------
+
+class LogFollower(object):
+    """Read only the complete lines appended to a log since the last poll.
+
+    Keeps the file open between polls, like `tail -F`: when logrotate moves
+    the file away (the path's inode changes) the old handle is drained to
+    EOF before the new file is opened from byte 0, and a file that shrank
+    or whose leading bytes changed (copytruncate) is re-read from the top.
+    `start` is the byte offset of the first poll (None = the current end of
+    file); a start inside a line skips that partial line.
+    """
+
+    def __init__(self, path, start=None):
+        self.path = path
+        self.start = start
+        self.offset = 0
+        self.rotations = 0
+        self.truncations = 0
+        self._f = None
+        self._ino = None
+        self._head = b""
+        self._partial = b""
+        self._skip = False
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _open(self, offset):
+        self._f = open(self.path, "rb")
+        st = os.fstat(self._f.fileno())
+        self._ino = st.st_ino
+        self.offset = min(offset, st.st_size)
+        self._partial = b""
+        self._skip = False
+        self._head = self._f.read(min(self.offset, FOLLOW_HEAD))
+        if self.offset > 0:
+            self._f.seek(self.offset - 1)
+            self._skip = self._f.read(1) != b"\n"
+
+    def _drain(self):
+        """Yield complete lines from self.offset to the current end of the handle."""
+        self._f.seek(self.offset)
+        while True:
+            chunk = self._f.read(FOLLOW_CHUNK)
+            if not chunk:
+                return
+            if self.offset < FOLLOW_HEAD:
+                self._head = (self._head + chunk)[:FOLLOW_HEAD]
+            self.offset += len(chunk)
+            data = self._partial + chunk
+            lines = data.split(b"\n")
+            self._partial = lines.pop()
+            if self._skip and lines:
+                lines.pop(0)
+                self._skip = False
+            for line in lines:
+                yield line
+
+    def _replaced(self):
+        """True when the path now names a different file than the open handle."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False  # rotated but not recreated yet: keep reading the old file
+        if st.st_ino != self._ino:
+            return True
+        if st.st_size < self.offset:
+            self.truncations += 1
+            self.offset = 0
+            self._partial = b""
+            self._skip = False
+            self._head = b""
+            return False
+        if self._head:
+            self._f.seek(0)
+            if self._f.read(len(self._head)) != self._head:
+                self.truncations += 1
+                self.offset = 0
+                self._partial = b""
+                self._skip = False
+                self._head = b""
+        return False
+
+    def poll(self):
+        """Yield the complete lines (bytes, no newline) appended since the last poll.
+
+        A generator: consume it fully before polling again. A missing log
+        yields nothing until it appears (and is then read from the top).
+        """
+        if self._f is None:
+            try:
+                self._open(os.path.getsize(self.path) if self.start is None else self.start)
+            except OSError:
+                self.start = 0
+                return
+        elif self._replaced():
+            for line in self._drain():
+                yield line
+            self.close()
+            self.rotations += 1
+            try:
+                self._open(0)
+            except OSError:
+                self.start = 0
+                return
+        for line in self._drain():
+            yield line
+
+
+class RollingCounters(object):
+    """In-memory event counts over sliding windows (default 1/5/15 minutes).
+
+    Events land in one-second buckets keyed by their own timestamp (the log
+    line's stamp, not the time it was read), so a catch-up read after a
+    pause still lands in the right window. Buckets older than the largest
+    window are dropped on each totals() call. Keys are any hashable, e.g.
+    "errors" or ("sip", "486").
+    """
+
+    def __init__(self, windows=ROLLING_WINDOWS):
+        self.windows = tuple(sorted(windows))
+        self.horizon = self.windows[-1]
+        self._buckets = {}
+
+    def add(self, key, when=None, n=1):
+        now = time.time()
+        sec = int(now if when is None else when)
+        if sec < now - self.horizon:
+            return
+        bucket = self._buckets.get(sec)
+        if bucket is None:
+            bucket = self._buckets[sec] = {}
+        bucket[key] = bucket.get(key, 0) + n
+
+    def totals(self, now=None):
+        """{window_seconds: {key: count}} for every window, in one pass."""
+        now = time.time() if now is None else now
+        out = dict((w, {}) for w in self.windows)
+        for sec in list(self._buckets):
+            age = now - sec
+            if age >= self.horizon:
+                del self._buckets[sec]
+                continue
+            for w in self.windows:
+                if age < w:
+                    dest = out[w]
+                    for key, n in self._buckets[sec].items():
+                        dest[key] = dest.get(key, 0) + n
+        return out
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def _parse_when(value):
+    try:
+        return parse_when(value)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Print an exact time window of the Asterisk full log "
+                                             "using a persistent byte-offset index")
+    ap.add_argument("--log", default=FULL_LOG, help="Log file (default: %s)" % FULL_LOG)
+    ap.add_argument("--hours", type=float, help="Window: the last N hours")
+    ap.add_argument("--start", help="Window start 'YYYY-MM-DD HH:MM:SS'")
+    ap.add_argument("--end", help="Window end 'YYYY-MM-DD HH:MM:SS'")
+    ap.add_argument("--index-dir", default=LOG_INDEX_DIR, help="Where index files are kept")
+    ap.add_argument("--stats", action="store_true", help="Update the index and print its stats only")
+    ap.add_argument("--call", help="Print one call's log by call-id (C-0000001a)")
+    ap.add_argument("--channel", help="Print the log of every call seen on this channel (name prefix)")
+    ap.add_argument("--linkedid", help="Print the log of every call seen with this linkedid")
+    args = ap.parse_args()
+
+    by_call = args.call or args.channel or args.linkedid
+    idx = (CallIndex if by_call else LogIndex)(args.log, index_dir=args.index_dir)
+    try:
+        if args.stats:
+            scanned = idx.update()
+            out = idx.stats()
+            out["scanned_bytes"] = scanned
+            print(json.dumps(out, indent=2))
+            return 0
+        if by_call:
+            calls = call_log(channel=args.channel, linkedid=args.linkedid, callid=args.call,
+                             path=args.log, index_dir=args.index_dir)
+            if not calls:
+                print("No matching calls in %s" % args.log, file=sys.stderr)
+                return 1
+            for cid, lines in calls:
+                sys.stdout.write("==== %s (%d lines) ====\n" % (cid, len(lines)))
+                for line in lines:
+                    sys.stdout.write(line + "\n")
+            return 0
+        start = _parse_when(args.start) if args.start else None
+        end = _parse_when(args.end) if args.end else None
+        if start is None and args.hours is not None:
+            start = datetime.now() - timedelta(hours=args.hours)
+        for line in idx.iter_window(start, end):
+            sys.stdout.write(line + "\n")
+    except BrokenPipeError:
+        pass
+    except OSError as e:
+        print("Cannot read %s: %s" % (args.log, e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
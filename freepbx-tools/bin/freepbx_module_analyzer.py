@@ -5,7 +5,7 @@ freepbx_module_analyzer.py
 --------------------------
 Comprehensive FreePBX module status and configuration analysis tool.
 Evaluates all installed modules and their configurations.
-✓ Python 3.6 compatible (uses mysql CLI via subprocess; no external modules).
+✓ Python 3.6 compatible (uses the mysql CLI via freepbx_db; no external modules).
 
 VARIABLE MAP (Key Script Variables)
 -----------------------------------
@@ -45,6 +45,9 @@ See function docstrings for additional details on arguments and return values.
 import argparse, json, os, subprocess, sys, time, re
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
+
 # ANSI Color codes
 class Colors:
     CYAN = '\033[96m'
@@ -77,23 +80,11 @@ DEFAULT_SOCK = "/var/lib/mysql/mysql.sock"
 # ---------------------------
 
 def run_mysql(sql, socket=None, user="root", password=None, db=ASTERISK_DB):
-    """Run a SQL statement via mysql CLI and return stdout as text."""
-    env = os.environ.copy()
-    if password:
-        env["MYSQL_PWD"] = password
-    cmd = ["mysql", "-BN"]
-    if user:
-        cmd += ["--user", str(user)]
-    if socket:
-        cmd += ["--socket", str(socket)]
-    if db:
-        cmd += [str(db)]
-    cmd += ["-e", sql]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       universal_newlines=True, env=env)
-    if p.returncode != 0:
+    """Run a SQL statement on the shared mysql session and return stdout as text."""
+    try:
+        return freepbx_db.run_mysql(sql, socket=socket, user=user, password=password, db=db)
+    except freepbx_db.MySQLError:
         return ""
-    return p.stdout
 
 def run_command(cmd):
     """Run a shell command and return stdout."""
@@ -106,15 +97,10 @@ def run_command(cmd):
 
 def rows_as_dicts(sql, cols, **kw):
     """Run a SELECT that returns exactly len(cols) columns -> list[dict]."""
-    out = run_mysql(sql, **kw).rstrip("\n")
-    if not out:
+    try:
+        return freepbx_db.rows_as_dicts(sql, cols, **kw)
+    except freepbx_db.MySQLError:
         return []
-    dicts = []
-    for line in out.split("\n"):
-        parts = line.split("\t")
-        parts = (parts + [""] * len(cols))[:len(cols)]
-        dicts.append(dict(zip(cols, parts)))
-    return dicts
 
 def get_tables(**kw):
     return set(run_mysql("SHOW TABLES;", **kw).split())
@@ -50,6 +50,13 @@ import re
 from datetime import datetime
 import json
 
+# Asterisk CLI over the shared AMI connection (bin/freepbx_ami.py) when available
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_ami
+except ImportError:
+    freepbx_ami = None
+
 class Colors:
     """ANSI color codes for terminal output"""
     CYAN = '\033[96m'
@@ -645,12 +652,36 @@ class NetworkDiagnostics:
         except KeyboardInterrupt:
             print(f"\n{Colors.YELLOW}⏹️  Monitoring stopped by user{Colors.RESET}")
     
+    def show_asterisk_ami(self, command):
+        """Print an Asterisk CLI command's output obtained over AMI, like
+        run_command() would. Returns False when AMI isn't available."""
+        client = freepbx_ami.get_client() if freepbx_ami is not None else None
+        if client is None:
+            return False
+        try:
+            output = client.command(command)
+        except freepbx_ami.AMIError:
+            return False
+        print(f"{Colors.CYAN}╔{'═' * 78}╗{Colors.RESET}")
+        print(f"{Colors.CYAN}║{Colors.YELLOW}{Colors.BOLD} 🔧 AMI COMMAND{' ' * 62}{Colors.RESET}{Colors.CYAN} ║{Colors.RESET}")
+        print(f"{Colors.CYAN}╠{'═' * 78}╣{Colors.RESET}")
+        print(f"{Colors.CYAN}║{Colors.WHITE} {command:<75}{Colors.RESET}{Colors.CYAN} ║{Colors.RESET}")
+        print(f"{Colors.CYAN}╚{'═' * 78}╝{Colors.RESET}\n")
+        for line in output.splitlines():
+            print(f"{Colors.GREEN}│{Colors.RESET} {line}")
+        return True
+
     def show_asterisk_sip_peers(self):
         """Show Asterisk SIP peers"""
         print(f"\n{Colors.CYAN}╔{'═' * 78}╗{Colors.RESET}")
         print(f"{Colors.CYAN}║{Colors.YELLOW}{Colors.BOLD} ☎️  ASTERISK SIP PEERS{' ' * 54}{Colors.RESET}{Colors.CYAN} ║{Colors.RESET}")
         print(f"{Colors.CYAN}╚{'═' * 78}╝{Colors.RESET}\n")
         
+        if self.show_asterisk_ami("pjsip show endpoints"):
+            print(f"\n{Colors.GREEN}📊 SIP Registrations:{Colors.RESET}\n")
+            self.show_asterisk_ami("pjsip show registrations")
+            return
+
         import os
         
         # Check for asterisk CLI
@@ -679,6 +710,11 @@ class NetworkDiagnostics:
         print(f"{Colors.CYAN}║{Colors.YELLOW}{Colors.BOLD} 📞 ACTIVE ASTERISK CHANNELS{' ' * 48}{Colors.RESET}{Colors.CYAN} ║{Colors.RESET}")
         print(f"{Colors.CYAN}╚{'═' * 78}╝{Colors.RESET}\n")
         
+        if self.show_asterisk_ami("core show channels"):
+            print(f"\n{Colors.GREEN}📊 Channel statistics:{Colors.RESET}\n")
+            self.show_asterisk_ami("core show channels count")
+            return
+
         import os
         
         # Check for asterisk CLI
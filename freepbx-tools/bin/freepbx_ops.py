@@ -6,7 +6,7 @@ freepbx_ops.py  —  FreePBX Operations Tool
 Subcommands:
   trace   <DID>            Full call-path trace for a DID
   decode  <destination>    Human-readable decode of a raw FreePBX destination
-  find    <query>          Search across all PBX components
+  find    <query>          Search across all PBX components (indexed snapshot)
   snapshot                 Save current call-flow state to JSON
   rollback <file>          Restore IVR/TC destinations from a snapshot
   validate                 Run health/consistency checks
@@ -15,17 +15,24 @@ Subcommands:
 """
 
 import argparse
+import hashlib
 import json
 import os
 import subprocess
 import sys
 import datetime
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
 
 # ── constants ────────────────────────────────────────────────────────────────
 
 ASTERISK_DB   = "asterisk"
 SNAPSHOT_DIR  = "/home/123net/callflows/snapshots"
 SESSION_LOG   = "/tmp/freepbx_ops_session.json"
+DUMP_PATH     = "/home/123net/callflows/freepbx_dump.json"   # freepbx_dump.py snapshot
+FIND_INDEX_VERSION = 2
 
 # ── colour helpers ───────────────────────────────────────────────────────────
 
@@ -46,34 +53,14 @@ def hdr(msg):  print(C.CYAN + C.BOLD + msg + C.RESET)
 _DB_KW = {}   # populated by main() from CLI args
 
 def run_mysql(sql, db=ASTERISK_DB):
-    env = os.environ.copy()
-    if _DB_KW.get("password"):
-        env["MYSQL_PWD"] = _DB_KW["password"]
-    cmd = ["mysql", "-BN"]
-    if _DB_KW.get("user"):
-        cmd += ["--user", _DB_KW["user"]]
-    if _DB_KW.get("socket"):
-        cmd += ["--socket", _DB_KW["socket"]]
-    if db:
-        cmd += [db]
-    cmd += ["-e", sql]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       universal_newlines=True, env=env)
-    if p.returncode != 0:
-        raise RuntimeError((p.stderr or "mysql error").strip())
-    return p.stdout
+    return freepbx_db.run_mysql(sql, socket=_DB_KW.get("socket"), user=_DB_KW.get("user"),
+                                password=_DB_KW.get("password"), db=db)
 
 def qrows(sql, cols, db=ASTERISK_DB):
     """SELECT -> list of dicts."""
-    out = run_mysql(sql, db=db).rstrip("\n")
-    if not out:
-        return []
-    result = []
-    for line in out.split("\n"):
-        parts = line.split("\t")
-        parts = (parts + [""] * len(cols))[:len(cols)]
-        result.append(dict(zip(cols, parts)))
-    return result
+    return freepbx_db.rows_as_dicts(sql, cols, socket=_DB_KW.get("socket"),
+                                    user=_DB_KW.get("user"),
+                                    password=_DB_KW.get("password"), db=db)
 
 def qone(sql, cols, db=ASTERISK_DB):
     rows = qrows(sql, cols, db=db)
@@ -379,11 +366,277 @@ def cmd_decode(args):
     print(f"\n  Raw:   {C.YELLOW}{dest}{C.RESET}")
     print(f"  Human: {decode(dest)}\n")
 
+# ── find index ────────────────────────────────────────────────────────────────
+#
+# `find` answers from an index over the freepbx_dump.py snapshot: one
+# document per extension, ring group, IVR, IVR option, DID, time condition,
+# queue and announcement, and a trigram map over every searchable field.
+# The index is cached next to the snapshot (<snapshot>.find_index.json) and
+# rebuilt only when the snapshot's contents change.
+
+# Result kinds, in the order ties are listed
+FIND_KINDS = [
+    ("ext",   "Extension"),
+    ("did",   "DID"),
+    ("rg",    "Ring Group"),
+    ("queue", "Queue"),
+    ("ivr",   "IVR"),
+    ("tc",    "Time Cond."),
+    ("ann",   "Announcement"),
+    ("opt",   "IVR Option"),
+]
+
+# Destination type -> (label, names table), for labels built from the snapshot
+_SNAPSHOT_DESTS = {
+    "from-did-direct":  ("Extension", "ext"),
+    "from-internal":    ("Extension", "ext"),
+    "ext-group":        ("Ring Group", "rg"),
+    "timeconditions":   ("Time Condition", "tc"),
+    "ivr":              ("IVR", "ivr"),
+    "app-announcement": ("Announcement", "ann"),
+    "queue":            ("Queue", "queue"),
+    "app-queue":        ("Queue", "queue"),
+    "ext-queues":       ("Queue", "queue"),
+}
+
+def find_index_path(snapshot):
+    return os.path.splitext(snapshot)[0] + ".find_index.json"
+
+def _snapshot_label(dest, names):
+    """decode() from the snapshot's names instead of the DB (plain text)."""
+    parts  = dest.split(",")
+    dtype  = parts[0]
+    arg1   = parts[1] if len(parts) > 1 else ""
+    if dtype.startswith("ivr-"):
+        dtype, arg1 = "ivr", dtype[4:]
+    elif dtype.startswith("app-announcement-"):
+        dtype, arg1 = "app-announcement", dtype.rsplit("-", 1)[1]
+    if dtype in _SNAPSHOT_DESTS:
+        label, table = _SNAPSHOT_DESTS[dtype]
+        name = names[table].get(arg1)
+        return f"{label} {arg1}" + (f" — {name}" if name else "")
+    if dtype == "app-blackhole":
+        return "Hang Up"
+    return dest
+
+def _find_docs(snap):
+    """Snapshot -> [[kind, key, title, detail, [[value, weight], ...]], ...].
+
+    Weights: 3 for the entity's own number, 2 for its name (and ring
+    group / queue members), 1 for destinations it points at."""
+    def s(v):
+        # The dump keeps the mysql CLI's literal "NULL" for un-COALESCEd columns
+        return "" if v is None or v == "NULL" else str(v)
+
+    ivrs  = snap.get("ivrs") or {}
+    names = {
+        "ext":   {s(r.get("extension")): s(r.get("name")) for r in snap.get("extensions", [])},
+        "rg":    {s(r.get("grpnum")): s(r.get("description")) for r in snap.get("ringgroups", [])},
+        "tc":    {s(r.get("timeconditions_id")): s(r.get("displayname")) for r in snap.get("timeconditions", [])},
+        "ivr":   {s(r.get("ivr_id")): s(r.get("name")) for r in ivrs.get("menus", [])},
+        "ann":   {s(r.get("announcement_id")): s(r.get("description")) for r in snap.get("announcements", [])},
+        "queue": {s(r.get("queue")): s(r.get("queue_name")) for r in snap.get("queues", []) if "queue" in r},
+    }
+
+    def dest_fields(*dests):
+        out = []
+        for d in dests:
+            if d:
+                out += [[d, 1], [_snapshot_label(d, names), 1]]
+        return out
+
+    docs = []
+    for ext, name in names["ext"].items():
+        docs.append(["ext", ext, name, "", [[ext, 3], [name, 2]]])
+    for r in snap.get("inbound", []):
+        did, dest = s(r.get("did")), s(r.get("destination"))
+        docs.append(["did", did or "(any)", s(r.get("label")), "→ " + _snapshot_label(dest, names),
+                     [[did, 3], [s(r.get("label")), 2], [s(r.get("cid")), 1]] + dest_fields(dest)])
+    for r in snap.get("ringgroups", []):
+        grp, members = s(r.get("grpnum")), s(r.get("grplist"))
+        post = s(r.get("postdest"))
+        docs.append(["rg", grp, s(r.get("description")), f"members: {members}",
+                     [[grp, 3], [s(r.get("description")), 2]]
+                     + [[m, 2] for m in members.split("-") if m] + dest_fields(post)])
+    for r in snap.get("queues", []):
+        if "queue" not in r:    # the trailing {"_dynamic_members": [...]} entry
+            continue
+        qid, members = s(r.get("queue")), s(r.get("members"))
+        docs.append(["queue", qid, s(r.get("queue_name")), f"members: {members or '-'}",
+                     [[qid, 3], [s(r.get("queue_name")), 2]] + [[m, 2] for m in members.split(",") if m]])
+    for ivr_id, name in names["ivr"].items():
+        docs.append(["ivr", ivr_id, name, "", [[ivr_id, 3], [name, 2]]])
+    for r in ivrs.get("options", []):
+        ivr_id, sel, dest = s(r.get("ivr_id")), s(r.get("selection")), s(r.get("dest"))
+        name = names["ivr"].get(ivr_id)
+        docs.append(["opt", f"{ivr_id}/{sel}", f"IVR {ivr_id}" + (f" — {name}" if name else "") + f", press {sel}",
+                     "→ " + _snapshot_label(dest, names), dest_fields(dest)])
+    for r in snap.get("timeconditions", []):
+        tcid, t, f = s(r.get("timeconditions_id")), s(r.get("true_dest")), s(r.get("false_dest"))
+        docs.append(["tc", tcid, s(r.get("displayname")),
+                     f"match → {_snapshot_label(t, names)} / no match → {_snapshot_label(f, names)}",
+                     [[tcid, 3], [s(r.get("displayname")), 2]] + dest_fields(t, f)])
+    for r in snap.get("announcements", []):
+        ann_id, post = s(r.get("announcement_id")), s(r.get("post_dest"))
+        docs.append(["ann", ann_id, s(r.get("description")), "", [[ann_id, 3], [s(r.get("description")), 2]]
+                     + dest_fields(post)])
+
+    for doc in docs:
+        doc[4] = [[v.lower(), w] for v, w in doc[4] if v]
+    return docs
+
+def _trigrams(text):
+    """Every 3-character substring of text."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def build_find_index(snapshot):
+    """Read the snapshot and build its search index (a JSON-able dict)."""
+    with open(snapshot, "rb") as f:
+        raw = f.read()
+    snap = json.loads(raw.decode("utf-8", "replace"))
+    docs = _find_docs(snap)
+    grams = {}
+    for i, doc in enumerate(docs):
+        for g in set().union(*(_trigrams(v) for v, _w in doc[4])):
+            grams.setdefault(g, []).append(i)
+    st = os.stat(snapshot)
+    return {
+        "version": FIND_INDEX_VERSION, "snapshot": os.path.abspath(snapshot),
+        "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+        "sha1": hashlib.sha1(raw).hexdigest(),
+        "generated_at": (snap.get("meta") or {}).get("generated_at_utc", ""),
+        "verified_at": (snap.get("meta") or {}).get("verified_at_utc", ""),
+        "docs": docs, "grams": grams,
+    }
+
+def _save_find_index(index, path):
+    """Persist atomically; an unwritable dir only costs the next run a rebuild."""
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    try:
+        with open(tmp, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+
+def load_find_index(snapshot):
+    """(index, rebuilt) for the snapshot: the cached index while the snapshot
+    is unchanged — same size and mtime, or, after a touch, the same SHA-1 —
+    otherwise a fresh build, saved for the next run."""
+    path = find_index_path(snapshot)
+    st = os.stat(snapshot)
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = None
+    if index and index.get("version") == FIND_INDEX_VERSION \
+            and index.get("snapshot") == os.path.abspath(snapshot):
+        if index.get("size") == st.st_size and index.get("mtime_ns") == st.st_mtime_ns:
+            return index, False
+        with open(snapshot, "rb") as f:
+            if hashlib.sha1(f.read()).hexdigest() == index.get("sha1"):
+                index["size"], index["mtime_ns"] = st.st_size, st.st_mtime_ns
+                _save_find_index(index, path)
+                return index, False
+    index = build_find_index(snapshot)
+    _save_find_index(index, path)
+    return index, True
+
+def search_find_index(index, query, limit=20):
+    """Ranked [(score, doc)] for `query` (case-insensitive substring).
+
+    Candidates come from intersecting the query's trigram postings; a
+    one- or two-letter query has no trigram, so every document is checked
+    (in memory, still milliseconds). Each candidate's fields are scored:
+    exact match 4, field prefix 3, word prefix 2, substring 1 — times 10,
+    plus the field's weight. Ties are listed by kind, then number."""
+    q = query.strip().lower()
+    if not q:
+        return []
+    docs = index["docs"]
+    grams = index["grams"]
+    keys = _trigrams(q)
+    if keys:
+        postings = sorted((grams.get(g, []) for g in keys), key=len)
+        cand = set(postings[0])
+        for p in postings[1:]:
+            cand.intersection_update(p)
+            if not cand:
+                break
+    else:
+        cand = range(len(docs))
+
+    order = {kind: i for i, (kind, _label) in enumerate(FIND_KINDS)}
+    hits = []
+    for i in cand:
+        kind, key, _title, _detail, fields = docs[i]
+        best = 0
+        for value, weight in fields:
+            pos = value.find(q)
+            if pos < 0:
+                continue
+            if value == q:
+                quality = 4
+            elif pos == 0:
+                quality = 3
+            elif value[pos - 1] in " -_/,.@":
+                quality = 2
+            else:
+                quality = 1
+            best = max(best, quality * 10 + weight)
+        if best:
+            hits.append((best, docs[i]))
+    hits.sort(key=lambda h: (-h[0], order.get(h[1][0], 99), h[1][1]))
+    return hits[:limit] if limit else hits
+
 # ── find command ──────────────────────────────────────────────────────────────
 
+def _like(text):
+    """Escape user text for a single-quoted LIKE '%...%' pattern."""
+    return (text.replace("\\", "\\\\").replace("'", "''")
+                .replace("%", "\\%").replace("_", "\\_"))
+
 def cmd_find(args):
-    q = args.query.lower()
     hdr(f"\n🔍  Searching for: {args.query}\n")
+    snapshot = args.snapshot or DUMP_PATH
+    if not args.db:
+        if os.path.isfile(snapshot):
+            return _find_indexed(args, snapshot)
+        warn(f"No snapshot at {snapshot} — searching the live DB "
+             f"(run freepbx_dump.py to enable the index)\n")
+    return _find_db(args)
+
+def _find_indexed(args, snapshot):
+    started = time.time()
+    try:
+        index, rebuilt = load_find_index(snapshot)
+    except (OSError, ValueError) as e:
+        warn(f"Could not index {snapshot} ({e}) — searching the live DB\n")
+        return _find_db(args)
+    hits = search_find_index(index, args.query, limit=args.limit)
+    elapsed = (time.time() - started) * 1000
+
+    labels = dict(FIND_KINDS)
+    for score, (kind, key, title, detail, _fields) in hits:
+        line = f"  {C.CYAN}{labels.get(kind, kind):<13}{C.RESET} {C.GREEN}{key:<15}{C.RESET} {title}"
+        if detail:
+            line += f"  {C.WHITE}{detail}{C.RESET}"
+        print(line)
+    if not hits:
+        warn(f"No results found for '{args.query}'")
+
+    source = "rebuilt index" if rebuilt else "cached index"
+    print(f"\n  {len(hits)} result(s) in {elapsed:.1f} ms from {source} — "
+          f"snapshot {index.get('verified_at') or index.get('generated_at') or '?'} "
+          f"({len(index['docs'])} entries). "
+          f"Use --db for live data.\n")
+
+def _find_db(args):
+    q = _like(args.query.lower())
     found = False
 
     # Extensions / Users
@@ -945,6 +1198,9 @@ def main():
     # find
     sp = sub.add_parser("find", help="Search across all PBX components")
     sp.add_argument("query", help="Search term (name, number, extension)")
+    sp.add_argument("--snapshot", default=None, help=f"Snapshot to search (default: {DUMP_PATH})")
+    sp.add_argument("--limit", type=int, default=20, help="Max results (default: 20; 0 = all)")
+    sp.add_argument("--db", action="store_true", help="Query the live DB instead of the snapshot index")
 
     # snapshot
     sp = sub.add_parser("snapshot", help="Save current call-flow state to JSON")
@@ -42,6 +42,14 @@ import json
 import sys
 from datetime import datetime
 from collections import defaultdict
+import os
+
+# Asterisk CLI over the shared AMI connection (bin/freepbx_ami.py) when available
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_ami
+except ImportError:
+    freepbx_ami = None
 
 class Colors:
     """ANSI color codes"""
@@ -112,8 +120,13 @@ class PhoneAnalyzer:
         return []
     
     def get_asterisk_cli(self, command):
-        """Run Asterisk CLI command"""
-        import os
+        """Run Asterisk CLI command (over AMI when available, else asterisk -rx)"""
+        client = freepbx_ami.get_client() if freepbx_ami is not None else None
+        if client is not None:
+            try:
+                return client.command(command) + "\n"
+            except freepbx_ami.AMIError:
+                pass
         asterisk_paths = ["/usr/sbin/asterisk", "/usr/bin/asterisk", "asterisk"]
         for path in asterisk_paths:
             if os.path.exists(path) or '/' not in path:
@@ -0,0 +1,701 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+freepbx_queue_stats.py
+----------------------
+Queue metrics from /var/log/asterisk/queue_log for tickets: service level,
+abandon rate, wait-time percentiles and agent occupancy, per queue and per
+hour.
+✓ Python 3.6 compatible (stdlib only).
+
+queue_log is streamed line by line (the live file and its rotations,
+gzipped ones included), and every event is folded into hourly counters and
+wait-time histograms kept in a local SQLite rollup, so memory stays flat no
+matter how many months of history are read. Each file is checkpointed by a
+fingerprint of its first line plus the byte offset parsed so far, in the same
+transaction as the counters it produced: a daily rerun only parses the events
+appended since, and a rotated copy of an already-parsed file is recognised
+and not counted twice. Reports are read back from the rollup for any window.
+
+queue_log format: epoch|callid|queue|agent|EVENT|data1|data2|...
+    ENTERQUEUE       url|callerid|position
+    CONNECT          holdtime|bridged uniqueid|ringtime
+    ABANDON          position|origposition|waittime
+    EXITWITHTIMEOUT  position|origposition|waittime
+    EXITEMPTY        position|origposition|waittime
+    EXITWITHKEY      key|position|origposition|waittime
+    COMPLETECALLER   holdtime|calltime|origposition      (COMPLETEAGENT alike)
+    TRANSFER         extension|context|holdtime|calltime|origposition
+    RINGNOANSWER     ringtime (ms)
+    ADDMEMBER / REMOVEMEMBER, AGENTLOGIN / AGENTLOGOFF, PAUSE / UNPAUSE (-ALL)
+
+VARIABLE MAP (Key Script Variables)
+-----------------------------------
+Colors          : ANSI color codes for CLI output
+QUEUE_LOG       : Default Asterisk queue_log path
+ROLLUP_PATH     : Local SQLite rollup (hourly counters + file checkpoints)
+ROLLUP_VERSION  : Bumped when the rollup schema changes (old rollups are rebuilt)
+QUEUE_COLUMNS   : Per (hour, queue) counters, in queue_hour column order
+AGENT_COLUMNS   : Per (hour, agent) counters, in agent_hour column order
+FLUSH_EVENTS    : Events folded in memory before a flush + checkpoint
+DEFAULT_SL      : Default service-level threshold (seconds)
+FINGERPRINT_MAX : Longest first line hashed as a file fingerprint
+
+    FUNCTION MAP (Major Functions)
+    -----------------------------
+    wait_bucket           : Wait seconds -> histogram bucket (1s / 5s / 30s resolution)
+    bucket_floor          : Histogram bucket -> its lowest wait in seconds
+    percentile            : Percentile of a {bucket: calls} histogram, in seconds
+    queue_logs            : The live queue_log and its rotations, oldest first
+    QueueRollup           : SQLite rollup: update() parses new events, report() reads a window
+    QueueRollup.update    : Stream every queue_log file from its checkpoint
+    QueueRollup.report    : Per-queue (and per-hour / per-agent) metrics for a window
+    queue_metrics         : Raw counters + histograms -> rates, SL, percentiles
+    print_report          : Render a report as terminal tables
+    main                  : CLI entry point
+"""
+
+import gzip
+import hashlib
+import json
+import contextlib
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+try:
+    import sqlite3
+except ImportError:  # some minimal Python builds ship without _sqlite3
+    sqlite3 = None
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX dev boxes: updates are not serialized
+    fcntl = None
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+
+
+class Colors:
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+    RED = '\033[91m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    CYAN = '\033[96m'
+    MAGENTA = '\033[95m'
+    WHITE = '\033[97m'
+    BLUE = '\033[94m'
+
+
+QUEUE_LOG = "/var/log/asterisk/queue_log"
+ROLLUP_PATH = "/home/123net/callflows/queue_rollup.sqlite"
+ROLLUP_VERSION = 1
+QUEUE_COLUMNS = ("offered", "answered", "abandoned", "timeout", "exitempty", "exitkey",
+                 "completed", "ringnoanswer", "hold_total", "talk_total", "abandon_wait_total")
+AGENT_COLUMNS = ("answered", "calls", "talk", "ringnoanswer", "logged_in", "paused")
+FLUSH_EVENTS = 100000
+DEFAULT_SL = 20
+FINGERPRINT_MAX = 4096
+
+_Q = dict((name, i) for i, name in enumerate(QUEUE_COLUMNS))
+_A = dict((name, i) for i, name in enumerate(AGENT_COLUMNS))
+
+
+# ---------------------------
+# Wait-time histogram
+# ---------------------------
+
+def wait_bucket(seconds):
+    """1s buckets under a minute, 5s to 5 minutes, 30s to an hour, then one overflow bucket."""
+    if seconds < 60:
+        return max(0, int(seconds))
+    if seconds < 300:
+        return 60 + int(seconds - 60) // 5
+    if seconds < 3600:
+        return 108 + int(seconds - 300) // 30
+    return 218
+
+
+def bucket_floor(bucket):
+    if bucket < 60:
+        return bucket
+    if bucket < 108:
+        return 60 + (bucket - 60) * 5
+    if bucket < 218:
+        return 300 + (bucket - 108) * 30
+    return 3600
+
+
+def percentile(hist, pct):
+    """`pct` (0-100) percentile of a {bucket: calls} histogram, as the bucket's
+    lowest wait in seconds (exact under a minute), or None if it is empty."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    rank = max(1, int(-(-total * pct // 100)))
+    seen = 0
+    for bucket in sorted(hist):
+        seen += hist[bucket]
+        if seen >= rank:
+            return bucket_floor(bucket)
+    return bucket_floor(max(hist))
+
+
+def _hour_key(epoch):
+    return time.strftime("%Y-%m-%d %H", time.localtime(epoch))
+
+
+def _spread(start, end):
+    """Split the seconds of [start, end) over the local hours they fall in."""
+    out = []
+    while start < end:
+        t = time.localtime(start)
+        next_hour = start - (t.tm_min * 60 + t.tm_sec) + 3600
+        stop = min(end, next_hour)
+        out.append((_hour_key(start), stop - start))
+        start = stop
+    return out
+
+
+# ---------------------------
+# Files
+# ---------------------------
+
+def queue_logs(path=QUEUE_LOG):
+    """The live queue_log and its rotations (queue_log.1, queue_log-YYYYMMDD[.gz]), oldest first."""
+    if freepbx_log_index is not None:
+        files = freepbx_log_index.rotated_logs(path)
+    else:
+        files = [path] if os.path.isfile(path) else []
+    # the live file last; rotations by age (the newest rotation has the newest mtime)
+    return sorted(files, key=lambda p: (p == path, os.path.getmtime(p)))
+
+
+def _open(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _fingerprint(f):
+    """sha1 of the file's first complete line, or None while it is still being written."""
+    first = f.readline(FINGERPRINT_MAX)
+    if not first.endswith(b"\n"):
+        return None
+    return hashlib.sha1(first).hexdigest()
+
+
+# ---------------------------
+# Rollup
+# ---------------------------
+
+class QueueRollup:
+    """Hourly queue_log aggregates and per-file checkpoints in a local SQLite file.
+
+    queue_hour holds the QUEUE_COLUMNS counters per (hour, queue), wait_hist
+    the answer / abandon wait histograms per (hour, queue), agent_hour the
+    AGENT_COLUMNS counters per (hour, agent). files maps a queue_log
+    fingerprint to the byte offset parsed so far; state keeps the agent
+    login / pause sessions still open at the last event.
+
+    update() and reset() hold an exclusive flock on "<path>.lock" and read
+    the checkpoints only once they have it, so a cron run and an interactive
+    report never parse (and count) the same bytes twice.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS queue_hour (hour TEXT, queue TEXT, %s,
+        PRIMARY KEY (hour, queue));
+    CREATE TABLE IF NOT EXISTS wait_hist (hour TEXT, queue TEXT, kind TEXT, bucket INTEGER,
+        calls INTEGER, PRIMARY KEY (hour, queue, kind, bucket));
+    CREATE TABLE IF NOT EXISTS agent_hour (hour TEXT, agent TEXT, %s,
+        PRIMARY KEY (hour, agent));
+    CREATE TABLE IF NOT EXISTS files (fingerprint TEXT PRIMARY KEY, path TEXT, offset INTEGER,
+        updated REAL);
+    CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+    """ % (", ".join("%s INTEGER" % c for c in QUEUE_COLUMNS),
+           ", ".join("%s INTEGER" % c for c in AGENT_COLUMNS))
+    TABLES = ["queue_hour", "wait_hist", "agent_hour", "files", "state"]
+
+    def __init__(self, path=ROLLUP_PATH):
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.path = path
+        self.con = sqlite3.connect(path, timeout=30)
+        version = self.con.execute("PRAGMA user_version").fetchone()[0]
+        if version != ROLLUP_VERSION:
+            self.reset()
+        self.con.executescript(self.SCHEMA)
+        self._pending()
+        self._load_sessions()
+
+    def close(self):
+        self.con.close()
+
+    @contextlib.contextmanager
+    def _exclusive(self):
+        """Hold the rollup's writer lock (blocks while another process updates)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def is_empty(self):
+        """True before the first update(): no queue_log file has a checkpoint yet."""
+        return self.con.execute("SELECT COUNT(*) FROM files").fetchone()[0] == 0
+
+    def reset(self):
+        """Drop everything; the next update() re-parses all queue_log history."""
+        with self._exclusive():
+            for table in self.TABLES:
+                self.con.execute("DROP TABLE IF EXISTS %s" % table)
+            self.con.execute("PRAGMA user_version = %d" % ROLLUP_VERSION)
+            self.con.executescript(self.SCHEMA)
+
+    def _pending(self):
+        self.queues = {}      # (hour, queue) -> [QUEUE_COLUMNS]
+        self.hists = {}       # (hour, queue, kind, bucket) -> calls
+        self.agents = {}      # (hour, agent) -> [AGENT_COLUMNS]
+        self.events = 0
+
+    # -- folding events -----------------------------------------------------
+
+    def _queue(self, hour, queue):
+        row = self.queues.get((hour, queue))
+        if row is None:
+            row = self.queues[(hour, queue)] = [0] * len(QUEUE_COLUMNS)
+        return row
+
+    def _agent(self, hour, agent):
+        row = self.agents.get((hour, agent))
+        if row is None:
+            row = self.agents[(hour, agent)] = [0] * len(AGENT_COLUMNS)
+        return row
+
+    def _hist(self, hour, queue, kind, seconds):
+        key = (hour, queue, kind, wait_bucket(seconds))
+        self.hists[key] = self.hists.get(key, 0) + 1
+
+    def _credit(self, sessions, agent, col, until):
+        """Credit an open login / pause session up to `until` and restart it there."""
+        since = sessions[agent]["since"] if isinstance(sessions[agent], dict) else sessions[agent]
+        for hour, secs in _spread(since, until):
+            self._agent(hour, agent)[_A[col]] += secs
+        if isinstance(sessions[agent], dict):
+            sessions[agent]["since"] = until
+        else:
+            sessions[agent] = until
+
+    def feed(self, line):
+        """Fold one queue_log line (bytes) into the pending counters."""
+        parts = line.rstrip(b"\r\n").split(b"|")
+        if len(parts) < 5:
+            return
+        try:
+            ts = int(float(parts[0]))
+        except ValueError:
+            return
+        event = parts[4]
+        queue = parts[2].decode("utf-8", "replace")
+        agent = parts[3].decode("utf-8", "replace")
+        data = parts[5:]
+        hour = _hour_key(ts)
+        self.events += 1
+        self.last_ts = max(self.last_ts, ts)
+
+        def num(i):
+            try:
+                return int(data[i])
+            except (IndexError, ValueError):
+                return 0
+
+        if event == b"ENTERQUEUE":
+            self._queue(hour, queue)[_Q["offered"]] += 1
+        elif event == b"CONNECT":
+            row = self._queue(hour, queue)
+            row[_Q["answered"]] += 1
+            row[_Q["hold_total"]] += num(0)
+            self._hist(hour, queue, "answer", num(0))
+            self._agent(hour, agent)[_A["answered"]] += 1
+        elif event == b"ABANDON":
+            row = self._queue(hour, queue)
+            row[_Q["abandoned"]] += 1
+            row[_Q["abandon_wait_total"]] += num(2)
+            self._hist(hour, queue, "abandon", num(2))
+        elif event == b"EXITWITHTIMEOUT":
+            self._queue(hour, queue)[_Q["timeout"]] += 1
+        elif event == b"EXITEMPTY":
+            self._queue(hour, queue)[_Q["exitempty"]] += 1
+        elif event == b"EXITWITHKEY":
+            self._queue(hour, queue)[_Q["exitkey"]] += 1
+        elif event in (b"COMPLETECALLER", b"COMPLETEAGENT", b"TRANSFER"):
+            talk = num(3) if event == b"TRANSFER" else num(1)
+            row = self._queue(hour, queue)
+            row[_Q["completed"]] += 1
+            row[_Q["talk_total"]] += talk
+            arow = self._agent(hour, agent)
+            arow[_A["calls"]] += 1
+            arow[_A["talk"]] += talk
+        elif event == b"RINGNOANSWER":
+            self._queue(hour, queue)[_Q["ringnoanswer"]] += 1
+            self._agent(hour, agent)[_A["ringnoanswer"]] += 1
+        elif event in (b"ADDMEMBER", b"AGENTLOGIN"):
+            session = self.logins.get(agent)
+            if session is None:
+                session = self.logins[agent] = {"since": ts, "queues": []}
+            if queue not in session["queues"]:
+                session["queues"].append(queue)
+        elif event in (b"REMOVEMEMBER", b"AGENTLOGOFF"):
+            session = self.logins.get(agent)
+            if session is not None:
+                if queue in session["queues"]:
+                    session["queues"].remove(queue)
+                if not session["queues"] or event == b"AGENTLOGOFF":
+                    self._credit(self.logins, agent, "logged_in", ts)
+                    del self.logins[agent]
+        elif event in (b"PAUSE", b"PAUSEALL"):
+            self.pauses.setdefault(agent, ts)
+        elif event in (b"UNPAUSE", b"UNPAUSEALL"):
+            if agent in self.pauses:
+                self._credit(self.pauses, agent, "paused", ts)
+                del self.pauses[agent]
+
+    # -- persistence --------------------------------------------------------
+
+    def _add_rows(self, table, keys, columns, rows):
+        sets = ", ".join("%s = %s + ?" % (c, c) for c in columns)
+        where = " AND ".join("%s = ?" % k for k in keys)
+        update = "UPDATE %s SET %s WHERE %s" % (table, sets, where)
+        insert = "INSERT INTO %s (%s) VALUES (%s)" % (
+            table, ", ".join(keys + columns), ", ".join("?" * (len(keys) + len(columns))))
+        for key, values in rows:
+            # no UPSERT: EL7's SQLite (3.7) predates ON CONFLICT DO UPDATE
+            if self.con.execute(update, tuple(values) + tuple(key)).rowcount == 0:
+                self.con.execute(insert, tuple(key) + tuple(values))
+
+    def flush(self, fingerprint=None, path=None, offset=None):
+        """Write the pending counters, the open sessions and (optionally) one
+        file checkpoint in a single transaction, then start a new batch."""
+        with self.con:
+            self._add_rows("queue_hour", ["hour", "queue"], list(QUEUE_COLUMNS),
+                           self.queues.items())
+            self._add_rows("wait_hist", ["hour", "queue", "kind", "bucket"], ["calls"],
+                           ((k, [n]) for k, n in self.hists.items()))
+            self._add_rows("agent_hour", ["hour", "agent"], list(AGENT_COLUMNS),
+                           self.agents.items())
+            self.con.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", ("sessions", json.dumps(
+                {"logins": self.logins, "pauses": self.pauses, "last_ts": self.last_ts})))
+            if fingerprint is not None:
+                self.con.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                 (fingerprint, path, offset, time.time()))
+        self._pending()
+
+    def _load_sessions(self):
+        row = self.con.execute("SELECT value FROM state WHERE key = 'sessions'").fetchone()
+        data = json.loads(row[0]) if row else {}
+        self.logins = data.get("logins") or {}
+        self.pauses = data.get("pauses") or {}
+        self.last_ts = data.get("last_ts") or 0
+
+    # -- update -------------------------------------------------------------
+
+    def update(self, path=QUEUE_LOG, progress=None):
+        """Parse every queue_log file from its checkpoint; returns (files, events, bytes).
+
+        Open login / pause sessions are credited up to the last event seen,
+        so occupancy for the hours already parsed is complete. Concurrent
+        callers take turns; each starts from the checkpoints the previous one
+        left.
+        """
+        with self._exclusive():
+            return self._update(path, progress)
+
+    def _update(self, path, progress):
+        self._load_sessions()
+        done = dict(self.con.execute("SELECT fingerprint, offset FROM files"))
+        files_read = events = nbytes = 0
+        for log in queue_logs(path):
+            try:
+                with _open(log) as f:
+                    fp = _fingerprint(f)
+                    if fp is None:
+                        continue
+                    offset = done.get(fp, 0)
+                    if not log.endswith(".gz") and offset > os.fstat(f.fileno()).st_size:
+                        offset = 0  # same first line but shorter: rewritten, start over
+                    f.seek(offset)
+                    pos = offset
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # partial last line: next run
+                        pos += len(line)
+                        self.feed(line)
+                        if self.events >= FLUSH_EVENTS:
+                            events += self.events
+                            self.flush(fp, log, pos)
+                            if progress:
+                                progress(log, pos)
+                    if pos != offset:
+                        files_read += 1
+                        nbytes += pos - offset
+                    events += self.events
+                    self.flush(fp, log, pos)
+                    done[fp] = pos
+            except (OSError, EOFError) as e:
+                print(f"{Colors.YELLOW}⚠️  {log}: {e}{Colors.RESET}", file=sys.stderr)
+                self._pending()
+        if self.last_ts:
+            for agent in list(self.logins):
+                self._credit(self.logins, agent, "logged_in", self.last_ts)
+            for agent in list(self.pauses):
+                self._credit(self.pauses, agent, "paused", self.last_ts)
+            self.flush()
+        return files_read, events, nbytes
+
+    # -- report -------------------------------------------------------------
+
+    def report(self, first_hour, last_hour, by_hour=False, sl=DEFAULT_SL, queue=None):
+        """Metrics for the hours in [first_hour, last_hour] ('YYYY-MM-DD HH').
+
+        Returns {"queues": {name: metrics}, "intervals": [...] (by_hour only),
+        "agents": {name: metrics}}.
+        """
+        where = "hour BETWEEN ? AND ?"
+        args = [first_hour, last_hour]
+        if queue:
+            where += " AND queue = ?"
+            args.append(queue)
+        group = "queue, hour" if by_hour else "queue"
+        rows = self.con.execute(
+            "SELECT %s, %s FROM queue_hour WHERE %s GROUP BY %s" % (
+                group if by_hour else "queue, ''", ", ".join("SUM(%s)" % c for c in QUEUE_COLUMNS),
+                where, group), args).fetchall()
+        hists = {}
+        for q, hour, kind, bucket, calls in self.con.execute(
+                "SELECT queue, %s, kind, bucket, SUM(calls) FROM wait_hist WHERE %s "
+                "GROUP BY %s, kind, bucket" % ("hour" if by_hour else "''", where, group), args):
+            hists.setdefault((q, hour), {}).setdefault(kind, {})[bucket] = calls
+        out = {"window": [first_hour, last_hour], "sl_threshold": sl, "queues": {}, "agents": {}}
+        if by_hour:
+            out["intervals"] = []
+        totals = {}
+        for row in rows:
+            q, hour, counters = row[0], row[1], list(row[2:])
+            h = hists.get((q, hour), {})
+            if by_hour:
+                m = queue_metrics(counters, h.get("answer", {}), h.get("abandon", {}), sl)
+                m.update({"queue": q, "hour": hour})
+                out["intervals"].append(m)
+                acc = totals.setdefault(q, [[0] * len(QUEUE_COLUMNS), {}, {}])
+                acc[0] = [a + b for a, b in zip(acc[0], counters)]
+                for kind, target in (("answer", acc[1]), ("abandon", acc[2])):
+                    for bucket, n in h.get(kind, {}).items():
+                        target[bucket] = target.get(bucket, 0) + n
+            else:
+                totals[q] = [counters, h.get("answer", {}), h.get("abandon", {})]
+        for q, (counters, answer, abandon) in sorted(totals.items()):
+            out["queues"][q] = queue_metrics(counters, answer, abandon, sl)
+        if by_hour:
+            out["intervals"].sort(key=lambda m: (m["hour"], m["queue"]))
+        if not queue:
+            span = self._span_seconds(first_hour, last_hour)
+            for row in self.con.execute(
+                    "SELECT agent, %s FROM agent_hour WHERE hour BETWEEN ? AND ? GROUP BY agent" % (
+                        ", ".join("SUM(%s)" % c for c in AGENT_COLUMNS)), (first_hour, last_hour)):
+                a = dict(zip(AGENT_COLUMNS, row[1:]))
+                staffed = a["logged_in"] - a["paused"]
+                a["occupancy"] = round(100.0 * a["talk"] / staffed, 1) if staffed > 0 else None
+                a["avg_talk"] = round(a["talk"] / a["calls"], 1) if a["calls"] else None
+                a["window_seconds"] = span
+                out["agents"][row[0]] = a
+        return out
+
+    def _span_seconds(self, first_hour, last_hour):
+        try:
+            a = datetime.strptime(first_hour, "%Y-%m-%d %H")
+            b = datetime.strptime(last_hour, "%Y-%m-%d %H") + timedelta(hours=1)
+            return int((min(b, datetime.now()) - a).total_seconds())
+        except ValueError:
+            return None
+
+
+def queue_metrics(counters, answer_hist, abandon_hist, sl=DEFAULT_SL):
+    """QUEUE_COLUMNS counters + wait histograms -> one report row.
+
+    service_level is answered-within-`sl`-seconds / (answered + abandoned);
+    abandon_rate is abandoned / offered; wait percentiles are over answered
+    calls' hold time.
+    """
+    c = dict(zip(QUEUE_COLUMNS, (int(v or 0) for v in counters)))
+    in_sl = sum(n for b, n in answer_hist.items() if bucket_floor(b) <= sl)
+    decided = c["answered"] + c["abandoned"]
+    c.update({
+        "abandon_rate": round(100.0 * c["abandoned"] / c["offered"], 1) if c["offered"] else None,
+        "service_level": round(100.0 * in_sl / decided, 1) if decided else None,
+        "avg_wait": round(c["hold_total"] / c["answered"], 1) if c["answered"] else None,
+        "wait_p50": percentile(answer_hist, 50),
+        "wait_p90": percentile(answer_hist, 90),
+        "wait_p95": percentile(answer_hist, 95),
+        "avg_abandon_wait": round(c["abandon_wait_total"] / c["abandoned"], 1) if c["abandoned"] else None,
+        "abandon_wait_p50": percentile(abandon_hist, 50),
+        "avg_talk": round(c["talk_total"] / c["completed"], 1) if c["completed"] else None,
+    })
+    return c
+
+
+# ---------------------------
+# Output
+# ---------------------------
+
+def _fmt(value, suffix=""):
+    return "—" if value is None else f"{value}{suffix}"
+
+
+def _rate_color(value, warn, bad, higher_is_worse=True):
+    if value is None:
+        return Colors.WHITE
+    worse = value >= bad if higher_is_worse else value <= bad
+    meh = value >= warn if higher_is_worse else value <= warn
+    return Colors.RED if worse else Colors.YELLOW if meh else Colors.GREEN
+
+
+def print_report(rep, show_agents=False):
+    sl = rep["sl_threshold"]
+    print(f"\n{Colors.CYAN}{Colors.BOLD}{'=' * 100}")
+    print(f"  📞 QUEUE PERFORMANCE  {rep['window'][0]}:00 → {rep['window'][1]}:59  (SL = answered ≤ {sl}s)")
+    print(f"{'=' * 100}{Colors.RESET}\n")
+    header = (f"{'Queue':<14}{'Offered':>8}{'Answer':>8}{'Aband':>7}{'TmOut':>7}"
+              f"{'Aband%':>8}{'SL%':>7}{'AvgWait':>9}{'p50':>6}{'p90':>6}{'p95':>6}{'AvgTalk':>9}")
+    if not rep["queues"]:
+        print(f"{Colors.YELLOW}No queue activity in this window{Colors.RESET}")
+    else:
+        print(Colors.WHITE + header + Colors.RESET)
+        print(Colors.CYAN + "─" * len(header) + Colors.RESET)
+        for q, m in rep["queues"].items():
+            ac = _rate_color(m["abandon_rate"], 10, 20)
+            sc = _rate_color(m["service_level"], 80, 60, higher_is_worse=False)
+            print(f"{Colors.GREEN}{q[:13]:<14}{Colors.RESET}{m['offered']:>8}{m['answered']:>8}"
+                  f"{m['abandoned']:>7}{m['timeout']:>7}"
+                  f"{ac}{_fmt(m['abandon_rate']):>8}{Colors.RESET}{sc}{_fmt(m['service_level']):>7}{Colors.RESET}"
+                  f"{_fmt(m['avg_wait'], 's'):>9}{_fmt(m['wait_p50']):>6}{_fmt(m['wait_p90']):>6}"
+                  f"{_fmt(m['wait_p95']):>6}{_fmt(m['avg_talk'], 's'):>9}")
+    if rep.get("intervals"):
+        print(f"\n{Colors.CYAN}{Colors.BOLD}  ⏰ PER HOUR{Colors.RESET}\n")
+        header = (f"{'Hour':<15}{'Queue':<14}{'Offered':>8}{'Answer':>8}{'Aband':>7}"
+                  f"{'Aband%':>8}{'SL%':>7}{'AvgWait':>9}{'p90':>6}")
+        print(Colors.WHITE + header + Colors.RESET)
+        print(Colors.CYAN + "─" * len(header) + Colors.RESET)
+        for m in rep["intervals"]:
+            print(f"{m['hour'] + ':00':<15}{m['queue'][:13]:<14}{m['offered']:>8}{m['answered']:>8}"
+                  f"{m['abandoned']:>7}{_fmt(m['abandon_rate']):>8}{_fmt(m['service_level']):>7}"
+                  f"{_fmt(m['avg_wait'], 's'):>9}{_fmt(m['wait_p90']):>6}")
+    if show_agents and rep.get("agents"):
+        print(f"\n{Colors.CYAN}{Colors.BOLD}  👤 AGENTS{Colors.RESET}\n")
+        header = (f"{'Agent':<28}{'Answer':>8}{'Calls':>7}{'Talk':>9}{'AvgTalk':>9}"
+                  f"{'RNA':>6}{'LoggedIn':>10}{'Paused':>9}{'Occ%':>7}")
+        print(Colors.WHITE + header + Colors.RESET)
+        print(Colors.CYAN + "─" * len(header) + Colors.RESET)
+        for agent, a in sorted(rep["agents"].items(), key=lambda x: -x[1]["talk"]):
+            print(f"{agent[:27]:<28}{a['answered']:>8}{a['calls']:>7}{a['talk']:>8}s"
+                  f"{_fmt(a['avg_talk'], 's'):>9}{a['ringnoanswer']:>6}{a['logged_in']:>9}s"
+                  f"{a['paused']:>8}s{_fmt(a['occupancy']):>7}")
+        print(f"\n{Colors.WHITE}Occupancy = talk / (logged-in − paused); '—' for static members "
+              f"(no ADDMEMBER/AGENTLOGIN events){Colors.RESET}")
+    print("")
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def _parse_when(value, end_of_day=False):
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            dt = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end_of_day:
+            dt += timedelta(hours=23)
+        return dt
+    raise SystemExit(f"Bad time {value!r} (use 'YYYY-MM-DD[ HH:MM[:SS]]')")
+
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Queue metrics (service level, abandon rate, wait "
+                                             "percentiles, agent occupancy) from queue_log")
+    ap.add_argument("--queue-log", default=QUEUE_LOG, help=f"queue_log path (default: {QUEUE_LOG})")
+    ap.add_argument("--db", default=ROLLUP_PATH, help=f"Rollup/checkpoint file (default: {ROLLUP_PATH})")
+    ap.add_argument("--hours", type=int, default=24, help="Report the last N hours (default: 24)")
+    ap.add_argument("--start", help="Report from 'YYYY-MM-DD[ HH:MM]' (overrides --hours)")
+    ap.add_argument("--end", help="Report until 'YYYY-MM-DD[ HH:MM]' (default: now)")
+    ap.add_argument("--queue", help="Only this queue")
+    ap.add_argument("--by-hour", action="store_true", help="Add a per-queue, per-hour table")
+    ap.add_argument("--agents", action="store_true", help="Add the per-agent table (occupancy)")
+    ap.add_argument("--sl", type=int, default=DEFAULT_SL,
+                    help=f"Service-level threshold in seconds (default: {DEFAULT_SL})")
+    ap.add_argument("--json", metavar="FILE", help="Write the report as JSON ('-' for stdout)")
+    ap.add_argument("--no-update", action="store_true", help="Report from the rollup without parsing new events")
+    ap.add_argument("--rebuild", action="store_true", help="Drop the rollup and re-parse all history")
+    args = ap.parse_args()
+
+    if sqlite3 is None:
+        print(f"{Colors.RED}❌ This Python has no sqlite3 module; queue stats need it for the rollup{Colors.RESET}")
+        return 1
+    try:
+        rollup = QueueRollup(args.db)
+    except (OSError, sqlite3.Error) as e:
+        print(f"{Colors.RED}❌ Cannot open rollup {args.db}: {e}{Colors.RESET}")
+        return 1
+    quiet = args.json == "-"
+    try:
+        if args.rebuild:
+            rollup.reset()
+        if not args.no_update:
+            t0 = time.time()
+
+            def progress(log, pos):
+                if not quiet:
+                    sys.stdout.write(f"\r{Colors.CYAN}   ⏳ {os.path.basename(log)}: "
+                                     f"{pos / 1048576.0:,.1f} MB{Colors.RESET}   ")
+                    sys.stdout.flush()
+
+            files, events, nbytes = rollup.update(args.queue_log, progress=progress)
+            if not quiet:
+                print(f"\r{Colors.CYAN}📥 Parsed {events:,} new event(s) from {files} file(s) "
+                      f"({nbytes / 1048576.0:,.1f} MB) in {time.time() - t0:.1f}s{Colors.RESET}   ")
+        end = _parse_when(args.end, end_of_day=True) if args.end else datetime.now()
+        start = _parse_when(args.start) if args.start else datetime.now() - timedelta(hours=args.hours)
+        rep = rollup.report(start.strftime("%Y-%m-%d %H"), end.strftime("%Y-%m-%d %H"),
+                            by_hour=args.by_hour, sl=args.sl, queue=args.queue)
+    finally:
+        rollup.close()
+
+    if args.json:
+        text = json.dumps(rep, indent=2, sort_keys=True)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as f:
+                f.write(text + "\n")
+            print(f"{Colors.GREEN}✅ Wrote {args.json}{Colors.RESET}")
+    if not quiet:
+        print_report(rep, show_agents=args.agents)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
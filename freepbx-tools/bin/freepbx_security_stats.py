@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+freepbx_security_stats.py
+-------------------------
+Failed-authentication aggregator for /var/log/asterisk/full: per source IP
+and per endpoint (account) sliding-window counters with first / last seen,
+answering "top offenders in the last 24h" without re-reading the log.
+✓ Python 3.6 compatible (stdlib only).
+
+The security checks used to regex a fresh tail of the log on every run and
+forget everything in between. Here every SecurityEvent / failed-auth line is
+folded once into 10-minute buckets kept in a small JSON state file, together
+with a checkpoint per log file (sha1 of its first line + byte offset parsed
+so far). A later run only reads the bytes appended since; when logrotate
+renames full to full.1 (or gzips it) the rotated copy is recognised by its
+fingerprint and finished from its offset, and the new full is read from the
+top, so nothing is missed or counted twice across rotations. Buckets older
+than RETENTION_HOURS and offenders not seen since are dropped on save.
+
+Lines counted:
+    SECURITY[...] res_security_log.c: SecurityEvent="InvalidPassword",...,
+        AccountID="100",...,RemoteAddress="IPV4/UDP/203.0.113.7/5060",...
+        (every event type except SuccessfulAuth / ChallengeSent)
+    NOTICE[...] chan_sip.c: Registration from '"100"<sip:100@pbx>' failed for
+        '203.0.113.7:5060' - Wrong password
+    NOTICE[...] res_pjsip/pjsip_distributor.c: Request 'REGISTER' from
+        '<sip:100@pbx>' failed for '203.0.113.7:5060' (callid: ...) - No matching endpoint found
+    anything else matching "failed ... auth" (first IPv4 on the line)
+
+VARIABLE MAP (Key Script Variables)
+-----------------------------------
+Colors           : ANSI color codes for CLI output
+FULL_LOG         : Default Asterisk full log path
+STATE_PATH       : Persisted aggregator state (JSON)
+STATE_VERSION    : Bumped when the state layout changes (old state is rebuilt)
+BUCKET_SECONDS   : Sliding-window resolution
+RETENTION_HOURS  : How far back buckets and offenders are kept
+MAX_KEYS         : Offenders kept per table (least recently seen are evicted)
+MAX_PEERS        : Endpoints remembered per IP / IPs per endpoint
+FINGERPRINT_MAX  : Longest first line hashed as a file fingerprint
+BENIGN_EVENTS    : SecurityEvent types that are not failures
+_PREFILTER_RE    : One cheap bytes test every log line goes through
+
+    FUNCTION MAP (Major Functions)
+    -----------------------------
+    parse_security_line   : Log line (bytes) -> (event type, ip, endpoint) or None
+    security_logs         : Log files still inside the retention window, oldest first
+    SecurityStats         : Persisted per-IP / per-endpoint bucketed counters
+    SecurityStats.update  : Fold in every line appended since the last run
+    SecurityStats.top     : Top offenders over the last N hours
+    SecurityStats.total   : All failed-auth events over the last N hours
+    top_offenders         : One-call helper: update, then top IPs / endpoints + total
+    print_report          : Render top IPs / endpoints as terminal tables
+    main                  : CLI entry point
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+try:
+    import freepbx_log_index
+except ImportError:
+    freepbx_log_index = None
+
+
+class Colors:
+    RESET = '\033[0m'
+    BOLD = '\033[1m'
+    RED = '\033[91m'
+    GREEN = '\033[92m'
+    YELLOW = '\033[93m'
+    CYAN = '\033[96m'
+    MAGENTA = '\033[95m'
+    WHITE = '\033[97m'
+    BLUE = '\033[94m'
+
+
+FULL_LOG = "/var/log/asterisk/full"
+STATE_PATH = "/home/123net/callflows/security_state.json"
+STATE_VERSION = 1
+BUCKET_SECONDS = 600
+RETENTION_HOURS = 168
+MAX_KEYS = 5000
+MAX_PEERS = 20
+FINGERPRINT_MAX = 4096
+BENIGN_EVENTS = ("SuccessfulAuth", "ChallengeSent")
+
+_PREFILTER_RE = re.compile(rb"(?i)SecurityEvent=|failed for '|failed.*auth")
+_EVENT_RE = re.compile(rb'SecurityEvent="([^"]+)"')
+_ACCOUNT_RE = re.compile(rb'AccountID="([^"]*)"')
+_REMOTE_RE = re.compile(rb'RemoteAddress="IPV[46]/[^/"]+/([^"]+)/\d+"')
+_FAILED_FOR_RE = re.compile(rb"from '([^']*)' failed for '\[?([0-9A-Fa-f.:]+?)\]?(?::\d+)?'"
+                            rb"(?: \([^)]*\))?(?: - (.*))?")
+_SIP_USER_RE = re.compile(rb"sips?:([^@>;:]+)@")
+_IPV4_RE = re.compile(rb"\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b")
+
+
+# ---------------------------
+# Parsing
+# ---------------------------
+
+def _text(value):
+    return value.decode("utf-8", "replace") if value else None
+
+
+def parse_security_line(line):
+    """(event type, ip, endpoint) for a failed-auth log line (bytes), else None.
+
+    ip / endpoint are None when the line doesn't name one.
+    """
+    if not _PREFILTER_RE.search(line):
+        return None
+    m = _EVENT_RE.search(line)
+    if m:
+        etype = _text(m.group(1))
+        if etype in BENIGN_EVENTS:
+            return None
+        # RemoteAddress, not the first address on the line (that is LocalAddress)
+        ip = _REMOTE_RE.search(line)
+        account = _ACCOUNT_RE.search(line)
+        return etype, _text(ip.group(1)) if ip else None, _text(account.group(1)) if account else None
+    m = _FAILED_FOR_RE.search(line)
+    if m:
+        user = _SIP_USER_RE.search(m.group(1))
+        reason = (m.group(3) or b"failed").strip()[:40]
+        return _text(reason), _text(m.group(2)), _text(user.group(1)) if user else None
+    if re.search(rb"(?i)failed.*auth", line):
+        ip = _IPV4_RE.search(line)
+        return "auth failed", _text(ip.group(0)) if ip else None, None
+    return None
+
+
+# ---------------------------
+# Files
+# ---------------------------
+
+def security_logs(path=FULL_LOG, hours=RETENTION_HOURS):
+    """The live log and the rotations whose span reaches into the last `hours`, oldest first."""
+    if freepbx_log_index is None:
+        return [path] if os.path.isfile(path) else []
+    start = datetime.now() - timedelta(hours=hours)
+    files = [p for p, _first, _last in freepbx_log_index.logs_for_range(start, None, path)]
+    if os.path.isfile(path) and path not in files:
+        files.append(path)  # no stamped line yet: still needs a checkpoint
+    return files
+
+
+def _open(path):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+
+def _fingerprint(f):
+    """sha1 of the file's first complete line, or None while it is still being written."""
+    first = f.readline(FINGERPRINT_MAX)
+    if not first.endswith(b"\n"):
+        return None
+    return hashlib.sha1(first).hexdigest()
+
+
+def _first_offset(path, hours):
+    """Where to start a live log seen for the first time: the retention
+    window's byte offset from its LogIndex, or 0."""
+    if freepbx_log_index is None or path.endswith(".gz"):
+        return 0
+    try:
+        index = freepbx_log_index.LogIndex(path)
+        index.update()
+        return index.byte_range(datetime.now() - timedelta(hours=hours))[0]
+    except OSError:
+        return 0
+
+
+# ---------------------------
+# Aggregator
+# ---------------------------
+
+class SecurityStats(object):
+    """Per-IP and per-endpoint failed-auth counters persisted as JSON.
+
+    tables["ip"][ip] and tables["endpoint"][account] are
+        {"first": epoch, "last": epoch,
+         "b": {bucket start epoch (str): events},
+         "t": {event type: events},
+         "peers": {endpoint (for an IP) / IP (for an endpoint): events}}
+    events holds the bucketed total (lines without an IP or endpoint included)
+    and files maps a log fingerprint to {"path", "offset", "seen"}.
+    """
+
+    TABLES = ("ip", "endpoint")
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.files = {}
+        self.events = {}
+        self.tables = dict((name, {}) for name in self.TABLES)
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != STATE_VERSION:
+            return False
+        self.files = data.get("files") or {}
+        self.events = data.get("events") or {}
+        for name in self.TABLES:
+            self.tables[name] = data.get(name) or {}
+        return True
+
+    def save(self):
+        """Prune, then persist atomically; an unwritable state dir only costs a re-read."""
+        self.prune()
+        data = {"version": STATE_VERSION, "updated": int(time.time()), "files": self.files,
+                "events": self.events}
+        data.update(self.tables)
+        tmp = "%s.%d.tmp" % (self.path, os.getpid())
+        try:
+            parent = os.path.dirname(self.path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def prune(self, now=None):
+        """Drop buckets past the retention window, offenders not seen inside it,
+        file checkpoints not seen inside it, and the least recent offenders
+        beyond MAX_KEYS."""
+        now = now or time.time()
+        horizon = now - RETENTION_HOURS * 3600
+        for name in self.TABLES:
+            table = self.tables[name]
+            for key in list(table):
+                entry = table[key]
+                if entry["last"] < horizon:
+                    del table[key]
+                    continue
+                for bucket in [b for b in entry["b"] if int(b) + BUCKET_SECONDS <= horizon]:
+                    del entry["b"][bucket]
+            if len(table) > MAX_KEYS:
+                for key in sorted(table, key=lambda k: table[k]["last"])[:len(table) - MAX_KEYS]:
+                    del table[key]
+        for bucket in [b for b in self.events if int(b) + BUCKET_SECONDS <= horizon]:
+            del self.events[bucket]
+        for fp in [fp for fp, cp in self.files.items() if cp.get("seen", 0) < horizon]:
+            del self.files[fp]
+
+    # -- folding events -----------------------------------------------------
+
+    def _count(self, name, key, peer, etype, when):
+        table = self.tables[name]
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {"first": when, "last": when, "b": {}, "t": {}, "peers": {}}
+        entry["first"] = min(entry["first"], when)
+        entry["last"] = max(entry["last"], when)
+        bucket = str(when - when % BUCKET_SECONDS)
+        entry["b"][bucket] = entry["b"].get(bucket, 0) + 1
+        entry["t"][etype] = entry["t"].get(etype, 0) + 1
+        if peer is not None and (peer in entry["peers"] or len(entry["peers"]) < MAX_PEERS):
+            entry["peers"][peer] = entry["peers"].get(peer, 0) + 1
+
+    def feed(self, line, year=None, horizon=0):
+        """Fold one log line (bytes) in; returns True if it was a failed-auth event."""
+        parsed = parse_security_line(line)
+        if parsed is None:
+            return False
+        stamp = freepbx_log_index.line_timestamp(line, year) if freepbx_log_index else None
+        if stamp is not None:
+            if stamp != self._stamp:
+                self._stamp, self._epoch = stamp, int(freepbx_log_index.stamp_epoch(stamp))
+            when = self._epoch
+        else:
+            when = int(time.time())
+        if when < horizon:
+            return False
+        etype, ip, endpoint = parsed
+        bucket = str(when - when % BUCKET_SECONDS)
+        self.events[bucket] = self.events.get(bucket, 0) + 1
+        if ip:
+            self._count("ip", ip, endpoint, etype, when)
+        if endpoint:
+            self._count("endpoint", endpoint, ip, etype, when)
+        return True
+
+    def update(self, log=FULL_LOG):
+        """Read every log file in the retention window from its checkpoint and
+        save; returns (files read, events, bytes)."""
+        self._stamp = self._epoch = None
+        horizon = time.time() - RETENTION_HOURS * 3600
+        files_read = events = nbytes = 0
+        for path in security_logs(log):
+            try:
+                year = (freepbx_log_index.file_year(os.path.getmtime(path))
+                        if freepbx_log_index else None)
+                with _open(path) as f:
+                    fp = _fingerprint(f)
+                    if fp is None:
+                        continue
+                    cp = self.files.get(fp)
+                    if cp is not None:
+                        offset = cp["offset"]
+                        if not path.endswith(".gz") and offset > os.fstat(f.fileno()).st_size:
+                            offset = 0  # same first line but shorter: rewritten, start over
+                    else:
+                        offset = _first_offset(path, RETENTION_HOURS) if path == log else 0
+                    f.seek(offset)
+                    pos = offset
+                    feed = self.feed
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break  # partial last line: next run
+                        pos += len(line)
+                        if feed(line, year, horizon):
+                            events += 1
+                    if pos != offset:
+                        files_read += 1
+                        nbytes += pos - offset
+                    self.files[fp] = {"path": path, "offset": pos, "seen": int(time.time())}
+            except (OSError, EOFError) as e:
+                print(f"{Colors.YELLOW}⚠️  {path}: {e}{Colors.RESET}", file=sys.stderr)
+        self.save()
+        return files_read, events, nbytes
+
+    # -- querying -----------------------------------------------------------
+
+    def top(self, hours=24, limit=10, by="ip", now=None):
+        """[(key, info)] of the `limit` busiest offenders over the last `hours`.
+
+        info = {"count", "first", "last", "types", "peers"}; count sums the
+        BUCKET_SECONDS buckets overlapping the window, first / last are the
+        all-time (within retention) first and last failed attempts.
+        """
+        now = now or time.time()
+        since = now - min(hours, RETENTION_HOURS) * 3600
+        rows = []
+        for key, entry in self.tables[by].items():
+            if entry["last"] < since:
+                continue
+            count = sum(n for b, n in entry["b"].items() if int(b) + BUCKET_SECONDS > since)
+            if count:
+                rows.append((key, {
+                    "count": count, "first": entry["first"], "last": entry["last"],
+                    "types": sorted(entry["t"].items(), key=lambda x: -x[1]),
+                    "peers": sorted(entry["peers"].items(), key=lambda x: -x[1]),
+                }))
+        rows.sort(key=lambda r: (-r[1]["count"], -r[1]["last"]))
+        return rows[:limit]
+
+    def total(self, hours=24, now=None):
+        """Failed-auth events over the last `hours`, each counted once."""
+        now = now or time.time()
+        since = now - min(hours, RETENTION_HOURS) * 3600
+        return sum(n for b, n in self.events.items() if int(b) + BUCKET_SECONDS > since)
+
+
+def top_offenders(hours=24, limit=10, log=FULL_LOG, state=STATE_PATH, update=True):
+    """One-call helper: {"ip": [...], "endpoint": [...], "total": n} for the last `hours`.
+
+    Raises OSError if neither the state nor the log can be read.
+    """
+    stats = SecurityStats(state)
+    if update:
+        if not os.path.isfile(log):
+            raise OSError("log not found: %s" % log)
+        stats.update(log)
+    return {"hours": hours, "total": stats.total(hours),
+            "ip": stats.top(hours, limit, "ip"), "endpoint": stats.top(hours, limit, "endpoint")}
+
+
+# ---------------------------
+# Output
+# ---------------------------
+
+def _when(epoch):
+    return time.strftime("%m-%d %H:%M", time.localtime(epoch))
+
+
+def print_report(rep):
+    hours = rep["hours"]
+    print(f"\n{Colors.CYAN}{Colors.BOLD}{'=' * 90}")
+    print(f"  🔒 FAILED AUTHENTICATION — last {hours}h  ({rep['total']} event(s))")
+    print(f"{'=' * 90}{Colors.RESET}")
+    for by, title, peer_label in (("ip", "Source IP", "endpoints tried"),
+                                  ("endpoint", "Endpoint", "from IPs")):
+        rows = rep[by]
+        print(f"\n{Colors.WHITE}{Colors.BOLD}  {title}s{Colors.RESET}")
+        if not rows:
+            print(f"  {Colors.GREEN}✅ none{Colors.RESET}")
+            continue
+        header = f"  {title:<28}{'Events':>8}  {'First seen':<13}{'Last seen':<13}{'Top type':<22}{peer_label}"
+        print(Colors.WHITE + header + Colors.RESET)
+        print(Colors.CYAN + "  " + "─" * (len(header) + 8) + Colors.RESET)
+        for key, info in rows:
+            color = Colors.RED if info["count"] >= 100 else Colors.YELLOW if info["count"] >= 20 else Colors.WHITE
+            top_type = info["types"][0][0] if info["types"] else ""
+            peers = ", ".join(p for p, _n in info["peers"][:4])
+            print(f"  {color}{key[:27]:<28}{info['count']:>8}{Colors.RESET}  {_when(info['first']):<13}"
+                  f"{_when(info['last']):<13}{top_type[:21]:<22}{peers[:40]}")
+    print("")
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+
+def main():
+    import argparse
+    ap = argparse.ArgumentParser(description="Top failed-authentication offenders (per IP and per "
+                                             "endpoint) from the Asterisk full log")
+    ap.add_argument("--log", default=FULL_LOG, help=f"Full log path (default: {FULL_LOG})")
+    ap.add_argument("--state", default=STATE_PATH, help=f"Aggregator state file (default: {STATE_PATH})")
+    ap.add_argument("--hours", type=int, default=24,
+                    help=f"Window in hours (default: 24, at most {RETENTION_HOURS})")
+    ap.add_argument("--top", type=int, default=10, help="Offenders per table (default: 10)")
+    ap.add_argument("--json", metavar="FILE", help="Write the report as JSON ('-' for stdout)")
+    ap.add_argument("--no-update", action="store_true", help="Report from the saved state without reading the log")
+    ap.add_argument("--rebuild", action="store_true", help="Forget the saved state and re-read the retention window")
+    args = ap.parse_args()
+
+    quiet = args.json == "-"
+    if args.hours > RETENTION_HOURS and not quiet:
+        print(f"{Colors.YELLOW}⚠️  Only the last {RETENTION_HOURS}h are kept; reporting those{Colors.RESET}")
+    stats = SecurityStats(args.state)
+    if args.rebuild:
+        stats.reset()
+    if not args.no_update:
+        if not os.path.isfile(args.log):
+            print(f"{Colors.RED}❌ Log not found: {args.log}{Colors.RESET}")
+            return 1
+        t0 = time.time()
+        files, events, nbytes = stats.update(args.log)
+        if not quiet:
+            print(f"{Colors.CYAN}📥 Folded {events:,} new failed-auth event(s) from {files} file(s) "
+                  f"({nbytes / 1048576.0:,.1f} MB) in {time.time() - t0:.1f}s{Colors.RESET}")
+    rep = {"hours": min(args.hours, RETENTION_HOURS), "total": stats.total(args.hours),
+           "ip": stats.top(args.hours, args.top, "ip"),
+           "endpoint": stats.top(args.hours, args.top, "endpoint")}
+
+    if args.json:
+        text = json.dumps(rep, indent=2, sort_keys=True)
+        if args.json == "-":
+            print(text)
+        else:
+            with open(args.json, "w") as f:
+                f.write(text + "\n")
+            print(f"{Colors.GREEN}✅ Wrote {args.json}{Colors.RESET}")
+    if not quiet:
+        print_report(rep)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -4,7 +4,7 @@
 freepbx_tc_status.py
 --------------------
 Report Time Condition override state + last feature-code (*<id>) use from CDRs.
-- Python 3.6 friendly (uses mysql CLI via subprocess)
+- Python 3.6 friendly (uses the mysql CLI via freepbx_db)
 - No external modules needed
 
 VARIABLE MAP (Key Script Variables)
@@ -42,6 +42,13 @@ See function docstrings for additional details on arguments and return values.
 import argparse, subprocess, os, sys, re
 from datetime import datetime
 
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
+try:
+    import freepbx_ami  # AstDB reads over one AMI connection, else asterisk -rx
+except ImportError:
+    freepbx_ami = None
+
 # ANSI Color codes
 class Colors:
     CYAN = '\033[96m'
@@ -73,19 +80,7 @@ MYSQL_BIN       = "mysql"
 ASTERISK_CLI    = "/usr/sbin/asterisk"
 
 def run_mysql(sql, db, user="root", password=None, socket=None):
-    env = os.environ.copy()
-    if password:
-        env["MYSQL_PWD"] = password
-    cmd = [MYSQL_BIN]
-    if user:   cmd += ["--user", str(user)]
-    if socket: cmd += ["--socket", str(socket)]
-    if db:     cmd += [str(db)]
-    cmd += ["-BN", "-e", sql]
-    p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                       universal_newlines=True, env=env)
-    if p.returncode != 0:
-        raise RuntimeError("mysql error ({}):\n{}".format(db, p.stderr.strip()))
-    return p.stdout
+    return freepbx_db.run_mysql(sql, socket=socket, user=user, password=password, db=db)
 
 def timeconditions_list(mysql_kw):
     """
@@ -221,17 +216,26 @@ def parse_astdb_states():
     Different FreePBX versions use slightly different families; try several.
     We’ll return dict: { <id>: 'MATCHED'|'UNMATCHED' } (meaning forced state)
     """
-    if not os.path.exists(ASTERISK_CLI):
+    ami = freepbx_ami is not None and freepbx_ami.get_client() is not None
+    if not ami and not os.path.exists(ASTERISK_CLI):
         return {}
     # Collect database listings
     patterns = ["TC/", "TIMECONDITION/", "TIMECOND/"]
     states = {}
     for pat in patterns:
-        try:
-            out = subprocess.check_output([ASTERISK_CLI, "-rx", "database show {}".format(pat)],
-                                          universal_newlines=True, stderr=subprocess.DEVNULL)
-        except Exception:
-            continue
+        out = None
+        if ami:
+            try:
+                rows = freepbx_ami.db_tree(pat)
+                out = "\n".join("{} : {}".format(k, v) for k, v in sorted(rows.items()))
+            except freepbx_ami.AMIError:
+                out = None
+        if out is None:
+            try:
+                out = subprocess.check_output([ASTERISK_CLI, "-rx", "database show {}".format(pat)],
+                                              universal_newlines=True, stderr=subprocess.DEVNULL)
+            except Exception:
+                continue
         for line in out.splitlines():
             # Example lines:
             #  /TC/273                                   : UNMATCHED
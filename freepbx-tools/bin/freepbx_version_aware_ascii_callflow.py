@@ -52,6 +52,9 @@ import re
 import time
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+import freepbx_db
+
 # ANSI Color codes
 class Colors:
     CYAN = '\033[96m'
@@ -83,6 +86,8 @@ class FreePBXUniversalCollector:
         self.all_tables = []
         self.schema_map = {}
         self.data = {}
+        self.index = {}      # component -> {str(key): row} (built by _build_indexes)
+        self.timings = []    # [(phase, seconds)] for the --all summary
         
     def analyze_system(self):
         """Complete system analysis with version detection and schema discovery."""
@@ -91,10 +96,12 @@ class FreePBXUniversalCollector:
         print(Colors.CYAN + Colors.BOLD + "╚" + "═" * 78 + "╝" + Colors.RESET)
         
         # Phase 1: Version Detection
+        t0 = time.time()
         self._detect_asterisk_version()
         self._detect_freepbx_version()
         self._detect_database_version()
         self._discover_all_tables()
+        self.timings.append(("Version detection", time.time() - t0))
         
         # System Profile Box
         print(Colors.CYAN + "\n╔" + "═" * 78 + "╗" + Colors.RESET)
@@ -109,10 +116,14 @@ class FreePBXUniversalCollector:
         print(Colors.CYAN + "╚" + "═" * 78 + "╝" + Colors.RESET)
         
         # Phase 2: Schema Discovery
+        t0 = time.time()
         self._discover_schema_mappings()
+        self.timings.append(("Schema discovery", time.time() - t0))
         
         # Phase 3: Data Collection
+        t0 = time.time()
         self._collect_all_data()
+        self.timings.append(("Data collection", time.time() - t0))
         
     def _detect_asterisk_version(self):
         """Detect Asterisk version with Python 3.6 compatibility."""
@@ -733,7 +744,42 @@ class FreePBXUniversalCollector:
         padding = " " * max(0, 78 - len(visible_text))
         print(Colors.CYAN + "║" + summary_line + padding + "║" + Colors.RESET)
         print(Colors.CYAN + "╚" + "═" * 78 + "╝" + Colors.RESET)
+
+        self._build_indexes()
     
+    # Lookup key per component for the _find_* helpers; ivr_options is
+    # grouped (one menu -> many rows), the rest map one key -> first row.
+    INDEX_KEYS = {
+        'time_conditions': 'id',
+        'ring_groups': 'group_num',
+        'ivr_menus': 'id',
+        'extensions': 'extension',
+        'setcid': 'id',
+        'misc_destinations': 'id',
+    }
+
+    def _build_indexes(self):
+        """Hash the collected rows by id once, so every _find_* is a dict hit
+        instead of a str()-comparing scan per tree node."""
+        self.index = {}
+        for component, key in self.INDEX_KEYS.items():
+            idx = {}
+            for row in self.data.get(component) or []:
+                idx.setdefault(str(row.get(key)), row)
+            self.index[component] = idx
+        grouped = defaultdict(list)
+        for opt in self.data.get('ivr_options') or []:
+            grouped[str(opt.get('ivr_id'))].append(opt)
+        self.index['ivr_options'] = dict(grouped)
+
+    def print_timings(self):
+        """Print how long each phase took (version detection → rendering)."""
+        print(Colors.CYAN + "\n⏱  Phase timings:" + Colors.RESET)
+        for phase, secs in self.timings:
+            print(f"   {Colors.WHITE}{phase:<20}{Colors.RESET} {Colors.GREEN}{secs:8.3f}s{Colors.RESET}")
+        total = sum(secs for _phase, secs in self.timings)
+        print(f"   {Colors.BOLD}{'Total':<20} {total:8.3f}s{Colors.RESET}")
+
     def _format_sample_item(self, component, item):
         """Format a sample item for display."""
         if component == 'inbound_routes':
@@ -829,22 +875,12 @@ class FreePBXUniversalCollector:
         return {}
         
     def _query(self, sql):
-        """Execute MySQL query with Python 3.6 compatibility."""
-        cmd = ["mysql", "-NBe", sql, "asterisk", "-u", self.user]
-        if self.socket:
-            cmd.extend(["-S", self.socket])
-            
+        """Execute MySQL query on the shared freepbx_db session."""
         try:
-            # Python 3.6 compatible subprocess call
-            result = subprocess.run(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                universal_newlines=True, 
-                timeout=30
-            )
-            return result.stdout.strip() if result.returncode == 0 else None
-        except Exception as e:
+            out = freepbx_db.run_mysql(sql, socket=self.socket, user=self.user,
+                                       db="asterisk", timeout=30)
+            return out.strip()
+        except Exception:
             return None
 
     def generate_ascii_callflow(self, did=None):
@@ -857,10 +893,12 @@ class FreePBXUniversalCollector:
             print(Colors.RED + "\n   ⚠ No inbound routes found - cannot generate call flows" + Colors.RESET)
             return
         
+        t0 = time.time()
         if did:
             self._generate_single_did_flow(did)
         else:
             self._generate_all_flows()
+        self.timings.append(("Rendering", time.time() - t0))
     
     def _generate_all_flows(self):
         """Generate ASCII call flows for all inbound routes."""
@@ -1394,10 +1432,7 @@ class FreePBXUniversalCollector:
     
     def _find_time_condition(self, tc_id):
         """Find time condition by ID."""
-        for tc in self.data.get('time_conditions', []):
-            if str(tc.get('id')) == str(tc_id):
-                return tc
-        return None
+        return self.index.get('time_conditions', {}).get(str(tc_id))
     
     def _get_time_condition_labels(self, tc):
         """Generate appropriate labels for time condition branches based on condition type"""
@@ -1439,46 +1474,27 @@ class FreePBXUniversalCollector:
     
     def _find_ring_group(self, rg_id):
         """Find ring group by ID."""
-        for rg in self.data.get('ring_groups', []):
-            if str(rg.get('group_num')) == str(rg_id):
-                return rg
-        return None
+        return self.index.get('ring_groups', {}).get(str(rg_id))
     
     def _find_ivr_menu(self, ivr_id):
         """Find IVR menu by ID."""
-        for ivr in self.data.get('ivr_menus', []):
-            if str(ivr.get('id')) == str(ivr_id):
-                return ivr
-        return None
+        return self.index.get('ivr_menus', {}).get(str(ivr_id))
     
     def _find_ivr_options(self, ivr_id):
         """Find IVR options for menu ID."""
-        options = []
-        for opt in self.data.get('ivr_options', []):
-            if str(opt.get('ivr_id')) == str(ivr_id):
-                options.append(opt)
-        return options
+        return self.index.get('ivr_options', {}).get(str(ivr_id), [])
     
     def _find_extension(self, ext_id):
         """Find extension by ID."""
-        for ext in self.data.get('extensions', []):
-            if str(ext.get('extension')) == str(ext_id):
-                return ext
-        return None
+        return self.index.get('extensions', {}).get(str(ext_id))
     
     def _find_setcid(self, setcid_id):
         """Find Set Caller ID by ID."""
-        for setcid in self.data.get('setcid', []):
-            if str(setcid.get('id')) == str(setcid_id):
-                return setcid
-        return None
+        return self.index.get('setcid', {}).get(str(setcid_id))
     
     def _find_misc_destination(self, misc_id):
         """Find Misc Destination by ID."""
-        for misc in self.data.get('misc_destinations', []):
-            if str(misc.get('id')) == str(misc_id):
-                return misc
-        return None
+        return self.index.get('misc_destinations', {}).get(str(misc_id))
     
     def _describe_callerid_transformation(self, name_template, num_template):
         """Describe what the caller ID transformation will do"""
@@ -1554,7 +1570,8 @@ def main():
     parser.add_argument("--print-data", action="store_true", help="Print collected data")
     parser.add_argument("--detailed", action="store_true", help="Show detailed output")
     parser.add_argument("--did", help="Generate ASCII call flow for specific DID")
-    parser.add_argument("--generate-flow", action="store_true", help="Generate ASCII call flow diagrams")
+    parser.add_argument("--generate-flow", "--all", dest="generate_flow", action="store_true",
+                        help="Generate ASCII call flow diagrams for all DIDs (prints phase timings)")
     parser.add_argument("--export", metavar="PATH", help="Write all collected data to PATH as JSON")
     
     args = parser.parse_args()
@@ -1588,6 +1605,7 @@ def main():
         
     if args.generate_flow:
         collector.generate_ascii_callflow()
+        collector.print_timings()
 
     if args.export:
         with open(args.export, "w") as f: